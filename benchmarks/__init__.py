@@ -0,0 +1,4 @@
+'''
+Benchmarks package initialization.
+Benchmark suite for the patron data paths, run on the embedded SQLite backend.
+'''
@@ -0,0 +1,423 @@
+'''
+Load test for the HTTP service of the Client Management System.
+Starts server.py on a synthetic SQLite table, or targets a running server,
+and drives it with many concurrent keep-alive clients sending a mix of
+reads and writes. Throughput and latency percentiles are printed per
+request type and saved for later comparison.
+
+Usage (from the project root):
+
+    python3 -m benchmarks.load_test --rows 100000 --concurrency 32 --duration 30
+    python3 -m benchmarks.load_test --url http://127.0.0.1:8080 --rows 100000
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+from benchmarks.run import DATA_DIR, RESULTS_DIR, _git_commit, percentile
+from benchmarks.synthetic import create_database
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Request types and their share of the mix
+REQUEST_MIX = {
+    "get": 40,
+    "list": 15,
+    "search": 15,
+    "update": 15,
+    "aggregate": 5,
+    "create_delete": 9,
+    "stream": 1
+}
+
+# Search fragments, taken from the synthetic name syllables
+_FRAGMENTS = ("an", "ber", "cal", "dra", "el", "fin", "gor", "hal", "mar", "ros")
+
+# Clients created by the test get IDs above this offset past the table
+_CREATED_ID_OFFSET = 1000000
+
+# Seconds to wait for a started server to answer
+STARTUP_TIMEOUT = 60
+
+class HTTPConnection:
+    '''Minimal keep-alive HTTP/1.1 client connection.'''
+    
+    def __init__(self, host, port):
+        '''
+        Initialize a closed connection.
+        
+        Args:
+            host (str): Server address
+            port (int): Server port
+        '''
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def request(self, method, path, body=None, headers=None):
+        '''
+        Send a request and read the whole response.
+        
+        Args:
+            method (str): Request method
+            path (str): Path and query string
+            body (dict, optional): Value sent as a JSON body
+            headers (dict, optional): Extra request headers
+        
+        Returns:
+            tuple: (status code, lower-case header dict, body bytes)
+        '''
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                 f"Content-Length: {len(payload)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await self.writer.drain()
+        
+        try:
+            status = int((await self.reader.readline()).split()[1])
+        except (IndexError, ValueError):
+            await self.close()
+            raise ConnectionError("Server closed the connection") from None
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        
+        if response_headers.get("transfer-encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            data = b"".join(chunks)
+        else:
+            data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, response_headers, data
+    
+    async def close(self):
+        '''Close the connection.'''
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.reader = self.writer = None
+
+def build_requests(rows):
+    '''
+    Build one coroutine function per request type.
+    
+    Each takes an HTTPConnection and a random.Random and returns whether
+    the server answered as expected.
+    
+    Args:
+        rows (int): Number of clients in the table, with IDs 1..rows
+    
+    Returns:
+        dict: Request type -> coroutine function
+    '''
+    async def get(conn, rng):
+        status, _, _ = await conn.request("GET", f"/patrons/{rng.randint(1, rows)}")
+        return status in (200, 404)
+    
+    async def list_page(conn, rng):
+        status, _, _ = await conn.request(
+            "GET", f"/patrons?after={rng.randint(0, max(rows - 100, 0))}&limit=100")
+        return status == 200
+    
+    async def search(conn, rng):
+        field = rng.choice(("name", "preference"))
+        status, _, _ = await conn.request(
+            "GET", f"/search?field={field}&value={rng.choice(_FRAGMENTS)}&prefix=1&limit=50")
+        return status == 200
+    
+    async def update(conn, rng):
+        pat_id = rng.randint(1, rows)
+        status, headers, _ = await conn.request("GET", f"/patrons/{pat_id}")
+        if status != 200:
+            return status == 404
+        status, _, _ = await conn.request(
+            "PATCH", f"/patrons/{pat_id}", {"balance": round(rng.uniform(0, 5000), 2)},
+            {"If-Match": headers["etag"]})
+        # 412: another client changed the same row first
+        return status in (204, 404, 412)
+    
+    async def aggregate(conn, rng):
+        graph_type = rng.choice(("preference", "balance", "frequency"))
+        status, _, _ = await conn.request("GET", f"/aggregates/{graph_type}?mode=Histogram")
+        return status == 200
+    
+    async def create_delete(conn, rng):
+        pat_id = rows + _CREATED_ID_OFFSET + rng.randint(1, 10 ** 8)
+        status, _, _ = await conn.request("POST", "/patrons", {
+            "id": pat_id, "name": "Load Test", "balance": 10, "contact": 5550100,
+            "preference": "Tea", "frequency": 1})
+        if status != 201:
+            return status == 409
+        status, _, _ = await conn.request("DELETE", f"/patrons/{pat_id}")
+        return status == 204
+    
+    async def stream(conn, rng):
+        status, _, _ = await conn.request("GET", "/patrons.jsonl")
+        return status == 200
+    
+    return {"get": get, "list": list_page, "search": search, "update": update,
+            "aggregate": aggregate, "create_delete": create_delete, "stream": stream}
+
+async def run_load(host, port, rows, concurrency, duration, mix, seed=0):
+    '''
+    Send requests from many concurrent clients for a fixed time.
+    
+    Args:
+        host (str): Server address
+        port (int): Server port
+        rows (int): Number of clients in the table
+        concurrency (int): Concurrent connections
+        duration (float): Seconds to run
+        mix (dict): Request type -> weight
+        seed (int): Random seed
+    
+    Returns:
+        dict: Latencies in seconds and error count per request type, and
+              the elapsed time
+    '''
+    requests = build_requests(rows)
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+    
+    async def client(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = HTTPConnection(host, port)
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    ok = await requests[name](conn, rng)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError):
+                    ok = False
+                    await conn.close()
+                latencies[name].append(time.perf_counter() - start)
+                if not ok:
+                    errors[name] += 1
+        finally:
+            await conn.close()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    return {"latencies": latencies, "errors": errors, "elapsed": time.perf_counter() - start}
+
+def summarize(run):
+    '''
+    Compute throughput and latency percentiles from a load run.
+    
+    Args:
+        run (dict): Result of run_load
+    
+    Returns:
+        dict: Statistics per request type, plus "total"
+    '''
+    results = {}
+    everything = []
+    for name, values in run["latencies"].items():
+        if not values:
+            continue
+        everything += values
+        values = sorted(values)
+        results[name] = {
+            "requests": len(values),
+            "errors": run["errors"][name],
+            "requests_per_sec": len(values) / run["elapsed"],
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000
+        }
+    everything.sort()
+    if everything:
+        results["total"] = {
+            "requests": len(everything),
+            "errors": sum(run["errors"].values()),
+            "requests_per_sec": len(everything) / run["elapsed"],
+            "p50_ms": percentile(everything, 50) * 1000,
+            "p95_ms": percentile(everything, 95) * 1000,
+            "p99_ms": percentile(everything, 99) * 1000,
+            "max_ms": everything[-1] * 1000
+        }
+    return results
+
+def _free_port():
+    '''Return a TCP port that is free on the loopback interface.'''
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_until_ready(url, process):
+    '''Wait until a started server answers /health.'''
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"The server did not answer within {STARTUP_TIMEOUT} seconds")
+
+def start_server(rows, seed=0, pool_size=None):
+    '''
+    Start server.py on a copy of a synthetic SQLite table.
+    
+    The copy is written to by the test, so the table used by the benchmark
+    suite is left unchanged.
+    
+    Args:
+        rows (int): Number of clients in the table
+        seed (int): Random seed for the data
+        pool_size (int, optional): DB_POOL_SIZE for the server
+    
+    Returns:
+        tuple: (server process, base URL)
+    '''
+    source = create_database(os.path.join(DATA_DIR, f"patron_{rows}.sqlite"), rows, seed)
+    path = os.path.join(DATA_DIR, f"load_{rows}.sqlite")
+    shutil.copyfile(source, path)
+    
+    port = _free_port()
+    env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=path,
+               SNAPSHOT_CACHE_DIR=os.path.join(DATA_DIR, f"load_snapshot_{rows}"))
+    if pool_size:
+        env["DB_POOL_SIZE"] = str(pool_size)
+    process = subprocess.Popen([sys.executable, "server.py", "--port", str(port)],
+                               cwd=PROJECT_DIR, env=env)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_ready(url, process)
+    except Exception:
+        process.kill()
+        raise
+    return process, url
+
+def stop_server(process):
+    '''Stop a started server, letting it flush and close its connections.'''
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def main(argv=None):
+    '''
+    Run the load test from the command line.
+    
+    Args:
+        argv (list, optional): Arguments; defaults to sys.argv[1:]
+    
+    Returns:
+        int: Process exit status
+    '''
+    parser = argparse.ArgumentParser(description="Load test the HTTP service")
+    parser.add_argument("--url", help="running server to test instead of starting one")
+    parser.add_argument("--rows", type=int, default=100000,
+                        help="clients in the table; IDs are assumed to be 1..rows")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run")
+    parser.add_argument("--pool-size", type=int, help="DB_POOL_SIZE of a started server")
+    parser.add_argument("--mix", nargs="+", metavar="TYPE=WEIGHT",
+                        help=f"request weights, e.g. get=80 update=20 "
+                             f"(types: {', '.join(REQUEST_MIX)})")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--output",
+                        help="results file (default: benchmarks/results/load-<time>.json)")
+    args = parser.parse_args(argv)
+    
+    mix = dict(REQUEST_MIX)
+    if args.mix:
+        mix = {name: 0 for name in REQUEST_MIX}
+        for item in args.mix:
+            name, _, weight = item.partition("=")
+            if name not in REQUEST_MIX or not weight.isdigit():
+                parser.error(f"invalid --mix entry: {item}")
+            mix[name] = int(weight)
+    
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args.rows, args.seed, args.pool_size)
+    try:
+        target = urlsplit(url)
+        print(f"{args.concurrency} clients for {args.duration:g}s against {url}", file=sys.stderr)
+        run = asyncio.run(run_load(target.hostname, target.port or 80, args.rows,
+                                   args.concurrency, args.duration, mix, args.seed))
+    finally:
+        if process is not None:
+            stop_server(process)
+    
+    results = summarize(run)
+    print(f"{'request':16} {'count':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in results.items():
+        print(f"{name:16} {stats['requests']:8} {stats['errors']:7} "
+              f"{stats['requests_per_sec']:9.1f} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+              f"{stats['p99_ms']:9.2f} {stats['max_ms']:9.2f}")
+    
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "url": args.url or "started server (sqlite)",
+            "rows": args.rows,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": mix,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR,
+                                         "load-" + time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+    return 1 if results.get("total", {}).get("errors") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
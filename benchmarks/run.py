@@ -0,0 +1,358 @@
+'''
+Benchmark runner for the Client Management System.
+Measures the data paths behind each dialog on the SQLite backend and
+saves latency, throughput and memory figures for later comparison.
+
+Usage (from the project root):
+
+    python3 -m benchmarks.run --rows 10000 100000
+    python3 -m benchmarks.run --rows 1000000 --only search --compare benchmarks/results/old.json
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import create_database
+from database.backends import SQLiteBackend
+from database.cache import patron_cache
+from database.db_config import run_query, set_backend
+from database.search_index import MATCH_CONTAINS, MATCH_PREFIX, search_index
+from database.snapshot import PatronSnapshot, patron_snapshot
+from services.graphs import fetch_graph_data
+from services.records import (PAGE_SIZE, add_patron, delete_patron, fetch_page, find_patrons,
+                              get_patron, iter_patrons, update_patron)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Table sizes offered on the command line
+TABLE_SIZES = (10000, 100000, 1000000, 10000000)
+
+# Timed iterations per operation, unless the operation sets its own
+DEFAULT_ITERATIONS = 200
+
+# Iterations run under tracemalloc to find the peak memory of an operation
+MEMORY_ITERATIONS = 5
+
+class Operation:
+    '''One benchmarked operation.'''
+    
+    def __init__(self, name, run, iterations=None, warmup=3):
+        '''
+        Initialize the operation.
+        
+        Args:
+            name (str): "<area>.<operation>", e.g. "search.prefix"
+            run (callable): Called with a random.Random; may return a
+                zero-argument cleanup function that is run untimed
+            iterations (int, optional): Timed runs; defaults to the suite setting
+            warmup (int): Untimed runs before measuring
+        '''
+        self.name = name
+        self.run = run
+        self.iterations = iterations
+        self.warmup = warmup
+
+def build_operations(rows):
+    '''
+    Create the operations for a table of a given size.
+    
+    Args:
+        rows (int): Number of rows in the patron table
+    
+    Returns:
+        list: Operation instances
+    '''
+    def random_id(rng):
+        return rng.randint(1, rows)
+    
+    # Names sampled up front, so picking a search term is not timed
+    sample = random.Random(rows).sample(range(1, rows + 1), min(rows, 200))
+    placeholders = ", ".join(["%s"] * len(sample))
+    names = [row[0].lower() for row in run_query(
+        f"SELECT PAT_NAME FROM patron WHERE PAT_ID IN ({placeholders})", tuple(sample), fetch=True)]
+    
+    def random_name_fragment(rng, length):
+        name = rng.choice(names)
+        start = rng.randint(0, max(len(name) - length, 0))
+        return name[start:start + length]
+    
+    def uncached_lookup(rng):
+        run_query("SELECT * FROM patron WHERE PAT_ID = %s", (random_id(rng),), fetch=True)
+    
+    def cached_lookup(rng):
+        # A small hot set, as when a user opens the same few clients
+        get_patron(rng.randint(1, min(rows, 100)))
+    
+    def offset_page(rng):
+        # The query PatronRowSource falls back to when the scrollbar is dragged
+        offset = rng.randint(0, max(rows - PAGE_SIZE, 0))
+        run_query("SELECT * FROM patron ORDER BY PAT_ID LIMIT %s OFFSET %s",
+                  (PAGE_SIZE, offset), fetch=True)
+    
+    def stream_all(rng):
+        for _ in iter_patrons():
+            pass
+    
+    def like_scan(rng):
+        # The original leading-wildcard search, kept as a baseline
+        run_query("SELECT * FROM patron WHERE PAT_NAME LIKE %s",
+                  (f"%{random_name_fragment(rng, 3)}%",), fetch=True)
+    
+    def index_build(rng):
+        search_index.invalidate()
+        search_index.search_ids("PAT_NAME", "ann")
+    
+    def update(rng):
+        update_patron(random_id(rng), {"balance": round(rng.uniform(0, 5000), 2)})
+    
+    def delete(rng):
+        pat_id = random_id(rng)
+        row = get_patron(pat_id)
+        delete_patron(pat_id)
+        fields = ("id", "name", "balance", "contact", "preference", "frequency")
+        return lambda: add_patron(dict(zip(fields, row))) if row else None
+    
+    def graph(graph_type, mode, source="sql"):
+        return lambda rng: fetch_graph_data(graph_type, mode, source=source)
+    
+    def snapshot_load(rng):
+        patron_snapshot.invalidate()
+        patron_snapshot.sync()
+    
+    def snapshot_warm_start(rng):
+        # A new process mapping the copy saved by snapshot.load; the
+        # background check against the database is left out of the timing
+        snapshot = PatronSnapshot(cache_dir=patron_snapshot.cache_dir)
+        snapshot.histogram("balance", 20)
+        return lambda: snapshot.sync(wait=True)
+    
+    # Full scans are expensive on the large tables; run them fewer times
+    scan_iterations = max(3, min(DEFAULT_ITERATIONS, 2000000 // rows))
+    
+    return [
+        Operation("execute_query.point_lookup", uncached_lookup),
+        Operation("cache.point_lookup", cached_lookup),
+        Operation("display.first_page", lambda rng: fetch_page(limit=PAGE_SIZE)),
+        Operation("display.keyset_page",
+                  lambda rng: fetch_page(after_id=random_id(rng), limit=PAGE_SIZE)),
+        Operation("display.offset_page", offset_page, iterations=scan_iterations),
+        Operation("display.stream_all", stream_all, iterations=3, warmup=0),
+        Operation("search.like_scan", like_scan, iterations=scan_iterations),
+        Operation("search.prefix",
+                  lambda rng: find_patrons("Name", random_name_fragment(rng, 3), MATCH_PREFIX)),
+        Operation("search.trigram_build", index_build, iterations=3, warmup=0),
+        Operation("search.contains",
+                  lambda rng: find_patrons("Name", random_name_fragment(rng, 4), MATCH_CONTAINS)),
+        Operation("modify.update", update),
+        Operation("delete.delete", delete),
+        Operation("graphs.preference", graph("preference", "Auto"), iterations=scan_iterations),
+        Operation("graphs.histogram", graph("balance", "Histogram"), iterations=scan_iterations),
+        Operation("graphs.percentiles", graph("balance", "Percentiles"), iterations=scan_iterations),
+        Operation("graphs.top_n", graph("balance", "Top N"), iterations=scan_iterations),
+        Operation("snapshot.load", snapshot_load, iterations=3, warmup=0),
+        Operation("snapshot.warm_start", snapshot_warm_start, iterations=10),
+        Operation("snapshot.preference", graph("preference", "Auto", "snapshot")),
+        Operation("snapshot.histogram", graph("balance", "Histogram", "snapshot")),
+        Operation("snapshot.top_n", graph("balance", "Top N", "snapshot")),
+        Operation("snapshot.percentiles",
+                  lambda rng: patron_snapshot.percentiles("balance", (5, 50, 95, 99)))
+    ]
+
+def percentile(sorted_values, pct):
+    '''
+    Return a percentile of already sorted values (nearest rank).
+    
+    Args:
+        sorted_values (list): Values in ascending order
+        pct (float): Percentile between 0 and 100
+    
+    Returns:
+        float: The percentile value
+    '''
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def measure(operation, iterations, seed=0):
+    '''
+    Time an operation and measure its peak Python memory.
+    
+    Args:
+        operation (Operation): Operation to run
+        iterations (int): Timed runs, unless the operation sets its own
+        seed (int): Random seed, so runs are comparable
+    
+    Returns:
+        dict: Latency percentiles in ms, throughput in ops/sec and peak
+              memory in bytes
+    '''
+    rng = random.Random(seed)
+    iterations = operation.iterations or iterations
+    
+    def run_once():
+        cleanup = operation.run(rng)
+        if callable(cleanup):
+            cleanup()
+    
+    for _ in range(operation.warmup):
+        run_once()
+    
+    latencies = []
+    total = 0.0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        cleanup = operation.run(rng)
+        elapsed = time.perf_counter() - start
+        if callable(cleanup):
+            cleanup()
+        latencies.append(elapsed)
+        total += elapsed
+    
+    # Memory is measured separately since tracing slows everything down
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(min(MEMORY_ITERATIONS, iterations)):
+        run_once()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "ops_per_sec": iterations / total if total else 0.0,
+        "peak_memory_bytes": max(peak, 0)
+    }
+
+def run_suite(sizes, iterations=DEFAULT_ITERATIONS, only=None, seed=0, out=None):
+    '''
+    Run every operation against each table size.
+    
+    Args:
+        sizes (list): Table sizes to benchmark
+        iterations (int): Default timed runs per operation
+        only (list, optional): Operation name prefixes to run, e.g. ["search"]
+        seed (int): Random seed for data and operations
+        out (file, optional): Stream for progress output; defaults to stderr
+    
+    Returns:
+        dict: Results keyed by table size, then operation name
+    '''
+    out = out or sys.stderr
+    results = {}
+    
+    for rows in sizes:
+        path = os.path.join(DATA_DIR, f"patron_{rows}.sqlite")
+        start = time.perf_counter()
+        create_database(path, rows, seed)
+        print(f"{rows:,} rows: database ready in {time.perf_counter() - start:.1f}s", file=out)
+        
+        set_backend(SQLiteBackend(path))
+        patron_cache.clear()
+        search_index.invalidate()
+        patron_snapshot.invalidate()
+        patron_snapshot.cache_dir = os.path.join(DATA_DIR, f"snapshot_{rows}")
+        
+        results[str(rows)] = {}
+        for operation in build_operations(rows):
+            if only and not any(operation.name.startswith(prefix) for prefix in only):
+                continue
+            stats = measure(operation, iterations, seed)
+            results[str(rows)][operation.name] = stats
+            print(f"  {operation.name:28} p50 {stats['p50_ms']:9.3f} ms  "
+                  f"p99 {stats['p99_ms']:9.3f} ms  {stats['ops_per_sec']:10.1f} ops/s  "
+                  f"peak {stats['peak_memory_bytes'] / 1024:9.1f} KiB", file=out)
+        
+        set_backend(None)
+    
+    return results
+
+def _git_commit():
+    '''Return the current git commit, or None outside a git checkout.'''
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, previous, out=None):
+    '''
+    Print the p50 latency change of each operation against an earlier run.
+    
+    Args:
+        current (dict): Results of this run
+        previous (dict): Results loaded from an earlier results file
+        out (file, optional): Output stream; defaults to stdout
+    '''
+    out = out or sys.stdout
+    print(f"{'rows':>10}  {'operation':28} {'old p50':>10} {'new p50':>10} {'change':>8}", file=out)
+    for rows, operations in current.items():
+        for name, stats in operations.items():
+            old = previous.get(rows, {}).get(name)
+            if not old:
+                continue
+            change = (stats["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+            print(f"{rows:>10}  {name:28} {old['p50_ms']:10.3f} {stats['p50_ms']:10.3f} "
+                  f"{change:+7.1f}%", file=out)
+
+def main(argv=None):
+    '''
+    Run the benchmark suite from the command line.
+    
+    Args:
+        argv (list, optional): Arguments; defaults to sys.argv[1:]
+    
+    Returns:
+        int: Process exit status
+    '''
+    parser = argparse.ArgumentParser(description="Benchmark the patron data paths")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000],
+                        help=f"table sizes, e.g. {' '.join(map(str, TABLE_SIZES))}")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help="timed runs per operation")
+    parser.add_argument("--only", nargs="+",
+                        help="operation name prefixes to run, e.g. search graphs.histogram")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    
+    results = run_suite(args.rows, args.iterations, args.only, args.seed)
+    
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": f"sqlite {sqlite3.sqlite_version}",
+            "iterations": args.iterations,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
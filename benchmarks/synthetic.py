@@ -0,0 +1,103 @@
+'''
+Synthetic data module for the benchmark suite.
+Generates SQLite patron tables of any size for the SQLite backend to run on.
+'''
+
+import os
+import random
+import sqlite3
+
+from database.patron import PATRON_COLUMNS
+from database.migrations import MIGRATIONS, SCHEMA_MIGRATIONS_TABLE
+from database.schema import schema_statements
+
+# Building blocks for synthetic names and preferences
+_SYLLABLES = ("an", "ber", "cal", "dra", "el", "fin", "gor", "hal", "is", "jo",
+              "ka", "lin", "mar", "nor", "ol", "pe", "quin", "ros", "sa", "tor",
+              "ul", "ve", "wen", "xa", "yor", "zel")
+_PREFERENCES = ("Books", "Music", "Movies", "Sports", "Travel", "Cooking", "Gaming",
+                "Art", "Fashion", "Technology", "Gardening", "Fitness", "Photography",
+                "Theatre", "Wine", "Coffee", "Tea", "Hiking", "Cycling", "Crafts")
+
+# Rows inserted per transaction while generating a table
+GENERATE_BATCH = 50000
+
+def synthetic_rows(count, seed=0, start_id=1):
+    '''
+    Generate reproducible patron rows.
+    
+    Args:
+        count (int): Number of rows
+        seed (int): Random seed
+        start_id (int): PAT_ID of the first row
+    
+    Yields:
+        tuple: Patron row in table column order
+    '''
+    rng = random.Random(seed)
+    for pat_id in range(start_id, start_id + count):
+        first = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        last = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        yield (pat_id,
+               f"{first} {last}",
+               round(rng.lognormvariate(6, 1), 2),
+               rng.randint(1000000, 9999999),
+               rng.choice(_PREFERENCES),
+               int(rng.expovariate(0.1)))
+
+def create_database(path, rows, seed=0):
+    '''
+    Create a SQLite database holding a synthetic patron table.
+    
+    An existing file with the requested number of rows is reused, since
+    generating the largest tables takes minutes.
+    
+    Args:
+        path (str): SQLite database file
+        rows (int): Number of patron rows
+        seed (int): Random seed
+    
+    Returns:
+        str: The database path
+    '''
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            existing = conn.execute("SELECT COUNT(*) FROM patron").fetchone()[0]
+        except sqlite3.Error:
+            existing = None
+        conn.close()
+        if existing == rows:
+            return path
+        os.remove(path)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        statements = schema_statements("sqlite")
+        conn.execute(statements[0])
+        
+        generated = synthetic_rows(rows, seed)
+        while True:
+            batch = [row for _, row in zip(range(GENERATE_BATCH), generated)]
+            if not batch:
+                break
+            conn.executemany(f"INSERT INTO patron ({', '.join(PATRON_COLUMNS)}) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", batch)
+            conn.commit()
+        
+        # Indexes are built after loading, which is much faster than
+        # maintaining them row by row
+        for statement in statements[1:]:
+            conn.execute(statement)
+        
+        # The schema is current, so the backend has no migrations to run
+        conn.execute(SCHEMA_MIGRATIONS_TABLE)
+        conn.executemany("INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                         [(version, name) for version, name, _ in MIGRATIONS])
+        conn.commit()
+    finally:
+        conn.close()
+    return path
@@ -0,0 +1,437 @@
+'''
+Client Management System
+Command line entry point for scripted and batch use.
+
+Runs the same patron operations as the GUI through the service layer, without
+importing tkinter or matplotlib, so it starts quickly and works on servers
+without a display. Query results are streamed to stdout as CSV or JSON Lines.
+
+Examples:
+    python3 cli.py list --format jsonl > patrons.jsonl
+    python3 cli.py search name ann --prefix
+    python3 cli.py update 42 --balance 120.5
+    python3 cli.py bulk-update --where frequency '>' 10 --preference Email
+    python3 cli.py bulk-delete --ids 3,7,10-20 && python3 cli.py purge
+    python3 cli.py import new_clients.csv
+    python3 cli.py export clients.csv.gz --field preference --value tea
+    python3 cli.py --query-stats stats.json list > /dev/null
+    python3 cli.py migrate --status
+    python3 cli.py check-plans --format jsonl
+'''
+
+import argparse
+import csv
+import json
+import sys
+
+from database import db_config
+from database.db_config import close_pool, get_backend, get_pool
+from database.instrumentation import dump_query_stats
+from database.migrations import migrate, migration_status
+from database.patron import PATRON_COLUMNS, PATRON_FIELDS
+from database.pool import PoolTimeoutError
+from database.search_index import MATCH_CONTAINS, MATCH_PREFIX
+from database.write_behind import write_queue
+from services.records import (STREAM_BATCH_SIZE, add_patron, delete_patron, find_patrons,
+                              get_patron, iter_patrons, update_patron)
+from services.bulk_import import IMPORT_CHUNK_SIZE, import_patrons
+from services.bulk_modify import (BULK_CHUNK_SIZE, FILTER_OPERATORS, bulk_delete, bulk_update,
+                                  parse_ids, preview_bulk_update)
+from services.chart_modes import CHART_MODES
+from services.export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, export_patrons
+from services.purge import PURGE_CONFIG, count_deleted, purge_deleted
+
+# Output formats for query results
+OUTPUT_FORMATS = ("csv", "jsonl")
+
+def write_rows(rows, columns, fmt="csv", out=None):
+    '''
+    Write rows to a stream as they are produced.
+    
+    Args:
+        rows (iterable): Row tuples
+        columns (tuple): Column names, written as the CSV header or JSON keys
+        fmt (str): "csv" or "jsonl"
+        out (file, optional): Output stream; defaults to stdout
+    
+    Returns:
+        int: Number of rows written
+    '''
+    out = out or sys.stdout
+    count = 0
+    
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(dict(zip(columns, row)), default=str))
+            out.write("\n")
+            count += 1
+    
+    return count
+
+def _field_values(args):
+    '''
+    Collect patron field values given as command line options.
+    
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    
+    Returns:
+        dict: Field name -> raw value for every option that was given
+    '''
+    return {field: getattr(args, field) for field in PATRON_FIELDS
+            if getattr(args, field, None) is not None}
+
+def cmd_list(args):
+    '''Stream every record.'''
+    write_rows(iter_patrons(args.batch_size), PATRON_COLUMNS, args.format)
+    return 0
+
+def cmd_get(args):
+    '''Print one record by client ID.'''
+    row = get_patron(args.id)
+    if row is None:
+        print(f"No client found with ID: {args.id}", file=sys.stderr)
+        return 1
+    write_rows([row], PATRON_COLUMNS, args.format)
+    return 0
+
+def cmd_search(args):
+    '''Search records by name or preference.'''
+    mode = MATCH_PREFIX if args.prefix else MATCH_CONTAINS
+    rows = find_patrons(args.field.capitalize(), args.value, mode, args.limit)
+    write_rows(rows, PATRON_COLUMNS, args.format)
+    return 0
+
+def cmd_add(args):
+    '''Insert a new record.'''
+    add_patron(_field_values(args))
+    print(f"Added client {args.id}", file=sys.stderr)
+    return 0
+
+def cmd_update(args):
+    '''Update fields of one record.'''
+    values = _field_values(args)
+    values.pop("id", None)
+    if not update_patron(args.id, values):
+        print(f"No client found with ID: {args.id}", file=sys.stderr)
+        return 1
+    print(f"Updated client {args.id}", file=sys.stderr)
+    return 0
+
+def _bulk_selection(args):
+    '''
+    Read the clients selected by --ids and --where.
+    
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    
+    Returns:
+        tuple: (client IDs or None, filter conditions or None)
+    '''
+    ids = parse_ids(args.ids) if args.ids else None
+    if args.ids and not ids:
+        raise ValueError("No client IDs given")
+    return ids, args.where or None
+
+def _preview(ids, conditions, args, action):
+    '''Print the records a bulk command would change instead of changing them.'''
+    count, rows = preview_bulk_update(ids, conditions)
+    write_rows(rows, PATRON_COLUMNS, args.format)
+    print(f"{count} clients would be {action}", file=sys.stderr)
+    return 0
+
+def cmd_bulk_update(args):
+    '''Apply one change to every record selected by ID or by a filter.'''
+    ids, conditions = _bulk_selection(args)
+    if args.dry_run:
+        return _preview(ids, conditions, args, "updated")
+    
+    adjustments = {"balance": args.add_balance, "frequency": args.add_frequency}
+    report = bulk_update(ids, conditions, _field_values(args), adjustments, args.chunk_size)
+    print(report.summary(), file=sys.stderr)
+    return 0
+
+def cmd_bulk_delete(args):
+    '''Delete every record selected by ID or by a filter.'''
+    ids, conditions = _bulk_selection(args)
+    if args.dry_run:
+        return _preview(ids, conditions, args, "deleted")
+    
+    report = bulk_delete(ids, conditions, args.chunk_size)
+    print(report.summary(), file=sys.stderr)
+    return 0
+
+def cmd_purge(args):
+    '''Remove deleted records from the table.'''
+    if args.dry_run:
+        print(f"{count_deleted()} deleted clients waiting to be purged", file=sys.stderr)
+        return 0
+    report = purge_deleted(args.chunk_size, args.pause_ms, args.max_rows)
+    print(report.summary(), file=sys.stderr)
+    return 0
+
+def cmd_delete(args):
+    '''Delete one record.'''
+    if not delete_patron(args.id):
+        print(f"No client found with ID: {args.id}", file=sys.stderr)
+        return 1
+    print(f"Deleted client {args.id}", file=sys.stderr)
+    return 0
+
+def cmd_graph(args):
+    '''Print the aggregates behind a chart.'''
+    # Imported here so other commands do not pay for loading NumPy
+    from services.graphs import (GRAPH_SOURCE, PERCENTILES, bucket_percentiles,
+                                 fetch_graph_data, rebin)
+    from database.snapshot import patron_snapshot
+    
+    if GRAPH_SOURCE == "snapshot":
+        # Do not print from a copy opened from disk before it has been
+        # checked against the database
+        patron_snapshot.sync(wait=True)
+    
+    if args.bins < 1:
+        raise ValueError("--bins must be at least 1")
+    mode, data = fetch_graph_data(args.type, args.mode, args.n)
+    # Histogram and percentile views arrive as fine buckets, like in the GUI
+    if mode == "Histogram" and data:
+        edges, counts = rebin(data, args.bins)
+        data = [(float(low), float(high), int(count))
+                for low, high, count in zip(edges[:-1], edges[1:], counts)]
+    elif mode == "Percentiles" and data:
+        data = [(f"p{p}", float(value))
+                for p, value in zip(PERCENTILES, bucket_percentiles(data))]
+    columns = {
+        "Pie": ("PAT_PREFERENCE", "COUNT"),
+        "Per Client": ("PAT_ID", "VALUE"),
+        "Top N": ("PAT_ID", "PAT_NAME", "VALUE"),
+        "Bottom N": ("PAT_ID", "PAT_NAME", "VALUE"),
+        "Percentiles": ("PERCENTILE", "VALUE")
+    }.get(mode, ("LOW", "HIGH", "COUNT"))
+    write_rows(data, columns, args.format)
+    return 0
+
+def cmd_import(args):
+    '''Import records from a CSV or JSON Lines file.'''
+    report = import_patrons(args.path, args.input_format, args.chunk_size)
+    for line_no, message in report.errors:
+        print(f"line {line_no}: {message}", file=sys.stderr)
+    print(report.summary(), file=sys.stderr)
+    return 1 if report.error_count else 0
+
+def cmd_export(args):
+    '''Export all records, or those matching a filter, to a file.'''
+    field = args.field.capitalize() if args.field else None
+    mode = MATCH_PREFIX if args.prefix else MATCH_CONTAINS
+    report = export_patrons(args.path, args.output_format, field, args.value, mode,
+                            compress=args.gzip or None, batch_size=args.batch_size)
+    print(report.summary(), file=sys.stderr)
+    return 0
+
+def cmd_migrate(args):
+    '''Apply pending schema migrations and list every migration.'''
+    backend = get_backend()
+    with get_pool().connection() as conn:
+        applied = [] if args.status else migrate(conn, backend)
+        status = migration_status(conn, backend)
+    write_rows(status, ("VERSION", "NAME", "APPLIED_AT"), args.format)
+    if applied:
+        print(f"Applied migrations {', '.join(map(str, applied))}", file=sys.stderr)
+    pending = sum(1 for _, _, applied_at in status if applied_at is None)
+    print(f"{pending} migrations pending" if pending else "Schema is up to date", file=sys.stderr)
+    return 0
+
+def cmd_check_plans(args):
+    '''Explain every query the read operations issue and flag full table scans.'''
+    # Imported here so other commands do not pay for loading NumPy
+    from services.plan_check import PLAN_FULL_SCAN, PLAN_OK, check_plans, worst_verdict
+    
+    results = check_plans()
+    shown = [result for result in results if args.all or result["verdict"] != PLAN_OK]
+    write_rows(([r["verdict"], r["operation"], r["reason"] or "; ".join(r["plan"]), r["query"]]
+                for r in shown), ("VERDICT", "OPERATION", "PLAN", "QUERY"), args.format)
+    
+    full_scans = sum(1 for result in results if result["verdict"] == PLAN_FULL_SCAN)
+    print(f"{len(results)} queries checked, {full_scans} full table scans", file=sys.stderr)
+    return 1 if worst_verdict(results) == PLAN_FULL_SCAN else 0
+
+def _add_field_options(parser, required):
+    '''
+    Add one option per editable patron field.
+    
+    Args:
+        parser (argparse.ArgumentParser): Parser to extend
+        required (bool): Whether every field must be given
+    '''
+    for field in PATRON_FIELDS[1:]:
+        parser.add_argument(f"--{field}", required=required)
+
+def build_parser():
+    '''
+    Build the command line parser.
+    
+    Returns:
+        argparse.ArgumentParser: Parser with one subcommand per operation
+    '''
+    parser = argparse.ArgumentParser(description="Client Management System command line")
+    parser.add_argument("--query-stats", metavar="PATH",
+                        help="write query timings and slow queries to this JSON file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    def output_options(sub):
+        sub.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                         help="output format (default: csv)")
+    
+    sub = commands.add_parser("list", help="stream every record")
+    output_options(sub)
+    sub.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE,
+                     help="records read per query")
+    sub.set_defaults(func=cmd_list)
+    
+    sub = commands.add_parser("get", help="show one record")
+    sub.add_argument("id", type=int)
+    output_options(sub)
+    sub.set_defaults(func=cmd_get)
+    
+    sub = commands.add_parser("search", help="search by name or preference")
+    sub.add_argument("field", choices=("name", "preference"))
+    sub.add_argument("value")
+    sub.add_argument("--prefix", action="store_true", help="match the start of the value only")
+    sub.add_argument("--limit", type=int, help="maximum number of records")
+    output_options(sub)
+    sub.set_defaults(func=cmd_search)
+    
+    sub = commands.add_parser("add", help="add a record")
+    sub.add_argument("id")
+    _add_field_options(sub, required=True)
+    sub.set_defaults(func=cmd_add)
+    
+    sub = commands.add_parser("update", help="update fields of a record")
+    sub.add_argument("id", type=int)
+    _add_field_options(sub, required=False)
+    sub.set_defaults(func=cmd_update)
+    
+    def selection_options(sub, action):
+        sub.add_argument("--ids", help="client IDs and ranges, e.g. '3,7,10-20'")
+        sub.add_argument("--where", nargs=3, action="append", metavar=("FIELD", "OP", "VALUE"),
+                         help=f"only {action} records matching this condition; OP is one of "
+                              f"{', '.join(FILTER_OPERATORS)} (repeatable)")
+    
+    def bulk_options(sub):
+        sub.add_argument("--dry-run", action="store_true",
+                         help="print the number of matching records and the first few instead")
+        sub.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE,
+                         help="records per transaction")
+        output_options(sub)
+    
+    sub = commands.add_parser("bulk-update", help="apply one change to many records")
+    selection_options(sub, "update")
+    _add_field_options(sub, required=False)
+    sub.add_argument("--add-balance", help="amount added to the balance")
+    sub.add_argument("--add-frequency", help="amount added to the frequency")
+    bulk_options(sub)
+    sub.set_defaults(func=cmd_bulk_update)
+    
+    sub = commands.add_parser("bulk-delete", help="delete many records")
+    selection_options(sub, "delete")
+    bulk_options(sub)
+    sub.set_defaults(func=cmd_bulk_delete)
+    
+    sub = commands.add_parser("purge", help="remove deleted records from the table")
+    sub.add_argument("--chunk-size", type=int, default=PURGE_CONFIG['chunk_size'],
+                     help="records removed per transaction")
+    sub.add_argument("--pause-ms", type=float, default=PURGE_CONFIG['pause_ms'],
+                     help="pause between transactions")
+    sub.add_argument("--max-rows", type=int, help="stop after about this many records")
+    sub.add_argument("--dry-run", action="store_true",
+                     help="print the number of records waiting to be purged instead")
+    sub.set_defaults(func=cmd_purge)
+    
+    sub = commands.add_parser("delete", help="delete a record")
+    sub.add_argument("id", type=int)
+    sub.set_defaults(func=cmd_delete)
+    
+    sub = commands.add_parser("graph", help="print the data behind a chart")
+    sub.add_argument("type", choices=("balance", "frequency", "preference"))
+    sub.add_argument("--mode", default="Auto", choices=CHART_MODES, help="chart mode")
+    sub.add_argument("-n", type=int, default=10, help="clients in the top/bottom-N modes")
+    sub.add_argument("--bins", type=int, default=20, help="bars in the histogram mode")
+    output_options(sub)
+    sub.set_defaults(func=cmd_graph)
+    
+    sub = commands.add_parser("import", help="import records from a file")
+    sub.add_argument("path")
+    sub.add_argument("--input-format", choices=("csv", "jsonl"),
+                     help="input format; detected from the extension if omitted")
+    sub.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                     help="rows per transaction")
+    sub.set_defaults(func=cmd_import)
+    
+    sub = commands.add_parser("export", help="export records to a file")
+    sub.add_argument("path", help="output file; a .gz suffix compresses it")
+    sub.add_argument("--output-format", choices=list(EXPORT_FORMATS),
+                     help="file format; detected from the extension if omitted")
+    sub.add_argument("--gzip", action="store_true", help="compress the output")
+    sub.add_argument("--field", choices=("name", "preference"),
+                     help="only export records whose field matches --value")
+    sub.add_argument("--value", help="text the field must contain")
+    sub.add_argument("--prefix", action="store_true", help="match the start of the value only")
+    sub.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE,
+                     help="records fetched per batch")
+    sub.set_defaults(func=cmd_export)
+    
+    sub = commands.add_parser("migrate", help="apply pending schema migrations")
+    sub.add_argument("--status", action="store_true",
+                     help="only list the migrations and when they were applied")
+    output_options(sub)
+    sub.set_defaults(func=cmd_migrate)
+    
+    sub = commands.add_parser("check-plans",
+                              help="explain the application's queries and flag full scans")
+    sub.add_argument("--all", action="store_true",
+                     help="list every query, not only those reading more than an index range")
+    output_options(sub)
+    sub.set_defaults(func=cmd_check_plans)
+    
+    return parser
+
+def main(argv=None):
+    '''
+    Run one command.
+    
+    Args:
+        argv (list, optional): Arguments; defaults to sys.argv[1:]
+    
+    Returns:
+        int: Process exit status
+    '''
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (db_config.DatabaseError, PoolTimeoutError) as err:
+        print(f"Database error: {err}", file=sys.stderr)
+        return 2
+    except ValueError as err:
+        print(f"Input error: {err}", file=sys.stderr)
+        return 2
+    except BrokenPipeError:
+        # Output was piped into a command that stopped reading, e.g. head
+        sys.stderr.close()
+        return 0
+    finally:
+        # Queued writes are saved before the pool closes
+        left = write_queue.close()
+        if left:
+            print(f"{left} queued writes kept in {write_queue.spool_path}", file=sys.stderr)
+        close_pool()
+        if args.query_stats:
+            dump_query_stats(args.query_stats)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+'''
+Backends package initialization.
+Import the storage backends to make them accessible from the backends package.
+'''
+
+from database.backends.base import Backend
+from database.backends.mysql import MySQLBackend
+from database.backends.sqlite import SQLiteBackend
+
+# Backend name (DB_BACKEND) -> backend class
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend
+}
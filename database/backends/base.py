@@ -0,0 +1,135 @@
+'''
+Storage backend base module for the Client Management System.
+Defines the interface every database backend implements.
+'''
+
+import threading
+
+from database.migrations import migrate
+
+class Backend:
+    '''
+    A database engine the application can run on.
+    
+    Backends hand out DB-API connections that accept MySQL-style ``%s``
+    placeholders, so the SQL in the rest of the application is shared.
+    Subclasses set ``name`` and ``dialect`` and implement ``connect`` and
+    ``error_class``.
+    '''
+    
+    name = None
+    dialect = None
+    
+    # Prefix that turns a query into a request for its plan
+    explain_prefix = "EXPLAIN"
+    
+    def __init__(self, create_schema=True):
+        '''
+        Initialize the backend.
+        
+        Args:
+            create_schema (bool): Create or migrate the schema on first connection
+        '''
+        self._schema_ready = not create_schema
+        self._schema_lock = threading.Lock()
+    
+    def connect(self):
+        '''
+        Open a new connection.
+        
+        Returns:
+            connection: DB-API connection with ``cursor``, ``commit``,
+            ``rollback``, ``close`` and ``is_connected`` methods
+        '''
+        raise NotImplementedError
+    
+    @property
+    def error_class(self):
+        '''Base class of the errors raised by this backend's driver.'''
+        raise NotImplementedError
+    
+    def is_healthy(self, conn):
+        '''
+        Check whether a pooled connection can still be used.
+        
+        Args:
+            conn: Connection returned by ``connect``
+        
+        Returns:
+            bool: True if the connection is usable
+        '''
+        return conn.is_connected()
+    
+    def patron_columns(self, cursor):
+        '''
+        Return the columns of the existing patron table.
+        
+        Args:
+            cursor: Cursor of a connection returned by ``connect``
+        
+        Returns:
+            set: Column names, or None if there is no patron table yet
+        '''
+        try:
+            cursor.execute("SELECT * FROM patron LIMIT 0")
+        except self.error_class:
+            return None
+        cursor.fetchall()
+        return {description[0].upper() for description in cursor.description}
+    
+    def create_schema(self, conn):
+        '''
+        Create the patron table, its indexes and views, or apply the schema
+        migrations an existing database has not seen yet.
+        
+        Args:
+            conn: Connection returned by ``connect``
+        
+        Returns:
+            list: Migration versions applied (see database.migrations)
+        '''
+        return migrate(conn, self)
+    
+    def ensure_schema(self, conn):
+        '''
+        Bring the schema up to date once, on the first connection opened.
+        
+        Args:
+            conn: Connection returned by ``connect``
+        '''
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self.create_schema(conn)
+                    self._schema_ready = True
+    
+    def is_schema_conflict(self, err):
+        '''
+        Check whether a schema statement failed because its change is
+        already in place, e.g. an index that exists or a column that was
+        added before.
+        
+        Args:
+            err (Exception): Error raised by the driver
+        
+        Returns:
+            bool: True if the error can be ignored
+        '''
+        return False
+    
+    def is_duplicate_key(self, err):
+        '''
+        Check whether an insert failed because a row with the same key
+        already exists.
+        
+        Args:
+            err (Exception): Error raised by the driver
+        
+        Returns:
+            bool: True if the error is a duplicate-key violation
+        '''
+        return False
+    
+    def describe(self):
+        '''Return a short description of the backend for logs and diagnostics.'''
+        return self.name
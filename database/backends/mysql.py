@@ -0,0 +1,68 @@
+'''
+MySQL storage backend for the Client Management System.
+Connects to a MySQL server with mysql-connector-python.
+'''
+
+import importlib
+
+from database.backends.base import Backend
+
+# MySQL errors raised by schema statements whose change is already in place:
+# duplicate column, duplicate index, duplicate row (a migration recorded by
+# another process) and dropping an index that does not exist
+SCHEMA_CONFLICT_ERRORS = (1060, 1061, 1062, 1091)
+
+# ER_DUP_ENTRY: an insert hit an existing primary or unique key
+DUPLICATE_KEY_ERROR = 1062
+
+class MySQLBackend(Backend):
+    '''Backend for a MySQL server.'''
+    
+    name = 'mysql'
+    dialect = 'mysql'
+    
+    def __init__(self, config, create_schema=True):
+        '''
+        Initialize the backend.
+        
+        Args:
+            config (dict): Keyword arguments for ``mysql.connector.connect``
+            create_schema (bool): Apply pending schema migrations on first connection
+        '''
+        super().__init__(create_schema)
+        self.config = config
+    
+    @staticmethod
+    def _driver():
+        '''
+        Returns the MySQL driver module, importing it on first use.
+        
+        The connector is slow to import, so it is only loaded once the first
+        connection is made rather than when the application starts.
+        
+        Returns:
+            module: mysql.connector
+        '''
+        return importlib.import_module("mysql.connector")
+    
+    def connect(self):
+        conn = self._driver().connect(**self.config)
+        try:
+            self.ensure_schema(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+    
+    @property
+    def error_class(self):
+        return self._driver().Error
+    
+    def is_schema_conflict(self, err):
+        return getattr(err, 'errno', None) in SCHEMA_CONFLICT_ERRORS
+    
+    def is_duplicate_key(self, err):
+        return getattr(err, 'errno', None) == DUPLICATE_KEY_ERROR
+    
+    def describe(self):
+        return f"mysql://{self.config.get('user')}@{self.config.get('host')}/{self.config.get('database')}"
@@ -0,0 +1,164 @@
+'''
+SQLite storage backend for the Client Management System.
+Runs the application on an embedded database file, with no server needed.
+'''
+
+import math
+import os
+import sqlite3
+
+from database.backends.base import Backend
+
+# Pragmas applied to every connection. WAL lets readers run while a write is
+# in progress; the rest trade a little durability on power loss for speed.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # ms to wait for a lock held by another connection
+    'cache_size': -64000,          # 64 MB page cache per connection
+    'temp_store': 'MEMORY',
+    'mmap_size': 268435456,        # Map up to 256 MB of the file
+    'foreign_keys': 'ON'
+}
+
+def _least(*values):
+    '''SQL LEAST(), as provided by MySQL; NULL if any argument is NULL.'''
+    return None if None in values else min(values)
+
+def _floor(value):
+    '''SQL FLOOR(), as provided by MySQL.'''
+    return None if value is None else math.floor(value)
+
+class SQLiteCursor:
+    '''Cursor that accepts MySQL-style ``%s`` placeholders.'''
+    
+    def __init__(self, cursor):
+        self._cursor = cursor
+    
+    @staticmethod
+    def _convert(query):
+        '''Replace MySQL ``%s`` placeholders with sqlite3 ``?`` placeholders.'''
+        return query.replace("%s", "?")
+    
+    def execute(self, query, params=None):
+        self._cursor.execute(self._convert(query), tuple(params or ()))
+    
+    def executemany(self, query, rows):
+        self._cursor.executemany(self._convert(query), rows)
+    
+    def fetchall(self):
+        return self._cursor.fetchall()
+    
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+    
+    def fetchone(self):
+        return self._cursor.fetchone()
+    
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+    
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+    
+    @property
+    def description(self):
+        return self._cursor.description
+    
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    '''sqlite3 connection exposing the parts of the MySQL connector API the app uses.'''
+    
+    def __init__(self, conn):
+        '''
+        Wrap an open sqlite3 connection.
+        
+        Args:
+            conn (sqlite3.Connection): Connection to wrap
+        '''
+        self._conn = conn
+        self._open = True
+    
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+    
+    def cursor(self, *args, **kwargs):
+        return SQLiteCursor(self._conn.cursor())
+    
+    def commit(self):
+        self._conn.commit()
+    
+    def rollback(self):
+        self._conn.rollback()
+    
+    def is_connected(self):
+        return self._open
+    
+    def close(self):
+        self._open = False
+        self._conn.close()
+
+class SQLiteBackend(Backend):
+    '''
+    Backend for an embedded SQLite database file.
+    
+    The schema is created, or migrated, on the first connection, so a new
+    branch office only needs to point SQLITE_PATH at a writable location.
+    '''
+    
+    name = 'sqlite'
+    dialect = 'sqlite'
+    explain_prefix = "EXPLAIN QUERY PLAN"
+    
+    def __init__(self, path, pragmas=None, create_schema=True):
+        '''
+        Initialize the backend.
+        
+        Args:
+            path (str): Database file; created if missing
+            pragmas (dict, optional): Pragmas overriding DEFAULT_PRAGMAS
+            create_schema (bool): Create or migrate the schema on first connection
+        '''
+        super().__init__(create_schema)
+        self.path = path
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+    
+    def connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        
+        # Pooled connections move between worker threads, one at a time
+        raw = sqlite3.connect(self.path, check_same_thread=False)
+        raw.create_function("LEAST", -1, _least, deterministic=True)
+        raw.create_function("FLOOR", 1, _floor, deterministic=True)
+        for pragma, value in self.pragmas.items():
+            raw.execute(f"PRAGMA {pragma} = {value}")
+        conn = SQLiteConnection(raw)
+        try:
+            self.ensure_schema(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+    
+    @property
+    def error_class(self):
+        return sqlite3.Error
+    
+    def is_schema_conflict(self, err):
+        # SQLite has IF [NOT] EXISTS for everything but ADD COLUMN
+        message = str(err)
+        return (message.startswith("duplicate column name")
+                or message.startswith("UNIQUE constraint failed: schema_migrations"))
+    
+    def is_duplicate_key(self, err):
+        return (isinstance(err, sqlite3.IntegrityError)
+                and str(err).startswith("UNIQUE constraint failed"))
+    
+    def describe(self):
+        return f"sqlite:///{os.path.abspath(self.path)}"
@@ -0,0 +1,215 @@
+'''
+Patron cache module for the Client Management System.
+Provides a read-through LRU cache of patron rows keyed by PAT_ID.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from database.db_config import run_query
+
+# Cache configuration using environment variables
+CACHE_CONFIG = {
+    'max_size': int(os.getenv('PATRON_CACHE_SIZE', '1000')),
+    'ttl': float(os.getenv('PATRON_CACHE_TTL', '60'))
+}
+
+class PatronCache:
+    '''
+    Thread-safe LRU cache with a time-to-live for patron rows.
+    
+    Entries older than ``ttl`` seconds are treated as missing, and the least
+    recently used entry is evicted once ``max_size`` entries are held.
+    '''
+    
+    def __init__(self, max_size=1000, ttl=60.0):
+        '''
+        Initialize the cache.
+        
+        Args:
+            max_size (int): Maximum number of rows held
+            ttl (float): Seconds a row stays valid after it was stored
+        '''
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # PAT_ID -> (expiry time, row)
+        self._lock = threading.Lock()
+        
+        # Bumped on every invalidation so that rows read before a write
+        # committed are not stored after it
+        self.epoch = 0
+        
+        # Statistics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+    
+    def get(self, pat_id):
+        '''
+        Look up a row.
+        
+        Args:
+            pat_id (int): Client ID
+        
+        Returns:
+            tuple: The cached row, or None on a miss
+        '''
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(pat_id)
+            if entry is None:
+                self._misses += 1
+                return None
+            
+            expires, row = entry
+            if expires <= now:
+                del self._entries[pat_id]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(pat_id)
+            self._hits += 1
+            return row
+    
+    def put(self, pat_id, row, epoch=None):
+        '''
+        Store a row, evicting the least recently used rows if the cache is full.
+        
+        Args:
+            pat_id (int): Client ID
+            row (tuple): Patron row
+            epoch (int, optional): Value of ``epoch`` read before the row was
+                loaded; the row is not stored if an invalidation happened since
+        '''
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._entries[pat_id] = (time.monotonic() + self.ttl, row)
+            self._entries.move_to_end(pat_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+    
+    def invalidate(self, pat_id):
+        '''
+        Drop a row after it was changed or deleted.
+        
+        Args:
+            pat_id (int): Client ID
+        '''
+        with self._lock:
+            self.epoch += 1
+            if self._entries.pop(pat_id, None) is not None:
+                self._invalidations += 1
+    
+    def clear(self):
+        '''Drop every cached row.'''
+        with self._lock:
+            self.epoch += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+    
+    def stats(self):
+        '''
+        Return a snapshot of cache statistics.
+        
+        Returns:
+            dict: Size, hit/miss/eviction counters and the hit ratio
+        '''
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
+
+# Shared cache used by all dialogs
+patron_cache = PatronCache(**CACHE_CONFIG)
+
+# Callbacks told about patron writes, e.g. to keep search indexes current
+_write_listeners = []
+
+def add_write_listener(listener):
+    '''
+    Register a callback run after patron rows are written.
+    
+    Args:
+        listener (callable): Function taking the affected client ID, or
+            None when an unknown set of rows changed
+    '''
+    _write_listeners.append(listener)
+
+def notify_patron_write(pat_id=None):
+    '''
+    Tell registered listeners that patron rows were written.
+    
+    Args:
+        pat_id (int, optional): Client ID affected, or None if many rows changed
+    '''
+    for listener in list(_write_listeners):
+        listener(pat_id)
+
+def fetch_patron(pat_id):
+    '''
+    Return a patron row, reading through the cache.
+    
+    Args:
+        pat_id (int): Client ID
+    
+    Returns:
+        tuple: The patron row, or None if no client has this ID
+    '''
+    row = patron_cache.get(pat_id)
+    if row is not None:
+        return row
+    
+    epoch = patron_cache.epoch
+    result = run_query("SELECT * FROM live_patron WHERE PAT_ID = %s", (pat_id,), fetch=True)
+    if not result:
+        return None
+    
+    row = tuple(result[0])
+    patron_cache.put(pat_id, row, epoch=epoch)
+    return row
+
+def write_patron(query, params, pat_id):
+    '''
+    Run a committed INSERT/UPDATE/DELETE for one client and invalidate its cache entry.
+    
+    Args:
+        query (str): SQL statement to execute
+        params (tuple): Parameters for the statement
+        pat_id (int): Client ID affected by the statement
+    
+    Returns:
+        int: Number of affected rows
+    '''
+    try:
+        return run_query(query, params, commit=True)
+    finally:
+        # Invalidate even on failure; the row state is unknown
+        patron_cache.invalidate(pat_id)
+        notify_patron_write(pat_id)
+
+def get_cache_stats():
+    '''
+    Returns statistics for the shared patron cache.
+    
+    Returns:
+        dict: Size, hit/miss/eviction counters and the hit ratio
+    '''
+    return patron_cache.stats()
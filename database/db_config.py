@@ -4,13 +4,29 @@ Contains the database connection parameters and utility functions.
 '''
 
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
-import mysql.connector as rt
-import tkinter.messagebox as MessBox
+
+from database.backends import BACKENDS
+from database.instrumentation import explain, query_stats
+from database.pool import ConnectionPool, PoolTimeoutError
 
 # Load environment variables
 load_dotenv()
 
+# Storage backend: "mysql" for a MySQL server, "sqlite" for an embedded file
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+
+# SQLite database file used when DB_BACKEND is "sqlite"
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'client_management.sqlite')
+
+# Apply pending schema migrations on the first connection. Set DB_MIGRATE=0
+# where the application's database user may not change the schema, and run
+# "cli.py migrate" as a user who may
+DB_MIGRATE = os.getenv('DB_MIGRATE', '1') not in ('', '0')
+
 # Database configuration using environment variables
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -19,23 +35,140 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'Client_Management')
 }
 
+# Connection pool configuration using environment variables
+POOL_CONFIG = {
+    'size': int(os.getenv('DB_POOL_SIZE', '5')),
+    'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+    'checkout_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK', '30'))
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_backend = None
+
+def _create_backend():
+    '''
+    Build the backend selected by DB_BACKEND.
+    
+    Returns:
+        Backend: The configured storage backend
+    '''
+    if DB_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND '{DB_BACKEND}'; expected one of {', '.join(BACKENDS)}")
+    if DB_BACKEND == 'sqlite':
+        return BACKENDS['sqlite'](SQLITE_PATH, create_schema=DB_MIGRATE)
+    return BACKENDS[DB_BACKEND](DB_CONFIG, create_schema=DB_MIGRATE)
+
+def get_backend():
+    '''
+    Returns the active storage backend, creating it on first use.
+    
+    Returns:
+        Backend: The application-wide storage backend
+    '''
+    global _backend
+    if _backend is None:
+        with _pool_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+def set_backend(backend):
+    '''
+    Switch to another storage backend.
+    
+    The current pool is closed, so every later query uses the new backend.
+    Benchmarks use this to run against a local SQLite database.
+    
+    Args:
+        backend (Backend): Backend to use, or None to go back to DB_BACKEND
+    '''
+    global _backend
+    close_pool()
+    with _pool_lock:
+        _backend = backend
+
+def __getattr__(name):
+    '''Resolve DatabaseError, the active backend's base error class, on use.'''
+    if name == "DatabaseError":
+        return get_backend().error_class
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _print_error(title, message):
+    '''Default error handler: write the error to stderr.'''
+    print(f"{title}: {message}", file=sys.stderr)
+
+_error_handler = _print_error
+
+def set_error_handler(handler):
+    '''
+    Set the function used to report errors from get_connection and execute_query.
+    
+    This module never imports a UI toolkit; the GUI installs a handler that
+    shows a message box, while scripts keep the default stderr output.
+    
+    Args:
+        handler (callable): Function taking a title and a message
+    '''
+    global _error_handler
+    _error_handler = handler or _print_error
+
 def get_connection():
     '''
-    Establishes and returns a connection to the MySQL database.
+    Establishes and returns a new, unpooled connection to the database.
     
     Returns:
-        connection: MySQL connection object
+        connection: Connection from the active backend
     '''
+    backend = get_backend()
     try:
-        conn = rt.connect(**DB_CONFIG)
+        conn = backend.connect()
         return conn
-    except rt.Error as err:
-        MessBox.showerror("Database Connection Error", f"Failed to connect to database: {err}")
+    except backend.error_class as err:
+        _error_handler("Database Connection Error", f"Failed to connect to database: {err}")
         return None
 
-def execute_query(query, params=None, fetch=False, commit=False):
+def get_pool():
     '''
-    Executes a SQL query with optional parameters.
+    Returns the shared connection pool, creating it on first use.
+    
+    Returns:
+        ConnectionPool: The application-wide connection pool
+    '''
+    global _pool
+    if _pool is None:
+        backend = get_backend()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(backend.connect, is_healthy=backend.is_healthy,
+                                       **POOL_CONFIG)
+    return _pool
+
+def get_pool_stats():
+    '''
+    Returns statistics for the shared connection pool.
+    
+    Returns:
+        dict: Checkouts, waits, reuse ratio and occupancy counters
+    '''
+    return get_pool().stats()
+
+def close_pool():
+    '''Close the shared connection pool and all of its idle connections.'''
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def run_query(query, params=None, fetch=False, commit=False):
+    '''
+    Executes a SQL query on a pooled connection and raises on failure.
+    
+    Unlike execute_query, this never touches the UI, so it is safe to call
+    from worker threads. Every call is timed and recorded by the query
+    instrumentation (see database.instrumentation).
     
     Args:
         query (str): SQL query to execute
@@ -44,30 +177,134 @@ def execute_query(query, params=None, fetch=False, commit=False):
         commit (bool): Whether to commit the transaction
     
     Returns:
-        List of query results if fetch=True, else None
+        List of query results if fetch=True, else the number of affected rows
+    
+    Raises:
+        DatabaseError: If connecting or executing the query fails
+        PoolTimeoutError: If no pooled connection became available
     '''
-    conn = get_connection()
-    if not conn:
-        return None
+    backend = get_backend()
+    pool = get_pool()
+    conn = pool.acquire()
     
     cursor = conn.cursor()
+    discard = False
+    rows = None
+    error = None
+    plan = None
+    elapsed = None
+    start = time.perf_counter()
     try:
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
         
-        result = None
         if fetch:
             result = cursor.fetchall()
+            rows = len(result)
+        else:
+            result = cursor.rowcount
+            rows = result
         
         if commit:
             conn.commit()
         
+        # Capture the plan while the connection is still checked out
+        elapsed = time.perf_counter() - start
+        if query_stats.wants_plan(query, elapsed):
+            plan = explain(conn, query, params, backend.explain_prefix)
+        
         return result
-    except rt.Error as err:
-        MessBox.showerror("Database Error", f"Error executing query: {err}")
-        return None
+    except backend.error_class as err:
+        error = err
+        discard = not conn.is_connected()
+        raise
     finally:
+        if elapsed is None:
+            elapsed = time.perf_counter() - start
+        query_stats.record(query, params, elapsed, rows, error, plan)
         cursor.close()
-        conn.close()
\ No newline at end of file
+        pool.release(conn, discard=discard)
+
+def stream_query(query, params=None, batch_size=1000):
+    '''
+    Executes a SQL query and yields its rows in batches as they arrive.
+    
+    The rows are read with ``fetchmany`` from an unbuffered cursor (the
+    MySQL connector's default), so the server streams the result and only
+    one batch is held in memory. The pooled connection stays checked out
+    until the generator is exhausted or closed; a stream closed early leaves
+    unread rows behind, so its connection is discarded.
+    
+    Args:
+        query (str): SQL query to execute
+        params (tuple, optional): Parameters for the query
+        batch_size (int): Rows per batch
+    
+    Yields:
+        list: The next batch of rows
+    
+    Raises:
+        DatabaseError: If connecting or executing the query fails
+        PoolTimeoutError: If no pooled connection became available
+    '''
+    backend = get_backend()
+    pool = get_pool()
+    conn = pool.acquire()
+    
+    cursor = conn.cursor()
+    discard = True
+    rows = 0
+    error = None
+    start = time.perf_counter()
+    try:
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rows += len(batch)
+            yield batch
+        discard = not conn.is_connected()
+    except backend.error_class as err:
+        error = err
+        raise
+    finally:
+        # The time includes the caller's work between batches
+        query_stats.record(query, params, time.perf_counter() - start, rows, error)
+        try:
+            cursor.close()
+        except backend.error_class:
+            discard = True
+        pool.release(conn, discard=discard)
+
+def execute_query(query, params=None, fetch=False, commit=False):
+    '''
+    Executes a SQL query with optional parameters on a pooled connection.
+    
+    Errors are reported through the error handler (see set_error_handler).
+    
+    Args:
+        query (str): SQL query to execute
+        params (tuple, optional): Parameters for the query
+        fetch (bool): Whether to fetch results
+        commit (bool): Whether to commit the transaction
+    
+    Returns:
+        List of query results if fetch=True, else the number of affected rows;
+        None if an error occurred
+    '''
+    error_class = get_backend().error_class
+    try:
+        return run_query(query, params, fetch=fetch, commit=commit)
+    except PoolTimeoutError as err:
+        _error_handler("Database Connection Error", f"Failed to connect to database: {err}")
+        return None
+    except error_class as err:
+        _error_handler("Database Error", f"Error executing query: {err}")
+        return None
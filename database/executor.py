@@ -0,0 +1,97 @@
+'''
+Background query executor module for the Client Management System.
+Runs database work on worker threads so callers never block on the server.
+'''
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database.db_config import POOL_CONFIG, run_query
+
+class QueryExecutor:
+    '''
+    Thread pool that runs database calls and returns futures.
+    
+    The number of workers matches the connection pool size, so every
+    running task can hold a connection without waiting on another task.
+    '''
+    
+    def __init__(self, max_workers=None):
+        '''
+        Initialize the executor.
+        
+        Args:
+            max_workers (int, optional): Number of worker threads; defaults
+                to the connection pool size
+        '''
+        self.max_workers = max_workers or POOL_CONFIG['size']
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                        thread_name_prefix="db-worker")
+    
+    def submit(self, fn, *args, **kwargs):
+        '''
+        Run a callable on a worker thread.
+        
+        Args:
+            fn (callable): Function to run
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+        
+        Returns:
+            concurrent.futures.Future: Future for the function's result
+        '''
+        return self._pool.submit(fn, *args, **kwargs)
+    
+    def query(self, query, params=None, fetch=False, commit=False):
+        '''
+        Run a SQL query on a worker thread.
+        
+        Args:
+            query (str): SQL query to execute
+            params (tuple, optional): Parameters for the query
+            fetch (bool): Whether to fetch results
+            commit (bool): Whether to commit the transaction
+        
+        Returns:
+            concurrent.futures.Future: Future for the value returned by run_query
+        '''
+        return self.submit(run_query, query, params, fetch=fetch, commit=commit)
+    
+    def shutdown(self, wait=True):
+        '''
+        Stop accepting work and optionally wait for running tasks.
+        
+        Args:
+            wait (bool): Whether to block until running tasks finish
+        '''
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    '''
+    Returns the shared query executor, creating it on first use.
+    
+    Returns:
+        QueryExecutor: The application-wide query executor
+    '''
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = QueryExecutor()
+    return _executor
+
+def shutdown_executor(wait=True):
+    '''
+    Shut down the shared query executor.
+    
+    Args:
+        wait (bool): Whether to block until running tasks finish
+    '''
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
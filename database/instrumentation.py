@@ -0,0 +1,410 @@
+'''
+Query instrumentation module for the Client Management System.
+Records latency, row counts and a slow-query log for every database query.
+
+Statements are grouped by fingerprint: the SQL with literals and
+placeholders replaced by ``?`` and whitespace collapsed, so the same query
+run with different parameters is counted once. Set QUERY_STATS_DUMP to a
+file path to have the statistics written there when the process exits.
+'''
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Instrumentation configuration using environment variables
+QUERY_STATS_CONFIG = {
+    'enabled': os.getenv('QUERY_STATS', '1') not in ('', '0'),
+    'slow_ms': float(os.getenv('SLOW_QUERY_MS', '200')),
+    'slow_log_size': int(os.getenv('SLOW_QUERY_LOG_SIZE', '100')),
+    'explain': os.getenv('SLOW_QUERY_EXPLAIN', '') not in ('', '0'),
+    'dump_path': os.getenv('QUERY_STATS_DUMP', '')
+}
+
+# Upper bounds (ms) of the latency histogram buckets; a last bucket holds the rest
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Longest parameter list stored in the slow-query log, in characters
+_MAX_PARAMS_LENGTH = 200
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Files whose frames are skipped when looking for the caller of a slow query
+_DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_LIBRARY_DIR = os.path.dirname(threading.__file__)
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    '''
+    Normalize a SQL statement so that runs with different values group together.
+    
+    Args:
+        query (str): SQL statement
+    
+    Returns:
+        str: Statement with literals and placeholders replaced by ``?``,
+             ``IN`` lists shortened to ``(?+)`` and whitespace collapsed
+    '''
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?+)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+def _call_site():
+    '''
+    Find the application code that issued the current query.
+    
+    Returns:
+        str: "path:line in function" of the first frame outside the database
+             package and the standard library, or None
+    '''
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if not path.startswith((_DATABASE_DIR, _LIBRARY_DIR)):
+            return f"{os.path.relpath(path)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+class QueryStats:
+    '''Latency histogram and counters for one statement fingerprint.'''
+    
+    def __init__(self, fingerprint):
+        '''
+        Initialize empty statistics.
+        
+        Args:
+            fingerprint (str): Normalized statement
+        '''
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    
+    def add(self, elapsed, rows, failed):
+        '''
+        Record one execution.
+        
+        Args:
+            elapsed (float): Seconds the query took
+            rows (int): Rows returned or affected, or None
+            failed (bool): Whether the query raised an error
+        '''
+        self.count += 1
+        self.errors += failed
+        self.rows += rows or 0
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        
+        elapsed_ms = elapsed * 1000
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+    
+    def percentile(self, pct):
+        '''
+        Estimate a latency percentile from the histogram.
+        
+        Args:
+            pct (float): Percentile between 0 and 100
+        
+        Returns:
+            float: Upper bound in ms of the bucket holding the percentile;
+                   the maximum for the overflow bucket
+        '''
+        if not self.count:
+            return 0.0
+        target = self.count * pct / 100
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return min(float(LATENCY_BUCKETS_MS[index]), self.max_time * 1000)
+                break
+        return self.max_time * 1000
+    
+    def to_dict(self):
+        '''
+        Returns the statistics as plain values.
+        
+        Returns:
+            dict: Counters, average and percentile latencies in ms and the histogram
+        '''
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "avg_rows": self.rows / self.count if self.count else 0.0,
+            "total_ms": self.total_time * 1000,
+            "avg_ms": self.total_time * 1000 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_time * 1000,
+            "histogram": dict(zip([f"<={b}ms" for b in LATENCY_BUCKETS_MS] + ["more"],
+                                  self.buckets))
+        }
+
+class QueryInstrumentation:
+    '''
+    Thread-safe collector of query statistics and slow queries.
+    
+    Every query is added to the statistics of its fingerprint. Queries
+    taking at least ``slow_ms`` are also kept, with their parameters and the
+    code that issued them, in a bounded slow-query log.
+    '''
+    
+    def __init__(self, slow_ms=200.0, slow_log_size=100, explain=False, enabled=True):
+        '''
+        Initialize the collector.
+        
+        Args:
+            slow_ms (float): Latency in ms from which a query is logged as slow
+            slow_log_size (int): Number of slow queries kept; older ones are dropped
+            explain (bool): Capture the plan of slow SELECT queries
+            enabled (bool): Whether queries are recorded at all
+        '''
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.enabled = enabled
+        self._stats = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._slow_total = 0
+        self._started = time.time()
+        self._captures = []
+        self._lock = threading.Lock()
+    
+    def is_slow(self, elapsed):
+        '''
+        Check whether a query belongs in the slow-query log.
+        
+        Args:
+            elapsed (float): Seconds the query took
+        
+        Returns:
+            bool: True if the query took at least ``slow_ms``
+        '''
+        return self.enabled and elapsed * 1000 >= self.slow_ms
+    
+    def wants_plan(self, query, elapsed):
+        '''
+        Check whether the plan of a query should be captured.
+        
+        Only slow SELECT statements are explained; explaining a write would
+        not be safe on every backend.
+        
+        Args:
+            query (str): SQL statement
+            elapsed (float): Seconds the query took
+        
+        Returns:
+            bool: True if an EXPLAIN should be run
+        '''
+        return (self.explain and self.is_slow(elapsed)
+                and query.lstrip()[:6].upper() == "SELECT")
+    
+    def record(self, query, params, elapsed, rows=None, error=None, plan=None):
+        '''
+        Record one executed query.
+        
+        Args:
+            query (str): SQL statement
+            params (tuple): Query parameters
+            elapsed (float): Seconds the query took
+            rows (int, optional): Rows returned or affected
+            error (Exception, optional): Error the query raised
+            plan (list, optional): EXPLAIN output for the query
+        '''
+        if self._captures:
+            with self._lock:
+                for captured in self._captures:
+                    captured.append((query, params))
+        if not self.enabled:
+            return
+        key = fingerprint(query)
+        slow = self.is_slow(elapsed)
+        if slow:
+            entry = {
+                "time": time.time(),
+                "elapsed_ms": elapsed * 1000,
+                "fingerprint": key,
+                "query": query,
+                "params": repr(params)[:_MAX_PARAMS_LENGTH] if params else "",
+                "rows": rows,
+                "error": f"{type(error).__name__}: {error}" if error else None,
+                "thread": threading.current_thread().name,
+                "source": _call_site(),
+                "plan": plan
+            }
+        
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(key)
+            stats.add(elapsed, rows, error is not None)
+            if slow:
+                self._slow_total += 1
+                entry["id"] = self._slow_total
+                self._slow.append(entry)
+    
+    @contextmanager
+    def capture(self):
+        '''
+        Collect every statement run, by any thread, while the block runs.
+        
+        Statements are collected even when recording is disabled.
+        
+        Yields:
+            list: (query, params) tuples, appended in the order the
+                  statements finish
+        '''
+        captured = []
+        with self._lock:
+            self._captures.append(captured)
+        try:
+            yield captured
+        finally:
+            with self._lock:
+                self._captures.remove(captured)
+    
+    def query_stats(self):
+        '''
+        Returns the statistics of every fingerprint, slowest total time first.
+        
+        Returns:
+            list: Dictionaries as returned by QueryStats.to_dict
+        '''
+        with self._lock:
+            stats = [s.to_dict() for s in self._stats.values()]
+        return sorted(stats, key=lambda s: -s["total_ms"])
+    
+    def slow_queries(self):
+        '''
+        Returns the slow-query log, most recent first.
+        
+        Returns:
+            list: Slow query entries
+        '''
+        with self._lock:
+            return list(reversed(self._slow))
+    
+    def snapshot(self):
+        '''
+        Returns everything recorded so far.
+        
+        Returns:
+            dict: Settings, totals, per-fingerprint statistics and slow queries
+        '''
+        stats = self.query_stats()
+        with self._lock:
+            slow_total = self._slow_total
+        return {
+            "started": self._started,
+            "captured": time.time(),
+            "slow_ms": self.slow_ms,
+            "explain": self.explain,
+            "queries": sum(s["count"] for s in stats),
+            "errors": sum(s["errors"] for s in stats),
+            "slow_total": slow_total,
+            "statements": stats,
+            "slow_queries": self.slow_queries()
+        }
+    
+    def reset(self):
+        '''Discard all statistics and the slow-query log.'''
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._slow_total = 0
+            self._started = time.time()
+    
+    def dump(self, path):
+        '''
+        Write a snapshot to a JSON file.
+        
+        Args:
+            path (str): File to write; replaced if it exists
+        
+        Returns:
+            str: The path written
+        '''
+        snapshot = self.snapshot()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2, default=str)
+        os.replace(temp_path, path)
+        return path
+
+# Application-wide collector used by db_config.run_query
+query_stats = QueryInstrumentation(
+    slow_ms=QUERY_STATS_CONFIG['slow_ms'],
+    slow_log_size=QUERY_STATS_CONFIG['slow_log_size'],
+    explain=QUERY_STATS_CONFIG['explain'],
+    enabled=QUERY_STATS_CONFIG['enabled']
+)
+
+def explain(conn, query, params, prefix="EXPLAIN"):
+    '''
+    Capture the plan of a query on an open connection.
+    
+    Args:
+        conn: Connection the query ran on
+        query (str): SQL statement
+        params (tuple): Query parameters
+        prefix (str): Statement prefix that asks the backend for a plan
+    
+    Returns:
+        list: Plan rows, or the error message as a single row if the
+              plan could not be read
+    '''
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"{prefix} {query}", params)
+        return [list(row) for row in cursor.fetchall()]
+    except Exception as err:
+        return [[f"EXPLAIN failed: {err}"]]
+    finally:
+        cursor.close()
+
+def dump_query_stats(path=None):
+    '''
+    Write the application-wide query statistics to a JSON file.
+    
+    Args:
+        path (str, optional): File to write; defaults to QUERY_STATS_DUMP,
+                              or query_stats.json if that is not set
+    
+    Returns:
+        str: The path written
+    '''
+    return query_stats.dump(path or QUERY_STATS_CONFIG['dump_path'] or "query_stats.json")
+
+def get_query_stats():
+    '''
+    Returns the application-wide query statistics.
+    
+    Returns:
+        dict: Snapshot as returned by QueryInstrumentation.snapshot
+    '''
+    return query_stats.snapshot()
+
+if QUERY_STATS_CONFIG['dump_path']:
+    atexit.register(dump_query_stats)
@@ -0,0 +1,192 @@
+'''
+Schema migration module for the Client Management System.
+Brings the patron table, its indexes and views up to date, one numbered
+step at a time.
+
+Every step that has been applied is recorded in the schema_migrations
+table, so each database only runs the steps it has not seen yet. The steps
+are written so that running one again does no harm: a step interrupted
+half way (MySQL commits every DDL statement on its own) is simply repeated.
+An empty database is created from the current schema in database.schema
+and all steps are recorded as applied.
+
+Append new steps to MIGRATIONS; never edit or renumber a released one.
+'''
+
+from database.schema import index_statement, schema_statements, view_statement
+
+# Record of the steps applied to this database
+SCHEMA_MIGRATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def _drop_index(dialect, name):
+    '''Return the statement that drops an index from the patron table.'''
+    if dialect == 'sqlite':
+        return f"DROP INDEX IF EXISTS {name}"
+    return f"DROP INDEX {name} ON patron"
+
+def _create_patron_table(dialect):
+    '''The patron table as first released.'''
+    if dialect == 'sqlite':
+        return ['''
+            CREATE TABLE IF NOT EXISTS patron (
+                PAT_ID INTEGER PRIMARY KEY,
+                PAT_NAME VARCHAR(50) COLLATE NOCASE,
+                PAT_BALANCE FLOAT,
+                PAT_CONTACT INT,
+                PAT_PREFERENCE VARCHAR(50) COLLATE NOCASE,
+                PAT_FREQUENCY INT
+            )
+        ''']
+    return ['''
+        CREATE TABLE IF NOT EXISTS patron (
+            PAT_ID INT PRIMARY KEY,
+            PAT_NAME VARCHAR(50),
+            PAT_BALANCE FLOAT,
+            PAT_CONTACT INT,
+            PAT_PREFERENCE VARCHAR(50),
+            PAT_FREQUENCY INT
+        )
+    ''']
+
+def _add_column_indexes(dialect):
+    '''One index per searched and charted column.'''
+    return [index_statement(dialect, f"idx_patron_{column.lower()}", f"PAT_{column}")
+            for column in ('NAME', 'PREFERENCE', 'BALANCE', 'FREQUENCY')]
+
+def _add_soft_delete(dialect):
+    '''PAT_DELETED flag and the live_patron view that hides deleted clients.'''
+    flag = 'INTEGER' if dialect == 'sqlite' else 'TINYINT'
+    return [f"ALTER TABLE patron ADD COLUMN PAT_DELETED {flag} NOT NULL DEFAULT 0",
+            index_statement(dialect, 'idx_patron_deleted', 'PAT_DELETED'),
+            view_statement(dialect)]
+
+def _add_row_version(dialect):
+    '''PAT_VERSION counter used to detect conflicting edits.'''
+    kind = 'INTEGER' if dialect == 'sqlite' else 'INT'
+    return [f"ALTER TABLE patron ADD COLUMN PAT_VERSION {kind} NOT NULL DEFAULT 0"]
+
+def _tune_indexes(dialect):
+    '''
+    Rebuild the column indexes for reads through live_patron.
+    
+    PAT_DELETED follows each column, so prefix searches and the chart
+    aggregates no longer visit the table to skip deleted clients. On SQLite
+    the PAT_DELETED index is narrowed to the deleted rows the purger reads.
+    '''
+    statements = []
+    for column in ('NAME', 'PREFERENCE', 'BALANCE', 'FREQUENCY'):
+        name = f"idx_patron_{column.lower()}"
+        statements.append(_drop_index(dialect, name))
+        statements.append(index_statement(dialect, name, f"PAT_{column}, PAT_DELETED"))
+    if dialect == 'sqlite':
+        statements.append(_drop_index(dialect, 'idx_patron_deleted'))
+        statements.append(index_statement(dialect, 'idx_patron_deleted', 'PAT_DELETED',
+                                          'PAT_DELETED = 1'))
+    return statements
+
+# Schema steps in the order they are applied: (version, name, function
+# returning the statements for a dialect)
+MIGRATIONS = (
+    (1, "create patron table", _create_patron_table),
+    (2, "index searched and charted columns", _add_column_indexes),
+    (3, "soft delete", _add_soft_delete),
+    (4, "row versions", _add_row_version),
+    (5, "indexes tuned for live_patron reads", _tune_indexes)
+)
+
+def applied_migrations(cursor, backend):
+    '''
+    Read the steps recorded as applied.
+    
+    Args:
+        cursor: Cursor of a connection returned by ``backend.connect``
+        backend (Backend): Backend the connection belongs to
+    
+    Returns:
+        dict: Version -> time it was applied, or None if the database has
+              no schema_migrations table
+    '''
+    try:
+        cursor.execute("SELECT version, applied_at FROM schema_migrations")
+    except backend.error_class:
+        return None
+    return dict(cursor.fetchall())
+
+def _execute(cursor, backend, statement, params=None):
+    '''Run one schema statement, ignoring errors that mean it was already applied.'''
+    try:
+        cursor.execute(statement, params)
+    except backend.error_class as err:
+        if not backend.is_schema_conflict(err):
+            raise
+
+def _record(cursor, backend, version, name):
+    '''Record a step as applied.'''
+    _execute(cursor, backend, "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+             (version, name))
+
+def migrate(conn, backend):
+    '''
+    Apply the steps this database has not seen yet.
+    
+    A database without a patron table gets the current schema directly. A
+    patron table created before migrations were recorded is taken through
+    every step, each of which skips what is already in place.
+    
+    Args:
+        conn: Connection returned by ``backend.connect``
+        backend (Backend): Backend the connection belongs to
+    
+    Returns:
+        list: Versions applied, in order; empty if the schema was current
+    '''
+    cursor = conn.cursor()
+    try:
+        applied = applied_migrations(cursor, backend)
+        empty = applied is None and backend.patron_columns(cursor) is None
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        
+        if empty:
+            for statement in schema_statements(backend.dialect):
+                _execute(cursor, backend, statement)
+            for version, name, _ in MIGRATIONS:
+                _record(cursor, backend, version, name)
+            conn.commit()
+            return [version for version, _, _ in MIGRATIONS]
+        
+        done = []
+        for version, name, statements in MIGRATIONS:
+            if applied and version in applied:
+                continue
+            for statement in statements(backend.dialect):
+                _execute(cursor, backend, statement)
+            _record(cursor, backend, version, name)
+            conn.commit()
+            done.append(version)
+        return done
+    finally:
+        cursor.close()
+
+def migration_status(conn, backend):
+    '''
+    List every step and whether it has been applied.
+    
+    Args:
+        conn: Connection returned by ``backend.connect``
+        backend (Backend): Backend the connection belongs to
+    
+    Returns:
+        list: (version, name, time applied or None) tuples in order
+    '''
+    cursor = conn.cursor()
+    try:
+        applied = applied_migrations(cursor, backend) or {}
+    finally:
+        cursor.close()
+    return [(version, name, applied.get(version)) for version, name, _ in MIGRATIONS]
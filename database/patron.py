@@ -0,0 +1,84 @@
+'''
+Patron record module for the Client Management System.
+Contains the patron column layout and the validation rules shared by all write paths.
+'''
+
+# Columns of the patron table, in table order
+PATRON_COLUMNS = (
+    'PAT_ID',
+    'PAT_NAME',
+    'PAT_BALANCE',
+    'PAT_CONTACT',
+    'PAT_PREFERENCE',
+    'PAT_FREQUENCY'
+)
+
+# Form field names, in the same order as PATRON_COLUMNS
+PATRON_FIELDS = ('id', 'name', 'balance', 'contact', 'preference', 'frequency')
+
+# Type conversion applied to each field
+FIELD_TYPES = {
+    'id': int,
+    'name': str,
+    'balance': float,
+    'contact': int,
+    'preference': str,
+    'frequency': int
+}
+
+INSERT_PATRON_QUERY = '''
+    INSERT INTO patron 
+    (PAT_ID, PAT_NAME, PAT_BALANCE, PAT_CONTACT, PAT_PREFERENCE, PAT_FREQUENCY) 
+    VALUES (%s, %s, %s, %s, %s, %s)
+'''
+
+# SET clause added to every UPDATE of a client. PAT_VERSION then changes with
+# each write, so a save based on a stale copy of the client can be detected
+BUMP_VERSION = "PAT_VERSION = PAT_VERSION + 1"
+
+class MissingFieldError(ValueError):
+    '''Raised when a required text field is empty.'''
+
+def parse_patron(values):
+    '''
+    Convert raw field values into a patron row.
+    
+    Numeric fields are converted first, then the text fields are checked for
+    emptiness, matching the checks done by the Add Record form.
+    
+    Args:
+        values (dict): Field name (see PATRON_FIELDS) -> raw value
+    
+    Returns:
+        tuple: Row values in PATRON_COLUMNS order
+    
+    Raises:
+        ValueError: If a numeric field is missing or not a valid number
+        MissingFieldError: If the name or preference is empty
+    '''
+    row = []
+    for field in PATRON_FIELDS:
+        value = values.get(field)
+        convert = FIELD_TYPES[field]
+        
+        if convert is str:
+            row.append('' if value is None else str(value))
+            continue
+        
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            raise ValueError(f"Missing value for {field}")
+        if convert is int and isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f"Invalid value for {field}: {value!r}")
+            value = int(value)
+        try:
+            row.append(convert(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {field}: {value!r}") from None
+    
+    if not row[1] or not row[4]:
+        raise MissingFieldError("All fields must be filled")
+    
+    return tuple(row)
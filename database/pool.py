@@ -0,0 +1,284 @@
+'''
+Connection pool module for the Client Management System.
+Keeps a bounded set of reusable database connections shared between threads.
+'''
+
+import threading
+import time
+from contextlib import contextmanager
+
+class PoolTimeoutError(Exception):
+    '''Raised when no connection becomes available before the checkout timeout.'''
+
+class _PoolEntry:
+    '''Bookkeeping for a single pooled connection.'''
+    
+    __slots__ = ("conn", "created_at", "last_used", "last_checked", "uses")
+    
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+        self.uses = 0
+
+class ConnectionPool:
+    '''
+    Bounded, thread-safe pool of database connections.
+    
+    Connections are created lazily up to ``size``. Idle connections are handed
+    out most-recently-used first, checked for liveness when they have been idle
+    longer than ``health_check_interval`` and closed once they have been idle
+    longer than ``idle_timeout``.
+    '''
+    
+    def __init__(self, connect, size=5, idle_timeout=300.0, checkout_timeout=10.0,
+                 health_check_interval=30.0, is_healthy=None):
+        '''
+        Initialize the pool.
+        
+        Args:
+            connect (callable): Zero-argument function returning a new connection
+            size (int): Maximum number of open connections
+            idle_timeout (float): Seconds after which an idle connection is closed
+            checkout_timeout (float): Seconds to wait for a free connection
+            health_check_interval (float): Idle seconds after which a connection is pinged
+            is_healthy (callable, optional): Function taking a connection and returning
+                whether it is still usable; defaults to ``conn.is_connected()``
+        '''
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._is_healthy = is_healthy or self._default_is_healthy
+        
+        self._cond = threading.Condition()
+        self._idle = []        # Stack of idle entries, most recently used last
+        self._in_use = {}      # id(conn) -> entry
+        self._open = 0         # Open connections, including ones being created
+        self._closed = False
+        
+        # Statistics
+        self._checkouts = 0
+        self._reuses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._created = 0
+        self._evicted = 0
+        self._discarded = 0
+    
+    @staticmethod
+    def _default_is_healthy(conn):
+        '''Check a connection using its ``is_connected`` method when available.'''
+        is_connected = getattr(conn, "is_connected", None)
+        return is_connected() if is_connected else True
+    
+    @staticmethod
+    def _close_quietly(conn):
+        '''Close a connection, ignoring any error raised while doing so.'''
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _evict_idle(self, now):
+        '''
+        Remove idle connections past the idle timeout.
+        
+        Must be called with the pool lock held.
+        
+        Returns:
+            list: Connections that should be closed outside the lock
+        '''
+        expired = [e for e in self._idle if now - e.last_used > self.idle_timeout]
+        if expired:
+            self._idle = [e for e in self._idle if now - e.last_used <= self.idle_timeout]
+            self._open -= len(expired)
+            self._evicted += len(expired)
+            self._cond.notify(len(expired))
+        return [e.conn for e in expired]
+    
+    def acquire(self, timeout=None):
+        '''
+        Check out a connection from the pool.
+        
+        Args:
+            timeout (float, optional): Seconds to wait; defaults to ``checkout_timeout``
+        
+        Returns:
+            connection: A live database connection
+        
+        Raises:
+            PoolTimeoutError: If no connection became available in time
+        '''
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            
+            stale = self._evict_idle(time.monotonic())
+            entry = None
+            
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No database connection available after {timeout:.1f}s "
+                        f"(pool size {self.size})"
+                    )
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                start = time.monotonic()
+                self._cond.wait(remaining)
+                self._wait_time += time.monotonic() - start
+        
+        for conn in stale:
+            self._close_quietly(conn)
+        
+        now = time.monotonic()
+        if entry is not None and now - entry.last_checked > self.health_check_interval:
+            # Ping connections that have been idle for a while
+            try:
+                healthy = self._is_healthy(entry.conn)
+            except Exception:
+                healthy = False
+            if healthy:
+                entry.last_checked = now
+            else:
+                self._close_quietly(entry.conn)
+                with self._cond:
+                    self._discarded += 1
+                entry = None
+        
+        reused = entry is not None
+        if entry is None:
+            try:
+                entry = _PoolEntry(self._connect())
+            except Exception:
+                # Give the slot back so other callers are not starved
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        
+        entry.uses += 1
+        with self._cond:
+            self._checkouts += 1
+            if reused:
+                self._reuses += 1
+            else:
+                self._created += 1
+            self._in_use[id(entry.conn)] = entry
+        
+        return entry.conn
+    
+    def release(self, conn, discard=False):
+        '''
+        Return a connection to the pool.
+        
+        Any open transaction is rolled back so the next user starts clean.
+        
+        Args:
+            conn: Connection previously returned by ``acquire``
+            discard (bool): Close the connection instead of keeping it
+        '''
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            return
+        
+        if not discard and getattr(conn, "in_transaction", False):
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        
+        with self._cond:
+            if discard or self._closed:
+                self._open -= 1
+                if discard:
+                    self._discarded += 1
+            else:
+                now = time.monotonic()
+                entry.last_used = now
+                entry.last_checked = now
+                self._idle.append(entry)
+                conn = None
+            self._cond.notify()
+        
+        if conn is not None:
+            self._close_quietly(conn)
+    
+    @contextmanager
+    def connection(self, timeout=None):
+        '''
+        Context manager that checks out a connection and always returns it.
+        
+        A connection whose use raised an exception is discarded if it no
+        longer passes the health check.
+        
+        Args:
+            timeout (float, optional): Seconds to wait for a free connection
+        '''
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            try:
+                discard = not self._is_healthy(conn)
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+    
+    def close(self):
+        '''Close all idle connections and refuse further checkouts.'''
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry.conn)
+    
+    def stats(self):
+        '''
+        Return a snapshot of pool statistics.
+        
+        Returns:
+            dict: Counters for checkouts, waits, reuse ratio and pool occupancy
+        '''
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "checkouts": checkouts,
+                "reuses": self._reuses,
+                "reuse_ratio": self._reuses / checkouts if checkouts else 0.0,
+                "waits": self._waits,
+                "wait_time": self._wait_time,
+                "created": self._created,
+                "evicted": self._evicted,
+                "discarded": self._discarded,
+            }
@@ -0,0 +1,112 @@
+'''
+Schema module for the Client Management System.
+Contains the patron table and index definitions for each supported SQL dialect.
+'''
+
+from database.patron import PATRON_COLUMNS
+
+# Patron table, per dialect. SQLite compares the text columns without regard
+# to case, like MySQL's default collation, so LIKE behaves the same on both
+PATRON_TABLE = {
+    'mysql': '''
+        CREATE TABLE IF NOT EXISTS patron (
+            PAT_ID INT PRIMARY KEY,
+            PAT_NAME VARCHAR(50),
+            PAT_BALANCE FLOAT,
+            PAT_CONTACT INT,
+            PAT_PREFERENCE VARCHAR(50),
+            PAT_FREQUENCY INT,
+            PAT_DELETED TINYINT NOT NULL DEFAULT 0,
+            PAT_VERSION INT NOT NULL DEFAULT 0
+        )
+    ''',
+    'sqlite': '''
+        CREATE TABLE IF NOT EXISTS patron (
+            PAT_ID INTEGER PRIMARY KEY,
+            PAT_NAME VARCHAR(50) COLLATE NOCASE,
+            PAT_BALANCE FLOAT,
+            PAT_CONTACT INT,
+            PAT_PREFERENCE VARCHAR(50) COLLATE NOCASE,
+            PAT_FREQUENCY INT,
+            PAT_DELETED INTEGER NOT NULL DEFAULT 0,
+            PAT_VERSION INTEGER NOT NULL DEFAULT 0
+        )
+    '''
+}
+
+# Clients that have not been deleted. Deleting a client only sets
+# PAT_DELETED; every read goes through this view, so deleted clients are
+# hidden at once, and the purger removes the rows later
+LIVE_PATRON_VIEW = f'''
+    live_patron AS
+    SELECT {', '.join(PATRON_COLUMNS)} FROM patron WHERE PAT_DELETED = 0
+'''
+
+# Secondary indexes: (name, column list, partial index condition). Every
+# read goes through live_patron, so PAT_DELETED follows the searched column:
+# prefix searches range-scan the name and preference indexes, and the graph
+# aggregates are answered from the preference, balance and frequency indexes
+# alone. On SQLite the PAT_DELETED index only holds deleted rows, which is
+# all the purger looks for; a full index would tempt the planner into
+# reading every live client through it. MySQL has no partial indexes and
+# indexes the whole column
+PATRON_INDEXES = (
+    ('idx_patron_name', 'PAT_NAME, PAT_DELETED', None),
+    ('idx_patron_preference', 'PAT_PREFERENCE, PAT_DELETED', None),
+    ('idx_patron_balance', 'PAT_BALANCE, PAT_DELETED', None),
+    ('idx_patron_frequency', 'PAT_FREQUENCY, PAT_DELETED', None),
+    ('idx_patron_deleted', 'PAT_DELETED', 'PAT_DELETED = 1')
+)
+
+def index_statement(dialect, name, columns, where=None):
+    '''
+    Return the statement that creates one index on the patron table.
+    
+    Args:
+        dialect (str): "mysql" or "sqlite"
+        name (str): Index name
+        columns (str): Indexed columns, comma separated
+        where (str, optional): Condition limiting a partial index; ignored
+                               on MySQL
+    
+    Returns:
+        str: SQL statement
+    '''
+    if dialect == 'sqlite':
+        statement = f"CREATE INDEX IF NOT EXISTS {name} ON patron ({columns})"
+        return f"{statement} WHERE {where}" if where else statement
+    # MySQL has no CREATE INDEX IF NOT EXISTS; see Backend.is_schema_conflict
+    return f"CREATE INDEX {name} ON patron ({columns})"
+
+def view_statement(dialect):
+    '''
+    Return the statement that creates the live_patron view.
+    
+    Args:
+        dialect (str): "mysql" or "sqlite"
+    
+    Returns:
+        str: SQL statement
+    '''
+    if dialect == 'sqlite':
+        return f"CREATE VIEW IF NOT EXISTS {LIVE_PATRON_VIEW.strip()}"
+    return f"CREATE OR REPLACE VIEW {LIVE_PATRON_VIEW.strip()}"
+
+def schema_statements(dialect):
+    '''
+    Return the statements that create the current patron table, its indexes
+    and views in an empty database.
+    
+    Existing databases are brought up to date by database.migrations.
+    
+    Args:
+        dialect (str): "mysql" or "sqlite"
+    
+    Returns:
+        list: SQL statements, table first
+    '''
+    statements = [PATRON_TABLE[dialect]]
+    for name, columns, where in PATRON_INDEXES:
+        statements.append(index_statement(dialect, name, columns, where))
+    statements.append(view_statement(dialect))
+    return statements
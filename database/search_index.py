@@ -0,0 +1,461 @@
+'''
+Search index module for the Client Management System.
+Provides indexed prefix search in SQL and an in-process trigram index for
+substring search on client names and preferences.
+'''
+
+import bisect
+import heapq
+import os
+import threading
+from array import array
+
+from database.cache import add_write_listener
+from database.db_config import run_query, stream_query
+from database.patron import PATRON_COLUMNS
+
+# Search configuration using environment variables
+SEARCH_CONFIG = {
+    'limit': int(os.getenv('SEARCH_RESULT_LIMIT', '200'))
+}
+
+# Searchable fields and their columns
+SEARCH_FIELDS = {
+    "Name": "PAT_NAME",
+    "Preference": "PAT_PREFERENCE"
+}
+
+# Match modes offered by the search dialog
+MATCH_CONTAINS = "Contains"
+MATCH_PREFIX = "Starts with"
+MATCH_MODES = [MATCH_CONTAINS, MATCH_PREFIX]
+
+# Terms shorter than a trigram are matched with LIKE instead of the index
+_MIN_INDEXED_TERM = 3
+
+# Rows read per batch while building the index
+_BUILD_BATCH = 5000
+
+def escape_like(value):
+    '''
+    Escape LIKE wildcards in a search value.
+    
+    Args:
+        value (str): Raw search value
+    
+    Returns:
+        str: Value safe to use in a LIKE pattern with ``ESCAPE '!'``
+    '''
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+def prefix_search(column, prefix, limit=None):
+    '''
+    Find clients whose column starts with a prefix.
+    
+    A pattern without a leading wildcard lets MySQL range-scan the B-tree
+    index on the column, and the index order also satisfies the ORDER BY.
+    
+    Args:
+        column (str): One of the columns in SEARCH_FIELDS
+        prefix (str): Prefix to match
+        limit (int, optional): Maximum number of rows; defaults to SEARCH_CONFIG
+    
+    Returns:
+        list: Matching patron rows ordered by the column
+    '''
+    if column not in SEARCH_FIELDS.values():
+        raise ValueError(f"Column cannot be searched: {column}")
+    limit = limit or SEARCH_CONFIG['limit']
+    
+    query = (f"SELECT * FROM live_patron WHERE {column} LIKE %s ESCAPE '!' "
+             f"ORDER BY {column}, PAT_ID LIMIT %s")
+    return run_query(query, (escape_like(prefix) + "%", limit), fetch=True)
+
+def _trigrams(text):
+    '''
+    Split a value into its overlapping three-character grams.
+    
+    Args:
+        text (str): Case-folded value
+    
+    Returns:
+        set: Trigrams of the value; empty if it is shorter than three characters
+    '''
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _contains(postings, pat_id):
+    '''Whether a sorted posting array holds a client ID.'''
+    i = bisect.bisect_left(postings, pat_id)
+    return i < len(postings) and postings[i] == pat_id
+
+def _rank(term, text):
+    '''
+    Sort key for a substring match; lower keys rank higher.
+    
+    Exact matches come first, then prefix matches, then matches at the
+    start of a word, then any other match. Ties go to the earlier match
+    and then to the shorter value.
+    
+    Args:
+        term (str): Case-folded search term
+        text (str): Case-folded value containing the term
+    
+    Returns:
+        tuple: Match tier, match position and value length
+    '''
+    position = text.find(term)
+    if text == term:
+        tier = 0
+    elif position == 0:
+        tier = 1
+    elif not text[position - 1].isalnum():
+        tier = 2
+    else:
+        tier = 3
+    return (tier, position, len(text))
+
+class TrigramIndex:
+    '''
+    Inverted index from trigrams to client IDs for one text column.
+    
+    Values are case-folded, matching MySQL's case-insensitive collation.
+    A term of three or more characters is looked up by intersecting the
+    postings of its trigrams; shorter terms are left to ``like_search``.
+    Postings are sorted ``array('i')`` of client IDs, four bytes per entry
+    instead of a set slot and an int object each. All candidates are
+    checked against the value before being ranked.
+    '''
+    
+    def __init__(self):
+        '''Initialize an empty index.'''
+        self._texts = {}  # PAT_ID -> case-folded value
+        self._grams = {}  # trigram -> sorted array of PAT_IDs
+    
+    def __len__(self):
+        return len(self._texts)
+    
+    def add(self, pat_id, value):
+        '''
+        Index a value, replacing any earlier value for the same client.
+        
+        Args:
+            pat_id (int): Client ID
+            value (str): Column value, or None to only remove the client
+        '''
+        self.remove(pat_id)
+        if not value:
+            return
+        text = value.casefold()
+        self._texts[pat_id] = text
+        for gram in _trigrams(text):
+            postings = self._grams.get(gram)
+            if postings is None:
+                self._grams[gram] = array('i', (pat_id,))
+            elif postings[-1] < pat_id:
+                # Builds read clients in ID order, so this is the usual case
+                postings.append(pat_id)
+            else:
+                postings.insert(bisect.bisect_left(postings, pat_id), pat_id)
+    
+    def remove(self, pat_id):
+        '''
+        Remove a client from the index.
+        
+        Args:
+            pat_id (int): Client ID
+        '''
+        text = self._texts.pop(pat_id, None)
+        if text is None:
+            return
+        for gram in _trigrams(text):
+            postings = self._grams.get(gram)
+            if postings is not None and _contains(postings, pat_id):
+                del postings[bisect.bisect_left(postings, pat_id)]
+                if not postings:
+                    del self._grams[gram]
+    
+    def clear(self):
+        '''Remove every client from the index.'''
+        self._texts.clear()
+        self._grams.clear()
+    
+    def _candidates(self, term):
+        '''
+        Return IDs whose value may contain the term.
+        
+        Args:
+            term (str): Case-folded search term of three or more characters
+        
+        Returns:
+            list: Candidate client IDs
+        '''
+        postings = [self._grams.get(gram) for gram in _trigrams(term)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        # Walk the shortest postings and look each ID up in the others
+        return [pat_id for pat_id in postings[0]
+                if all(_contains(other, pat_id) for other in postings[1:])]
+    
+    def search(self, term, limit):
+        '''
+        Find the best-ranked clients whose value contains a term.
+        
+        Args:
+            term (str): Search term of three or more characters
+            limit (int): Maximum number of IDs returned
+        
+        Returns:
+            list: Client IDs, best match first
+        '''
+        term = term.casefold()
+        if len(term) < _MIN_INDEXED_TERM:
+            raise ValueError(f"Term too short for the trigram index: {term!r}")
+        
+        texts = self._texts
+        matches = ((_rank(term, texts[pat_id]), pat_id)
+                   for pat_id in self._candidates(term)
+                   if term in texts[pat_id])
+        return [pat_id for _, pat_id in heapq.nsmallest(limit, matches)]
+
+def like_search(column, term, limit=None):
+    '''
+    Find clients whose column contains a short term, without the trigram index.
+    
+    A one or two character term matches a large share of the clients, so
+    the index would only hand back most of the table. The LIKE filter runs
+    in the database and the matches are streamed and ranked in batches, so
+    only the best ``limit`` are held at once.
+    
+    Args:
+        column (str): One of the columns in SEARCH_FIELDS
+        term (str): Substring to match, ignoring case
+        limit (int, optional): Maximum number of IDs; defaults to SEARCH_CONFIG
+    
+    Returns:
+        list: Client IDs, best match first
+    '''
+    if column not in SEARCH_FIELDS.values():
+        raise ValueError(f"Column cannot be searched: {column}")
+    term = term.casefold()
+    if not term:
+        return []
+    
+    def matches():
+        query = f"SELECT PAT_ID, {column} FROM live_patron WHERE {column} LIKE %s ESCAPE '!'"
+        for rows in stream_query(query, (f"%{escape_like(term)}%",)):
+            for pat_id, value in rows:
+                text = value.casefold()
+                # LIKE folds case by the column collation; keep the index's rule
+                if term in text:
+                    yield _rank(term, text), pat_id
+    
+    return [pat_id for _, pat_id in heapq.nsmallest(limit or SEARCH_CONFIG['limit'], matches())]
+
+class PatronSearchIndex:
+    '''
+    Trigram indexes for the searchable patron columns.
+    
+    The indexes are built from a snapshot of the table on first use. After
+    that, writes reported through the patron cache are applied one client
+    at a time before the next search; bulk changes cause a full rebuild.
+    '''
+    
+    def __init__(self):
+        '''Initialize the index; nothing is loaded until the first search.'''
+        self._indexes = {column: TrigramIndex() for column in SEARCH_FIELDS.values()}
+        self._lock = threading.Lock()
+        self._built = False
+        self._dirty = set()
+        self._pending_lock = threading.Lock()
+    
+    def on_write(self, pat_id):
+        '''
+        Record a write so the index catches up before the next search.
+        
+        Args:
+            pat_id (int): Client ID written, or None if many rows changed
+        '''
+        with self._pending_lock:
+            if pat_id is None:
+                self._built = False
+                self._dirty.clear()
+            else:
+                self._dirty.add(pat_id)
+    
+    def invalidate(self):
+        '''Force a full rebuild on the next search.'''
+        self.on_write(None)
+    
+    def _build(self):
+        '''Load every searchable value from the database, one batch at a time.'''
+        columns = list(self._indexes)
+        for index in self._indexes.values():
+            index.clear()
+        try:
+            for rows in stream_query(f"SELECT PAT_ID, {', '.join(columns)} FROM live_patron "
+                                     "ORDER BY PAT_ID", batch_size=_BUILD_BATCH):
+                for row in rows:
+                    for column, value in zip(columns, row[1:]):
+                        self._indexes[column].add(row[0], value)
+        except Exception:
+            # Do not search a half-built index
+            for index in self._indexes.values():
+                index.clear()
+            raise
+    
+    def _refresh(self, ids):
+        '''
+        Reload the searchable values of a few clients.
+        
+        Args:
+            ids (list): Client IDs written since the last search
+        '''
+        columns = list(self._indexes)
+        placeholders = ", ".join(["%s"] * len(ids))
+        rows = run_query(f"SELECT PAT_ID, {', '.join(columns)} FROM live_patron "
+                         f"WHERE PAT_ID IN ({placeholders})", tuple(ids), fetch=True)
+        found = {row[0]: row for row in rows}
+        for pat_id in ids:
+            row = found.get(pat_id)
+            for i, column in enumerate(columns, start=1):
+                self._indexes[column].add(pat_id, row[i] if row else None)
+    
+    def _sync(self):
+        '''Bring the indexes up to date; must be called with the index lock held.'''
+        with self._pending_lock:
+            rebuild = not self._built
+            dirty = list(self._dirty)
+            self._dirty.clear()
+            self._built = True
+        
+        try:
+            if rebuild:
+                self._build()
+            elif dirty:
+                self._refresh(dirty)
+        except Exception:
+            # Try again on the next search
+            with self._pending_lock:
+                if rebuild:
+                    self._built = False
+                else:
+                    self._dirty.update(dirty)
+            raise
+    
+    def search_ids(self, column, term, limit=None):
+        '''
+        Find clients whose column contains a term.
+        
+        Terms shorter than three characters go to ``like_search``; the index
+        is neither built nor consulted for them.
+        
+        Args:
+            column (str): One of the columns in SEARCH_FIELDS
+            term (str): Substring to match, ignoring case
+            limit (int, optional): Maximum number of IDs; defaults to SEARCH_CONFIG
+        
+        Returns:
+            list: Client IDs, best match first
+        '''
+        if column not in self._indexes:
+            raise ValueError(f"Column cannot be searched: {column}")
+        if len(term.casefold()) < _MIN_INDEXED_TERM:
+            return like_search(column, term, limit)
+        with self._lock:
+            self._sync()
+            return self._indexes[column].search(term, limit or SEARCH_CONFIG['limit'])
+    
+    def search(self, column, term, limit=None):
+        '''
+        Find clients whose column contains a term and load their rows.
+        
+        Args:
+            column (str): One of the columns in SEARCH_FIELDS
+            term (str): Substring to match, ignoring case
+            limit (int, optional): Maximum number of rows; defaults to SEARCH_CONFIG
+        
+        Returns:
+            list: Matching patron rows, best match first
+        '''
+        ids = self.search_ids(column, term, limit)
+        if not ids:
+            return []
+        
+        placeholders = ", ".join(["%s"] * len(ids))
+        rows = run_query(f"SELECT * FROM live_patron WHERE PAT_ID IN ({placeholders})",
+                         tuple(ids), fetch=True)
+        order = {pat_id: i for i, pat_id in enumerate(ids)}
+        return sorted(rows, key=lambda row: order[row[0]])
+
+# Shared index kept current by patron writes
+search_index = PatronSearchIndex()
+add_write_listener(search_index.on_write)
+
+def search_patrons(field, value, mode=MATCH_CONTAINS, limit=None):
+    '''
+    Search clients by name or preference.
+    
+    Args:
+        field (str): Key of SEARCH_FIELDS, e.g. "Name"
+        value (str): Text to search for
+        mode (str): MATCH_CONTAINS or MATCH_PREFIX
+        limit (int, optional): Maximum number of rows; defaults to SEARCH_CONFIG
+    
+    Returns:
+        list: Matching patron rows, best match first
+    '''
+    column = SEARCH_FIELDS[field]
+    if mode == MATCH_PREFIX:
+        return prefix_search(column, value, limit)
+    return search_index.search(column, value, limit)
+
+def refines(previous, value, mode=MATCH_CONTAINS):
+    '''
+    Check whether every match for a value also matched an earlier value.
+    
+    Args:
+        previous (str): Value of the earlier search
+        value (str): Value of the new search
+        mode (str): MATCH_CONTAINS or MATCH_PREFIX
+    
+    Returns:
+        bool: True if the new matches are a subset of the earlier ones
+    '''
+    previous = previous.casefold()
+    value = value.casefold()
+    if mode == MATCH_PREFIX:
+        return value.startswith(previous)
+    return previous in value
+
+def refine_results(rows, field, value, mode=MATCH_CONTAINS, limit=None):
+    '''
+    Narrow the rows of an earlier search to a refined value without a query.
+    
+    The rows are filtered and ordered the same way the database or trigram
+    index would have done. Only use this when the earlier search returned
+    fewer rows than the limit; otherwise rows beyond the cap could be missed.
+    
+    Args:
+        rows (list): Patron rows returned by the earlier search
+        field (str): Key of SEARCH_FIELDS, e.g. "Name"
+        value (str): Refined search value
+        mode (str): MATCH_CONTAINS or MATCH_PREFIX
+        limit (int, optional): Maximum number of rows; defaults to SEARCH_CONFIG
+    
+    Returns:
+        list: Matching patron rows, best match first
+    '''
+    position = PATRON_COLUMNS.index(SEARCH_FIELDS[field])
+    term = value.casefold()
+    limit = limit or SEARCH_CONFIG['limit']
+    
+    if mode == MATCH_PREFIX:
+        matches = [row for row in rows
+                   if row[position] and row[position].casefold().startswith(term)]
+        matches.sort(key=lambda row: (row[position].casefold(), row[0]))
+        return matches[:limit]
+    
+    matches = ((_rank(term, row[position].casefold()), row[0], row) for row in rows
+               if row[position] and term in row[position].casefold())
+    return [row for _, _, row in heapq.nsmallest(limit, matches, key=lambda m: m[:2])]
@@ -0,0 +1,661 @@
+'''
+Columnar snapshot module for the Client Management System.
+Keeps the numeric and categorical patron columns in NumPy arrays so charts
+and summaries are computed in memory instead of re-reading the table.
+
+Numeric columns are float64 arrays with NaN for NULL, aligned by position
+with the sorted PAT_ID array. Preferences are dictionary-encoded: each row
+holds an int32 code into a list of distinct preferences, -1 for NULL.
+Distinct values are compared without regard to case, like GROUP BY in the
+database.
+
+The arrays are also saved to SNAPSHOT_CACHE_DIR, one ``.npy`` file per
+column, together with each client's PAT_VERSION. On the next start they are
+memory-mapped instead of read from the database, so the first chart appears
+without loading the table, and the copy is checked against the database in
+the background.
+'''
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+import numpy as np
+from database.cache import add_write_listener
+from database.db_config import get_backend, run_query
+
+# Snapshot configuration using environment variables
+SNAPSHOT_CONFIG = {
+    'batch_size': int(os.getenv('SNAPSHOT_BATCH_SIZE', '10000')),
+    'ttl': float(os.getenv('SNAPSHOT_TTL', '60')),
+    'cache_dir': os.getenv('SNAPSHOT_CACHE_DIR', 'snapshot_cache')
+}
+
+# Layout version of the on-disk cache; caches in another layout are ignored
+CACHE_FORMAT = 2
+
+# Balance sums are compared with this relative tolerance, since FLOAT values
+# are summed with rounding differences by the server
+_BALANCE_TOLERANCE = 1e-7
+
+# Numeric columns held as arrays, keyed by attribute name
+NUMERIC_COLUMNS = {
+    'balance': 'PAT_BALANCE',
+    'contact': 'PAT_CONTACT',
+    'frequency': 'PAT_FREQUENCY'
+}
+
+# Columns read by the snapshot, in array order after PAT_ID
+_COLUMNS = list(NUMERIC_COLUMNS.values()) + ['PAT_PREFERENCE', 'PAT_VERSION']
+
+# The live clients; live_patron does not expose PAT_VERSION
+_LIVE_ROWS = "FROM patron WHERE PAT_DELETED = 0"
+
+def _float_array(values, count):
+    '''Convert values to a float64 array, mapping None to NaN.'''
+    return np.fromiter((np.nan if v is None else v for v in values), dtype=np.float64,
+                       count=count)
+
+class PatronSnapshot:
+    '''
+    In-memory columnar copy of the patron table.
+    
+    The snapshot is loaded on first use in keyset-paginated batches, so the
+    full table is never held as Python tuples. After that, writes reported
+    through the patron cache are applied row by row before the next read;
+    bulk changes, and snapshots older than ``ttl`` seconds, are reloaded.
+    
+    With a ``cache_dir``, every full load is saved to disk and the first
+    read of a later run maps that copy instead. A background thread then
+    compares a watermark of the copy (row count, highest PAT_ID, column
+    sums and row versions) with the database: clients added since are appended, and any
+    other difference causes a full reload.
+    '''
+    
+    def __init__(self, batch_size=10000, ttl=60.0, cache_dir=None):
+        '''
+        Initialize the snapshot; nothing is loaded until the first read.
+        
+        Args:
+            batch_size (int): Rows read per query while loading
+            ttl (float): Seconds before the snapshot is reloaded in full, to
+                         pick up writes made by other clients; 0 disables this
+            cache_dir (str, optional): Directory of the on-disk copy; no copy
+                                       is kept if empty
+        '''
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir or None
+        
+        self.ids = np.empty(0, dtype=np.int64)
+        self.columns = {name: np.empty(0) for name in NUMERIC_COLUMNS}
+        self.codes = np.empty(0, dtype=np.int32)
+        self.versions = np.empty(0, dtype=np.int64)  # PAT_VERSION, to detect any update
+        self.categories = []
+        self._category_codes = {}  # casefolded preference -> code
+        
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._dirty = set()
+        self._pending_lock = threading.Lock()
+        
+        # The on-disk copy is only tried for the first load
+        self._cache_tried = False
+        self._reconciled = threading.Event()
+        self._reconciled.set()
+    
+    def on_write(self, pat_id):
+        '''
+        Record a write so the snapshot catches up before the next read.
+        
+        Args:
+            pat_id (int): Client ID written, or None if many rows changed
+        '''
+        with self._pending_lock:
+            if pat_id is None:
+                self._loaded_at = None
+                self._dirty.clear()
+            else:
+                self._dirty.add(pat_id)
+    
+    def invalidate(self):
+        '''Force a full reload on the next read.'''
+        self.on_write(None)
+    
+    def _encode(self, preferences, count):
+        '''
+        Dictionary-encode preferences, adding new ones to the category list.
+        
+        Args:
+            preferences (iterable): Preference strings or None
+            count (int): Number of values
+        
+        Returns:
+            numpy.ndarray: int32 codes, -1 for NULL
+        '''
+        codes = self._category_codes
+        categories = self.categories
+        
+        def code(value):
+            if value is None:
+                return -1
+            key = value.casefold()
+            found = codes.get(key)
+            if found is None:
+                found = codes[key] = len(categories)
+                categories.append(value)
+            return found
+        
+        return np.fromiter((code(v) for v in preferences), dtype=np.int32, count=count)
+    
+    def _to_arrays(self, rows):
+        '''
+        Convert fetched rows into one array per column.
+        
+        Args:
+            rows (list): (PAT_ID, balance, contact, frequency, preference,
+                         version) tuples
+        
+        Returns:
+            tuple: (ids array, dict of numeric arrays, preference codes array,
+                   versions array)
+        '''
+        count = len(rows)
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=count)
+        numeric = {name: _float_array((r[i] for r in rows), count)
+                   for i, name in enumerate(NUMERIC_COLUMNS, start=1)}
+        codes = self._encode((r[-2] for r in rows), count)
+        versions = np.fromiter((r[-1] for r in rows), dtype=np.int64, count=count)
+        return ids, numeric, codes, versions
+    
+    def _read_after(self, after_id=None):
+        '''
+        Read rows in PAT_ID order, one batch at a time.
+        
+        Args:
+            after_id (int, optional): Only read clients with a higher PAT_ID
+        
+        Yields:
+            tuple: (ids array, dict of numeric arrays, preference codes array,
+                   versions array) for each batch
+        '''
+        query = f"SELECT PAT_ID, {', '.join(_COLUMNS)} {_LIVE_ROWS}"
+        while True:
+            if after_id is None:
+                rows = run_query(f"{query} ORDER BY PAT_ID LIMIT %s",
+                                 (self.batch_size,), fetch=True)
+            else:
+                rows = run_query(f"{query} AND PAT_ID > %s ORDER BY PAT_ID LIMIT %s",
+                                 (after_id, self.batch_size), fetch=True)
+            if rows:
+                yield self._to_arrays(rows)
+                after_id = rows[-1][0]
+            if len(rows) < self.batch_size:
+                return
+    
+    def _append(self, chunks):
+        '''
+        Add batches of rows with higher PAT_IDs than any held.
+        
+        Args:
+            chunks (list): Batches as yielded by _read_after
+        '''
+        if not chunks:
+            return
+        self.ids = np.concatenate([self.ids] + [c[0] for c in chunks])
+        self.columns = {name: np.concatenate([self.columns[name]] + [c[1][name] for c in chunks])
+                        for name in NUMERIC_COLUMNS}
+        self.codes = np.concatenate([self.codes] + [c[2] for c in chunks])
+        self.versions = np.concatenate([self.versions] + [c[3] for c in chunks])
+    
+    def _load(self):
+        '''Read the whole table and save it to the on-disk cache.'''
+        self.categories = []
+        self._category_codes = {}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.columns = {name: np.empty(0) for name in NUMERIC_COLUMNS}
+        self.codes = np.empty(0, dtype=np.int32)
+        self.versions = np.empty(0, dtype=np.int64)
+        self._append(list(self._read_after()))
+        self._save_cache()
+    
+    def _refresh(self, ids):
+        '''
+        Reload the rows of a few clients and apply them in place.
+        
+        Updated rows are overwritten, deleted rows removed and new rows
+        inserted at their sorted position.
+        
+        Args:
+            ids (list): Client IDs written since the last read
+        '''
+        placeholders = ", ".join(["%s"] * len(ids))
+        rows = run_query(f"SELECT PAT_ID, {', '.join(_COLUMNS)} {_LIVE_ROWS} "
+                         f"AND PAT_ID IN ({placeholders}) ORDER BY PAT_ID",
+                         tuple(ids), fetch=True)
+        new_ids, numeric, codes, versions = self._to_arrays(rows)
+        
+        # Drop every written row, then insert the current version of those
+        # that still exist
+        written = np.asarray(sorted(ids), dtype=np.int64)
+        keep = ~np.isin(self.ids, written, assume_unique=True)
+        positions = np.searchsorted(self.ids[keep], new_ids)
+        
+        self.ids = np.insert(self.ids[keep], positions, new_ids)
+        self.columns = {name: np.insert(values[keep], positions, numeric[name])
+                        for name, values in self.columns.items()}
+        self.codes = np.insert(self.codes[keep], positions, codes)
+        self.versions = np.insert(self.versions[keep], positions, versions)
+    
+    def _sync(self):
+        '''Bring the snapshot up to date; must be called with the lock held.'''
+        with self._pending_lock:
+            expired = (self._loaded_at is None
+                       or (self.ttl and time.monotonic() - self._loaded_at > self.ttl))
+            dirty = list(self._dirty)
+            self._dirty.clear()
+            # Reloading is cheaper than applying very many single-row changes
+            expired = expired or len(dirty) > self.batch_size
+            warm_start = expired and not self._cache_tried
+            self._cache_tried = True
+            if expired:
+                self._loaded_at = time.monotonic()
+        
+        try:
+            if warm_start and self._open_cache():
+                self._start_reconcile()
+                expired = False
+            if expired:
+                self._load()
+            elif dirty:
+                self._refresh(dirty)
+        except Exception:
+            # Try again on the next read
+            with self._pending_lock:
+                if expired:
+                    self._loaded_at = None
+                else:
+                    self._dirty.update(dirty)
+            raise
+    
+    def sync(self, wait=False):
+        '''
+        Load or update the snapshot so it reflects the latest known writes.
+        
+        Args:
+            wait (bool): Also wait until a copy opened from disk has been
+                         checked against the database
+        '''
+        with self._lock:
+            self._sync()
+        if wait:
+            self._reconciled.wait()
+    
+    def watermark(self):
+        '''
+        Summarize the rows held, for comparison with the database.
+        
+        Returns:
+            dict: Row count, highest PAT_ID, the sums of PAT_ID, contact,
+                  frequency and balance, and the sum and highest PAT_VERSION
+        '''
+        with self._lock:
+            ids, columns, versions = self.ids, self.columns, self.versions
+        
+        def int_sum(values):
+            return int(values[~np.isnan(values)].astype(np.int64).sum())
+        
+        return {
+            "rows": len(ids),
+            "max_id": int(ids[-1]) if len(ids) else None,
+            "id_sum": int(ids.sum()),
+            "contact_sum": int_sum(columns['contact']),
+            "frequency_sum": int_sum(columns['frequency']),
+            "balance_sum": float(np.nansum(columns['balance'])),
+            # Every update bumps PAT_VERSION, including ones that only
+            # change the preference or a balance within the tolerance
+            "version_sum": int(versions.sum()),
+            "max_version": int(versions.max()) if len(versions) else None
+        }
+    
+    @staticmethod
+    def _server_watermark():
+        '''
+        Summarize the patron table with one aggregate query.
+        
+        Returns:
+            dict: The same keys as watermark
+        '''
+        (rows, max_id, id_sum, contact_sum, frequency_sum, balance_sum, version_sum,
+         max_version) = run_query(
+            "SELECT COUNT(*), MAX(PAT_ID), SUM(PAT_ID), SUM(PAT_CONTACT), SUM(PAT_FREQUENCY), "
+            f"SUM(PAT_BALANCE), SUM(PAT_VERSION), MAX(PAT_VERSION) {_LIVE_ROWS}",
+            fetch=True)[0]
+        return {
+            "rows": int(rows),
+            "max_id": None if max_id is None else int(max_id),
+            "id_sum": int(id_sum or 0),
+            "contact_sum": int(contact_sum or 0),
+            "frequency_sum": int(frequency_sum or 0),
+            "balance_sum": float(balance_sum or 0),
+            "version_sum": int(version_sum or 0),
+            "max_version": None if max_version is None else int(max_version)
+        }
+    
+    @staticmethod
+    def _same(local, server):
+        '''Check whether two watermarks describe the same rows.'''
+        exact = ("rows", "max_id", "id_sum", "contact_sum", "frequency_sum", "version_sum",
+                 "max_version")
+        return (all(local[key] == server[key] for key in exact)
+                and math.isclose(local["balance_sum"], server["balance_sum"],
+                                 rel_tol=_BALANCE_TOLERANCE, abs_tol=0.005))
+    
+    def _start_reconcile(self):
+        '''Check a copy opened from disk against the database in the background.'''
+        self._reconciled.clear()
+        threading.Thread(target=self._reconcile, name="snapshot-reconcile", daemon=True).start()
+    
+    def _reconcile(self):
+        '''Bring a copy opened from disk up to date with the database.'''
+        try:
+            # The aggregate scans the table, so run it without holding the lock
+            server = self._server_watermark()
+            with self._lock:
+                self._sync()
+                if self._same(self.watermark(), server):
+                    return
+                
+                # Clients added since the copy was saved
+                if len(self.ids) and server["max_id"] is not None and server["max_id"] > self.ids[-1]:
+                    self._append(list(self._read_after(int(self.ids[-1]))))
+                    if self._same(self.watermark(), server):
+                        self._save_cache()
+                        return
+                
+                # Rows were changed or deleted: the copy cannot be patched
+                self._load()
+                with self._pending_lock:
+                    self._loaded_at = time.monotonic()
+        except Exception as err:
+            # Keep the copy; it is reloaded in full once the TTL expires
+            print(f"Snapshot cache not checked against the database: {err}", file=sys.stderr)
+        finally:
+            self._reconciled.set()
+    
+    def _cache_path(self, name):
+        '''Path of a file in the cache directory.'''
+        return os.path.join(self.cache_dir, name)
+    
+    def _save_cache(self):
+        '''
+        Write the arrays to the cache directory.
+        
+        Each save writes a new set of column files and then replaces the
+        metadata file that names them, so a crash never leaves a mix of
+        old and new columns.
+        '''
+        if not self.cache_dir:
+            return
+        generation = uuid.uuid4().hex
+        arrays = dict(self.columns, ids=self.ids, codes=self.codes, versions=self.versions)
+        meta = {
+            "format": CACHE_FORMAT,
+            "source": get_backend().describe(),
+            "generation": generation,
+            "saved": time.time(),
+            "rows": len(self.ids),
+            "categories": self.categories,
+            "watermark": self.watermark()
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for name, values in arrays.items():
+                np.save(self._cache_path(f"{name}-{generation}.npy"), values)
+            temp_path = self._cache_path("meta.json.tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(temp_path, self._cache_path("meta.json"))
+        except OSError as err:
+            # The cache only speeds up the next start
+            print(f"Snapshot cache not saved: {err}", file=sys.stderr)
+            return
+        
+        # Remove earlier generations; files still mapped may not be removable
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy") and generation not in name:
+                try:
+                    os.remove(self._cache_path(name))
+                except OSError:
+                    pass
+    
+    def _open_cache(self):
+        '''
+        Memory-map the arrays saved by an earlier run.
+        
+        Returns:
+            bool: True if a cache for the current database was opened
+        '''
+        if not self.cache_dir:
+            return False
+        try:
+            with open(self._cache_path("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["format"] != CACHE_FORMAT or meta["source"] != get_backend().describe():
+                return False
+            generation = meta["generation"]
+            arrays = {name: np.load(self._cache_path(f"{name}-{generation}.npy"), mmap_mode="r")
+                      for name in list(NUMERIC_COLUMNS) + ["ids", "codes", "versions"]}
+        except (OSError, ValueError, KeyError):
+            return False
+        if any(len(values) != meta["rows"] for values in arrays.values()):
+            return False
+        
+        self.ids = arrays.pop("ids")
+        self.codes = arrays.pop("codes")
+        self.versions = arrays.pop("versions")
+        self.columns = arrays
+        self.categories = list(meta["categories"])
+        self._category_codes = {value.casefold(): code
+                                for code, value in enumerate(self.categories)}
+        return True
+    
+    def __len__(self):
+        with self._lock:
+            self._sync()
+            return len(self.ids)
+    
+    def column(self, name):
+        '''
+        Returns the array of a numeric column.
+        
+        Args:
+            name (str): Key of NUMERIC_COLUMNS
+        
+        Returns:
+            numpy.ndarray: float64 values in PAT_ID order, NaN for NULL
+        '''
+        if name not in NUMERIC_COLUMNS:
+            raise ValueError(f"Not a numeric column: {name}")
+        with self._lock:
+            self._sync()
+            return self.columns[name]
+    
+    def head(self, column, limit):
+        '''
+        Returns the first clients by PAT_ID with their values of a column.
+        
+        Args:
+            column (str): Key of NUMERIC_COLUMNS
+            limit (int): Maximum number of clients
+        
+        Returns:
+            tuple: (ids array, values array with NaN for NULL)
+        '''
+        with self._lock:
+            values = self.column(column)
+            return self.ids[:limit], values[:limit]
+    
+    def where(self, balance=None, contact=None, frequency=None, preference=None):
+        '''
+        Build a row mask from range and membership conditions.
+        
+        Args:
+            balance, contact, frequency (tuple, optional): Inclusive
+                (low, high) range; either bound may be None
+            preference (str or list, optional): Preference(s) to keep,
+                ignoring case
+        
+        Returns:
+            numpy.ndarray: Boolean mask, True for rows matching every condition
+        '''
+        with self._lock:
+            self._sync()
+            mask = np.ones(len(self.ids), dtype=bool)
+            ranges = {'balance': balance, 'contact': contact, 'frequency': frequency}
+            for name, bounds in ranges.items():
+                if bounds is None:
+                    continue
+                low, high = bounds
+                values = self.columns[name]
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            if preference is not None:
+                if isinstance(preference, str):
+                    preference = [preference]
+                wanted = [self._category_codes[p.casefold()] for p in preference
+                          if p.casefold() in self._category_codes]
+                mask &= np.isin(self.codes, wanted)
+            return mask
+    
+    def group_by_preference(self, column=None, mask=None):
+        '''
+        Count clients, and optionally sum a column, per preference.
+        
+        Args:
+            column (str, optional): Key of NUMERIC_COLUMNS to sum and average
+            mask (numpy.ndarray, optional): Rows to include, from ``where``
+        
+        Returns:
+            list: (preference, count) tuples, or (preference, count, sum,
+                  mean) if a column is given; largest group first. Clients
+                  without a preference are grouped under None.
+        '''
+        with self._lock:
+            self._sync()
+            codes = self.codes if mask is None else self.codes[mask]
+            # Shift by one so that NULL (-1) gets bin 0
+            counts = np.bincount(codes + 1, minlength=len(self.categories) + 1)
+            if column is not None:
+                values = self.columns[column] if mask is None else self.columns[column][mask]
+                present = ~np.isnan(values)
+                sums = np.bincount(codes[present] + 1, weights=values[present],
+                                   minlength=len(self.categories) + 1)
+                valid = np.bincount(codes[present] + 1, minlength=len(self.categories) + 1)
+            labels = [None] + self.categories
+        
+        groups = []
+        for index in np.flatnonzero(counts):
+            if column is None:
+                groups.append((labels[index], int(counts[index])))
+            else:
+                mean = sums[index] / valid[index] if valid[index] else None
+                groups.append((labels[index], int(counts[index]), float(sums[index]), mean))
+        groups.sort(key=lambda g: -g[1])
+        return groups
+    
+    def percentiles(self, column, percentiles, mask=None):
+        '''
+        Compute exact percentiles of a numeric column.
+        
+        Args:
+            column (str): Key of NUMERIC_COLUMNS
+            percentiles (sequence): Percentiles between 0 and 100
+            mask (numpy.ndarray, optional): Rows to include, from ``where``
+        
+        Returns:
+            numpy.ndarray: Value at each percentile, ignoring NULLs; empty if
+                           there are no values
+        '''
+        values = self.values(column, mask)
+        if not len(values):
+            return np.empty(0)
+        return np.percentile(values, percentiles)
+    
+    def histogram(self, column, bins, mask=None):
+        '''
+        Count values of a numeric column in evenly spaced bins.
+        
+        Args:
+            column (str): Key of NUMERIC_COLUMNS
+            bins (int): Number of bins
+            mask (numpy.ndarray, optional): Rows to include, from ``where``
+        
+        Returns:
+            tuple: (bin edges array, counts array), ignoring NULLs
+        '''
+        return np.histogram(self.values(column, mask), bins=bins)
+    
+    def values(self, column, mask=None):
+        '''
+        Returns the non-NULL values of a numeric column.
+        
+        Args:
+            column (str): Key of NUMERIC_COLUMNS
+            mask (numpy.ndarray, optional): Rows to include, from ``where``
+        
+        Returns:
+            numpy.ndarray: float64 values in PAT_ID order
+        '''
+        values = self.column(column)
+        if mask is not None:
+            values = values[mask]
+        return values[~np.isnan(values)]
+    
+    def ranked(self, column, n, descending=True):
+        '''
+        Find the clients with the highest or lowest values of a column.
+        
+        Ties are broken by PAT_ID, like the SQL used by the graphs.
+        
+        Args:
+            column (str): Key of NUMERIC_COLUMNS
+            n (int): Number of clients
+            descending (bool): Highest values if True, lowest otherwise
+        
+        Returns:
+            list: (PAT_ID, value) tuples in rank order
+        '''
+        with self._lock:
+            values = self.column(column)
+            ids = self.ids
+        present = np.flatnonzero(~np.isnan(values))
+        keys = -values[present] if descending else values[present]
+        if n < len(keys):
+            # Only sort the rows that can make the cut, ties at the cut included
+            cut = np.partition(keys, n - 1)[n - 1]
+            candidates = np.flatnonzero(keys <= cut)
+            present, keys = present[candidates], keys[candidates]
+        # ids are sorted, so a stable sort keeps ties in PAT_ID order
+        order = present[np.argsort(keys, kind="stable")[:n]]
+        return [(int(i), float(v)) for i, v in zip(ids[order], values[order])]
+    
+    def memory_usage(self):
+        '''
+        Returns the bytes held by the snapshot arrays.
+        
+        Returns:
+            int: Total size of the arrays
+        '''
+        with self._lock:
+            return (self.ids.nbytes + self.codes.nbytes + self.versions.nbytes
+                    + sum(values.nbytes for values in self.columns.values()))
+
+# Shared snapshot kept current by patron writes
+patron_snapshot = PatronSnapshot(**SNAPSHOT_CONFIG)
+add_write_listener(patron_snapshot.on_write)
@@ -0,0 +1,623 @@
+'''
+Write-behind queue module for the Client Management System.
+Acknowledges single-client writes once they are spooled to a local file and
+sends them to the database later, many per transaction.
+
+Every add, modify and delete is appended to the spool and fsynced before it
+is acknowledged, so an acknowledged write survives a crash: the spool is
+replayed on the next start. Pending writes are coalesced per PAT_ID (an add
+followed by a modify becomes one INSERT) and flushed in one group commit
+once WRITE_BEHIND_BATCH clients are pending or the oldest write is
+WRITE_BEHIND_DELAY_MS old.
+'''
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+
+from database import db_config
+from database.cache import notify_patron_write, patron_cache
+from database.db_config import get_backend, get_pool
+from database.instrumentation import query_stats
+from database.patron import BUMP_VERSION, INSERT_PATRON_QUERY, PATRON_COLUMNS, PATRON_FIELDS
+from database.pool import PoolTimeoutError
+
+try:
+    import fcntl
+except ImportError:  # Windows: the spool is not locked against other processes
+    fcntl = None
+
+# Write-behind configuration using environment variables
+WRITE_BEHIND_CONFIG = {
+    'enabled': os.getenv('WRITE_BEHIND', '0').lower() not in ('0', 'false', 'no', 'off', ''),
+    'spool_path': os.getenv('WRITE_BEHIND_SPOOL', 'write_spool.jsonl'),
+    'batch_size': int(os.getenv('WRITE_BEHIND_BATCH', '100')),
+    'delay_ms': float(os.getenv('WRITE_BEHIND_DELAY_MS', '500'))
+}
+
+# Kinds of pending write
+WRITE_INSERT = "insert"
+WRITE_UPDATE = "update"
+WRITE_DELETE = "delete"
+
+# Patron field name -> column
+_COLUMNS = {
+    'name': 'PAT_NAME',
+    'balance': 'PAT_BALANCE',
+    'contact': 'PAT_CONTACT',
+    'preference': 'PAT_PREFERENCE',
+    'frequency': 'PAT_FREQUENCY'
+}
+
+# Seconds to wait before retrying after a failed flush
+_RETRY_DELAY = 5.0
+
+class WriteRejectedError(Exception):
+    '''Raised when the database refuses a write over a working connection.'''
+
+def _same_values(stored, row):
+    '''Whether a stored client holds the given values; FLOAT columns round on the way in.'''
+    for stored_value, value in zip(stored, row):
+        if isinstance(stored_value, float) and isinstance(value, (int, float)):
+            if not math.isclose(stored_value, value, rel_tol=1e-6):
+                return False
+        elif stored_value != value:
+            return False
+    return True
+
+class PendingWrite:
+    '''
+    The combined effect of the writes to one client not yet in the database.
+    
+    Instances are never changed; merging returns a new instance, so a flush
+    can tell whether a client was written again while it was running.
+    '''
+    
+    __slots__ = ('kind', 'values', 'replace', 'queued_at')
+    
+    def __init__(self, kind, values=None, replace=False, queued_at=None):
+        '''
+        Initialize a pending write.
+        
+        Args:
+            kind (str): WRITE_INSERT, WRITE_UPDATE or WRITE_DELETE
+            values (dict, optional): Field name -> value; every field for an
+                                     insert, the changed fields for an update
+            replace (bool): For an insert, whether it replaces a client that
+                            is still in the database
+            queued_at (float, optional): Monotonic time of the oldest write merged in
+        '''
+        self.kind = kind
+        self.values = dict(values or {})
+        self.replace = replace
+        self.queued_at = time.monotonic() if queued_at is None else queued_at
+    
+    def merge(self, later):
+        '''
+        Combine this write with a later write to the same client.
+        
+        Args:
+            later (PendingWrite): The later write
+        
+        Returns:
+            PendingWrite: The combined write, or None if nothing is left to do
+        '''
+        queued_at = self.queued_at
+        if self.kind == WRITE_INSERT:
+            if later.kind == WRITE_UPDATE:
+                return PendingWrite(WRITE_INSERT, {**self.values, **later.values}, self.replace,
+                                    queued_at)
+            if later.kind == WRITE_DELETE:
+                # An insert that never reached the database leaves nothing
+                # to delete, unless it replaced a client that did
+                return PendingWrite(WRITE_DELETE, queued_at=queued_at) if self.replace else None
+            return PendingWrite(WRITE_INSERT, later.values, self.replace, queued_at)
+        
+        if self.kind == WRITE_UPDATE:
+            if later.kind == WRITE_UPDATE:
+                return PendingWrite(WRITE_UPDATE, {**self.values, **later.values},
+                                    queued_at=queued_at)
+            if later.kind == WRITE_DELETE:
+                return PendingWrite(WRITE_DELETE, queued_at=queued_at)
+            return PendingWrite(WRITE_INSERT, later.values, True, queued_at)
+        
+        # Deleted: only a new client with the same ID can follow
+        if later.kind == WRITE_INSERT:
+            return PendingWrite(WRITE_INSERT, later.values, True, queued_at)
+        return self
+    
+    def apply(self, row):
+        '''
+        Show what a client looks like once this write is flushed.
+        
+        Args:
+            row (tuple): The client as read from the database, or None
+        
+        Returns:
+            tuple: The client after the write, or None if it does not exist
+        '''
+        if self.kind == WRITE_DELETE:
+            return None
+        if self.kind == WRITE_INSERT:
+            return tuple(self.values.get(field) for field in PATRON_FIELDS)
+        if row is None:
+            return None
+        return tuple(self.values.get(field, value) for field, value in zip(PATRON_FIELDS, row))
+    
+    def to_record(self, pat_id):
+        '''Return the spool record of this write.'''
+        return {"id": pat_id, "kind": self.kind, "values": self.values, "replace": self.replace}
+
+class WriteBehindQueue:
+    '''
+    Durable queue of patron writes flushed to the database in group commits.
+    
+    A background thread flushes the queue; it is started by the first write
+    or by ``start``, which also replays writes left in the spool by a
+    previous run.
+    '''
+    
+    def __init__(self, spool_path, batch_size=100, delay_ms=500.0, enabled=True):
+        '''
+        Initialize the queue.
+        
+        Args:
+            spool_path (str): File that holds acknowledged writes until they are flushed
+            batch_size (int): Pending clients that trigger a flush
+            delay_ms (float): Age of the oldest pending write that triggers a flush
+            enabled (bool): Whether writes go through the queue at all
+        '''
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.delay = delay_ms / 1000
+        self.enabled = enabled
+        
+        self._pending = {}  # PAT_ID -> PendingWrite
+        self._in_flight = {}  # PAT_ID -> PendingWrite being flushed
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._spool = None
+        self._lock_file = None
+        self._thread = None
+        self._stopping = False
+        self._closed = False
+        self._retry_at = 0.0
+        
+        # Status
+        self.acknowledged = 0
+        self.flushed = 0
+        self.batches = 0
+        self.last_flush_at = None
+        self.last_flush_ms = None
+        self.last_error = None
+        self.failed = []  # (PAT_ID, kind, error) of writes the database rejected
+    
+    def start(self):
+        '''Replay the spool and start the flush thread, if not already done.'''
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The write queue is closed")
+            if self._thread is not None:
+                return
+            self._open_spool()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            if self._pending:
+                self._cond.notify_all()
+    
+    def _open_spool(self):
+        '''Lock the spool and load the writes it holds.'''
+        directory = os.path.dirname(os.path.abspath(self.spool_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        # The spool itself is replaced when compacted, so lock a separate file
+        lock = open(f"{self.spool_path}.lock", "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                raise RuntimeError(f"Write spool {self.spool_path} is in use by another "
+                                   "process; set WRITE_BEHIND_SPOOL to a separate file") from None
+        self._lock_file = lock
+        
+        if os.path.exists(self.spool_path):
+            with open(self.spool_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A write interrupted by a crash was never acknowledged
+                        continue
+                    self._merge(record["id"], PendingWrite(record["kind"], record["values"],
+                                                           record.get("replace", False)))
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+    
+    def _merge(self, pat_id, write):
+        '''Merge a write into the pending writes. The caller holds the lock.'''
+        earlier = self._pending.pop(pat_id, None)
+        if earlier is not None and self._in_flight.get(pat_id) is earlier:
+            # The earlier write may already be committing, so the new one is
+            # queued on top of its result: an existing or a deleted client
+            kind = WRITE_DELETE if earlier.kind == WRITE_DELETE else WRITE_UPDATE
+            earlier = PendingWrite(kind, queued_at=write.queued_at)
+        merged = write if earlier is None else earlier.merge(write)
+        if merged is not None:
+            self._pending[pat_id] = merged
+    
+    def _restore(self, batch):
+        '''
+        Put back writes whose flush failed, under any written since.
+        
+        The caller holds the lock.
+        
+        Args:
+            batch (dict): PAT_ID -> PendingWrite that was being flushed
+        '''
+        for pat_id, write in batch.items():
+            later = self._pending.pop(pat_id, None)
+            merged = write if later is None or later is write else write.merge(later)
+            if merged is not None:
+                self._pending[pat_id] = merged
+    
+    def submit(self, pat_id, kind, values=None):
+        '''
+        Spool a write and acknowledge it.
+        
+        Args:
+            pat_id (int): Client ID
+            kind (str): WRITE_INSERT, WRITE_UPDATE or WRITE_DELETE
+            values (dict, optional): Field name -> value
+        '''
+        self.start()
+        write = PendingWrite(kind, values)
+        line = json.dumps(write.to_record(pat_id)) + "\n"
+        with self._cond:
+            if self._stopping or self._spool is None:
+                raise RuntimeError("The write queue is closed")
+            self._spool.write(line)
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self._merge(pat_id, write)
+            self.acknowledged += 1
+            self._cond.notify_all()
+        
+        # Other readers of the client must not keep the old row
+        patron_cache.invalidate(pat_id)
+    
+    def pending(self, pat_id):
+        '''
+        Return the pending write to a client.
+        
+        Args:
+            pat_id (int): Client ID
+        
+        Returns:
+            PendingWrite: The write not yet flushed, or None
+        '''
+        with self._cond:
+            return self._pending.get(pat_id)
+    
+    def overlay(self, pat_id, row):
+        '''
+        Apply a client's pending write to the row read from the database.
+        
+        Args:
+            pat_id (int): Client ID
+            row (tuple): Row from the database, or None
+        
+        Returns:
+            tuple: The row as it will be once flushed, or None if the client
+            does not exist
+        '''
+        write = self.pending(pat_id)
+        return row if write is None else write.apply(row)
+    
+    def _due(self):
+        '''Whether the pending writes should be flushed now. The caller holds the lock.'''
+        if not self._pending or time.monotonic() < self._retry_at:
+            return False
+        if len(self._pending) >= self.batch_size or self._stopping:
+            return True
+        oldest = min(write.queued_at for write in self._pending.values())
+        return time.monotonic() - oldest >= self.delay
+    
+    def _run(self):
+        '''Flush the queue whenever it is due, until closed.'''
+        try:
+            while True:
+                with self._cond:
+                    while not self._due():
+                        if self._stopping and (not self._pending or self._retry_at):
+                            return
+                        self._cond.wait(self.delay)
+                try:
+                    self.flush()
+                except Exception as err:
+                    # flush only absorbs database errors; report anything else
+                    # but keep the thread, so acknowledged writes still go out
+                    traceback.print_exc()
+                    with self._cond:
+                        self.last_error = f"{type(err).__name__}: {err}"
+                        self._retry_at = time.monotonic() + _RETRY_DELAY
+        finally:
+            # Released here, not in close, so a flush that outlasts close
+            # still compacts the spool it committed from under the lock
+            with self._flush_lock, self._cond:
+                self._release_spool()
+    
+    def _release_spool(self):
+        '''Close the spool and unlock it for other processes. The caller holds both locks.'''
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the lock
+            self._lock_file = None
+    
+    def flush(self):
+        '''
+        Send every pending write to the database in one transaction.
+        
+        If the database rejects the transaction, the writes are retried one
+        by one; writes it rejects again are dropped and listed in
+        ``failed``, together with any later writes to a client whose insert
+        was rejected. If the database cannot be reached, the writes are kept
+        and retried later.
+        
+        Returns:
+            int: Number of clients written
+        '''
+        with self._flush_lock:
+            with self._cond:
+                if self._spool is None:
+                    # Not started, or closed: writes stay in the spool
+                    return 0
+                batch = dict(self._pending)
+                self._in_flight = batch
+            if not batch:
+                return 0
+            
+            start = time.perf_counter()
+            rejected = []
+            try:
+                try:
+                    self._write_batch(batch)
+                except WriteRejectedError:
+                    rejected = self._write_each(batch)
+            except BaseException as err:
+                with self._cond:
+                    self._in_flight = {}
+                    self._restore(batch)
+                    if not isinstance(err, (db_config.DatabaseError, PoolTimeoutError)):
+                        raise
+                    self.last_error = str(err)
+                    self._retry_at = time.monotonic() + _RETRY_DELAY
+                return 0
+            
+            written = len(batch) - len(rejected)
+            rejected_inserts = {pat_id for pat_id, kind, _ in rejected if kind == WRITE_INSERT}
+            with self._cond:
+                self._in_flight = {}
+                for pat_id, write in batch.items():
+                    patron_cache.invalidate(pat_id)
+                    later = self._pending.get(pat_id)
+                    if later is write:
+                        del self._pending[pat_id]
+                    elif later is not None and pat_id in rejected_inserts:
+                        # Later writes were to the client the insert would have added
+                        del self._pending[pat_id]
+                        rejected.append((pat_id, later.kind, "the client was never added"))
+                # Keep clients written again while the flush ran
+                self._compact_spool()
+                self.flushed += written
+                self.failed.extend(rejected)
+                self.batches += 1
+                self.last_flush_at = time.time()
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+                self.last_error = None
+                self._retry_at = 0.0
+            
+            for pat_id, kind, message in rejected:
+                print(f"Write to client {pat_id} ({kind}) rejected: {message}", file=sys.stderr)
+            for pat_id in batch:
+                notify_patron_write(pat_id)
+            return written
+    
+    def _write_each(self, batch):
+        '''
+        Write clients one transaction each, after a rejected group commit.
+        
+        Args:
+            batch (dict): PAT_ID -> PendingWrite
+        
+        Returns:
+            list: (PAT_ID, kind, error message) of the writes the database rejected
+        '''
+        rejected = []
+        for pat_id, write in batch.items():
+            try:
+                self._write_batch({pat_id: write})
+            except WriteRejectedError as err:
+                rejected.append((pat_id, write.kind, str(err)))
+        return rejected
+    
+    def _write_batch(self, batch):
+        '''
+        Apply writes to the database in one transaction.
+        
+        Args:
+            batch (dict): PAT_ID -> PendingWrite
+        '''
+        inserts = [(pat_id, write) for pat_id, write in batch.items()
+                   if write.kind == WRITE_INSERT]
+        deletes = [pat_id for pat_id, write in batch.items() if write.kind == WRITE_DELETE]
+        updates = {}
+        for pat_id, write in batch.items():
+            if write.kind == WRITE_UPDATE:
+                fields = tuple(sorted(write.values))
+                updates.setdefault(fields, []).append(
+                    tuple(write.values[field] for field in fields) + (pat_id,))
+        
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if deletes:
+                    placeholders = ", ".join(["%s"] * len(deletes))
+                    self._execute(cursor, f"UPDATE patron SET PAT_DELETED = 1, {BUMP_VERSION} "
+                                  f"WHERE PAT_ID IN ({placeholders}) AND PAT_DELETED = 0",
+                                  tuple(deletes))
+                if inserts:
+                    rows = self._insert_rows(cursor, inserts)
+                    if rows:
+                        self._execute(cursor, INSERT_PATRON_QUERY, rows, many=True)
+                for fields, rows in updates.items():
+                    set_clauses = ", ".join(f"{_COLUMNS[field]} = %s" for field in fields)
+                    self._execute(cursor, f"UPDATE patron SET {set_clauses}, {BUMP_VERSION} "
+                                  "WHERE PAT_ID = %s AND PAT_DELETED = 0", rows, many=True)
+                conn.commit()
+            except db_config.DatabaseError as err:
+                try:
+                    conn.rollback()
+                    healthy = get_backend().is_healthy(conn)
+                except Exception:
+                    healthy = False
+                if healthy:
+                    raise WriteRejectedError(str(err)) from err
+                raise
+            finally:
+                cursor.close()
+    
+    def _insert_rows(self, cursor, inserts):
+        '''
+        Clear the way for inserts and return the rows still to be inserted.
+        
+        The client an insert replaces is removed, as is a soft deleted client
+        with the same ID. A live client is left alone: if it holds exactly the
+        inserted values, a previous run wrote it before it could clear the
+        spool and the insert is skipped; otherwise the insert is rejected.
+        
+        Args:
+            cursor: Cursor of the flush transaction
+            inserts (list): (PAT_ID, PendingWrite) pairs of WRITE_INSERT writes
+        
+        Returns:
+            list: Row values in PATRON_COLUMNS order
+        
+        Raises:
+            WriteRejectedError: If a client other than a replaced one already has the ID
+        '''
+        replaced = tuple(pat_id for pat_id, write in inserts if write.replace)
+        added = tuple(pat_id for pat_id, write in inserts if not write.replace)
+        if replaced:
+            placeholders = ", ".join(["%s"] * len(replaced))
+            self._execute(cursor, f"DELETE FROM patron WHERE PAT_ID IN ({placeholders})",
+                          replaced)
+        existing = {}
+        if added:
+            placeholders = ", ".join(["%s"] * len(added))
+            self._execute(cursor, f"DELETE FROM patron WHERE PAT_ID IN ({placeholders}) "
+                          "AND PAT_DELETED = 1", added)
+            self._execute(cursor, f"SELECT {', '.join(PATRON_COLUMNS)} FROM patron "
+                          f"WHERE PAT_ID IN ({placeholders})", added)
+            existing = {row[0]: tuple(row) for row in cursor.fetchall()}
+        
+        rows = []
+        for pat_id, write in inserts:
+            row = tuple(write.values[field] for field in PATRON_FIELDS)
+            if pat_id not in existing:
+                rows.append(row)
+            elif not _same_values(existing[pat_id], row):
+                raise WriteRejectedError(f"Client ID {pat_id} already exists")
+        return rows
+    
+    @staticmethod
+    def _execute(cursor, query, params, many=False):
+        '''Run one statement of a flush and record it with the query statistics.'''
+        start = time.perf_counter()
+        try:
+            if many:
+                cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params)
+        except db_config.DatabaseError as err:
+            query_stats.record(query, None, time.perf_counter() - start, error=err)
+            raise
+        query_stats.record(query, None, time.perf_counter() - start,
+                           len(params) if many else cursor.rowcount)
+    
+    def _compact_spool(self):
+        '''Replace the spool with one holding only the pending writes. The caller holds the lock.'''
+        temp_path = f"{self.spool_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for pat_id, write in self._pending.items():
+                f.write(json.dumps(write.to_record(pat_id)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self._spool.close()
+        os.replace(temp_path, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+    
+    def status(self):
+        '''
+        Returns the state of the queue.
+        
+        Returns:
+            dict: Pending clients, age of the oldest pending write in
+            seconds, write and flush counters, the last flush and the last
+            error
+        '''
+        with self._cond:
+            oldest = min((write.queued_at for write in self._pending.values()), default=None)
+            return {
+                "enabled": self.enabled,
+                "pending": len(self._pending),
+                "oldest_age": None if oldest is None else time.monotonic() - oldest,
+                "acknowledged": self.acknowledged,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "last_flush_at": self.last_flush_at,
+                "last_flush_ms": self.last_flush_ms,
+                "last_error": self.last_error,
+                "failed": list(self.failed)
+            }
+    
+    def close(self, timeout=10.0):
+        '''
+        Flush the pending writes and stop the flush thread.
+        
+        Writes that could not be flushed stay in the spool for the next run.
+        If the final flush outlasts the timeout, it goes on in the background
+        and the spool stays locked until it finishes. Either way the queue
+        accepts no more writes.
+        
+        Args:
+            timeout (float): Seconds to wait for the final flush
+        
+        Returns:
+            int: Number of writes not yet in the database, including any
+                 still being flushed
+        '''
+        with self._cond:
+            self._closed = True
+            thread = self._thread
+            if thread is None:
+                return len(self._pending)
+            self._stopping = True
+            self._retry_at = 0.0
+            self._cond.notify_all()
+        thread.join(timeout)
+        
+        with self._cond:
+            if not thread.is_alive():
+                self._thread = None
+            return len(self._pending)
+
+# Shared queue, used for single-client writes when WRITE_BEHIND is set
+write_queue = WriteBehindQueue(**WRITE_BEHIND_CONFIG)
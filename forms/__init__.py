@@ -1,7 +1,29 @@
 '''
 Forms package initialization.
-Import all form classes to make them accessible from the forms package.
+Make all form classes accessible from the forms package.
+
+Form modules are imported on first use (PEP 562), so showing the login form
+does not load the database and service modules used by the other forms.
 '''
 
-from forms.login_form import LoginForm
-from forms.add_record_form import AddRecordForm
\ No newline at end of file
+import importlib
+
+# Public name -> module that defines it
+_EXPORTS = {
+    'LoginForm': 'forms.login_form',
+    'AddRecordForm': 'forms.add_record_form'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    '''Import the module defining a form the first time it is used.'''
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
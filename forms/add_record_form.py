@@ -5,7 +5,9 @@ Provides the UI for adding new client records.
 
 import tkinter as tk
 import tkinter.messagebox as MessBox
-from database.db_config import execute_query
+from database.patron import MissingFieldError, parse_patron
+from services.records import add_patron
+from widgets import TaskGroup, show_database_error
 
 class AddRecordForm:
     '''
@@ -61,46 +63,46 @@ class AddRecordForm:
                               font=("Helvetica", 15), 
                               command=self.root.destroy)
         cancel_btn.place(x=320, y=290)
+        
+        # Loading indicator
+        self.loading_label = tk.Label(self.root, text="")
+        self.loading_label.place(x=440, y=297)
+        
+        # Queries run in the background and are cancelled when the form closes
+        self.tasks = TaskGroup(self.root, busy_label=self.loading_label)
     
     def add_record(self):
         '''Add a new record to the database.'''
         try:
-            # Get values from entries
-            pat_id = int(self.entries["id"].get())
-            pat_name = self.entries["name"].get()
-            pat_balance = float(self.entries["balance"].get())
-            pat_contact = int(self.entries["contact"].get())
-            pat_preference = self.entries["preference"].get()
-            pat_frequency = int(self.entries["frequency"].get())
-            
-            # Validate inputs
-            if not pat_name or not pat_preference:
-                MessBox.showwarning("Validation Error", "All fields must be filled")
-                return
-            
-            # Insert query
-            query = '''
-                INSERT INTO patron 
-                (PAT_ID, PAT_NAME, PAT_BALANCE, PAT_CONTACT, PAT_PREFERENCE, PAT_FREQUENCY) 
-                VALUES (%s, %s, %s, %s, %s, %s)
-            '''
-            params = (pat_id, pat_name, pat_balance, pat_contact, pat_preference, pat_frequency)
+            # Get values from entries and validate them
+            values = {field: entry.get() for field, entry in self.entries.items()}
+            parse_patron(values)
             
-            # Execute query
-            result = execute_query(query, params, commit=True)
-            
-            if result is not None:  # None means error occurred
-                # Clear all entries
-                for entry in self.entries.values():
-                    entry.delete(0, 'end')
-                    
-                MessBox.showinfo("Success", "Record added successfully")
+            # Execute insert in the background
+            self.tasks.submit(add_patron, values,
+                              on_success=self.on_added,
+                              on_error=show_database_error)
         
+        except MissingFieldError:
+            MessBox.showwarning("Validation Error", "All fields must be filled")
         except ValueError:
             MessBox.showerror("Input Error", "Please enter valid numeric values for ID, Balance, Contact and Frequency")
         except Exception as e:
             MessBox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def on_added(self, rowcount):
+        '''
+        Clear the form after a record has been inserted.
+        
+        Args:
+            rowcount (int): Number of rows inserted
+        '''
+        # Clear all entries
+        for entry in self.entries.values():
+            entry.delete(0, 'end')
+            
+        MessBox.showinfo("Success", "Record added successfully")
+    
     def run(self):
         '''Run the Add Record form.'''
         self.root.grab_set()  # Make this window modal
@@ -11,17 +11,24 @@ This application provides functionality to manage client records including:
 - Visualize data with graphs
 '''
 
+import startup_timing  # First, so the timings cover every other import
+
+import sys
 import tkinter as tk
-from tkinter import ttk, font
+from tkinter import ttk, font, messagebox
+
+# Dialog modules, matplotlib and the MySQL driver load on first use
+import forms
+import operations
+from database.db_config import close_pool, set_error_handler
+from database.executor import shutdown_executor
+from database.write_behind import write_queue
+from services.purge import purger
 
-from forms import LoginForm, AddRecordForm
-from operations import (
-    display_records_formatted,
-    search_record,
-    modify_record,
-    delete_record,
-    show_graphs
-)
+startup_timing.mark("imports done")
+
+# Milliseconds between updates of the write queue status bar
+WRITE_STATUS_REFRESH_MS = 500
 
 class ClientManagementApp:
     '''Main application class for Client Management System.'''
@@ -33,11 +40,13 @@ class ClientManagementApp:
     
     def login(self):
         '''Show login form and proceed if authentication successful.'''
-        login_form = LoginForm(self.create_main_window)
+        login_form = forms.LoginForm(self.create_main_window)
+        login_form.root.after_idle(startup_timing.mark, "login window shown")
         login_form.run()
     
     def create_main_window(self):
         '''Create the main application window after successful login.'''
+        startup_timing.mark("login accepted")
         self.root = tk.Tk()
         self.root.title("Client Management System")
         self.root.geometry("1020x700")
@@ -48,9 +57,32 @@ class ClientManagementApp:
         
         # Create main layout
         self.create_layout()
+        self.root.after_idle(startup_timing.mark, "main window shown", "login accepted")
+        
+        # Remove deleted clients in the background while the application runs
+        purger.start()
+        
+        # Send writes left in the spool by the previous run
+        if write_queue.enabled:
+            try:
+                write_queue.start()
+            except (OSError, RuntimeError) as e:
+                write_queue.enabled = False
+                messagebox.showerror("Write Queue Error",
+                                     f"{e}\n\nChanges will be saved directly instead.")
         
         # Start the application
         self.root.mainloop()
+        
+        # Save queued writes, then stop background queries and release
+        # pooled connections. Writes that cannot be saved stay in the spool
+        left = write_queue.close()
+        if left:
+            print(f"{left} queued client changes kept in {write_queue.spool_path}; "
+                  "they are saved on the next start", file=sys.stderr)
+        purger.stop(timeout=5)
+        shutdown_executor(wait=False)
+        close_pool()
     
     def configure_styles(self):
         '''Configure application styles.'''
@@ -64,6 +96,12 @@ class ClientManagementApp:
     
     def create_layout(self):
         '''Create the main application layout.'''
+        # Status bar showing whether queued writes have been saved
+        if write_queue.enabled:
+            self.write_status = ttk.Label(self.root, text="", anchor="w")
+            self.write_status.pack(side="bottom", fill="x", padx=20, pady=(0, 5))
+            self.update_write_status()
+        
         # Main container
         main_container = ttk.Frame(self.root)
         main_container.pack(fill="both", expand=True, padx=10, pady=10)
@@ -82,6 +120,26 @@ class ClientManagementApp:
         # Create content area
         self.create_content_area(content_frame)
     
+    def update_write_status(self):
+        '''Show the state of the write-behind queue and schedule the next update.'''
+        status = write_queue.status()
+        if status["last_error"]:
+            text = (f"Database unreachable: {status['pending']} changes kept locally, "
+                    f"retrying ({status['last_error']})")
+        elif status["pending"]:
+            text = f"Saving {status['pending']} changes..."
+        elif status["acknowledged"]:
+            text = (f"All changes saved ({status['flushed']} in {status['batches']} "
+                    f"transactions, last took {status['last_flush_ms']:.0f} ms)")
+        else:
+            text = "All changes saved"
+        if status["failed"]:
+            pat_id, kind, message = status["failed"][-1]
+            text += (f"    {len(status['failed'])} rejected, last: {kind} of client "
+                     f"{pat_id}: {message}")
+        self.write_status.config(text=text)
+        self.root.after(WRITE_STATUS_REFRESH_MS, self.update_write_status)
+    
     def create_menu(self, parent):
         '''
         Create menu buttons in the left panel.
@@ -93,10 +151,14 @@ class ClientManagementApp:
         menu_options = [
             ("Display Records", self.display_records),
             ("Add Record", self.add_record),
+            ("Import Records", self.import_records),
+            ("Export Records", self.export_records),
             ("Search Records", self.search_records),
             ("Modify Record", self.modify_record),
+            ("Bulk Modify", self.bulk_modify_records),
             ("Delete Record", self.delete_record),
             ("Show Graphs", self.show_graphs),
+            ("Diagnostics", self.show_diagnostics),
             ("Exit", self.root.destroy)
         ]
         
@@ -132,30 +194,49 @@ class ClientManagementApp:
         self.output_area.insert("1.0", welcome_msg)
     
     def display_records(self):
-        '''Display all client records.'''
-        display_records_formatted(self.output_area)
+        '''Display client records one page at a time.'''
+        operations.display_records_paged(self.output_area)
     
     def add_record(self):
         '''Open form to add a new record.'''
-        add_form = AddRecordForm()
+        add_form = forms.AddRecordForm()
         add_form.run()
     
+    def import_records(self):
+        '''Open dialog to bulk import records from a file.'''
+        operations.import_records(self.root)
+    
+    def export_records(self):
+        '''Open dialog to export records to a file.'''
+        operations.export_records(self.root)
+    
     def search_records(self):
         '''Open dialog to search for records.'''
-        search_record(self.root)
+        operations.search_record(self.root)
     
     def modify_record(self):
         '''Open dialog to modify a record.'''
-        modify_record(self.root)
+        operations.modify_record(self.root)
+    
+    def bulk_modify_records(self):
+        '''Open dialog to apply one change to many records.'''
+        operations.bulk_modify_records(self.root)
     
     def delete_record(self):
         '''Open dialog to delete a record.'''
-        delete_record(self.root)
+        operations.delete_record(self.root)
     
     def show_graphs(self):
         '''Open dialog to show data visualizations.'''
-        show_graphs(self.root)
+        operations.show_graphs(self.root)
+    
+    def show_diagnostics(self):
+        '''Open the query statistics and slow-query log.'''
+        operations.show_diagnostics(self.root)
 
 if __name__ == "__main__":
+    # Report database errors in message boxes
+    set_error_handler(messagebox.showerror)
+    
     # Start the application
     app = ClientManagementApp()
\ No newline at end of file
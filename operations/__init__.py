@@ -1,10 +1,38 @@
 '''
 Operations package initialization.
-Import all operation functions to make them accessible from the operations package.
+Make all operation functions accessible from the operations package.
+
+The operation modules are imported on first use (PEP 562), so opening the
+login window does not pay for loading matplotlib, NumPy or the dialogs.
 '''
 
-from operations.display import display_records, display_records_formatted
-from operations.search import search_record
-from operations.modify import modify_record
-from operations.delete import delete_record
-from operations.graphs import show_graphs
\ No newline at end of file
+import importlib
+
+# Public name -> module that defines it
+_EXPORTS = {
+    'display_records': 'operations.display',
+    'display_records_formatted': 'operations.display',
+    'display_records_paged': 'operations.display',
+    'search_record': 'operations.search',
+    'modify_record': 'operations.modify',
+    'bulk_modify_records': 'operations.bulk_modify',
+    'delete_record': 'operations.delete',
+    'show_graphs': 'operations.graphs',
+    'import_records': 'operations.bulk_import',
+    'export_records': 'operations.export',
+    'show_diagnostics': 'operations.diagnostics'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    '''Import the module defining an operation the first time it is used.'''
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,196 @@
+'''
+Bulk import module for Client Management System.
+Handles streaming import of client records from CSV and JSON Lines files.
+'''
+
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from services.bulk_import import IMPORT_CHUNK_SIZE, ImportReport, detect_format, import_patrons
+from widgets import TaskGroup, show_database_error
+
+class ImportDialog:
+    '''Dialog window for bulk importing client records.'''
+    
+    def __init__(self, parent):
+        '''
+        Initialize the import dialog.
+        
+        Args:
+            parent: Parent tkinter window
+        '''
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Import Client Records")
+        self.dialog.geometry("650x500")
+        self.dialog.resizable(False, False)
+        
+        self.report = None
+        self.cancel_event = threading.Event()
+        
+        self.create_widgets()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+    
+    def create_widgets(self):
+        '''Create and place dialog widgets.'''
+        # File selection frame
+        file_frame = ttk.LabelFrame(self.dialog, text="Source File")
+        file_frame.pack(fill="x", padx=20, pady=10)
+        
+        ttk.Label(file_frame, text="File:").grid(row=0, column=0, padx=5, pady=5)
+        self.path_entry = ttk.Entry(file_frame, width=45)
+        self.path_entry.grid(row=0, column=1, padx=5, pady=5)
+        
+        browse_btn = ttk.Button(file_frame, text="Browse...", command=self.browse)
+        browse_btn.grid(row=0, column=2, padx=5, pady=5)
+        
+        ttk.Label(file_frame, text="Format:").grid(row=1, column=0, padx=5, pady=5)
+        self.format_box = ttk.Combobox(file_frame, values=["Auto", "CSV", "JSON Lines"],
+                                       state="readonly", width=12)
+        self.format_box.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.format_box.current(0)
+        
+        ttk.Label(file_frame, text="Rows per batch:").grid(row=2, column=0, padx=5, pady=5)
+        self.chunk_entry = ttk.Entry(file_frame, width=10)
+        self.chunk_entry.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        self.chunk_entry.insert(0, str(IMPORT_CHUNK_SIZE))
+        
+        # Progress frame
+        progress_frame = ttk.LabelFrame(self.dialog, text="Progress")
+        progress_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="indeterminate")
+        self.progress_bar.pack(fill="x", padx=10, pady=5)
+        
+        self.status_label = ttk.Label(progress_frame, text="Choose a file to import")
+        self.status_label.pack(anchor="w", padx=10, pady=5)
+        
+        # Per-row errors
+        self.error_list = tk.Listbox(progress_frame, height=10)
+        self.error_list.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        # Buttons frame
+        buttons_frame = ttk.Frame(self.dialog)
+        buttons_frame.pack(fill="x", padx=20, pady=10)
+        
+        self.start_btn = ttk.Button(buttons_frame, text="Start Import", command=self.start_import)
+        self.start_btn.pack(side="left", padx=10)
+        
+        self.stop_btn = ttk.Button(buttons_frame, text="Stop", command=self.cancel_event.set,
+                                   state="disabled")
+        self.stop_btn.pack(side="left", padx=10)
+        
+        close_btn = ttk.Button(buttons_frame, text="Close", command=self.close)
+        close_btn.pack(side="right", padx=10)
+        
+        # The import runs in the background and is stopped when the dialog closes
+        self.tasks = TaskGroup(self.dialog)
+    
+    def browse(self):
+        '''Let the user pick the file to import.'''
+        path = filedialog.askopenfilename(
+            parent=self.dialog,
+            title="Select file to import",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl *.ndjson"),
+                       ("All files", "*.*")]
+        )
+        if path:
+            self.path_entry.delete(0, tk.END)
+            self.path_entry.insert(0, path)
+    
+    def start_import(self):
+        '''Validate the options and start the import in the background.'''
+        path = self.path_entry.get()
+        if not path or not os.path.isfile(path):
+            messagebox.showwarning("Input Error", "Please choose an existing file")
+            return
+        
+        fmt = {"CSV": "csv", "JSON Lines": "jsonl"}.get(self.format_box.get())
+        try:
+            fmt = fmt or detect_format(path)
+            chunk_size = int(self.chunk_entry.get())
+            if chunk_size < 1:
+                raise ValueError("Rows per batch must be at least 1")
+        except ValueError as err:
+            messagebox.showerror("Input Error", str(err))
+            return
+        
+        self.error_list.delete(0, tk.END)
+        self.cancel_event.clear()
+        self.report = ImportReport()
+        self.start_btn.config(state="disabled")
+        self.stop_btn.config(state="normal")
+        self.progress_bar.start(10)
+        
+        self.tasks.submit(import_patrons, path, fmt, chunk_size,
+                          cancel_event=self.cancel_event, report=self.report,
+                          on_success=self.on_finished, on_error=self.on_failed)
+        self.poll_progress()
+    
+    def poll_progress(self):
+        '''Refresh the progress display while the import runs.'''
+        if not self.tasks.busy:
+            return
+        self.show_progress()
+        self.dialog.after(200, self.poll_progress)
+    
+    def show_progress(self):
+        '''Show the current totals and any new per-row errors.'''
+        report = self.report
+        self.status_label.config(text=report.summary())
+        
+        shown = self.error_list.size()
+        for line_no, message in report.errors[shown:]:
+            self.error_list.insert(tk.END, f"Line {line_no}: {message}")
+    
+    def on_finished(self, report):
+        '''
+        Show the final result of the import.
+        
+        Args:
+            report (ImportReport): The completed import report
+        '''
+        self.progress_bar.stop()
+        self.start_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+        self.show_progress()
+        
+        title = "Import Stopped" if report.cancelled else "Import Complete"
+        messagebox.showinfo(title, report.summary())
+    
+    def on_failed(self, error):
+        '''
+        Report an import that stopped because of an error.
+        
+        Args:
+            error (Exception): The error that stopped the import
+        '''
+        self.progress_bar.stop()
+        self.start_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+        self.show_progress()
+        
+        if isinstance(error, (OSError, ValueError)):
+            messagebox.showerror("Import Error", str(error))
+        else:
+            show_database_error(error)
+    
+    def close(self):
+        '''Stop any running import and close the dialog.'''
+        self.cancel_event.set()
+        self.dialog.destroy()
+    
+    def run(self):
+        '''Run the import dialog.'''
+        self.dialog.grab_set()  # Make this window modal
+        self.dialog.wait_window()  # Wait until this window is closed
+
+def import_records(parent):
+    '''
+    Open the import dialog.
+    
+    Args:
+        parent: Parent tkinter window
+    '''
+    dialog = ImportDialog(parent)
+    dialog.run()
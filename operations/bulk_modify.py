@@ -0,0 +1,230 @@
+'''
+Bulk modify operation module for Client Management System.
+Applies one change to many client records selected by ID or by a filter.
+'''
+
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from services.bulk_modify import (ADJUSTABLE_FIELDS, BulkModifyReport, bulk_update,
+                                  preview_bulk_update)
+from widgets import ClientSelector, TaskGroup, show_database_error
+
+# Editable fields and their labels
+_FIELDS = {
+    "name": "Client Name",
+    "balance": "Balance",
+    "contact": "Contact",
+    "preference": "Preference",
+    "frequency": "Frequency"
+}
+
+class BulkModifyDialog:
+    '''Dialog window for applying one change to many client records.'''
+    
+    def __init__(self, parent):
+        '''
+        Initialize the bulk modify dialog.
+        
+        Args:
+            parent: Parent tkinter window
+        '''
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Bulk Modify Client Records")
+        self.dialog.geometry("760x640")
+        self.dialog.resizable(False, False)
+        
+        self.report = None
+        self.cancel_event = threading.Event()
+        
+        self.create_widgets()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+    
+    def create_widgets(self):
+        '''Create and place dialog widgets.'''
+        # Selection frame
+        self.selector = ClientSelector(self.dialog, text="Clients to Modify")
+        self.selector.pack(fill="x", padx=20, pady=10)
+        
+        # Changes frame: set a value or adjust a numeric field by an amount
+        changes_frame = ttk.LabelFrame(self.dialog, text="Changes (leave empty to keep)")
+        changes_frame.pack(fill="x", padx=20, pady=10)
+        
+        ttk.Label(changes_frame, text="Set to").grid(row=0, column=1, padx=5, sticky="w")
+        ttk.Label(changes_frame, text="or add").grid(row=0, column=2, padx=5, sticky="w")
+        
+        self.entries = {}
+        self.adjust_entries = {}
+        for row, (field, label) in enumerate(_FIELDS.items(), start=1):
+            ttk.Label(changes_frame, text=f"{label}:").grid(row=row, column=0, padx=10, pady=3,
+                                                           sticky="w")
+            entry = ttk.Entry(changes_frame, width=30)
+            entry.grid(row=row, column=1, padx=5, pady=3)
+            self.entries[field] = entry
+            if field in ADJUSTABLE_FIELDS:
+                entry = ttk.Entry(changes_frame, width=12)
+                entry.grid(row=row, column=2, padx=5, pady=3, sticky="w")
+                self.adjust_entries[field] = entry
+        
+        # Preview and progress frame
+        progress_frame = ttk.LabelFrame(self.dialog, text="Preview and Progress")
+        progress_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        self.preview_text = tk.Text(progress_frame, height=8, wrap="none")
+        self.preview_text.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="determinate")
+        self.progress_bar.pack(fill="x", padx=10, pady=5)
+        
+        self.status_label = ttk.Label(progress_frame, text="Preview the clients before applying")
+        self.status_label.pack(anchor="w", padx=10, pady=5)
+        
+        # Buttons frame
+        buttons_frame = ttk.Frame(self.dialog)
+        buttons_frame.pack(fill="x", padx=20, pady=10)
+        
+        self.preview_btn = ttk.Button(buttons_frame, text="Preview", command=self.preview)
+        self.preview_btn.pack(side="left", padx=10)
+        
+        self.start_btn = ttk.Button(buttons_frame, text="Apply Changes", command=self.start_update)
+        self.start_btn.pack(side="left", padx=10)
+        
+        self.stop_btn = ttk.Button(buttons_frame, text="Stop", command=self.cancel_event.set,
+                                   state="disabled")
+        self.stop_btn.pack(side="left", padx=10)
+        
+        close_btn = ttk.Button(buttons_frame, text="Close", command=self.close)
+        close_btn.pack(side="right", padx=10)
+        
+        # Queries run in the background and are stopped when the dialog closes
+        self.tasks = TaskGroup(self.dialog)
+    
+    def preview(self):
+        '''Count the selected clients and show the first few.'''
+        try:
+            ids, conditions = self.selector.selection()
+        except ValueError as e:
+            messagebox.showwarning("Input Error", str(e))
+            return
+        
+        self.status_label.config(text="Counting clients...")
+        self.tasks.submit(preview_bulk_update, ids, conditions,
+                          on_success=self.show_preview, on_error=self.on_failed)
+    
+    def show_preview(self, result):
+        '''
+        Show the number of selected clients and a sample of them.
+        
+        Args:
+            result (tuple): (number of matching clients, sample rows)
+        '''
+        count, rows = result
+        self.preview_text.delete("1.0", tk.END)
+        for row in rows:
+            self.preview_text.insert(tk.END, "  ".join(str(value) for value in row) + "\n")
+        if count > len(rows):
+            self.preview_text.insert(tk.END, f"... and {count - len(rows)} more\n")
+        self.status_label.config(text=f"{count} clients would be modified")
+    
+    def start_update(self):
+        '''Validate the changes, confirm and start the update in the background.'''
+        try:
+            ids, conditions = self.selector.selection()
+        except ValueError as e:
+            messagebox.showwarning("Input Error", str(e))
+            return
+        
+        values = {field: entry.get().strip() for field, entry in self.entries.items()}
+        adjustments = {field: entry.get().strip() for field, entry in self.adjust_entries.items()}
+        if not any(values.values()) and not any(adjustments.values()):
+            messagebox.showwarning("Input Error", "No fields were modified")
+            return
+        
+        if not messagebox.askyesno("Confirm Bulk Modify",
+                                   "Apply these changes to every selected client?"):
+            return
+        
+        self.cancel_event.clear()
+        self.report = BulkModifyReport()
+        self.start_btn.config(state="disabled")
+        self.preview_btn.config(state="disabled")
+        self.stop_btn.config(state="normal")
+        self.status_label.config(text="Counting clients...")
+        
+        def run():
+            # Count first so the progress bar has a total
+            self.report.rows_matched = preview_bulk_update(ids, conditions, limit=0)[0]
+            return bulk_update(ids, conditions, values, adjustments,
+                               cancel_event=self.cancel_event, report=self.report)
+        
+        self.tasks.submit(run, on_success=self.on_finished, on_error=self.on_failed)
+        self.poll_progress()
+    
+    def poll_progress(self):
+        '''Refresh the progress display while the update runs.'''
+        if not self.tasks.busy:
+            return
+        if self.report.rows_matched is not None:
+            self.progress_bar.config(maximum=max(self.report.rows_matched, 1),
+                                     value=self.report.rows_updated)
+            self.status_label.config(text=self.report.summary())
+        self.dialog.after(200, self.poll_progress)
+    
+    def reset_buttons(self):
+        '''Re-enable the buttons after an update stops.'''
+        self.start_btn.config(state="normal")
+        self.preview_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+    
+    def on_finished(self, report):
+        '''
+        Show the final result of the update.
+        
+        Args:
+            report (BulkModifyReport): The completed report
+        '''
+        self.reset_buttons()
+        self.progress_bar.config(value=report.rows_updated)
+        self.status_label.config(text=report.summary())
+        
+        if report.cancelled:
+            messagebox.showinfo("Bulk Modify Stopped",
+                                f"Stopped after {report.rows_updated} clients; "
+                                "the changes made so far were kept")
+        else:
+            messagebox.showinfo("Bulk Modify Complete", report.summary())
+    
+    def on_failed(self, error):
+        '''
+        Report a preview or update that stopped because of an error.
+        
+        Args:
+            error (Exception): The error that stopped the work
+        '''
+        self.reset_buttons()
+        self.status_label.config(text="Bulk modify failed")
+        
+        if isinstance(error, ValueError):
+            messagebox.showerror("Input Error", str(error))
+        else:
+            show_database_error(error)
+    
+    def close(self):
+        '''Stop any running update and close the dialog.'''
+        self.cancel_event.set()
+        self.dialog.destroy()
+    
+    def run(self):
+        '''Run the bulk modify dialog.'''
+        self.dialog.grab_set()  # Make this window modal
+        self.dialog.wait_window()  # Wait until this window is closed
+
+def bulk_modify_records(parent):
+    '''
+    Open the bulk modify dialog.
+    
+    Args:
+        parent: Parent tkinter window
+    '''
+    dialog = BulkModifyDialog(parent)
+    dialog.run()
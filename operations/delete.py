@@ -1,14 +1,25 @@
 '''
 Delete operation module for Client Management System.
-Handles deletion of client records.
+Handles deletion of client records, one at a time or many at once.
 '''
 
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database.db_config import execute_query
+from database.patron import PATRON_COLUMNS
+from services.bulk_modify import BulkModifyReport, bulk_delete, preview_bulk_update
+from widgets import ClientSelector, TaskGroup, show_database_error
+
+# Maximum number of matching clients listed for selection
+DELETE_LIST_LIMIT = 500
 
 class DeleteDialog:
-    '''Dialog window for deleting client records.'''
+    '''
+    Dialog window for deleting client records.
+    
+    Clients are found by ID list or by a filter. Either the clients selected
+    in the list or every matching client can then be deleted.
+    '''
     
     def __init__(self, parent):
         '''
@@ -18,116 +29,216 @@ class DeleteDialog:
             parent: Parent tkinter window
         '''
         self.dialog = tk.Toplevel(parent)
-        self.dialog.title("Delete Client Record")
-        self.dialog.geometry("500x300")
+        self.dialog.title("Delete Client Records")
+        self.dialog.geometry("760x560")
         self.dialog.resizable(False, False)
         
+        self.report = None
+        self.cancel_event = threading.Event()
+        
         self.create_widgets()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
     
     def create_widgets(self):
         '''Create and place dialog widgets.'''
         # Search frame
-        search_frame = ttk.LabelFrame(self.dialog, text="Find Record to Delete")
-        search_frame.pack(fill="x", padx=20, pady=10)
+        self.selector = ClientSelector(self.dialog, text="Find Records to Delete")
+        self.selector.pack(fill="x", padx=20, pady=10)
         
-        ttk.Label(search_frame, text="Enter Client ID:").grid(row=0, column=0, padx=10, pady=10)
-        self.id_entry = ttk.Entry(search_frame, width=10)
-        self.id_entry.grid(row=0, column=1, padx=10, pady=10)
+        find_btn = ttk.Button(self.selector, text="Find Clients", command=self.find_clients)
+        find_btn.grid(row=2, column=1, padx=5, pady=5, sticky="w")
         
-        find_btn = ttk.Button(search_frame, text="Find Client", command=self.find_client)
-        find_btn.grid(row=0, column=2, padx=10, pady=10)
+        # Loading indicator
+        self.loading_label = ttk.Label(self.selector, text="")
+        self.loading_label.grid(row=2, column=2, padx=5, pady=5)
         
-        # Client info frame
-        self.info_frame = ttk.LabelFrame(self.dialog, text="Client Information")
+        # Matching clients; several can be selected with Shift and Ctrl
+        self.info_frame = ttk.LabelFrame(self.dialog, text="Matching Clients")
         self.info_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
-        # Client info text
-        self.info_text = tk.Text(self.info_frame, height=6, width=50, state="disabled")
-        self.info_text.pack(padx=10, pady=10, fill="both", expand=True)
+        self.client_tree = ttk.Treeview(self.info_frame, columns=PATRON_COLUMNS,
+                                        show="headings", selectmode="extended")
+        for column in PATRON_COLUMNS:
+            self.client_tree.heading(column, text=column)
+            self.client_tree.column(column, width=100)
+        self.client_tree.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
+        self.client_tree.bind("<<TreeviewSelect>>", self.update_buttons)
+        
+        scrollbar = ttk.Scrollbar(self.info_frame, command=self.client_tree.yview)
+        scrollbar.pack(side="right", fill="y", padx=(0, 10), pady=10)
+        self.client_tree.config(yscrollcommand=scrollbar.set)
+        
+        self.status_label = ttk.Label(self.dialog, text="")
+        self.status_label.pack(anchor="w", padx=20)
         
         # Buttons frame
         buttons_frame = ttk.Frame(self.dialog)
         buttons_frame.pack(fill="x", padx=20, pady=10)
         
-        self.delete_btn = ttk.Button(buttons_frame, text="Delete Client", 
-                                    command=self.confirm_delete, state="disabled")
+        self.delete_btn = ttk.Button(buttons_frame, text="Delete Selected",
+                                     command=self.delete_selected, state="disabled")
         self.delete_btn.pack(side="left", padx=10)
         
-        cancel_btn = ttk.Button(buttons_frame, text="Cancel", command=self.dialog.destroy)
+        self.delete_all_btn = ttk.Button(buttons_frame, text="Delete All Matching",
+                                         command=self.delete_all, state="disabled")
+        self.delete_all_btn.pack(side="left", padx=10)
+        
+        self.stop_btn = ttk.Button(buttons_frame, text="Stop", command=self.cancel_event.set,
+                                   state="disabled")
+        self.stop_btn.pack(side="left", padx=10)
+        
+        cancel_btn = ttk.Button(buttons_frame, text="Close", command=self.close)
         cancel_btn.pack(side="right", padx=10)
         
-        # Store client ID
-        self.current_client_id = None
-        self.client_data = None
+        # Selection that found the listed clients, and how many matched
+        self.found = None
+        self.match_count = 0
+        
+        # Queries run in the background and are cancelled when the dialog closes
+        self.tasks = TaskGroup(self.dialog, busy_label=self.loading_label)
     
-    def find_client(self):
-        '''Find and display client record for deletion.'''
+    def find_clients(self):
+        '''Find and list the clients matching the IDs or filter.'''
         try:
-            client_id = int(self.id_entry.get())
-            
-            # Query the database
-            query = "SELECT * FROM patron WHERE PAT_ID = %s"
-            result = execute_query(query, (client_id,), fetch=True)
-            
-            if not result:
-                messagebox.showinfo("Not Found", f"No client found with ID: {client_id}")
-                self.info_text.config(state="normal")
-                self.info_text.delete(1.0, tk.END)
-                self.info_text.config(state="disabled")
-                self.delete_btn.config(state="disabled")
-                return
-            
-            # Store client ID and data
-            self.current_client_id = client_id
-            self.client_data = result[0]
-            
-            # Display client info
-            self.info_text.config(state="normal")
-            self.info_text.delete(1.0, tk.END)
-            
-            # Format client info
-            info = f"ID: {self.client_data[0]}\n"
-            info += f"Name: {self.client_data[1]}\n"
-            info += f"Balance: {self.client_data[2]}\n"
-            info += f"Contact: {self.client_data[3]}\n"
-            info += f"Preference: {self.client_data[4]}\n"
-            info += f"Frequency: {self.client_data[5]}"
-            
-            self.info_text.insert(tk.END, info)
-            self.info_text.config(state="disabled")
-            
-            # Enable delete button
-            self.delete_btn.config(state="normal")
-        
-        except ValueError:
-            messagebox.showerror("Input Error", "Please enter a valid client ID")
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            ids, conditions = self.selector.selection()
+        except ValueError as e:
+            messagebox.showerror("Input Error", str(e))
+            return
+        
+        self.tasks.submit(preview_bulk_update, ids, conditions, DELETE_LIST_LIMIT,
+                          on_success=lambda result: self.show_clients((ids, conditions), result),
+                          on_error=self.on_failed)
     
-    def confirm_delete(self):
-        '''Confirm and delete client record.'''
-        if not self.current_client_id:
+    def show_clients(self, found, result, announce=True):
+        '''
+        List the clients that were found.
+        
+        Args:
+            found (tuple): (client IDs or None, filter conditions or None) searched for
+            result (tuple): (number of matching clients, first matching rows)
+            announce (bool): Tell the user when nothing matches
+        '''
+        count, rows = result
+        self.client_tree.delete(*self.client_tree.get_children())
+        if not count:
+            self.found = None
+            self.match_count = 0
+            self.status_label.config(text="")
+            self.update_buttons()
+            if announce:
+                messagebox.showinfo("Not Found", "No matching clients found")
             return
-            
-        # Ask for confirmation
-        confirm = messagebox.askyesno(
-            "Confirm Deletion", 
-            f"Are you sure you want to delete client '{self.client_data[1]}' (ID: {self.current_client_id})?"
-        )
-        
-        if not confirm:
+        
+        self.found = found
+        self.match_count = count
+        for row in rows:
+            self.client_tree.insert("", tk.END, iid=str(row[0]), values=row)
+        
+        # A single match is selected right away, as before
+        if count == 1:
+            self.client_tree.selection_set(str(rows[0][0]))
+        
+        shown = f", first {len(rows)} listed" if count > len(rows) else ""
+        self.status_label.config(text=f"{count} clients match{shown}")
+        self.update_buttons()
+    
+    def update_buttons(self, event=None):
+        '''Enable the delete buttons that apply to the listed clients.'''
+        busy = self.stop_btn.instate(["!disabled"])
+        selected = bool(self.client_tree.selection())
+        self.delete_btn.config(state="normal" if selected and not busy else "disabled")
+        self.delete_all_btn.config(state="normal" if self.found and not busy else "disabled")
+    
+    def delete_selected(self):
+        '''Confirm and delete the clients selected in the list.'''
+        ids = [int(iid) for iid in self.client_tree.selection()]
+        if not ids:
             return
-            
-        try:
-            # Execute delete query
-            query = "DELETE FROM patron WHERE PAT_ID = %s"
-            execute_query(query, (self.current_client_id,), commit=True)
-            
+        
+        if len(ids) == 1:
+            name = self.client_tree.item(str(ids[0]), "values")[1]
+            question = f"Are you sure you want to delete client '{name}' (ID: {ids[0]})?"
+        else:
+            question = f"Are you sure you want to delete the {len(ids)} selected clients?"
+        if messagebox.askyesno("Confirm Deletion", question):
+            self.start_delete(ids, None)
+    
+    def delete_all(self):
+        '''Confirm and delete every client matching the IDs or filter.'''
+        if not self.found:
+            return
+        
+        question = f"Are you sure you want to delete all {self.match_count} matching clients?"
+        if messagebox.askyesno("Confirm Deletion", question):
+            self.start_delete(*self.found)
+    
+    def start_delete(self, ids, conditions):
+        '''
+        Delete clients in the background.
+        
+        Args:
+            ids (list): Client IDs, or None
+            conditions (list): Filter conditions, or None
+        '''
+        self.cancel_event.clear()
+        self.report = BulkModifyReport("deleted")
+        self.stop_btn.config(state="normal")
+        self.update_buttons()
+        
+        self.tasks.submit(bulk_delete, ids, conditions, cancel_event=self.cancel_event,
+                          report=self.report, on_success=self.on_deleted,
+                          on_error=self.on_failed)
+        self.poll_progress()
+    
+    def poll_progress(self):
+        '''Refresh the progress display while clients are deleted.'''
+        if not self.tasks.busy:
+            return
+        self.status_label.config(text=self.report.summary())
+        self.dialog.after(200, self.poll_progress)
+    
+    def on_deleted(self, report):
+        '''
+        Confirm completed deletions and list what is left.
+        
+        Args:
+            report (BulkModifyReport): Clients deleted and throughput
+        '''
+        self.stop_btn.config(state="disabled")
+        self.status_label.config(text=report.summary())
+        if report.cancelled:
+            messagebox.showinfo("Deletion Stopped",
+                                f"Stopped after {report.rows_updated} clients were deleted")
+        elif report.rows_updated == 1:
             messagebox.showinfo("Success", "Client record deleted successfully")
-            self.dialog.destroy()
+        else:
+            messagebox.showinfo("Success", f"{report.rows_updated} client records deleted")
         
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        # Show the clients that still match
+        ids, conditions = self.found
+        self.tasks.submit(preview_bulk_update, ids, conditions, DELETE_LIST_LIMIT,
+                          on_success=lambda result: self.show_clients((ids, conditions), result,
+                                                                     announce=False),
+                          on_error=self.on_failed)
+    
+    def on_failed(self, error):
+        '''
+        Report a search or deletion that stopped because of an error.
+        
+        Args:
+            error (Exception): The error that stopped the work
+        '''
+        self.stop_btn.config(state="disabled")
+        self.update_buttons()
+        if isinstance(error, ValueError):
+            messagebox.showerror("Input Error", str(error))
+        else:
+            show_database_error(error)
+    
+    def close(self):
+        '''Stop any running deletion and close the dialog.'''
+        self.cancel_event.set()
+        self.dialog.destroy()
     
     def run(self):
         '''Run the delete dialog.'''
@@ -142,4 +253,4 @@ def delete_record(parent):
         parent: Parent tkinter window
     '''
     dialog = DeleteDialog(parent)
-    dialog.run()
\ No newline at end of file
+    dialog.run()
@@ -3,7 +3,10 @@ Display operation module for Client Management System.
 Handles the display of client records.
 '''
 
-from database.db_config import execute_query
+from database import db_config
+from database.pool import PoolTimeoutError
+from services.records import fetch_all_patrons
+from widgets import show_database_error
 import tkinter as tk
 from tkinter import ttk
 
@@ -12,10 +15,14 @@ def display_records():
     Fetch all records from the patron table.
     
     Returns:
-        list: List of tuples containing patron records
+        list: List of tuples containing patron records; None if the
+              query failed, after reporting the error
     '''
-    query = "SELECT * FROM patron"
-    return execute_query(query, fetch=True)
+    try:
+        return fetch_all_patrons()
+    except (db_config.DatabaseError, PoolTimeoutError) as err:
+        show_database_error(err)
+        return None
 
 def display_records_formatted(parent_frame):
     '''
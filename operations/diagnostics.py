@@ -0,0 +1,216 @@
+'''
+Diagnostics module for Client Management System.
+Shows query statistics, the slow-query log and connection pool counters.
+'''
+
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from database.cache import get_cache_stats
+from database.db_config import get_pool_stats
+from database.instrumentation import query_stats
+from database.write_behind import write_queue
+
+# Milliseconds between automatic refreshes of the open dialog
+DIAGNOSTICS_REFRESH_MS = 2000
+
+# Columns of the statement statistics table: heading, key, width
+_STATEMENT_COLUMNS = [
+    ("Count", "count", 60),
+    ("Errors", "errors", 50),
+    ("Avg rows", "avg_rows", 70),
+    ("p50 ms", "p50_ms", 60),
+    ("p95 ms", "p95_ms", 60),
+    ("p99 ms", "p99_ms", 60),
+    ("Max ms", "max_ms", 70),
+    ("Total ms", "total_ms", 80)
+]
+
+class DiagnosticsDialog:
+    '''
+    Dialog window showing what the database layer has been doing.
+    
+    The dialog is not modal, so it can stay open and refresh itself while
+    other dialogs are used.
+    '''
+    
+    def __init__(self, parent):
+        '''
+        Initialize the diagnostics dialog.
+        
+        Args:
+            parent: Parent tkinter window
+        '''
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Query Diagnostics")
+        self.dialog.geometry("900x600")
+        
+        self.slow_entries = {}  # Slow-query log id -> entry
+        self.refresh_job = None
+        
+        self.create_widgets()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+    
+    def create_widgets(self):
+        '''Create and place dialog widgets.'''
+        # Summary of totals, pool and cache
+        self.summary_label = ttk.Label(self.dialog, text="", justify="left")
+        self.summary_label.pack(fill="x", padx=20, pady=10)
+        
+        notebook = ttk.Notebook(self.dialog)
+        notebook.pack(fill="both", expand=True, padx=20, pady=5)
+        
+        # Per-statement statistics
+        statements_frame = ttk.Frame(notebook)
+        notebook.add(statements_frame, text="Statements")
+        
+        columns = [key for _, key, _ in _STATEMENT_COLUMNS]
+        self.statements_tree = ttk.Treeview(statements_frame, columns=columns)
+        self.statements_tree.heading("#0", text="Statement")
+        self.statements_tree.column("#0", width=300, anchor=tk.W)
+        for heading, key, width in _STATEMENT_COLUMNS:
+            self.statements_tree.heading(key, text=heading)
+            self.statements_tree.column(key, width=width, anchor=tk.E)
+        self.statements_tree.pack(side="left", fill="both", expand=True)
+        
+        scrollbar = ttk.Scrollbar(statements_frame, command=self.statements_tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.statements_tree.config(yscrollcommand=scrollbar.set)
+        
+        # Slow-query log with the details of the selected entry
+        slow_frame = ttk.Frame(notebook)
+        notebook.add(slow_frame, text="Slow Queries")
+        
+        self.slow_tree = ttk.Treeview(slow_frame, columns=("elapsed", "rows", "source"),
+                                      height=10)
+        self.slow_tree.heading("#0", text="Time")
+        self.slow_tree.column("#0", width=90, anchor=tk.W)
+        self.slow_tree.heading("elapsed", text="ms")
+        self.slow_tree.column("elapsed", width=70, anchor=tk.E)
+        self.slow_tree.heading("rows", text="Rows")
+        self.slow_tree.column("rows", width=60, anchor=tk.E)
+        self.slow_tree.heading("source", text="Issued by")
+        self.slow_tree.column("source", width=450, anchor=tk.W)
+        self.slow_tree.pack(fill="x")
+        self.slow_tree.bind("<<TreeviewSelect>>", self.show_slow_query)
+        
+        self.detail_text = tk.Text(slow_frame, height=12, wrap="word")
+        self.detail_text.pack(fill="both", expand=True, pady=5)
+        
+        # Buttons frame
+        buttons_frame = ttk.Frame(self.dialog)
+        buttons_frame.pack(fill="x", padx=20, pady=10)
+        
+        ttk.Button(buttons_frame, text="Refresh", command=self.refresh).pack(side="left", padx=10)
+        ttk.Button(buttons_frame, text="Reset", command=self.reset).pack(side="left", padx=10)
+        ttk.Button(buttons_frame, text="Save to File...", command=self.save).pack(side="left", padx=10)
+        ttk.Button(buttons_frame, text="Close", command=self.close).pack(side="right", padx=10)
+    
+    def refresh(self):
+        '''Reload the statistics and schedule the next refresh.'''
+        if self.refresh_job is not None:
+            self.dialog.after_cancel(self.refresh_job)
+        
+        snapshot = query_stats.snapshot()
+        pool = get_pool_stats()
+        cache = get_cache_stats()
+        self.summary_label.config(text=(
+            f"Queries: {snapshot['queries']}    Errors: {snapshot['errors']}    "
+            f"Slow (>= {snapshot['slow_ms']:.0f} ms): {snapshot['slow_total']}    "
+            f"Plans: {'on' if snapshot['explain'] else 'off'}\n"
+            f"Pool: {pool['in_use']} in use, {pool['idle']} idle of {pool['size']}, "
+            f"{pool['waits']} waits    "
+            f"Cache: {cache['hit_ratio']:.0%} hits, {cache['size']} rows"
+        ) + self.write_queue_summary())
+        
+        self.statements_tree.delete(*self.statements_tree.get_children())
+        for stats in snapshot["statements"]:
+            values = [stats["count"], stats["errors"]] + [
+                f"{stats[key]:.1f}" for _, key, _ in _STATEMENT_COLUMNS[2:]]
+            self.statements_tree.insert("", tk.END, text=stats["fingerprint"], values=values)
+        
+        # Keep the selected slow query across refreshes
+        selected = self.slow_tree.selection()
+        self.slow_entries = {str(entry["id"]): entry for entry in snapshot["slow_queries"]}
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for iid, entry in self.slow_entries.items():
+            self.slow_tree.insert("", tk.END, iid=iid,
+                                  text=time.strftime("%H:%M:%S", time.localtime(entry["time"])),
+                                  values=(f"{entry['elapsed_ms']:.1f}", entry["rows"],
+                                          entry["source"] or ""))
+        if selected and self.slow_tree.exists(selected[0]):
+            self.slow_tree.selection_set(selected[0])
+        
+        self.refresh_job = self.dialog.after(DIAGNOSTICS_REFRESH_MS, self.refresh)
+    
+    @staticmethod
+    def write_queue_summary():
+        '''Return a summary line of the write-behind queue, or "" if it is off.'''
+        status = write_queue.status()
+        if not status["enabled"]:
+            return ""
+        oldest = status["oldest_age"]
+        return (f"\nWrite queue: {status['pending']} pending"
+                f"{'' if oldest is None else f' (oldest {oldest:.1f} s)'}, "
+                f"{status['acknowledged']} acknowledged, {status['flushed']} flushed in "
+                f"{status['batches']} commits, {len(status['failed'])} rejected"
+                f"{'' if not status['last_error'] else ', error: ' + status['last_error']}")
+    
+    def show_slow_query(self, event=None):
+        '''Show the statement, parameters and plan of the selected slow query.'''
+        selected = self.slow_tree.selection()
+        if not selected:
+            return
+        entry = self.slow_entries[selected[0]]
+        
+        lines = [entry["query"], ""]
+        if entry["params"]:
+            lines.append(f"Parameters: {entry['params']}")
+        lines.append(f"Thread: {entry['thread']}")
+        if entry["error"]:
+            lines.append(f"Error: {entry['error']}")
+        if entry["plan"]:
+            lines += ["", "Plan:"] + ["  " + " | ".join(str(v) for v in row) for row in entry["plan"]]
+        
+        self.detail_text.delete("1.0", tk.END)
+        self.detail_text.insert("1.0", "\n".join(lines))
+    
+    def reset(self):
+        '''Discard the statistics collected so far.'''
+        query_stats.reset()
+        self.detail_text.delete("1.0", tk.END)
+        self.refresh()
+    
+    def save(self):
+        '''Write the statistics and slow-query log to a JSON file.'''
+        path = filedialog.asksaveasfilename(
+            parent=self.dialog,
+            title="Save query statistics",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            query_stats.dump(path)
+        except OSError as err:
+            messagebox.showerror("Save Error", f"Could not write {path}: {err}", parent=self.dialog)
+            return
+        messagebox.showinfo("Saved", f"Query statistics written to {path}", parent=self.dialog)
+    
+    def close(self):
+        '''Stop refreshing and close the dialog.'''
+        if self.refresh_job is not None:
+            self.dialog.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        self.dialog.destroy()
+
+def show_diagnostics(parent):
+    '''
+    Open the diagnostics dialog.
+    
+    Args:
+        parent: Parent tkinter window
+    '''
+    DiagnosticsDialog(parent)
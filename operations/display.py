@@ -3,80 +3,283 @@ Display operation module for Client Management System.
 Handles the display of client records.
 '''
 
-from database.db_config import execute_query
-import tkinter as tk
-from tkinter import ttk
+from database import db_config
+from database.pool import PoolTimeoutError
+from services.records import (PAGE_SIZE, count_patrons, fetch_all_patrons, fetch_page,
+                              fetch_last_page, fetch_page_at, fetch_page_at_position)
+from tkinter import ttk, messagebox
+from widgets import VirtualGrid, ListRowSource, PagedRowSource, TaskGroup, show_database_error
 
 def display_records():
     '''
     Fetch all records from the patron table.
     
     Returns:
-        list: List of tuples containing patron records
+        list: List of tuples containing patron records; None if the
+              query failed, after reporting the error
     '''
-    query = "SELECT * FROM patron"
-    return execute_query(query, fetch=True)
+    try:
+        return fetch_all_patrons()
+    except (db_config.DatabaseError, PoolTimeoutError) as err:
+        show_database_error(err)
+        return None
+
+# Column layout shared by the record grids
+RECORD_COLUMNS = ("ID", "Name", "Balance", "Contact", "Preference", "Frequency")
+RECORD_COLUMN_WIDTHS = {
+    "ID": 50,
+    "Name": 150,
+    "Balance": 80,
+    "Contact": 100,
+    "Preference": 120,
+    "Frequency": 80
+}
+
+class PatronRowSource(PagedRowSource):
+    '''
+    Lazy row source over the whole patron table, ordered by PAT_ID.
+    
+    A page next to a cached page is read with a keyset range scan from that
+    page's first or last PAT_ID. Random jumps (such as dragging the
+    scrollbar) first look up the PAT_ID at the page's position and read the
+    page from there; see fetch_page_at_position.
+    '''
+    
+    def load_count(self):
+        '''Return the number of records in the patron table.'''
+        return count_patrons()
+    
+    def load_page(self, page_no):
+        '''
+        Load one page of records.
+        
+        Args:
+            page_no (int): Zero-based page number
+        
+        Returns:
+            list: Records on the page in ascending PAT_ID order
+        '''
+        previous = self.cached_page(page_no - 1) if page_no > 0 else None
+        if previous:
+            records, _ = fetch_page(after_id=previous[-1][0], limit=self.page_size)
+            return records
+        following = self.cached_page(page_no + 1)
+        if following:
+            records, _ = fetch_page(before_id=following[0][0], limit=self.page_size)
+            return records
+        
+        return fetch_page_at_position(page_no * self.page_size, self.page_size)
+
+def _create_record_grid(parent_frame, source=None):
+    '''
+    Create a virtual grid configured with the patron columns.
+    
+    Args:
+        parent_frame: Tkinter Frame to place the grid in
+        source (optional): Row source for the grid
+    
+    Returns:
+        VirtualGrid: The created grid widget
+    '''
+    grid = VirtualGrid(parent_frame, RECORD_COLUMNS, source=source,
+                       widths=RECORD_COLUMN_WIDTHS)
+    grid.pack(fill="both", expand=True, padx=10, pady=10)
+    return grid
 
 def display_records_formatted(parent_frame):
     '''
-    Display all records in a Treeview grid widget.
+    Display all records in a virtual grid widget.
+    
+    Records are read lazily, a page at a time, on background threads as the
+    grid scrolls.
     
     Args:
-        parent_frame: Tkinter Frame to place the Treeview in
+        parent_frame: Tkinter Frame to place the grid in
     
     Returns:
-        ttk.Treeview: The created Treeview widget
+        VirtualGrid: The created grid widget
     '''
     # Clear any existing widgets in the frame
     for widget in parent_frame.winfo_children():
         widget.destroy()
     
-    # Create a frame for the Treeview and scrollbar
-    tree_frame = tk.Frame(parent_frame)
-    tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
-    
-    # Create scrollbar
-    y_scrollbar = ttk.Scrollbar(tree_frame)
-    y_scrollbar.pack(side="right", fill="y")
-    
-    # Create the Treeview widget
-    tree = ttk.Treeview(tree_frame, yscrollcommand=y_scrollbar.set)
-    tree.pack(fill="both", expand=True)
-    
-    # Configure the scrollbar
-    y_scrollbar.config(command=tree.yview)
-    
-    # Define columns
-    tree["columns"] = ("ID", "Name", "Balance", "Contact", "Preference", "Frequency")
-    
-    # Format columns
-    tree.column("#0", width=0, stretch=tk.NO)  # Hidden column
-    tree.column("ID", width=50, anchor=tk.W)
-    tree.column("Name", width=150, anchor=tk.W)
-    tree.column("Balance", width=80, anchor=tk.W)
-    tree.column("Contact", width=100, anchor=tk.W)
-    tree.column("Preference", width=120, anchor=tk.W)
-    tree.column("Frequency", width=80, anchor=tk.W)
-    
-    # Create headings
-    tree.heading("#0", text="")
-    tree.heading("ID", text="ID")
-    tree.heading("Name", text="Name")
-    tree.heading("Balance", text="Balance")
-    tree.heading("Contact", text="Contact")
-    tree.heading("Preference", text="Preference")
-    tree.heading("Frequency", text="Frequency")
-    
-    # Get records
-    records = display_records()
-    
-    if not records:
-        # Display a message if no records are found
-        tree.insert("", tk.END, values=("No records found", "", "", "", "", ""))
-        return tree
-    
-    # Insert records
-    for record in records:
-        tree.insert("", tk.END, values=record)
-    
-    return tree
\ No newline at end of file
+    grid = _create_record_grid(parent_frame)
+    grid.set_source(PatronRowSource(tasks=TaskGroup(grid)))
+    return grid
+
+class PagedRecordView:
+    '''
+    Paginated record display that holds a single page in memory at a time.
+    
+    Pages are located with keyset pagination on PAT_ID, so moving to the next,
+    previous, first or last page, or jumping to a client ID, costs one indexed
+    range scan no matter how large the patron table is.
+    '''
+    
+    def __init__(self, parent_frame, page_size=PAGE_SIZE):
+        '''
+        Initialize the paged view.
+        
+        Args:
+            parent_frame: Tkinter Frame to place the view in
+            page_size (int): Number of records per page
+        '''
+        self.parent_frame = parent_frame
+        self.page_size = page_size
+        
+        # Current page state
+        self.records = []
+        self.has_prev = False
+        self.has_next = False
+        self.pending = None
+        
+        self.create_widgets()
+    
+    def create_widgets(self):
+        '''Create and place the navigation controls and record grid.'''
+        # Clear any existing widgets in the frame
+        for widget in self.parent_frame.winfo_children():
+            widget.destroy()
+        
+        # Navigation bar
+        nav_frame = ttk.Frame(self.parent_frame)
+        nav_frame.pack(fill="x", padx=10, pady=(10, 0))
+        
+        self.first_btn = ttk.Button(nav_frame, text="<< First", command=self.first_page)
+        self.first_btn.pack(side="left", padx=2)
+        
+        self.prev_btn = ttk.Button(nav_frame, text="< Prev", command=self.prev_page)
+        self.prev_btn.pack(side="left", padx=2)
+        
+        self.next_btn = ttk.Button(nav_frame, text="Next >", command=self.next_page)
+        self.next_btn.pack(side="left", padx=2)
+        
+        self.last_btn = ttk.Button(nav_frame, text="Last >>", command=self.last_page)
+        self.last_btn.pack(side="left", padx=2)
+        
+        # Jump to ID controls
+        ttk.Label(nav_frame, text="Go to ID:").pack(side="left", padx=(15, 2))
+        self.jump_entry = ttk.Entry(nav_frame, width=10)
+        self.jump_entry.pack(side="left", padx=2)
+        self.jump_entry.bind("<Return>", lambda event: self.jump_to_id())
+        
+        jump_btn = ttk.Button(nav_frame, text="Go", command=self.jump_to_id)
+        jump_btn.pack(side="left", padx=2)
+        
+        # Page status
+        self.status_label = ttk.Label(nav_frame, text="")
+        self.status_label.pack(side="right", padx=5)
+        
+        self.loading_label = ttk.Label(nav_frame, text="")
+        self.loading_label.pack(side="right", padx=5)
+        
+        # Pages are fetched in the background; tasks die with the view
+        self.tasks = TaskGroup(nav_frame, busy_label=self.loading_label)
+        
+        self.record_grid = _create_record_grid(self.parent_frame)
+    
+    def show_page(self, records, has_prev, has_next):
+        '''
+        Replace the grid contents with a page of records.
+        
+        Args:
+            records (list): Records on the page, in ascending PAT_ID order
+            has_prev (bool): Whether records exist before this page
+            has_next (bool): Whether records exist after this page
+        '''
+        self.records = records
+        self.has_prev = has_prev
+        self.has_next = has_next
+        
+        self.record_grid.set_source(ListRowSource(records))
+        
+        if not records:
+            self.status_label.config(text="")
+        else:
+            self.status_label.config(
+                text=f"IDs {records[0][0]} - {records[-1][0]} ({len(records)} records)"
+            )
+        
+        self.prev_btn.config(state="normal" if has_prev else "disabled")
+        self.first_btn.config(state="normal" if has_prev else "disabled")
+        self.next_btn.config(state="normal" if has_next else "disabled")
+        self.last_btn.config(state="normal" if has_next else "disabled")
+    
+    def load(self, fn, *args, on_loaded):
+        '''
+        Fetch a page in the background, superseding any pending fetch.
+        
+        Args:
+            fn (callable): Page fetch function
+            *args: Arguments for the fetch function
+            on_loaded (callable): Called on the Tk thread with the fetch result
+        '''
+        self.tasks.cancel(self.pending)
+        self.pending = self.tasks.submit(fn, *args, on_success=on_loaded,
+                                         on_error=show_database_error)
+    
+    def first_page(self):
+        '''Show the page with the lowest PAT_IDs.'''
+        self.load(fetch_page, None, None, self.page_size,
+                  on_loaded=lambda result: self.show_page(result[0], False, result[1]))
+    
+    def last_page(self):
+        '''Show the page with the highest PAT_IDs.'''
+        self.load(fetch_last_page, self.page_size,
+                  on_loaded=lambda result: self.show_page(result[0], result[1], False))
+    
+    def next_page(self):
+        '''Show the page following the current one.'''
+        if not self.records or not self.has_next:
+            return
+        
+        def loaded(result):
+            records, has_next = result
+            if records:
+                self.show_page(records, True, has_next)
+        
+        self.load(fetch_page, self.records[-1][0], None, self.page_size, on_loaded=loaded)
+    
+    def prev_page(self):
+        '''Show the page preceding the current one.'''
+        if not self.records or not self.has_prev:
+            return
+        
+        def loaded(result):
+            records, has_prev = result
+            if records:
+                self.show_page(records, has_prev, True)
+        
+        self.load(fetch_page, None, self.records[0][0], self.page_size, on_loaded=loaded)
+    
+    def jump_to_id(self):
+        '''Show the page starting at the entered client ID, or the next one after it.'''
+        try:
+            client_id = int(self.jump_entry.get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter a valid client ID")
+            return
+        
+        def loaded(result):
+            records, has_prev, has_next = result
+            if not records:
+                messagebox.showinfo("Not Found", f"No clients with ID {client_id} or above")
+                return
+            self.show_page(records, has_prev, has_next)
+        
+        self.load(fetch_page_at, client_id, self.page_size, on_loaded=loaded)
+
+def display_records_paged(parent_frame, page_size=PAGE_SIZE):
+    '''
+    Display records one page at a time with navigation controls.
+    
+    Args:
+        parent_frame: Tkinter Frame to place the view in
+        page_size (int): Number of records per page
+    
+    Returns:
+        PagedRecordView: The created paged view
+    '''
+    view = PagedRecordView(parent_frame, page_size)
+    view.first_page()
+    return view
@@ -0,0 +1,218 @@
+'''
+Export module for Client Management System.
+Handles streaming export of client records to CSV, JSON Lines and Parquet files.
+'''
+
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from database.search_index import MATCH_MODES, SEARCH_FIELDS
+from services.export import EXPORT_FORMATS, ExportReport, export_patrons, parquet_available
+from widgets import TaskGroup, show_database_error
+
+# Format names shown in the dialog
+_FORMAT_NAMES = {"CSV": "csv", "JSON Lines": "jsonl", "Parquet": "parquet"}
+
+# Filter choice that exports every record
+_ALL_RECORDS = "All records"
+
+class ExportDialog:
+    '''Dialog window for exporting client records to a file.'''
+    
+    def __init__(self, parent):
+        '''
+        Initialize the export dialog.
+        
+        Args:
+            parent: Parent tkinter window
+        '''
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("Export Client Records")
+        self.dialog.geometry("600x420")
+        self.dialog.resizable(False, False)
+        
+        self.report = None
+        self.cancel_event = threading.Event()
+        
+        self.create_widgets()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+    
+    def create_widgets(self):
+        '''Create and place dialog widgets.'''
+        # Filter frame
+        filter_frame = ttk.LabelFrame(self.dialog, text="Records")
+        filter_frame.pack(fill="x", padx=20, pady=10)
+        
+        ttk.Label(filter_frame, text="Export:").grid(row=0, column=0, padx=5, pady=5)
+        self.field_box = ttk.Combobox(filter_frame, values=[_ALL_RECORDS] + list(SEARCH_FIELDS),
+                                      state="readonly", width=12)
+        self.field_box.grid(row=0, column=1, padx=5, pady=5)
+        self.field_box.current(0)
+        self.field_box.bind("<<ComboboxSelected>>", self.update_filter_state)
+        
+        self.match_mode = ttk.Combobox(filter_frame, values=MATCH_MODES, state="disabled", width=10)
+        self.match_mode.grid(row=0, column=2, padx=5, pady=5)
+        self.match_mode.current(0)
+        
+        self.value_entry = ttk.Entry(filter_frame, width=25, state="disabled")
+        self.value_entry.grid(row=0, column=3, padx=5, pady=5)
+        
+        # File frame
+        file_frame = ttk.LabelFrame(self.dialog, text="Destination")
+        file_frame.pack(fill="x", padx=20, pady=10)
+        
+        ttk.Label(file_frame, text="File:").grid(row=0, column=0, padx=5, pady=5)
+        self.path_entry = ttk.Entry(file_frame, width=45)
+        self.path_entry.grid(row=0, column=1, padx=5, pady=5)
+        
+        browse_btn = ttk.Button(file_frame, text="Browse...", command=self.browse)
+        browse_btn.grid(row=0, column=2, padx=5, pady=5)
+        
+        # Parquet is only offered when pyarrow is installed
+        formats = [name for name, fmt in _FORMAT_NAMES.items()
+                   if fmt != "parquet" or parquet_available()]
+        ttk.Label(file_frame, text="Format:").grid(row=1, column=0, padx=5, pady=5)
+        self.format_box = ttk.Combobox(file_frame, values=formats, state="readonly", width=12)
+        self.format_box.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.format_box.current(0)
+        
+        self.compress = tk.BooleanVar(value=False)
+        ttk.Checkbutton(file_frame, text="Compress (gzip)",
+                        variable=self.compress).grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        
+        # Progress frame
+        progress_frame = ttk.LabelFrame(self.dialog, text="Progress")
+        progress_frame.pack(fill="x", padx=20, pady=10)
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="indeterminate")
+        self.progress_bar.pack(fill="x", padx=10, pady=5)
+        
+        self.status_label = ttk.Label(progress_frame, text="Choose a file to export to")
+        self.status_label.pack(anchor="w", padx=10, pady=5)
+        
+        # Buttons frame
+        buttons_frame = ttk.Frame(self.dialog)
+        buttons_frame.pack(fill="x", padx=20, pady=10)
+        
+        self.start_btn = ttk.Button(buttons_frame, text="Start Export", command=self.start_export)
+        self.start_btn.pack(side="left", padx=10)
+        
+        self.stop_btn = ttk.Button(buttons_frame, text="Stop", command=self.cancel_event.set,
+                                   state="disabled")
+        self.stop_btn.pack(side="left", padx=10)
+        
+        close_btn = ttk.Button(buttons_frame, text="Close", command=self.close)
+        close_btn.pack(side="right", padx=10)
+        
+        # The export runs in the background and is stopped when the dialog closes
+        self.tasks = TaskGroup(self.dialog)
+    
+    def update_filter_state(self, event=None):
+        '''Enable the match mode and value only when a field is chosen.'''
+        state = "disabled" if self.field_box.get() == _ALL_RECORDS else "normal"
+        self.match_mode.config(state="readonly" if state == "normal" else state)
+        self.value_entry.config(state=state)
+    
+    def browse(self):
+        '''Let the user pick the file to write.'''
+        fmt = _FORMAT_NAMES[self.format_box.get()]
+        extension = EXPORT_FORMATS[fmt]
+        if self.compress.get() and fmt != "parquet":
+            extension += ".gz"
+        path = filedialog.asksaveasfilename(
+            parent=self.dialog,
+            title="Export records to",
+            defaultextension=extension,
+            filetypes=[(f"{self.format_box.get()} files", f"*{extension}"), ("All files", "*.*")]
+        )
+        if path:
+            self.path_entry.delete(0, tk.END)
+            self.path_entry.insert(0, path)
+    
+    def start_export(self):
+        '''Validate the options and start the export in the background.'''
+        path = self.path_entry.get()
+        if not path:
+            messagebox.showwarning("Input Error", "Please choose a file to export to")
+            return
+        
+        field = self.field_box.get()
+        field = None if field == _ALL_RECORDS else field
+        value = self.value_entry.get().strip()
+        if field and not value:
+            messagebox.showwarning("Input Error", "Please enter a value to filter on")
+            return
+        
+        self.cancel_event.clear()
+        self.report = ExportReport(path)
+        self.start_btn.config(state="disabled")
+        self.stop_btn.config(state="normal")
+        self.progress_bar.start(10)
+        
+        self.tasks.submit(export_patrons, path, _FORMAT_NAMES[self.format_box.get()],
+                          field, value, self.match_mode.get(),
+                          compress=self.compress.get() or None,
+                          cancel_event=self.cancel_event, report=self.report,
+                          on_success=self.on_finished, on_error=self.on_failed)
+        self.poll_progress()
+    
+    def poll_progress(self):
+        '''Refresh the progress display while the export runs.'''
+        if not self.tasks.busy:
+            return
+        self.status_label.config(text=self.report.summary())
+        self.dialog.after(200, self.poll_progress)
+    
+    def on_finished(self, report):
+        '''
+        Show the final result of the export.
+        
+        Args:
+            report (ExportReport): The completed export report
+        '''
+        self.progress_bar.stop()
+        self.start_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+        self.status_label.config(text=report.summary())
+        
+        if report.cancelled:
+            messagebox.showinfo("Export Stopped", "The export was stopped; no file was written")
+        else:
+            messagebox.showinfo("Export Complete", f"{report.summary()}\n\nSaved to {report.path}")
+    
+    def on_failed(self, error):
+        '''
+        Report an export that stopped because of an error.
+        
+        Args:
+            error (Exception): The error that stopped the export
+        '''
+        self.progress_bar.stop()
+        self.start_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+        self.status_label.config(text="Export failed")
+        
+        if isinstance(error, (OSError, ValueError)):
+            messagebox.showerror("Export Error", str(error))
+        else:
+            show_database_error(error)
+    
+    def close(self):
+        '''Stop any running export and close the dialog.'''
+        self.cancel_event.set()
+        self.dialog.destroy()
+    
+    def run(self):
+        '''Run the export dialog.'''
+        self.dialog.grab_set()  # Make this window modal
+        self.dialog.wait_window()  # Wait until this window is closed
+
+def export_records(parent):
+    '''
+    Open the export dialog.
+    
+    Args:
+        parent: Parent tkinter window
+    '''
+    dialog = ExportDialog(parent)
+    dialog.run()
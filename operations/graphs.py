@@ -5,9 +5,18 @@ Provides visualizations for client data.
 
 import tkinter as tk
 from tkinter import ttk
-import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from database.db_config import execute_query
+from services.graphs import (CHART_MODES, HISTOGRAM_BINS, MAX_PIE_SLICES, PERCENTILES,
+                             bucket_percentiles, fetch_graph_data, rebin)
+from widgets import TaskGroup, show_database_error
+
+# Axis label and bar colour per numeric graph type
+_GRAPH_STYLE = {
+    "balance": ("Balance", "green"),
+    "frequency": ("Frequency", "tab:blue")
+}
 
 class GraphDialog:
     '''Dialog window for displaying data visualizations.'''
@@ -21,7 +30,7 @@ class GraphDialog:
         '''
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Client Data Visualization")
-        self.dialog.geometry("800x600")
+        self.dialog.geometry("800x650")
         
         self.create_widgets()
         self.load_data()
@@ -45,99 +54,261 @@ class GraphDialog:
         ]
         
         for i, (text, value) in enumerate(graph_types):
-            ttk.Radiobutton(control_frame, text=text, value=value, 
+            ttk.Radiobutton(control_frame, text=text, value=value,
                            variable=self.graph_type).grid(row=0, column=i+1, padx=10, pady=10)
         
+        # Chart mode options for frequency and balance
+        ttk.Label(control_frame, text="View:").grid(row=1, column=0, padx=10, pady=5)
+        self.mode_box = ttk.Combobox(control_frame, values=CHART_MODES, state="readonly", width=12)
+        self.mode_box.grid(row=1, column=1, padx=10, pady=5)
+        self.mode_box.current(0)
+        
+        ttk.Label(control_frame, text="Bins / N:").grid(row=1, column=2, padx=10, pady=5)
+        self.count_spin = ttk.Spinbox(control_frame, from_=2, to=100, width=6)
+        self.count_spin.grid(row=1, column=3, padx=10, pady=5, sticky="w")
+        self.count_spin.set(HISTOGRAM_BINS)
+        
         # Graph display frame
         self.graph_frame = ttk.LabelFrame(self.dialog, text="Graph")
         self.graph_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
+        # One figure and canvas for the lifetime of the dialog; pyplot is not
+        # used, so figures never end up in its global registry
+        self.figure = Figure(figsize=(8, 5))
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.graph_frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # Artists that can be updated in place on the next redraw
+        self.bars = None
+        self.bars_key = None
+        self.annotations = []
+        
         # Generate button
-        generate_btn = ttk.Button(control_frame, text="Generate Graph", command=self.generate_graph)
+        generate_btn = ttk.Button(control_frame, text="Generate Graph", command=self.load_data)
         generate_btn.grid(row=0, column=len(graph_types)+1, padx=10, pady=10)
         
+        # Loading indicator
+        self.loading_label = ttk.Label(control_frame, text="")
+        self.loading_label.grid(row=1, column=len(graph_types)+1, padx=10, pady=5)
+        
         # Close button
         close_btn = ttk.Button(self.dialog, text="Close", command=self.dialog.destroy)
         close_btn.pack(pady=10)
         
-        # Store data
-        self.client_data = None
+        # Aggregated data of the graph being shown
+        self.chart_type = None
+        self.chart_mode = None
+        self.chart_data = None
+        self.pending = None
+        
+        # Queries run in the background and are cancelled when the dialog closes
+        self.tasks = TaskGroup(self.dialog, busy_label=self.loading_label)
+        
+        self.dialog.bind("<Destroy>", self.on_destroy, add="+")
+    
+    def get_count(self):
+        '''Return the bin count / N from the spinbox, clamped to a sane range.'''
+        try:
+            return min(max(int(self.count_spin.get()), 2), 100)
+        except ValueError:
+            return HISTOGRAM_BINS
     
     def load_data(self):
-        '''Load client data from database.'''
-        query = "SELECT * FROM patron"
-        self.client_data = execute_query(query, fetch=True)
+        '''Run the aggregate queries for the selected graph in the background.'''
+        graph_type = self.graph_type.get()
+        mode = self.mode_box.get()
         
-        # Generate initial graph
-        if self.client_data:
-            self.generate_graph()
-        else:
-            ttk.Label(self.graph_frame, text="No data available").pack(pady=50)
+        self.tasks.cancel(self.pending)
+        self.pending = self.tasks.submit(
+            fetch_graph_data, graph_type, mode, self.get_count(),
+            on_success=lambda result: self.on_data_loaded(graph_type, *result),
+            on_error=show_database_error
+        )
+    
+    def on_data_loaded(self, graph_type, chart_mode, chart_data):
+        '''
+        Store aggregated data and draw the graph.
+        
+        Args:
+            graph_type (str): Graph type the data was loaded for
+            chart_mode (str): Chart mode the data was loaded for
+            chart_data (list): Aggregated rows for the graph
+        '''
+        self.pending = None
+        self.chart_type = graph_type
+        self.chart_mode = chart_mode
+        self.chart_data = chart_data
+        
+        self.generate_graph()
     
     def generate_graph(self):
-        '''Generate and display graph based on selected type.'''
-        if not self.client_data:
-            return
-            
-        # Clear previous graph
-        for widget in self.graph_frame.winfo_children():
-            widget.destroy()
+        '''Draw the loaded data on the persistent figure.'''
+        if not self.chart_data:
+            self.reset_axes()
+            self.ax.set_axis_off()
+            self.ax.text(0.5, 0.5, "No data available", ha="center", va="center",
+                         transform=self.ax.transAxes)
+        elif self.chart_type == "preference":
+            self.draw_preferences()
+        else:
+            label, color = _GRAPH_STYLE[self.chart_type]
+            if self.chart_mode == "Per Client":
+                self.draw_per_client(label, color)
+            elif self.chart_mode in ("Top N", "Bottom N"):
+                self.draw_ranked(label, color)
+            elif self.chart_mode == "Percentiles":
+                self.draw_percentiles(label, color)
+            else:
+                self.draw_histogram(label, color)
         
-        # Create figure and axis
-        fig, ax = plt.subplots(figsize=(8, 5))
+        # Add some padding to prevent label cutoff
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+    
+    def reset_axes(self):
+        '''Remove every artist from the axes before drawing a different chart.'''
+        # Axes.clear() keeps settings such as the equal aspect of a pie
+        # chart, so start from fresh axes on the same figure instead
+        self.figure.clear()
+        self.ax = self.figure.add_subplot()
+        self.bars = None
+        self.bars_key = None
+        self.annotations = []
+    
+    def draw_bars(self, key, positions, values, widths, color, horizontal=False):
+        '''
+        Draw a bar chart, updating the existing bars in place when possible.
         
-        # Extract data based on selected graph type
-        graph_type = self.graph_type.get()
+        Bars are reused when the previous chart had the same kind and number
+        of bars, so a redraw only changes rectangle geometry.
         
-        if graph_type == "frequency":
-            # Frequency graph with discrete x-axis
-            ids = [str(client[0]) for client in self.client_data]  # Convert IDs to strings
-            frequencies = [client[5] for client in self.client_data]
-            
-            ax.bar(ids, frequencies)
-            ax.set_title('Client Visit Frequency')
-            ax.set_xlabel('Client ID')
-            ax.set_ylabel('Frequency')
-            # Set x-axis ticks explicitly
-            ax.set_xticks(range(len(ids)))
-            ax.set_xticklabels(ids)
-            
-        elif graph_type == "balance":
-            # Balance graph with discrete x-axis
-            ids = [str(client[0]) for client in self.client_data]  # Convert IDs to strings
-            balances = [client[2] for client in self.client_data]
-            
-            ax.bar(ids, balances, color='green')
-            ax.set_title('Client Balance')
-            ax.set_xlabel('Client ID')
-            ax.set_ylabel('Balance')
-            # Set x-axis ticks explicitly
-            ax.set_xticks(range(len(ids)))
-            ax.set_xticklabels(ids)
-            
-        elif graph_type == "preference":
-            # Preference distribution
-            preferences = {}
-            for client in self.client_data:
-                pref = client[4]
-                if pref in preferences:
-                    preferences[pref] += 1
+        Args:
+            key (tuple): Identifies the kind of chart the bars belong to
+            positions (sequence): Left edges (or bottom edges if horizontal)
+            values (sequence): Bar heights (or lengths if horizontal)
+            widths (sequence): Bar widths (or thicknesses if horizontal)
+            color (str): Bar colour
+            horizontal (bool): Draw horizontal bars
+        '''
+        key = key + (len(values),)
+        
+        if self.bars is not None and self.bars_key == key:
+            for rect, position, value, width in zip(self.bars, positions, values, widths):
+                if horizontal:
+                    rect.set_y(position)
+                    rect.set_height(width)
+                    rect.set_width(value)
                 else:
-                    preferences[pref] = 1
-            
-            labels = list(preferences.keys())
-            counts = list(preferences.values())
-            
-            ax.pie(counts, labels=labels, autopct='%1.1f%%')
-            ax.set_title('Client Preferences Distribution')
+                    rect.set_x(position)
+                    rect.set_width(width)
+                    rect.set_height(value)
+            self.ax.relim()
+            self.ax.autoscale_view()
+            return
         
-        # Add some padding to prevent label cutoff
-        plt.tight_layout()
+        self.reset_axes()
+        if horizontal:
+            self.bars = self.ax.barh(positions, values, height=widths, align="edge",
+                                     color=color, edgecolor="black")
+        else:
+            self.bars = self.ax.bar(positions, values, width=widths, align="edge",
+                                    color=color, edgecolor="black")
+        self.bars_key = key
+    
+    def draw_preferences(self):
+        '''Draw the preference distribution, merging small groups into "Other".'''
+        labels = [pref for pref, count in self.chart_data[:MAX_PIE_SLICES]]
+        counts = [count for pref, count in self.chart_data[:MAX_PIE_SLICES]]
+        
+        rest = sum(count for pref, count in self.chart_data[MAX_PIE_SLICES:])
+        if rest:
+            labels.append("Other")
+            counts.append(rest)
+        
+        self.reset_axes()
+        self.ax.pie(counts, labels=labels, autopct='%1.1f%%')
+        self.ax.set_title('Client Preferences Distribution')
+    
+    def draw_per_client(self, label, color):
+        '''Draw one bar per client for small data sets.'''
+        ids = [str(client_id) for client_id, value in self.chart_data]
+        values = [value for client_id, value in self.chart_data]
+        positions = np.arange(len(ids)) - 0.4
+        
+        self.draw_bars(("per client", self.chart_type), positions, values,
+                       [0.8] * len(ids), color)
+        self.ax.set_title(f'Client {label}')
+        self.ax.set_xlabel('Client ID')
+        self.ax.set_ylabel(label)
+        self.ax.set_xticks(range(len(ids)))
+        self.ax.set_xticklabels(ids, rotation=90 if len(ids) > 20 else 0)
+    
+    def draw_ranked(self, label, color):
+        '''Draw the top or bottom N clients as horizontal bars.'''
+        names = [f"{name} ({client_id})" for client_id, name, value in self.chart_data]
+        values = [value for client_id, name, value in self.chart_data]
+        positions = np.arange(len(names)) - 0.4
         
-        # Embed in tkinter
-        canvas = FigureCanvasTkAgg(fig, master=self.graph_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # First rank at the top
+        self.draw_bars(("ranked", self.chart_type), positions, values,
+                       [0.8] * len(names), color, horizontal=True)
+        self.ax.set_yticks(range(len(names)))
+        self.ax.set_yticklabels(names)
+        self.ax.set_ylim(len(names) - 0.5, -0.5)
+        
+        direction = "Highest" if self.chart_mode == "Top N" else "Lowest"
+        self.ax.set_title(f'{direction} {len(names)} Clients by {label}')
+        self.ax.set_xlabel(label)
+    
+    def draw_histogram(self, label, color):
+        '''Draw a histogram re-binned from the fine SQL buckets.'''
+        bins = self.get_count()
+        if all(low == high for low, high, count in self.chart_data) and len(self.chart_data) <= bins:
+            # Few distinct values: one bar centred on each value
+            positions = [low - 0.4 for low, high, count in self.chart_data]
+            widths = [0.8] * len(self.chart_data)
+            counts = [count for low, high, count in self.chart_data]
+        else:
+            edges, counts = rebin(self.chart_data, bins)
+            positions, widths = edges[:-1], np.diff(edges)
+        
+        self.draw_bars(("histogram", self.chart_type), positions, counts, widths, color)
+        self.ax.set_title(f'Client {label} Distribution')
+        self.ax.set_xlabel(label)
+        self.ax.set_ylabel('Number of Clients')
+    
+    def draw_percentiles(self, label, color):
+        '''Draw a percentile summary estimated from the fine SQL buckets.'''
+        values = bucket_percentiles(self.chart_data)
+        names = [f"p{p}" for p in PERCENTILES]
+        positions = np.arange(len(names)) - 0.4
+        
+        self.draw_bars(("percentiles", self.chart_type), positions, values,
+                       [0.8] * len(names), color, horizontal=True)
+        self.ax.set_yticks(range(len(names)))
+        self.ax.set_yticklabels(names)
+        
+        # Value labels are replaced rather than accumulated
+        for annotation in self.annotations:
+            annotation.remove()
+        self.annotations = [
+            self.ax.annotate(f"{value:,.2f}", (value, i), xytext=(3, 0),
+                             textcoords="offset points", va="center")
+            for i, value in enumerate(values)
+        ]
+        
+        total = sum(count for low, high, count in self.chart_data)
+        self.ax.set_title(f'Client {label} Percentiles (n={total:,})')
+        self.ax.set_xlabel(label)
+    
+    def on_destroy(self, event):
+        '''Release the figure as soon as the dialog is closed.'''
+        if event.widget is not self.dialog:
+            return
+        self.figure.clear()
+        self.bars = None
+        self.annotations = []
     
     def run(self):
         '''Run the graph dialog.'''
@@ -152,4 +323,4 @@ def show_graphs(parent):
         parent: Parent tkinter window
     '''
     dialog = GraphDialog(parent)
-    dialog.run()
\ No newline at end of file
+    dialog.run()
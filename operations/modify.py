@@ -1,11 +1,17 @@
 '''
 Modify operation module for Client Management System.
 Handles modification of client records.
+
+Only the fields that differ from the record as loaded are saved, and the
+save is refused if another user changed the client in the meantime.
 '''
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database.db_config import execute_query
+from database.patron import PATRON_FIELDS
+from services.records import (UpdateConflictError, changed_fields, get_patron_for_update,
+                              parse_updates, update_patron)
+from widgets import TaskGroup, show_database_error
 
 class ModifyDialog:
     '''Dialog window for modifying client records.'''
@@ -37,6 +43,10 @@ class ModifyDialog:
         find_btn = ttk.Button(search_frame, text="Find Client", command=self.find_client)
         find_btn.grid(row=0, column=2, padx=10, pady=10)
         
+        # Loading indicator
+        self.loading_label = ttk.Label(search_frame, text="")
+        self.loading_label.grid(row=0, column=3, padx=10, pady=10)
+        
         # Modification frame
         self.modify_frame = ttk.LabelFrame(self.dialog, text="Modify Client Details")
         self.modify_frame.pack(fill="both", expand=True, padx=20, pady=10)
@@ -74,45 +84,77 @@ class ModifyDialog:
         cancel_btn = ttk.Button(buttons_frame, text="Cancel", command=self.dialog.destroy)
         cancel_btn.pack(side="right", padx=10)
         
-        # Store client ID
+        # Store client ID, and the record and row version as loaded
         self.current_client_id = None
+        self.original = None
+        self.version = None
+        
+        # Lookup in flight; a new lookup supersedes it
+        self.pending = None
+        
+        # Queries run in the background and are cancelled when the dialog closes
+        self.tasks = TaskGroup(self.dialog, busy_label=self.loading_label)
     
     def find_client(self):
         '''Find and load client record for modification.'''
         try:
             client_id = int(self.id_entry.get())
             
-            # Query the database
-            query = "SELECT * FROM patron WHERE PAT_ID = %s"
-            result = execute_query(query, (client_id,), fetch=True)
-            
-            if not result:
-                messagebox.showinfo("Not Found", f"No client found with ID: {client_id}")
-                return
-            
-            # Store client ID and populate fields
-            self.current_client_id = client_id
-            client_data = result[0]
-            
-            # Enable and populate fields
-            field_mapping = {
-                "name": 1,  # Index of PAT_NAME in query result
-                "balance": 2,  # Index of PAT_BALANCE in query result
-                "contact": 3,  # Index of PAT_CONTACT in query result
-                "preference": 4,  # Index of PAT_PREFERENCE in query result
-                "frequency": 5   # Index of PAT_FREQUENCY in query result
-            }
-            
-            for field_key, data_index in field_mapping.items():
-                self.entries[field_key].config(state="normal")
-                self.entries[field_key].delete(0, tk.END)
-                self.entries[field_key].insert(0, client_data[data_index])
+            # Look the client up in the background, with its row version;
+            # an earlier lookup still running is dropped so it cannot load
+            # another client's row and version over this one
+            self.tasks.cancel(self.pending)
+            self.pending = self.tasks.submit(
+                get_patron_for_update, client_id,
+                on_success=lambda result: self.show_client(client_id, result),
+                on_error=show_database_error)
         
         except ValueError:
             messagebox.showerror("Input Error", "Please enter a valid client ID")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def show_client(self, client_id, result):
+        '''
+        Populate the modification fields with a loaded client record.
+        
+        Args:
+            client_id (int): ID that was looked up
+            result (tuple): (patron row, row version), or None if the ID does not exist
+        '''
+        self.pending = None
+        if result is None:
+            messagebox.showinfo("Not Found", f"No client found with ID: {client_id}")
+            return
+        
+        # Store client ID, row and version, and populate fields
+        self.current_client_id = client_id
+        self.original, self.version = result
+        self.fill_fields(self.original)
+    
+    def fill_fields(self, client_data, keep=()):
+        '''
+        Enable the modification fields and fill them from a client record.
+        
+        Args:
+            client_data (tuple): Patron row
+            keep (iterable): Fields whose entry is left as it is
+        '''
+        field_mapping = {
+            "name": 1,  # Index of PAT_NAME in query result
+            "balance": 2,  # Index of PAT_BALANCE in query result
+            "contact": 3,  # Index of PAT_CONTACT in query result
+            "preference": 4,  # Index of PAT_PREFERENCE in query result
+            "frequency": 5   # Index of PAT_FREQUENCY in query result
+        }
+        
+        for field_key, data_index in field_mapping.items():
+            self.entries[field_key].config(state="normal")
+            if field_key in keep:
+                continue
+            self.entries[field_key].delete(0, tk.END)
+            self.entries[field_key].insert(0, client_data[data_index])
+    
     def save_changes(self):
         '''Save modified client record to database.'''
         if not self.current_client_id:
@@ -120,57 +162,70 @@ class ModifyDialog:
             return
         
         try:
-            # Get updated values
-            updates = {}
-            conversion_funcs = {
-                "name": str,
-                "balance": float,
-                "contact": int,
-                "preference": str,
-                "frequency": int
-            }
-            
-            for field, entry in self.entries.items():
-                value = entry.get()
-                if value:  # Only update non-empty fields
-                    updates[field] = conversion_funcs[field](value)
-            
-            if not updates:
+            # Get updated values; only fields changed since loading are updated
+            values = {field: entry.get() for field, entry in self.entries.items()}
+            if not changed_fields(parse_updates(values), self.original):
                 messagebox.showinfo("No Changes", "No fields were modified")
                 return
             
-            # Build update query
-            field_mapping = {
-                "name": "PAT_NAME",
-                "balance": "PAT_BALANCE",
-                "contact": "PAT_CONTACT",
-                "preference": "PAT_PREFERENCE",
-                "frequency": "PAT_FREQUENCY"
-            }
-            
-            set_clauses = []
-            params = []
-            
-            for field, value in updates.items():
-                set_clauses.append(f"{field_mapping[field]} = %s")
-                params.append(value)
-            
-            # Add client ID to params
-            params.append(self.current_client_id)
-            
-            query = f"UPDATE patron SET {', '.join(set_clauses)} WHERE PAT_ID = %s"
-            
-            # Execute update
-            execute_query(query, params, commit=True)
-            
-            messagebox.showinfo("Success", "Client record updated successfully")
-            self.dialog.destroy()
+            # Execute update in the background
+            self.tasks.submit(update_patron, self.current_client_id, values, self.original,
+                              self.version, on_success=self.on_saved,
+                              on_error=self.on_save_failed)
         
         except ValueError as ve:
             messagebox.showerror("Input Error", "Please check the input values: " + str(ve))
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def on_saved(self, rowcount):
+        '''
+        Confirm a completed update and close the dialog.
+        
+        Args:
+            rowcount (int): Number of rows affected by the update
+        '''
+        messagebox.showinfo("Success", "Client record updated successfully")
+        self.dialog.destroy()
+    
+    def on_save_failed(self, error):
+        '''
+        Report an update that was not saved.
+        
+        When another user changed the client since it was loaded, their
+        values are loaded into the fields this user did not edit, so the
+        edits can be checked and saved again.
+        
+        Args:
+            error (Exception): The error that stopped the update
+        '''
+        if isinstance(error, ValueError):
+            messagebox.showerror("Input Error", "Please check the input values: " + str(error))
+            return
+        if not isinstance(error, UpdateConflictError):
+            show_database_error(error)
+            return
+        
+        if error.current is None:
+            messagebox.showerror("Update Conflict",
+                                 f"{error}. Your changes were not saved.")
+            self.dialog.destroy()
+            return
+        
+        row, version = error.current
+        edited = [field for field, entry in self.entries.items()
+                  if changed_fields(parse_updates({field: entry.get()}), self.original)]
+        others = [self.fields[field] for field in self.fields
+                  if changed_fields({field: row[PATRON_FIELDS.index(field)]}, self.original)]
+        self.fill_fields(row, keep=edited)
+        self.original, self.version = row, version
+        
+        messagebox.showwarning("Update Conflict",
+                               f"{error} since it was loaded "
+                               f"({', '.join(others) or 'no visible fields'}). "
+                               "Their values are now shown, except in the fields you "
+                               "edited. Your changes were not saved; check them and save again.")
+    
     def run(self):
         '''Run the modify dialog.'''
         self.dialog.grab_set()  # Make this window modal
@@ -5,7 +5,13 @@ Handles the search functionality for client records.
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database.db_config import execute_query
+from database.search_index import MATCH_MODES, SEARCH_CONFIG, refine_results, refines
+from services.records import find_patrons, get_patron
+from operations.display import RECORD_COLUMNS, RECORD_COLUMN_WIDTHS
+from widgets import VirtualGrid, ListRowSource, TaskGroup, show_database_error
+
+# Milliseconds to wait after the last keystroke before searching
+SEARCH_DEBOUNCE_MS = 250
 
 class SearchDialog:
     '''Dialog window for searching client records.'''
@@ -19,7 +25,7 @@ class SearchDialog:
         '''
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Search Client Records")
-        self.dialog.geometry("600x500")
+        self.dialog.geometry("600x540")
         self.dialog.resizable(False, False)
         
         self.create_widgets()
@@ -41,75 +47,150 @@ class SearchDialog:
         self.search_value = ttk.Entry(search_frame, width=30)
         self.search_value.grid(row=1, column=1, padx=5, pady=5)
         
+        # Search as the user types
+        self.search_value.bind("<KeyRelease>", self.schedule_search)
+        self.search_by.bind("<<ComboboxSelected>>", self.schedule_search)
+        
+        # Match mode for name and preference searches
+        ttk.Label(search_frame, text="Match:").grid(row=2, column=0, padx=5, pady=5)
+        self.match_mode = ttk.Combobox(search_frame, values=MATCH_MODES, state="readonly")
+        self.match_mode.grid(row=2, column=1, padx=5, pady=5)
+        self.match_mode.current(0)  # Default to substring match
+        self.match_mode.bind("<<ComboboxSelected>>", self.schedule_search)
+        
         # Search button
         search_btn = ttk.Button(search_frame, text="Search", command=self.perform_search)
         search_btn.grid(row=1, column=2, padx=10, pady=5)
         
-        # Results frame
-        results_frame = ttk.LabelFrame(self.dialog, text="Search Results")
-        results_frame.pack(fill="both", expand=True, padx=20, pady=10)
-        
-        # Treeview for results
-        columns = ("ID", "Name", "Balance", "Contact", "Preference", "Frequency")
-        self.tree = ttk.Treeview(results_frame, columns=columns, show="headings")
-        
-        # Set column headings
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=80)
+        # Loading indicator
+        self.loading_label = ttk.Label(search_frame, text="")
+        self.loading_label.grid(row=0, column=2, padx=10, pady=5)
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        # Results frame
+        self.results_frame = ttk.LabelFrame(self.dialog, text="Search Results")
+        self.results_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
-        # Pack tree and scrollbar
-        scrollbar.pack(side="right", fill="y")
-        self.tree.pack(side="left", fill="both", expand=True)
+        # Virtual grid for results; only the visible rows are materialized
+        self.results_grid = VirtualGrid(self.results_frame, RECORD_COLUMNS,
+                                        widths=RECORD_COLUMN_WIDTHS,
+                                        empty_text="")
+        self.results_grid.pack(fill="both", expand=True)
         
         # Close button
         close_btn = ttk.Button(self.dialog, text="Close", command=self.dialog.destroy)
         close_btn.pack(pady=10)
+        
+        # Queries run in the background and are cancelled when the dialog closes
+        self.tasks = TaskGroup(self.dialog, busy_label=self.loading_label)
+        self.pending = None
+        self.debounce_id = None
+        
+        # Criteria and rows of the last completed search, reused when the
+        # value is refined: (search type, match mode, value, rows)
+        self.last_search = None
+    
+    def schedule_search(self, event=None):
+        '''
+        Search once the user has stopped typing for SEARCH_DEBOUNCE_MS.
+        
+        Args:
+            event (optional): Tkinter event that triggered the search
+        '''
+        if self.debounce_id is not None:
+            self.dialog.after_cancel(self.debounce_id)
+        self.debounce_id = self.dialog.after(SEARCH_DEBOUNCE_MS,
+                                             lambda: self.perform_search(live=True))
     
-    def perform_search(self):
-        '''Execute search based on selected criteria and value.'''
+    def perform_search(self, live=False):
+        '''
+        Execute search based on selected criteria and value.
+        
+        Args:
+            live (bool): Whether the search was triggered by typing; live
+                searches do not show message boxes
+        '''
+        if self.debounce_id is not None:
+            self.dialog.after_cancel(self.debounce_id)
+            self.debounce_id = None
+        
         search_type = self.search_by.get()
         search_val = self.search_value.get()
+        mode = self.match_mode.get()
+        
+        # Any earlier search is superseded; its results are dropped
+        self.tasks.cancel(self.pending)
+        self.pending = None
         
         if not search_val:
-            messagebox.showwarning("Input Error", "Please enter a search value")
+            self.results_grid.set_source(ListRowSource())
+            self.results_frame.config(text="Search Results")
+            if not live:
+                messagebox.showwarning("Input Error", "Please enter a search value")
             return
         
-        # Clear previous results
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         try:
-            # Build query based on search type
+            # ID lookups go through the patron cache
             if search_type == "ID":
-                query = "SELECT * FROM patron WHERE PAT_ID = %s"
-                params = (int(search_val),)
-            elif search_type == "Name":
-                query = "SELECT * FROM patron WHERE PAT_NAME LIKE %s"
-                params = (f"%{search_val}%",)
-            elif search_type == "Preference":
-                query = "SELECT * FROM patron WHERE PAT_PREFERENCE LIKE %s"
-                params = (f"%{search_val}%",)
+                self.pending = self.tasks.submit(
+                    get_patron, int(search_val),
+                    on_success=lambda row: self.show_results([row] if row else [], live=live),
+                    on_error=show_database_error
+                )
+                return
             
-            # Execute search
-            results = execute_query(query, params, fetch=True)
+            # While typing, a longer value only narrows the previous complete
+            # result set, so filter it in place instead of querying again
+            if live and self.last_search is not None:
+                last_type, last_mode, last_val, last_rows = self.last_search
+                if (last_type == search_type and last_mode == mode
+                        and len(last_rows) < SEARCH_CONFIG['limit']
+                        and refines(last_val, search_val, mode)):
+                    rows = refine_results(last_rows, search_type, search_val, mode)
+                    self.show_results(rows, live=live, criteria=(search_type, mode, search_val))
+                    return
             
-            # Display results
-            if not results:
-                messagebox.showinfo("Search Results", "No matching records found")
-            else:
-                for row in results:
-                    self.tree.insert("", "end", values=row)
+            # Name and preference searches use the search indexes; prefix
+            # matches go to the column index, substrings to the trigram index
+            criteria = (search_type, mode, search_val)
+            self.pending = self.tasks.submit(
+                find_patrons, search_type, search_val, mode,
+                on_success=lambda rows: self.show_results(rows, live=live, criteria=criteria),
+                on_error=show_database_error
+            )
         
         except ValueError:
-            messagebox.showerror("Input Error", "Please enter a valid ID number")
+            self.results_grid.set_source(ListRowSource())
+            if live:
+                self.results_frame.config(text="Search Results (invalid ID)")
+            else:
+                messagebox.showerror("Input Error", "Please enter a valid ID number")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
     
+    def show_results(self, results, live=False, criteria=None):
+        '''
+        Display search results in the results grid.
+        
+        Args:
+            results (list): Matching patron records
+            live (bool): Whether the search was triggered by typing
+            criteria (tuple, optional): Search type, match mode and value of a
+                name or preference search, kept for later refinement
+        '''
+        self.pending = None
+        self.last_search = criteria + (results,) if criteria else None
+        
+        self.results_grid.set_source(ListRowSource(results))
+        if not results:
+            self.results_frame.config(text="Search Results (no matches)")
+            if not live:
+                messagebox.showinfo("Search Results", "No matching records found")
+        elif len(results) >= SEARCH_CONFIG['limit']:
+            # Results are capped; tell the user when there may be more
+            self.results_frame.config(text=f"Search Results (best {len(results)} matches)")
+        else:
+            self.results_frame.config(text=f"Search Results ({len(results)})")
+    
     def run(self):
         '''Run the search dialog.'''
         self.dialog.grab_set()  # Make this window modal
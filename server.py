@@ -0,0 +1,651 @@
+'''
+Client Management System
+HTTP service entry point for kiosks, web front-ends and scripts.
+
+Serves the patron operations as JSON over HTTP/1.1, so several front-ends
+share one process and one connection pool. Requests are handled on an
+asyncio event loop; the database calls themselves run on the shared query
+executor, whose workers match the pool size. Large results are streamed
+in batches with chunked transfer encoding.
+
+Endpoints:
+    GET    /patrons?after=ID&before=ID&limit=N   One page of clients
+    GET    /patrons.jsonl                         Every client, as JSON Lines
+    GET    /patrons/ID                            One client; the ETag is its row version
+    GET    /search?field=name&value=ann&prefix=1  Search by name or preference
+    POST   /patrons                               Add a client from a JSON object
+    PATCH  /patrons/ID                            Update fields; If-Match checks the version
+    DELETE /patrons/ID                            Delete a client
+    GET    /aggregates/TYPE?mode=Auto&n=10        Chart aggregates for TYPE
+    GET    /health                                Pool, cache and write queue counters
+
+Examples:
+    python3 server.py --port 8080
+    curl localhost:8080/patrons/42
+    curl -X PATCH -H 'If-Match: "3"' -d '{"balance": 120.5}' localhost:8080/patrons/42
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import sys
+import traceback
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from database import db_config
+from database.cache import get_cache_stats
+from database.db_config import close_pool, get_pool_stats
+from database.executor import get_executor, shutdown_executor
+from database.patron import PATRON_COLUMNS
+from database.pool import PoolTimeoutError
+from database.search_index import MATCH_CONTAINS, MATCH_PREFIX
+from database.write_behind import write_queue
+from services.records import (PAGE_SIZE, STREAM_BATCH_SIZE, DuplicateClientError,
+                              UpdateConflictError, add_patron, delete_patron, fetch_page,
+                              find_patrons, get_patron_for_update, update_patron)
+from services.purge import purger
+
+# Server configuration using environment variables
+SERVER_CONFIG = {
+    'host': os.getenv('SERVER_HOST', '127.0.0.1'),
+    'port': int(os.getenv('SERVER_PORT', '8080')),
+    'max_body': int(os.getenv('SERVER_MAX_BODY', '1048576')),
+    'keepalive': float(os.getenv('SERVER_KEEPALIVE', '15'))
+}
+
+# Largest page or search result returned in one response
+MAX_PAGE_SIZE = 1000
+
+# Graph types served by /aggregates
+AGGREGATE_TYPES = ("preference", "balance", "frequency")
+
+# Searchable fields, as given in the query string
+SEARCH_FIELDS = ("name", "preference")
+
+# Most header lines read per request
+MAX_HEADERS = 100
+
+class HTTPError(Exception):
+    '''Raised by a handler to answer with an error status.'''
+    
+    def __init__(self, status, message, body=None, headers=None):
+        '''
+        Initialize the error.
+        
+        Args:
+            status (HTTPStatus): Response status
+            message (str): Error message for the client
+            body (dict, optional): Extra JSON fields for the response
+            headers (dict, optional): Extra response headers
+        '''
+        super().__init__(message)
+        self.status = status
+        self.body = body or {}
+        self.headers = headers or {}
+
+class Request:
+    '''One parsed HTTP request.'''
+    
+    def __init__(self, method, target, version, headers, body=b""):
+        '''
+        Initialize the request.
+        
+        Args:
+            method (str): Request method
+            target (str): Path and query string
+            version (str): "HTTP/1.0" or "HTTP/1.1"
+            headers (dict): Lower-case header name -> value
+            body (bytes): Request body
+        '''
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.params = {}
+    
+    @property
+    def keep_alive(self):
+        '''Whether the connection stays open after the response.'''
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+    
+    def json(self):
+        '''
+        Decode the body as a JSON object.
+        
+        Returns:
+            dict: The decoded object
+        
+        Raises:
+            HTTPError: If the body is not a JSON object
+        '''
+        try:
+            value = json.loads(self.body or b"null")
+        except ValueError as err:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON body: {err}") from None
+        if not isinstance(value, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "The body must be a JSON object")
+        return value
+    
+    def int_param(self, name, default=None, minimum=None, maximum=None):
+        '''
+        Read an integer from the query string.
+        
+        Args:
+            name (str): Parameter name
+            default (int, optional): Value when the parameter is missing
+            minimum (int, optional): Smallest accepted value
+            maximum (int, optional): Values above this are lowered to it
+        
+        Returns:
+            int: The value, or ``default``
+        
+        Raises:
+            HTTPError: If the value is not an integer or is below ``minimum``
+        '''
+        if name not in self.query:
+            return default
+        try:
+            value = int(self.query[name])
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer") from None
+        if minimum is not None and value < minimum:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be at least {minimum}")
+        return value if maximum is None else min(value, maximum)
+
+class Response:
+    '''A response with a JSON body, or a body streamed in chunks.'''
+    
+    def __init__(self, status=HTTPStatus.OK, body=None, headers=None, stream=None,
+                 content_type="application/json"):
+        '''
+        Initialize the response.
+        
+        Args:
+            status (HTTPStatus): Response status
+            body (object, optional): Value sent as JSON
+            headers (dict, optional): Extra response headers
+            stream (async iterator, optional): Chunks of bytes sent instead of ``body``
+            content_type (str): Content type of the body
+        '''
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.stream = stream
+        self.content_type = content_type
+
+def _json_default(value):
+    '''Convert the NumPy values in chart aggregates for JSON.'''
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+def _encode(value):
+    '''Encode a value as a JSON body.'''
+    return json.dumps(value, default=_json_default).encode("utf-8")
+
+def _record(row):
+    '''Return a patron row as a JSON object.'''
+    return dict(zip(PATRON_COLUMNS, row))
+
+async def run_blocking(fn, *args, **kwargs):
+    '''
+    Run a database call on the query executor and wait for it.
+    
+    Args:
+        fn (callable): Function to run
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+    
+    Returns:
+        object: The function's result
+    '''
+    return await asyncio.wrap_future(get_executor().submit(fn, *args, **kwargs))
+
+async def list_patrons(request):
+    '''Return one page of clients in PAT_ID order.'''
+    after_id = request.int_param("after")
+    before_id = request.int_param("before")
+    limit = request.int_param("limit", PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    records, has_more = await run_blocking(fetch_page, after_id, before_id, limit)
+    return Response(body={
+        "records": [_record(row) for row in records],
+        "has_more": has_more,
+        "next_after": records[-1][0] if records else None
+    })
+
+async def stream_patrons(request):
+    '''Stream every client as JSON Lines, one batch per query.'''
+    batch_size = request.int_param("batch_size", STREAM_BATCH_SIZE, minimum=1,
+                                   maximum=MAX_PAGE_SIZE * 10)
+    
+    async def batches():
+        after_id = None
+        while True:
+            records, has_more = await run_blocking(fetch_page, after_id=after_id,
+                                                   limit=batch_size)
+            if records:
+                yield b"".join(_encode(_record(row)) + b"\n" for row in records)
+            if not has_more:
+                return
+            after_id = records[-1][0]
+    
+    return Response(stream=batches(), content_type="application/x-ndjson")
+
+async def get_client(request):
+    '''Return one client, with its row version as the ETag.'''
+    result = await run_blocking(get_patron_for_update, request.params["id"])
+    if result is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No client found with ID: {request.params['id']}")
+    row, version = result
+    return Response(body=_record(row), headers={"ETag": f'"{version}"'})
+
+async def search_clients(request):
+    '''Return the clients whose name or preference matches.'''
+    field = request.query.get("field", "name").lower()
+    if field not in SEARCH_FIELDS:
+        raise HTTPError(HTTPStatus.BAD_REQUEST,
+                        f"field must be one of {', '.join(SEARCH_FIELDS)}")
+    value = request.query.get("value", "")
+    if not value:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "value is required")
+    mode = MATCH_PREFIX if request.query.get("prefix") in ("1", "true", "yes") else MATCH_CONTAINS
+    limit = request.int_param("limit", PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    rows = await run_blocking(find_patrons, field.capitalize(), value, mode, limit)
+    return Response(body={"records": [_record(row) for row in rows]})
+
+async def create_client(request):
+    '''Add a client from a JSON object of patron fields.'''
+    values = request.json()
+    try:
+        await run_blocking(add_patron, values)
+    except DuplicateClientError as err:
+        raise HTTPError(HTTPStatus.CONFLICT, str(err)) from None
+    pat_id = _client_id(values["id"])
+    return Response(HTTPStatus.CREATED, {"id": pat_id},
+                    headers={"Location": f"/patrons/{pat_id}"})
+
+def _client_id(value):
+    '''Convert a client ID from a request body.'''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid value for id: {value!r}") from None
+
+def _if_match_version(request):
+    '''
+    Read the row version from the If-Match header.
+    
+    Returns:
+        int: The version, or None without an If-Match header
+    '''
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    tag = header.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid If-Match version: {header}") from None
+
+async def update_client(request):
+    '''
+    Update fields of one client.
+    
+    With an If-Match header only the fields that differ from the stored
+    client are written, and only if its row version still matches.
+    '''
+    pat_id = request.params["id"]
+    values = request.json()
+    values.pop("id", None)
+    version = _if_match_version(request)
+    
+    original = None
+    if version is not None:
+        current = await run_blocking(get_patron_for_update, pat_id)
+        if current is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No client found with ID: {pat_id}")
+        if current[1] != version:
+            raise UpdateConflictError(pat_id, current)
+        original = current[0]
+    
+    if not await run_blocking(update_patron, pat_id, values, original, version):
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No client found with ID: {pat_id}")
+    return Response(HTTPStatus.NO_CONTENT)
+
+async def delete_client(request):
+    '''Delete one client.'''
+    pat_id = request.params["id"]
+    if not await run_blocking(delete_patron, pat_id):
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No client found with ID: {pat_id}")
+    return Response(HTTPStatus.NO_CONTENT)
+
+async def aggregates(request):
+    '''Return the aggregates behind one chart.'''
+    # Imported here so a server that never draws charts does not load NumPy
+    from services.graphs import CHART_MODES, GRAPH_SOURCE, TOP_N, fetch_graph_data
+    from database.snapshot import patron_snapshot
+    
+    graph_type = request.params["type"]
+    if graph_type not in AGGREGATE_TYPES:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown graph type: {graph_type}")
+    mode = request.query.get("mode", "Auto")
+    if mode not in CHART_MODES:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"mode must be one of {', '.join(CHART_MODES)}")
+    n = request.int_param("n", TOP_N, minimum=1, maximum=MAX_PAGE_SIZE)
+    
+    def compute():
+        if GRAPH_SOURCE == "snapshot":
+            patron_snapshot.sync(wait=True)
+        return fetch_graph_data(graph_type, mode, n)
+    
+    mode, data = await run_blocking(compute)
+    return Response(body={"mode": mode, "data": data})
+
+async def health(request):
+    '''Return the connection pool, cache and write queue counters.'''
+    return Response(body={
+        "status": "ok",
+        "pool": get_pool_stats(),
+        "cache": get_cache_stats(),
+        "write_queue": write_queue.status() if write_queue.enabled else None
+    })
+
+# (method, path pattern, handler); named groups are passed in request.params
+ROUTES = [
+    ("GET", r"/patrons", list_patrons),
+    ("GET", r"/patrons\.jsonl", stream_patrons),
+    ("POST", r"/patrons", create_client),
+    ("GET", r"/patrons/(?P<id>-?\d+)", get_client),
+    ("PATCH", r"/patrons/(?P<id>-?\d+)", update_client),
+    ("PUT", r"/patrons/(?P<id>-?\d+)", update_client),
+    ("DELETE", r"/patrons/(?P<id>-?\d+)", delete_client),
+    ("GET", r"/search", search_clients),
+    ("GET", r"/aggregates/(?P<type>\w+)", aggregates),
+    ("GET", r"/health", health)
+]
+_ROUTES = [(method, re.compile(pattern + r"/?"), handler) for method, pattern, handler in ROUTES]
+
+async def dispatch(request):
+    '''
+    Route a request to its handler and turn errors into responses.
+    
+    Args:
+        request (Request): The parsed request
+    
+    Returns:
+        Response: The response to send
+    '''
+    method = "GET" if request.method == "HEAD" else request.method
+    allowed = []
+    for route_method, pattern, handler in _ROUTES:
+        match = pattern.fullmatch(request.path)
+        if match is None:
+            continue
+        if route_method != method:
+            allowed.append(route_method)
+            continue
+        request.params = {name: int(value) if name == "id" else value
+                          for name, value in match.groupdict().items()}
+        break
+    else:
+        if allowed:
+            return _error(HTTPStatus.METHOD_NOT_ALLOWED, f"Method {request.method} not allowed",
+                          headers={"Allow": ", ".join(allowed)})
+        return _error(HTTPStatus.NOT_FOUND, f"No such resource: {request.path}")
+    
+    try:
+        return await handler(request)
+    except HTTPError as err:
+        return _error(err.status, str(err), err.body, err.headers)
+    except UpdateConflictError as err:
+        body = None
+        headers = None
+        if err.current is not None:
+            body = {"current": _record(err.current[0])}
+            headers = {"ETag": f'"{err.current[1]}"'}
+        status = HTTPStatus.PRECONDITION_FAILED if err.current else HTTPStatus.NOT_FOUND
+        return _error(status, str(err), body, headers)
+    except ValueError as err:
+        return _error(HTTPStatus.BAD_REQUEST, str(err))
+    except PoolTimeoutError as err:
+        return _error(HTTPStatus.SERVICE_UNAVAILABLE, str(err), headers={"Retry-After": "1"})
+    except db_config.DatabaseError as err:
+        return _error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Database error: {err}")
+    except Exception:
+        traceback.print_exc()
+        return _error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
+
+def _error(status, message, body=None, headers=None):
+    '''Return an error response with a JSON body.'''
+    return Response(status, {"error": message, **(body or {})}, headers)
+
+async def read_request(reader, max_body):
+    '''
+    Read one request from a connection.
+    
+    Args:
+        reader (asyncio.StreamReader): The connection
+        max_body (int): Largest request body accepted, in bytes
+    
+    Returns:
+        Request: The request, or None if the client closed the connection
+    
+    Raises:
+        HTTPError: If the request is malformed or too large
+    '''
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+    if version not in ("HTTP/1.0", "HTTP/1.1"):
+        raise HTTPError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED, f"Unsupported version {version}")
+    
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n"):
+            break
+        if not line:
+            return None
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+    
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+    if length > max_body:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        f"Request body larger than {max_body} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return Request(method.upper(), target, version, headers, body)
+
+async def write_response(writer, response, keep_alive, head=False):
+    '''
+    Send a response, streaming its chunks as they are produced.
+    
+    Args:
+        writer (asyncio.StreamWriter): The connection
+        response (Response): Response to send
+        keep_alive (bool): Whether the connection stays open
+        head (bool): Send the headers only, for a HEAD request
+    '''
+    status = HTTPStatus(response.status)
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines += [f"{name}: {value}" for name, value in response.headers.items()]
+    
+    if response.stream is not None:
+        lines += [f"Content-Type: {response.content_type}", "Transfer-Encoding: chunked"]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if head:
+            writer.write(b"0\r\n\r\n")
+            return
+        # Each chunk waits for the client to catch up, so a slow reader
+        # holds back the queries instead of filling memory
+        async for chunk in response.stream:
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return
+    
+    body = b"" if response.body is None else _encode(response.body)
+    if response.body is not None:
+        lines.append(f"Content-Type: {response.content_type}")
+    if status != HTTPStatus.NO_CONTENT:
+        lines.append(f"Content-Length: {len(body)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if not head:
+        writer.write(body)
+    await writer.drain()
+
+async def handle_connection(reader, writer):
+    '''
+    Serve requests on one connection until it is closed or idle too long.
+    
+    Args:
+        reader (asyncio.StreamReader): Incoming side of the connection
+        writer (asyncio.StreamWriter): Outgoing side of the connection
+    '''
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(
+                    read_request(reader, SERVER_CONFIG['max_body']), SERVER_CONFIG['keepalive'])
+            except HTTPError as err:
+                await write_response(writer, _error(err.status, str(err)), keep_alive=False)
+                break
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                    ValueError):
+                break
+            if request is None:
+                break
+            
+            response = await dispatch(request)
+            try:
+                await write_response(writer, response, request.keep_alive,
+                                     head=request.method == "HEAD")
+            except Exception as err:
+                # The status line is already sent; closing without the final
+                # chunk tells the client the response is incomplete
+                if not isinstance(err, ConnectionError):
+                    traceback.print_exc()
+                break
+            if not request.keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled at shutdown: the transport is already closing
+            pass
+
+async def serve(host, port, on_ready=None):
+    '''
+    Run the HTTP service until SIGINT or SIGTERM.
+    
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on; 0 picks a free port
+        on_ready (callable, optional): Called with the bound (host, port)
+    '''
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    
+    # Handler tasks of the open connections, cancelled on stop so idle
+    # keep-alive connections do not hold up the shutdown
+    connections = set()
+    
+    async def on_connection(reader, writer):
+        task = asyncio.current_task()
+        connections.add(task)
+        try:
+            await handle_connection(reader, writer)
+        except asyncio.CancelledError:
+            # End normally: asyncio logs a traceback for a cancelled handler,
+            # and handle_connection has already closed the connection
+            pass
+        finally:
+            connections.discard(task)
+    
+    server = await asyncio.start_server(on_connection, host, port)
+    address = server.sockets[0].getsockname()[:2]
+    print(f"Serving on http://{address[0]}:{address[1]}", file=sys.stderr)
+    if on_ready is not None:
+        on_ready(address)
+    async with server:
+        try:
+            await stop.wait()
+            print("Stopping", file=sys.stderr)
+        finally:
+            # Also when serve itself is cancelled, e.g. by Ctrl+C on Windows
+            server.close()
+            for task in list(connections):
+                task.cancel()
+            await asyncio.gather(*connections, return_exceptions=True)
+
+def main(argv=None):
+    '''
+    Start the HTTP service.
+    
+    Args:
+        argv (list, optional): Arguments; defaults to sys.argv[1:]
+    
+    Returns:
+        int: Process exit status
+    '''
+    parser = argparse.ArgumentParser(description="Serve the client records over HTTP")
+    parser.add_argument("--host", default=SERVER_CONFIG['host'],
+                        help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=SERVER_CONFIG['port'],
+                        help="port to listen on (default: %(default)s)")
+    args = parser.parse_args(argv)
+    
+    # Remove deleted clients and send queued writes in the background
+    purger.start()
+    if write_queue.enabled:
+        write_queue.start()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        left = write_queue.close()
+        if left:
+            print(f"{left} queued writes kept in {write_queue.spool_path}", file=sys.stderr)
+        purger.stop(timeout=5)
+        shutdown_executor()
+        close_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
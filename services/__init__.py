@@ -0,0 +1,18 @@
+'''
+Services package initialization.
+Import the UI-free record and import operations to make them accessible from the services package.
+
+Graph aggregates live in services.graphs and are imported on demand, since
+they load NumPy.
+'''
+
+from services.records import (
+    count_patrons,
+    iter_patrons,
+    get_patron,
+    find_patrons,
+    add_patron,
+    update_patron,
+    delete_patron
+)
+from services.bulk_import import ImportReport, import_patrons
@@ -0,0 +1,285 @@
+'''
+Bulk import service module for the Client Management System.
+Streams client records from CSV and JSON Lines files into the database in
+batched transactions, without any user interface code.
+'''
+
+import csv
+import json
+import os
+import time
+from database.cache import notify_patron_write
+from database import db_config
+from database.db_config import get_pool
+from database.instrumentation import query_stats
+from database.patron import INSERT_PATRON_QUERY, PATRON_COLUMNS, PATRON_FIELDS, parse_patron
+from database.write_behind import write_queue
+
+# Number of rows validated and inserted per transaction
+IMPORT_CHUNK_SIZE = 1000
+
+# Maximum number of per-row errors kept in an import report
+MAX_REPORTED_ERRORS = 1000
+
+# Accepted file formats and their extensions
+IMPORT_FORMATS = {
+    "csv": (".csv",),
+    "jsonl": (".jsonl", ".ndjson", ".json")
+}
+
+# Header or key name (lower case) -> patron field name
+_FIELD_ALIASES = {name.lower(): field for name, field in zip(PATRON_COLUMNS, PATRON_FIELDS)}
+_FIELD_ALIASES.update({field: field for field in PATRON_FIELDS})
+
+class ImportReport:
+    '''Running totals and per-row errors of a bulk import.'''
+    
+    def __init__(self):
+        '''Initialize an empty report.'''
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message), capped at MAX_REPORTED_ERRORS
+        self.cancelled = False
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+    
+    @property
+    def rows_per_sec(self):
+        '''Rows read per second so far.'''
+        return self.rows_read / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def add_error(self, line_no, message):
+        '''
+        Record an error for one input row.
+        
+        Args:
+            line_no (int): Line number of the row in the input file
+            message (str): Description of the problem
+        '''
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+    
+    def summary(self):
+        '''Return a one-line human readable summary.'''
+        return (f"{self.rows_inserted} of {self.rows_read} rows imported, "
+                f"{self.error_count} errors, {self.rows_per_sec:,.0f} rows/sec")
+
+def detect_format(path):
+    '''
+    Guess the import format from a file name.
+    
+    Args:
+        path (str): Path of the input file
+    
+    Returns:
+        str: "csv" or "jsonl"
+    
+    Raises:
+        ValueError: If the extension is not recognised
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    for fmt, extensions in IMPORT_FORMATS.items():
+        if extension in extensions:
+            return fmt
+    raise ValueError(f"Cannot tell the format of '{path}'; expected a .csv or .jsonl file")
+
+def _map_fields(names):
+    '''
+    Map column or key names onto patron field names.
+    
+    Args:
+        names (iterable): Names found in the input
+    
+    Returns:
+        list: Patron field name for each input name, or None if unknown
+    '''
+    return [_FIELD_ALIASES.get(str(name).strip().lower()) for name in names]
+
+def read_csv(path):
+    '''
+    Stream rows from a CSV file with a header row.
+    
+    Args:
+        path (str): Path of the CSV file
+    
+    Yields:
+        tuple: (line number, field values dict or None, error message or None)
+    '''
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = _map_fields(header)
+        
+        for row in reader:
+            if not row:
+                continue
+            values = {field: value for field, value in zip(fields, row) if field}
+            yield reader.line_num, values, None
+
+def read_jsonl(path):
+    '''
+    Stream rows from a JSON Lines file with one object per line.
+    
+    Args:
+        path (str): Path of the JSON Lines file
+    
+    Yields:
+        tuple: (line number, field values dict or None, error message or None)
+    '''
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as err:
+                yield line_no, None, f"Invalid JSON: {err.msg}"
+                continue
+            if not isinstance(obj, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            fields = _map_fields(obj.keys())
+            values = {field: value for field, value in zip(fields, obj.values()) if field}
+            yield line_no, values, None
+
+def _chunks(rows, size):
+    '''
+    Group an iterable into lists of at most ``size`` items.
+    
+    Args:
+        rows (iterable): Items to group
+        size (int): Maximum group size
+    
+    Yields:
+        list: The next group
+    '''
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _clear_deleted(cursor, rows):
+    '''Remove deleted clients still waiting to be purged whose IDs the rows reuse.'''
+    placeholders = ", ".join(["%s"] * len(rows))
+    cursor.execute(f"DELETE FROM patron WHERE PAT_DELETED = 1 AND PAT_ID IN ({placeholders})",
+                   [row[0] for row in rows])
+
+def _insert_chunk(rows, line_numbers, report):
+    '''
+    Insert validated rows in a single transaction.
+    
+    The rows are sent with one ``executemany``, which the MySQL connector
+    turns into a multi-row INSERT. If the batch fails (for example on a
+    duplicate PAT_ID) it is rolled back and retried row by row so that the
+    offending rows can be reported and the rest still imported.
+    
+    Args:
+        rows (list): Validated patron rows
+        line_numbers (list): Input line number of each row
+        report (ImportReport): Report receiving per-row errors
+    
+    Returns:
+        int: Number of rows inserted
+    '''
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            start = time.perf_counter()
+            try:
+                _clear_deleted(cursor, rows)
+                cursor.executemany(INSERT_PATRON_QUERY, rows)
+                conn.commit()
+                query_stats.record(INSERT_PATRON_QUERY, None, time.perf_counter() - start,
+                                   len(rows))
+                return len(rows)
+            except db_config.DatabaseError as err:
+                query_stats.record(INSERT_PATRON_QUERY, None, time.perf_counter() - start,
+                                   error=err)
+                conn.rollback()
+            
+            # Retry the failed batch row by row
+            _clear_deleted(cursor, rows)
+            inserted = 0
+            for line_no, row in zip(line_numbers, rows):
+                try:
+                    cursor.execute(INSERT_PATRON_QUERY, row)
+                    inserted += 1
+                except db_config.DatabaseError as err:
+                    report.add_error(line_no, str(err))
+            conn.commit()
+            return inserted
+        finally:
+            cursor.close()
+
+def import_patrons(path, fmt=None, chunk_size=IMPORT_CHUNK_SIZE,
+                   on_progress=None, cancel_event=None, report=None):
+    '''
+    Stream patron records from a file into the database.
+    
+    The file is read lazily and processed ``chunk_size`` rows at a time, so
+    memory use does not depend on the file size. Each chunk is validated
+    with the same rules as the Add Record form and inserted in its own
+    transaction.
+    
+    Args:
+        path (str): Path of the input file
+        fmt (str, optional): "csv" or "jsonl"; detected from the extension if omitted
+        chunk_size (int): Rows per transaction
+        on_progress (callable, optional): Called with the report after each chunk
+        cancel_event (threading.Event, optional): Stops the import between chunks when set
+        report (ImportReport, optional): Report to fill in; a new one is created if omitted
+    
+    Returns:
+        ImportReport: Totals, per-row errors and throughput of the import
+    '''
+    fmt = fmt or detect_format(path)
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    
+    reader = read_csv(path) if fmt == "csv" else read_jsonl(path)
+    report = report or ImportReport()
+    
+    # Queued single-client writes go first, so duplicates are caught
+    if write_queue.enabled:
+        write_queue.flush()
+    
+    try:
+        for chunk in _chunks(reader, chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                report.cancelled = True
+                break
+            
+            rows = []
+            line_numbers = []
+            for line_no, values, error in chunk:
+                report.rows_read += 1
+                if error:
+                    report.add_error(line_no, error)
+                    continue
+                try:
+                    rows.append(parse_patron(values))
+                    line_numbers.append(line_no)
+                except ValueError as err:
+                    report.add_error(line_no, str(err))
+            
+            if rows:
+                report.rows_inserted += _insert_chunk(rows, line_numbers, report)
+            
+            report.elapsed = time.monotonic() - report.started
+            if on_progress:
+                on_progress(report)
+    finally:
+        # Many rows changed; let search indexes rebuild
+        if report.rows_inserted:
+            notify_patron_write(None)
+    
+    report.elapsed = time.monotonic() - report.started
+    return report
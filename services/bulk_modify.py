@@ -0,0 +1,390 @@
+'''
+Bulk modify service module for the Client Management System.
+Applies one change to, or deletes, every client selected by an ID list or
+a filter, with set-based UPDATE statements in chunked transactions.
+'''
+
+import re
+import time
+from database.cache import notify_patron_write, patron_cache
+from database.db_config import run_query
+from database.patron import BUMP_VERSION, FIELD_TYPES, PATRON_COLUMNS, PATRON_FIELDS
+from database.search_index import MATCH_CONTAINS, MATCH_PREFIX, escape_like
+from database.write_behind import write_queue
+from services.purge import purger
+from services.records import UPDATE_COLUMNS, parse_updates
+
+# Clients updated per transaction
+BULK_CHUNK_SIZE = 500
+
+# Number of clients shown in a preview
+PREVIEW_ROWS = 20
+
+# Most client IDs an ID list may select; larger selections use a filter
+MAX_BULK_IDS = 100000
+
+# Above this many clients, search indexes and the snapshot are rebuilt
+# instead of being updated client by client
+NOTIFY_EACH_LIMIT = 200
+
+# Patron field name -> column, for every field that can be filtered on
+FILTER_COLUMNS = dict(zip(PATRON_FIELDS, PATRON_COLUMNS))
+
+# Comparison operators for filter conditions
+FILTER_OPERATORS = ("=", "!=", "<", "<=", ">", ">=", MATCH_CONTAINS, MATCH_PREFIX)
+
+# Numeric fields that can be adjusted by an amount instead of set
+ADJUSTABLE_FIELDS = ("balance", "frequency")
+
+_ID_RANGE = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*$")
+
+class BulkModifyReport:
+    '''Running totals of a bulk modify.'''
+    
+    def __init__(self, action="updated"):
+        '''
+        Initialize an empty report.
+        
+        Args:
+            action (str): What is done to the clients, for the summary
+        '''
+        self.action = action
+        self.rows_matched = None
+        self.rows_updated = 0
+        self.chunks = 0
+        self.cancelled = False
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+    
+    @property
+    def rows_per_sec(self):
+        '''Rows updated per second so far.'''
+        return self.rows_updated / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def summary(self):
+        '''Return a one-line human readable summary.'''
+        matched = f" of {self.rows_matched}" if self.rows_matched is not None else ""
+        return (f"{self.rows_updated}{matched} clients {self.action} "
+                f"in {self.chunks} transactions, "
+                f"{self.rows_per_sec:,.0f} rows/sec")
+
+def parse_ids(text):
+    '''
+    Parse a list of client IDs such as "3, 7, 10-20".
+    
+    Args:
+        text (str): IDs and inclusive ranges separated by commas, spaces or new lines
+    
+    Returns:
+        list: Sorted distinct client IDs
+    
+    Raises:
+        ValueError: If an entry is not an ID or a range, or the list selects
+                    more than MAX_BULK_IDS clients
+    '''
+    too_many = (f"The ID list selects more than {MAX_BULK_IDS:,} clients; "
+                "select them with a filter instead")
+    ids = set()
+    for part in re.split(r"[,\s]+", re.sub(r"\s*-\s*", "-", text.strip())):
+        if not part:
+            continue
+        match = _ID_RANGE.match(part)
+        if match:
+            low, high = int(match.group(1)), int(match.group(2))
+            if low > high:
+                raise ValueError(f"Invalid ID range: {part}")
+            # Checked before the range is expanded, so "1-999999999" fails fast
+            if high - low + 1 > MAX_BULK_IDS:
+                raise ValueError(too_many)
+            ids.update(range(low, high + 1))
+        else:
+            try:
+                ids.add(int(part))
+            except ValueError:
+                raise ValueError(f"Invalid client ID: {part}") from None
+        if len(ids) > MAX_BULK_IDS:
+            raise ValueError(too_many)
+    return sorted(ids)
+
+def build_conditions(conditions):
+    '''
+    Build the SQL for filter conditions.
+    
+    Args:
+        conditions (list): (field, operator, value) tuples, all of which
+            must hold; operators are listed in FILTER_OPERATORS
+    
+    Returns:
+        tuple: (SQL condition, or None if there are no conditions,
+                parameters list)
+    
+    Raises:
+        ValueError: If a condition is invalid
+    '''
+    clauses = []
+    params = []
+    for field, operator, value in conditions or ():
+        if field not in FILTER_COLUMNS:
+            raise ValueError(f"Unknown field: {field}")
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown operator: {operator}")
+        column = FILTER_COLUMNS[field]
+        
+        if operator in (MATCH_CONTAINS, MATCH_PREFIX):
+            pattern = escape_like(str(value)) + "%"
+            if operator == MATCH_CONTAINS:
+                pattern = "%" + pattern
+            clauses.append(f"{column} LIKE %s ESCAPE '!'")
+            params.append(pattern)
+        else:
+            try:
+                typed = FIELD_TYPES[field](value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value for {field}: {value}") from None
+            clauses.append(f"{column} {'<>' if operator == '!=' else operator} %s")
+            params.append(typed)
+    
+    return (" AND ".join(clauses) or None), params
+
+def build_changes(values=None, adjustments=None):
+    '''
+    Build the SET clause of a bulk modify.
+    
+    Args:
+        values (dict, optional): Field name -> new raw value; empty values
+                                 are left unchanged
+        adjustments (dict, optional): Field in ADJUSTABLE_FIELDS -> amount
+                                      added to the current value
+    
+    Returns:
+        tuple: (SQL assignments, parameters list)
+    
+    Raises:
+        ValueError: If nothing is changed or a value is invalid
+    '''
+    updates = parse_updates(values or {})
+    assignments = [f"{UPDATE_COLUMNS[field]} = %s" for field in updates]
+    params = list(updates.values())
+    
+    for field, amount in (adjustments or {}).items():
+        if amount is None or amount == '':
+            continue
+        if field not in ADJUSTABLE_FIELDS:
+            raise ValueError(f"Field cannot be adjusted: {field}")
+        if field in updates:
+            raise ValueError(f"{field} cannot be both set and adjusted")
+        try:
+            amount = FIELD_TYPES[field](amount)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid adjustment for {field}: {amount}") from None
+        column = UPDATE_COLUMNS[field]
+        assignments.append(f"{column} = {column} + %s")
+        params.append(amount)
+    
+    if not assignments:
+        raise ValueError("No fields were modified")
+    return ", ".join(assignments), params
+
+def _chunk_filters(ids, conditions, chunk_size):
+    '''
+    Yield the WHERE clauses selecting the clients to modify, chunk by chunk.
+    
+    An explicit ID list is split directly. Otherwise the filter is read
+    with a keyset scan, one indexed query per chunk, so no statement has to
+    match the whole selection at once.
+    
+    Args:
+        ids (list): Sorted client IDs, or None
+        conditions (list): (field, operator, value) tuples
+        chunk_size (int): Clients per chunk
+    
+    Yields:
+        tuple: (client IDs in the chunk, SQL condition, parameters list)
+    
+    Raises:
+        ValueError: If no clients are selected or a condition is invalid
+    '''
+    where, params = build_conditions(conditions)
+    if not ids and where is None:
+        raise ValueError("Please give client IDs or a filter")
+    
+    def chunk_filter(chunk):
+        clause = f"PAT_ID IN ({', '.join(['%s'] * len(chunk))})"
+        if where:
+            clause += f" AND {where}"
+        return chunk, clause, list(chunk) + params
+    
+    if ids:
+        for start in range(0, len(ids), chunk_size):
+            yield chunk_filter(ids[start:start + chunk_size])
+        return
+    
+    after_id = None
+    while True:
+        if after_id is None:
+            rows = run_query(f"SELECT PAT_ID FROM live_patron WHERE {where} "
+                             "ORDER BY PAT_ID LIMIT %s", tuple(params) + (chunk_size,), fetch=True)
+        else:
+            rows = run_query(f"SELECT PAT_ID FROM live_patron WHERE {where} AND PAT_ID > %s "
+                             "ORDER BY PAT_ID LIMIT %s",
+                             tuple(params) + (after_id, chunk_size), fetch=True)
+        if not rows:
+            return
+        chunk = [row[0] for row in rows]
+        yield chunk_filter(chunk)
+        if len(chunk) < chunk_size:
+            return
+        after_id = chunk[-1]
+
+def preview_bulk_update(ids=None, conditions=None, limit=PREVIEW_ROWS):
+    '''
+    Count the clients a bulk modify would change and show the first few.
+    
+    Args:
+        ids (list, optional): Client IDs
+        conditions (list, optional): (field, operator, value) tuples
+        limit (int): Number of sample rows
+    
+    Returns:
+        tuple: (number of matching clients, first ``limit`` rows by PAT_ID)
+    
+    Raises:
+        ValueError: If no clients are selected or a condition is invalid
+    '''
+    ids = sorted(set(ids)) if ids else None
+    if not ids:
+        where, params = build_conditions(conditions)
+        if where is None:
+            raise ValueError("Please give client IDs or a filter")
+        count = run_query(f"SELECT COUNT(*) FROM live_patron WHERE {where}", tuple(params),
+                          fetch=True)
+        rows = run_query(f"SELECT * FROM live_patron WHERE {where} ORDER BY PAT_ID LIMIT %s",
+                         tuple(params) + (limit,), fetch=True)
+        return count[0][0], rows
+    
+    # Count an ID list in chunks, keeping each statement's parameter list short
+    count = 0
+    rows = []
+    for _, where, params in _chunk_filters(ids, conditions, BULK_CHUNK_SIZE):
+        count += run_query(f"SELECT COUNT(*) FROM live_patron WHERE {where}", tuple(params),
+                           fetch=True)[0][0]
+        if len(rows) < limit:
+            rows += run_query(f"SELECT * FROM live_patron WHERE {where} ORDER BY PAT_ID LIMIT %s",
+                              tuple(params) + (limit - len(rows),), fetch=True)
+    return count, rows
+
+def _update_chunks(assignments, set_params, ids, conditions, chunk_size, on_progress,
+                   cancel_event, report):
+    '''
+    Run one UPDATE per chunk of selected clients, each in its own transaction.
+    
+    Args:
+        assignments (str): SQL SET clause
+        set_params (list): Parameters of the SET clause
+        ids (list): Client IDs, or None
+        conditions (list): (field, operator, value) tuples
+        chunk_size (int): Clients per transaction
+        on_progress (callable): Called with the report after each chunk, or None
+        cancel_event (threading.Event): Stops the run between chunks when set, or None
+        report (BulkModifyReport): Report to fill in
+    
+    Returns:
+        BulkModifyReport: The report
+    '''
+    ids = sorted(set(ids)) if ids else None
+    touched = []
+    
+    # Apply queued single-client writes first, so they cannot undo this change
+    if write_queue.enabled:
+        write_queue.flush()
+    
+    try:
+        for chunk, where, params in _chunk_filters(ids, conditions, chunk_size):
+            if cancel_event is not None and cancel_event.is_set():
+                report.cancelled = True
+                break
+            
+            touched.extend(chunk)
+            try:
+                report.rows_updated += run_query(
+                    f"UPDATE patron SET {assignments}, {BUMP_VERSION} "
+                    f"WHERE {where} AND PAT_DELETED = 0",
+                    tuple(set_params + params), commit=True)
+            finally:
+                for pat_id in chunk:
+                    patron_cache.invalidate(pat_id)
+            report.chunks += 1
+            
+            report.elapsed = time.monotonic() - report.started
+            if on_progress:
+                on_progress(report)
+    finally:
+        # Let search indexes and the snapshot catch up
+        if len(touched) > NOTIFY_EACH_LIMIT:
+            notify_patron_write(None)
+        else:
+            for pat_id in touched:
+                notify_patron_write(pat_id)
+    
+    report.elapsed = time.monotonic() - report.started
+    return report
+
+def bulk_update(ids=None, conditions=None, values=None, adjustments=None,
+                chunk_size=BULK_CHUNK_SIZE, on_progress=None, cancel_event=None, report=None):
+    '''
+    Apply one change to every selected client.
+    
+    The clients are updated with one set-based UPDATE per chunk of
+    ``chunk_size`` IDs, each committed on its own, so locks are held
+    briefly and a stopped run keeps the chunks already done. Each UPDATE
+    repeats the filter, so clients changed by someone else in the meantime
+    are only updated if they still match.
+    
+    Args:
+        ids (list, optional): Client IDs
+        conditions (list, optional): (field, operator, value) tuples
+        values (dict, optional): Field name -> new raw value
+        adjustments (dict, optional): Field in ADJUSTABLE_FIELDS -> amount to add
+        chunk_size (int): Clients per transaction
+        on_progress (callable, optional): Called with the report after each chunk
+        cancel_event (threading.Event, optional): Stops the run between chunks when set
+        report (BulkModifyReport, optional): Report to fill in; a new one is created if omitted
+    
+    Returns:
+        BulkModifyReport: Rows updated, transactions and throughput
+    
+    Raises:
+        ValueError: If no clients are selected, nothing is changed or a value is invalid
+    '''
+    assignments, set_params = build_changes(values, adjustments)
+    return _update_chunks(assignments, set_params, ids, conditions, chunk_size, on_progress,
+                          cancel_event, report or BulkModifyReport())
+
+def bulk_delete(ids=None, conditions=None, chunk_size=BULK_CHUNK_SIZE, on_progress=None,
+                cancel_event=None, report=None):
+    '''
+    Delete every selected client.
+    
+    The clients are only marked as deleted, in chunks like bulk_update,
+    which hides them at once without the locking of a large DELETE; the
+    purger removes the rows later.
+    
+    Args:
+        ids (list, optional): Client IDs
+        conditions (list, optional): (field, operator, value) tuples
+        chunk_size (int): Clients per transaction
+        on_progress (callable, optional): Called with the report after each chunk
+        cancel_event (threading.Event, optional): Stops the run between chunks when set
+        report (BulkModifyReport, optional): Report to fill in; a new one is created if omitted
+    
+    Returns:
+        BulkModifyReport: Rows deleted, transactions and throughput
+    
+    Raises:
+        ValueError: If no clients are selected or a condition is invalid
+    '''
+    report = _update_chunks("PAT_DELETED = 1", [], ids, conditions, chunk_size, on_progress,
+                            cancel_event, report or BulkModifyReport("deleted"))
+    if report.rows_updated:
+        purger.wake()
+    return report
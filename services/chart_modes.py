@@ -0,0 +1,8 @@
+'''
+Chart mode names for the Client Management System.
+Kept apart from services.graphs, which loads NumPy, so the command line can
+offer the modes without importing it.
+'''
+
+# Chart modes available for the numeric graph types
+CHART_MODES = ("Auto", "Per Client", "Histogram", "Top N", "Bottom N", "Percentiles")
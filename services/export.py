@@ -0,0 +1,226 @@
+'''
+Export service module for the Client Management System.
+Streams client records from the database into CSV, JSON Lines or Parquet
+files, without any user interface code.
+'''
+
+import csv
+import gzip
+import importlib
+import importlib.util
+import json
+import os
+import time
+from database.db_config import stream_query
+from database.patron import PATRON_COLUMNS
+from database.search_index import MATCH_CONTAINS, MATCH_PREFIX, SEARCH_FIELDS, escape_like
+
+# Rows fetched from the server and written per batch
+EXPORT_BATCH_SIZE = 1000
+
+# Supported file formats and their extensions
+EXPORT_FORMATS = {
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "parquet": ".parquet"
+}
+
+class ExportReport:
+    '''Running totals of an export.'''
+    
+    def __init__(self, path=None):
+        '''
+        Initialize an empty report.
+        
+        Args:
+            path (str, optional): File being written
+        '''
+        self.path = path
+        self.rows_written = 0
+        self.cancelled = False
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+    
+    @property
+    def rows_per_sec(self):
+        '''Rows written per second so far.'''
+        return self.rows_written / self.elapsed if self.elapsed > 0 else 0.0
+    
+    def summary(self):
+        '''Return a one-line human readable summary.'''
+        return f"{self.rows_written} rows exported, {self.rows_per_sec:,.0f} rows/sec"
+
+def parquet_available():
+    '''
+    Check whether Parquet files can be written.
+    
+    Returns:
+        bool: True if pyarrow is installed
+    '''
+    # find_spec does not import pyarrow, which is slow to load
+    return importlib.util.find_spec("pyarrow") is not None
+
+def detect_export_format(path):
+    '''
+    Guess the export format from a file name.
+    
+    Args:
+        path (str): Output file path, optionally ending in ".gz"
+    
+    Returns:
+        str: "csv", "jsonl" or "parquet"
+    '''
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    for fmt, extension in EXPORT_FORMATS.items():
+        if name.endswith(extension):
+            return fmt
+    if name.endswith(".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the export format of '{os.path.basename(path)}'; "
+                     f"use one of {', '.join(EXPORT_FORMATS.values())}")
+
+def export_query(field=None, value=None, mode=MATCH_CONTAINS):
+    '''
+    Build the query selecting the records to export.
+    
+    Args:
+        field (str, optional): Key of SEARCH_FIELDS to filter on; all
+                               records are exported if omitted
+        value (str, optional): Text the field must contain or start with
+        mode (str): MATCH_CONTAINS or MATCH_PREFIX
+    
+    Returns:
+        tuple: (SQL query, parameters) returning records in PAT_ID order
+    '''
+    if not field:
+        return "SELECT * FROM live_patron ORDER BY PAT_ID", None
+    
+    column = SEARCH_FIELDS[field]
+    pattern = escape_like(value or "") + "%"
+    if mode != MATCH_PREFIX:
+        pattern = "%" + pattern
+    return (f"SELECT * FROM live_patron WHERE {column} LIKE %s ESCAPE '!' ORDER BY PAT_ID",
+            (pattern,))
+
+def _write_csv(f, batches):
+    '''Write batches of rows as CSV with a header line.'''
+    writer = csv.writer(f)
+    writer.writerow(PATRON_COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        yield len(batch)
+
+def _write_jsonl(f, batches):
+    '''Write batches of rows as one JSON object per line.'''
+    for batch in batches:
+        f.writelines(json.dumps(dict(zip(PATRON_COLUMNS, row)), default=str) + "\n"
+                     for row in batch)
+        yield len(batch)
+
+def _write_parquet(path, batches, compress):
+    '''Write each batch of rows as one Parquet row group.'''
+    try:
+        pa = importlib.import_module("pyarrow")
+        pq = importlib.import_module("pyarrow.parquet")
+    except ImportError:
+        raise ValueError("Parquet export needs the pyarrow package") from None
+    
+    schema = pa.schema([
+        ("PAT_ID", pa.int64()),
+        ("PAT_NAME", pa.string()),
+        ("PAT_BALANCE", pa.float64()),
+        ("PAT_CONTACT", pa.int64()),
+        ("PAT_PREFERENCE", pa.string()),
+        ("PAT_FREQUENCY", pa.int64())
+    ])
+    with pq.ParquetWriter(path, schema, compression="gzip" if compress else "snappy") as writer:
+        for batch in batches:
+            columns = [list(values) for values in zip(*batch)]
+            columns[2] = [None if v is None else float(v) for v in columns[2]]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield len(batch)
+
+def export_patrons(path, fmt=None, field=None, value=None, mode=MATCH_CONTAINS, compress=None,
+                   batch_size=EXPORT_BATCH_SIZE, on_progress=None, cancel_event=None,
+                   report=None):
+    '''
+    Stream client records from the database into a file.
+    
+    Rows are fetched from a server-side cursor and written ``batch_size``
+    at a time, so memory use does not depend on the number of records. The
+    output goes to a temporary file that replaces ``path`` only once the
+    export is complete; a failed or stopped export leaves nothing behind.
+    
+    Args:
+        path (str): Output file path
+        fmt (str, optional): "csv", "jsonl" or "parquet"; detected from the
+                             extension if omitted
+        field (str, optional): Key of SEARCH_FIELDS to filter on
+        value (str, optional): Text the field must contain or start with
+        mode (str): MATCH_CONTAINS or MATCH_PREFIX
+        compress (bool, optional): gzip the output; defaults to whether the
+                                   path ends in ".gz". Parquet files use
+                                   gzip compression inside the file instead.
+        batch_size (int): Rows fetched and written per batch
+        on_progress (callable, optional): Called with the report after each batch
+        cancel_event (threading.Event, optional): Stops the export between batches when set
+        report (ExportReport, optional): Report to fill in; a new one is created if omitted
+    
+    Returns:
+        ExportReport: Rows written and throughput of the export
+    '''
+    fmt = fmt or detect_export_format(path)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if compress is None:
+        compress = path.lower().endswith(".gz")
+    if field and not value:
+        raise ValueError("Please enter a value to filter on")
+    
+    report = report or ExportReport(path)
+    report.path = path
+    query, params = export_query(field, value, mode)
+    batches = stream_query(query, params, batch_size)
+    temp_path = f"{path}.part"
+    
+    try:
+        if fmt == "parquet":
+            written = _write_parquet(temp_path, batches, compress)
+            f = None
+        else:
+            if compress:
+                f = gzip.open(temp_path, "wt", encoding="utf-8", newline="")
+            else:
+                f = open(temp_path, "w", encoding="utf-8", newline="")
+            written = _write_csv(f, batches) if fmt == "csv" else _write_jsonl(f, batches)
+        
+        try:
+            for count in written:
+                report.rows_written += count
+                report.elapsed = time.monotonic() - report.started
+                if on_progress:
+                    on_progress(report)
+                if cancel_event is not None and cancel_event.is_set():
+                    report.cancelled = True
+                    break
+        finally:
+            written.close()
+            if f is not None:
+                f.close()
+        
+        if report.cancelled:
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        # Release the connection if the rows were not all read
+        batches.close()
+    
+    report.elapsed = time.monotonic() - report.started
+    return report
@@ -0,0 +1,339 @@
+'''
+Graph data service module for the Client Management System.
+Computes the aggregates behind each chart with SQL and NumPy, without any
+plotting or user interface code.
+
+By default the aggregates are computed from the columnar patron snapshot
+(see database.snapshot), so redrawing a chart costs no database round trip
+once the snapshot is loaded. Set GRAPH_SOURCE=sql to aggregate in the
+database instead.
+'''
+
+import math
+import os
+import numpy as np
+from database.db_config import run_query
+from database.snapshot import patron_snapshot
+from services.chart_modes import CHART_MODES
+
+# Where chart aggregates are computed: "snapshot" (in memory) or "sql"
+GRAPH_SOURCE = os.getenv('GRAPH_SOURCE', 'snapshot').lower()
+
+# Available aggregate sources
+GRAPH_SOURCES = ("snapshot", "sql")
+
+# Default number of bars in a histogram
+HISTOGRAM_BINS = 20
+
+# Number of buckets computed in SQL; NumPy re-bins them for display and percentiles
+FINE_BINS = 512
+
+# Above this many clients, "Auto" switches from one bar per client to a histogram
+PER_CLIENT_LIMIT = 50
+
+# Default number of clients shown by the top/bottom-N views
+TOP_N = 10
+
+# Percentiles shown by the percentile summary
+PERCENTILES = (5, 25, 50, 75, 90, 95, 99)
+
+# Preferences beyond this many are merged into an "Other" slice
+MAX_PIE_SLICES = 10
+
+# Numeric columns that can be charted, keyed by graph type
+NUMERIC_COLUMNS = {
+    "balance": "PAT_BALANCE",
+    "frequency": "PAT_FREQUENCY"
+}
+
+def fetch_preference_counts():
+    '''
+    Count clients per preference in the database.
+    
+    Returns:
+        list: (preference, client count) tuples, largest group first
+    '''
+    query = '''
+        SELECT PAT_PREFERENCE, COUNT(*) FROM live_patron
+        GROUP BY PAT_PREFERENCE
+        ORDER BY COUNT(*) DESC
+    '''
+    return run_query(query, fetch=True) or []
+
+def fetch_histogram(graph_type, bins=FINE_BINS):
+    '''
+    Build a histogram of a numeric column with a GROUP BY in the database.
+    
+    One query reads the value range, a second counts rows per bucket, so
+    only O(bins) rows are transferred regardless of the number of clients.
+    Integer columns whose whole range fits in ``bins`` buckets are counted
+    per distinct value instead.
+    
+    Args:
+        graph_type (str): Key of NUMERIC_COLUMNS
+        bins (int): Maximum number of buckets
+    
+    Returns:
+        list: (bucket low edge, bucket high edge, client count) tuples in
+              ascending order; empty if the column has no values
+    '''
+    column = NUMERIC_COLUMNS[graph_type]
+    
+    stats = run_query(f"SELECT MIN({column}), MAX({column}), COUNT({column}) FROM live_patron",
+                      fetch=True)
+    if not stats or not stats[0][2]:
+        return []
+    low, high, count = stats[0]
+    
+    if low == high:
+        return [(low, high, count)]
+    
+    if graph_type == "frequency" and high - low + 1 <= bins:
+        # Few distinct values: one bucket per value
+        query = f'''
+            SELECT {column}, COUNT(*) FROM live_patron
+            WHERE {column} IS NOT NULL
+            GROUP BY {column}
+            ORDER BY {column}
+        '''
+        return [(value, value, n) for value, n in run_query(query, fetch=True)]
+    
+    if graph_type == "frequency":
+        # Whole-number bucket widths for integer counts
+        width = math.ceil((high - low + 1) / bins)
+    else:
+        width = (float(high) - float(low)) / bins
+    query = f'''
+        SELECT LEAST(FLOOR(({column} - %s) / %s), %s) AS bucket, COUNT(*) FROM live_patron
+        WHERE {column} IS NOT NULL
+        GROUP BY bucket
+        ORDER BY bucket
+    '''
+    rows = run_query(query, (low, width, bins - 1), fetch=True)
+    return [(float(low) + int(bucket) * width, float(low) + (int(bucket) + 1) * width, n)
+            for bucket, n in rows]
+
+def fetch_per_client(graph_type, limit=PER_CLIENT_LIMIT):
+    '''
+    Fetch one value per client, ordered by client ID.
+    
+    Args:
+        graph_type (str): Key of NUMERIC_COLUMNS
+        limit (int): Maximum number of clients to return
+    
+    Returns:
+        list: (PAT_ID, value) tuples
+    '''
+    column = NUMERIC_COLUMNS[graph_type]
+    query = f"SELECT PAT_ID, {column} FROM live_patron ORDER BY PAT_ID LIMIT %s"
+    return run_query(query, (limit,), fetch=True) or []
+
+def fetch_ranked(graph_type, n=TOP_N, descending=True):
+    '''
+    Fetch the clients with the highest or lowest values of a numeric column.
+    
+    Args:
+        graph_type (str): Key of NUMERIC_COLUMNS
+        n (int): Number of clients to return
+        descending (bool): Return the highest values if True, the lowest otherwise
+    
+    Returns:
+        list: (PAT_ID, PAT_NAME, value) tuples in rank order
+    '''
+    column = NUMERIC_COLUMNS[graph_type]
+    order = "DESC" if descending else "ASC"
+    query = f'''
+        SELECT PAT_ID, PAT_NAME, {column} FROM live_patron
+        WHERE {column} IS NOT NULL
+        ORDER BY {column} {order}, PAT_ID
+        LIMIT %s
+    '''
+    return run_query(query, (n,), fetch=True) or []
+
+def snapshot_preference_counts():
+    '''
+    Count clients per preference in the columnar snapshot.
+    
+    Returns:
+        list: (preference, client count) tuples, largest group first
+    '''
+    return patron_snapshot.group_by_preference()
+
+def snapshot_histogram(graph_type, bins=FINE_BINS):
+    '''
+    Build the same buckets as fetch_histogram from the columnar snapshot.
+    
+    Args:
+        graph_type (str): Key of NUMERIC_COLUMNS
+        bins (int): Maximum number of buckets
+    
+    Returns:
+        list: (bucket low edge, bucket high edge, client count) tuples in
+              ascending order; empty if the column has no values
+    '''
+    values = patron_snapshot.values(graph_type)
+    if not len(values):
+        return []
+    low, high = values.min(), values.max()
+    
+    if low == high:
+        return [(float(low), float(high), len(values))]
+    
+    if graph_type == "frequency" and high - low + 1 <= bins:
+        # Few distinct values: one bucket per value
+        distinct, counts = np.unique(values, return_counts=True)
+        return [(int(v), int(v), int(n)) for v, n in zip(distinct, counts)]
+    
+    if graph_type == "frequency":
+        width = math.ceil((high - low + 1) / bins)
+    else:
+        width = (high - low) / bins
+    buckets = np.minimum(np.floor((values - low) / width), bins - 1).astype(np.int64)
+    counts = np.bincount(buckets, minlength=bins)
+    return [(float(low) + int(b) * width, float(low) + (int(b) + 1) * width, int(counts[b]))
+            for b in np.flatnonzero(counts)]
+
+def snapshot_per_client(graph_type, limit=PER_CLIENT_LIMIT):
+    '''
+    Take one value per client, ordered by client ID, from the columnar snapshot.
+    
+    Args:
+        graph_type (str): Key of NUMERIC_COLUMNS
+        limit (int): Maximum number of clients to return
+    
+    Returns:
+        list: (PAT_ID, value) tuples; the value is None for NULL
+    '''
+    ids, values = patron_snapshot.head(graph_type, limit)
+    return [(int(i), None if math.isnan(v) else v) for i, v in zip(ids, values.tolist())]
+
+def snapshot_ranked(graph_type, n=TOP_N, descending=True):
+    '''
+    Find the clients with the highest or lowest values in the columnar snapshot.
+    
+    The snapshot holds no names, so those are read for the ``n`` clients
+    found with one query.
+    
+    Args:
+        graph_type (str): Key of NUMERIC_COLUMNS
+        n (int): Number of clients to return
+        descending (bool): Return the highest values if True, the lowest otherwise
+    
+    Returns:
+        list: (PAT_ID, PAT_NAME, value) tuples in rank order
+    '''
+    ranked = patron_snapshot.ranked(graph_type, n, descending)
+    if not ranked:
+        return []
+    placeholders = ", ".join(["%s"] * len(ranked))
+    names = dict(run_query(f"SELECT PAT_ID, PAT_NAME FROM live_patron "
+                           f"WHERE PAT_ID IN ({placeholders})",
+                           tuple(pat_id for pat_id, _ in ranked), fetch=True))
+    return [(pat_id, names.get(pat_id), value) for pat_id, value in ranked]
+
+def rebin(buckets, bins=HISTOGRAM_BINS):
+    '''
+    Merge fine histogram buckets into evenly spaced display bins with NumPy.
+    
+    Args:
+        buckets (list): (low edge, high edge, count) tuples
+        bins (int): Number of display bins
+    
+    Returns:
+        tuple: (bin edges array, counts array with one entry per bin)
+    '''
+    lows = np.array([b[0] for b in buckets], dtype=float)
+    highs = np.array([b[1] for b in buckets], dtype=float)
+    counts = np.array([b[2] for b in buckets], dtype=float)
+    
+    low, high = lows.min(), highs.max()
+    centres = (lows + highs) / 2
+    
+    if np.array_equal(lows, highs):
+        # One bucket per whole value: use whole-number bin widths centred on
+        # the values so that no bin covers more values than its neighbours
+        width = max(math.ceil((high - low + 1) / bins), 1)
+        edges = low - 0.5 + width * np.arange(math.ceil((high - low + 1) / width) + 1)
+    else:
+        edges = np.linspace(low, high, bins + 1)
+    
+    hist, edges = np.histogram(centres, bins=edges, weights=counts)
+    return edges, hist
+
+def bucket_percentiles(buckets, percentiles=PERCENTILES):
+    '''
+    Estimate percentiles from histogram buckets.
+    
+    Values are assumed to be spread evenly inside each bucket, so the error
+    is at most one fine bucket width.
+    
+    Args:
+        buckets (list): (low edge, high edge, count) tuples in ascending order
+        percentiles (tuple): Percentiles to estimate, between 0 and 100
+    
+    Returns:
+        numpy.ndarray: Estimated value for each percentile
+    '''
+    lows = np.array([b[0] for b in buckets], dtype=float)
+    highs = np.array([b[1] for b in buckets], dtype=float)
+    counts = np.array([b[2] for b in buckets], dtype=float)
+    
+    cumulative = np.cumsum(counts)
+    targets = np.asarray(percentiles, dtype=float) / 100 * cumulative[-1]
+    index = np.clip(np.searchsorted(cumulative, targets, side="left"), 0, len(counts) - 1)
+    before = cumulative[index] - counts[index]
+    fraction = np.clip((targets - before) / counts[index], 0, 1)
+    return lows[index] + fraction * (highs[index] - lows[index])
+
+def fetch_graph_data(graph_type, mode="Auto", n=TOP_N, source=None):
+    '''
+    Compute the aggregates for one graph type and chart mode.
+    
+    "Auto" and "Per Client" draw one bar per client while there are at most
+    PER_CLIENT_LIMIT clients and switch to a histogram beyond that, so the
+    number of bars, and with it the render time, stays bounded as the data
+    grows.
+    
+    Args:
+        graph_type (str): "preference", "frequency" or "balance"
+        mode (str): One of CHART_MODES; ignored for "preference"
+        n (int): Number of clients for the top/bottom-N modes
+        source (str, optional): One of GRAPH_SOURCES; defaults to GRAPH_SOURCE
+    
+    Returns:
+        tuple: (chart mode actually used, aggregated data for the chart)
+    
+    Raises:
+        ValueError: If the graph type, chart mode or source is unknown
+    '''
+    if graph_type != "preference" and graph_type not in NUMERIC_COLUMNS:
+        raise ValueError(f"Unknown graph type '{graph_type}'")
+    if mode not in CHART_MODES:
+        raise ValueError(f"Unknown chart mode '{mode}'; expected one of {', '.join(CHART_MODES)}")
+    source = source or GRAPH_SOURCE
+    if source not in GRAPH_SOURCES:
+        raise ValueError(f"Unknown graph source '{source}'; expected one of {', '.join(GRAPH_SOURCES)}")
+    if source == "snapshot":
+        preference_counts, histogram = snapshot_preference_counts, snapshot_histogram
+        per_client, ranked = snapshot_per_client, snapshot_ranked
+    else:
+        preference_counts, histogram = fetch_preference_counts, fetch_histogram
+        per_client, ranked = fetch_per_client, fetch_ranked
+    
+    if graph_type == "preference":
+        return "Pie", preference_counts()
+    
+    if mode in ("Auto", "Per Client"):
+        # Read one row past the limit to find out whether it is exceeded
+        rows = per_client(graph_type, PER_CLIENT_LIMIT + 1)
+        if len(rows) <= PER_CLIENT_LIMIT:
+            return "Per Client", rows
+        mode = "Histogram"
+    
+    if mode == "Top N":
+        return mode, ranked(graph_type, n, descending=True)
+    if mode == "Bottom N":
+        return mode, ranked(graph_type, n, descending=False)
+    
+    # Histogram and percentile views both work from the fine buckets
+    return mode, histogram(graph_type)
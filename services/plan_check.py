@@ -0,0 +1,238 @@
+'''
+Query plan check module for the Client Management System.
+Runs the application's read operations, asks the database for the plan of
+every query they issue and reports the ones that read the whole table.
+
+Nothing is written: exports are checked from the query they would run, and
+the purger from the read that picks each chunk. Sample IDs and search
+terms are taken from the first client, so the plans match real data.
+'''
+
+import re
+from database.db_config import get_backend, get_pool
+from database.instrumentation import fingerprint, query_stats
+from database.search_index import MATCH_CONTAINS, MATCH_PREFIX, search_index
+from services.bulk_modify import preview_bulk_update
+from services.export import export_query
+from services.graphs import fetch_graph_data
+from services.purge import PURGE_CONFIG, count_deleted, next_deleted_ids
+from services.records import (count_patrons, fetch_last_page, fetch_page, fetch_page_at,
+                              fetch_page_at_position, find_patrons, get_patron_for_update)
+
+# Plan verdicts, best first
+PLAN_OK = "ok"
+PLAN_EXPECTED = "expected"          # Reads everything on purpose
+PLAN_INDEX_SCAN = "index scan"      # Reads a whole index but not the table
+PLAN_LIMITED_SCAN = "limited scan"  # Walks the table in key order until LIMIT rows match
+PLAN_FULL_SCAN = "full scan"        # Reads the whole table
+
+_VERDICT_ORDER = (PLAN_OK, PLAN_EXPECTED, PLAN_INDEX_SCAN, PLAN_LIMITED_SCAN, PLAN_FULL_SCAN)
+
+# SQLite plan step reading a whole table, or a whole index with "USING ..."
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(.*)$")
+_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+
+# SQLite plan step finding rows by the deleted flag alone. Without ANALYZE
+# statistics SQLite may read live_patron this way, which visits every client
+_SQLITE_DELETED_ONLY = re.compile(
+    r"^SEARCH \w+ USING (?:COVERING )?INDEX \w+ \(PAT_DELETED=\?\)$")
+
+# Graph types and chart modes whose SQL aggregates are checked
+_GRAPH_MODES = {
+    "balance": ("Per Client", "Histogram", "Top N", "Bottom N"),
+    "frequency": ("Per Client", "Histogram", "Top N", "Bottom N")
+}
+
+def _samples():
+    '''
+    Pick search values that exist in the table.
+    
+    Returns:
+        tuple: (client ID, name prefix, name fragment, preference prefix)
+    '''
+    rows, _ = fetch_page(limit=1)
+    if not rows:
+        return 1, "a", "a", "a"
+    pat_id, name, _, _, preference, _ = rows[0]
+    name = name or "a"
+    return pat_id, name[:2], name[1:4] or name, (preference or "a")[:2]
+
+def _operations(pat_id, prefix, fragment, preference):
+    '''
+    List the read operations to check.
+    
+    Returns:
+        list: (label, function, reason a full read is expected or None) tuples
+    '''
+    def contains_search():
+        # Rebuild the trigram index so its load is checked too
+        search_index.invalidate()
+        return find_patrons("Name", fragment, MATCH_CONTAINS)
+    
+    operations = [
+        ("count clients", count_patrons, None),
+        ("first page", fetch_page, None),
+        ("next page", lambda: fetch_page(after_id=pat_id), None),
+        ("go to client", lambda: fetch_page_at(pat_id), None),
+        ("last page", fetch_last_page, None),
+        ("scrollbar jump", lambda: fetch_page_at_position(count_patrons() // 2), None),
+        ("read client for editing", lambda: get_patron_for_update(pat_id), None),
+        ("name prefix search", lambda: find_patrons("Name", prefix, MATCH_PREFIX), None),
+        ("preference prefix search",
+         lambda: find_patrons("Preference", preference, MATCH_PREFIX), None),
+        ("contains search", contains_search,
+         "the trigram index is loaded from every client once per process"),
+        ("short contains search", lambda: find_patrons("Name", fragment[:2], MATCH_CONTAINS),
+         "a LIKE pattern with a leading wildcard cannot use an index"),
+        ("preference chart", lambda: fetch_graph_data("preference", source="sql"), None)
+    ]
+    for graph_type, modes in _GRAPH_MODES.items():
+        for mode in modes:
+            operations.append((f"{graph_type} chart, {mode}",
+                               lambda t=graph_type, m=mode: fetch_graph_data(t, m, source="sql"),
+                               None))
+    operations += [
+        ("bulk preview by filter",
+         lambda: preview_bulk_update(None, [("frequency", ">", "10")]), None),
+        ("bulk preview by IDs", lambda: preview_bulk_update([pat_id, pat_id + 1]), None),
+        ("count deleted clients", count_deleted, None),
+        ("purge chunk", lambda: next_deleted_ids(PURGE_CONFIG['chunk_size']), None)
+    ]
+    return operations
+
+def _exports(prefix, fragment):
+    '''
+    List the export queries to check; they are explained, not run.
+    
+    Returns:
+        list: (label, (query, params), reason a full read is expected or None) tuples
+    '''
+    return [
+        ("export all", export_query(), "every client is exported"),
+        ("export by name prefix", export_query("Name", prefix, MATCH_PREFIX), None),
+        ("export by name contains", export_query("Name", fragment, MATCH_CONTAINS),
+         "a LIKE pattern with a leading wildcard cannot use an index")
+    ]
+
+def explain_query(conn, query, params=None):
+    '''
+    Ask the database for the plan of a query.
+    
+    Args:
+        conn: Connection of the active backend
+        query (str): SQL statement
+        params (tuple, optional): Query parameters
+    
+    Returns:
+        list: One dictionary per plan row, keyed by lower case column name
+    '''
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"{get_backend().explain_prefix} {query}", params)
+        names = [description[0].lower() for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def plan_verdict(query, plan):
+    '''
+    Judge how much of the table a plan reads.
+    
+    SQLite reports a table read from start to end as ``SCAN <table>`` and a
+    whole index as ``SCAN <table> USING ... INDEX``; MySQL reports them as
+    access type ALL and index. Reading live_patron through the PAT_DELETED
+    index alone also counts as a table scan. A table scan that needs no sort
+    and stops at a LIMIT only walks the primary key until enough rows match.
+    
+    Args:
+        query (str): SQL statement
+        plan (list): Plan rows as returned by explain_query
+    
+    Returns:
+        tuple: (verdict, list of plan steps as text)
+    '''
+    table_scan = index_scan = sorted_ = False
+    steps = []
+    for row in plan:
+        if "detail" in row:
+            detail = str(row["detail"])
+            steps.append(detail)
+            match = _SQLITE_SCAN.match(detail)
+            if match and "USING" in match.group(2):
+                index_scan = True
+            elif match or (_SQLITE_DELETED_ONLY.match(detail) and "live_patron" in query):
+                table_scan = True
+            sorted_ = sorted_ or "TEMP B-TREE" in detail
+        else:
+            extra = row.get("extra") or ""
+            steps.append(f"{row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                         f"rows={row.get('rows')} {extra}".strip())
+            table_scan = table_scan or row.get("type") == "ALL"
+            index_scan = index_scan or row.get("type") == "index"
+            sorted_ = sorted_ or "filesort" in extra
+    
+    if table_scan and _LIMIT.search(query) and not sorted_:
+        return PLAN_LIMITED_SCAN, steps
+    if table_scan:
+        return PLAN_FULL_SCAN, steps
+    if index_scan:
+        return PLAN_INDEX_SCAN, steps
+    return PLAN_OK, steps
+
+def _check(conn, label, statements, expected):
+    '''Explain the distinct statements of one operation.'''
+    results = []
+    seen = set()
+    for query, params in statements:
+        key = fingerprint(query)
+        if key in seen:
+            continue
+        seen.add(key)
+        verdict, steps = plan_verdict(query, explain_query(conn, query, params))
+        if expected and verdict != PLAN_OK:
+            verdict = PLAN_EXPECTED
+        results.append({
+            "operation": label,
+            "verdict": verdict,
+            "reason": expected if verdict == PLAN_EXPECTED else None,
+            "plan": steps,
+            "query": key
+        })
+    return results
+
+def check_plans():
+    '''
+    Run the application's read operations and explain every query they issue.
+    
+    Returns:
+        list: One dictionary per distinct query of each operation, with the
+              operation label, verdict, reason for an expected full read,
+              plan steps and the query fingerprint
+    '''
+    pat_id, prefix, fragment, preference = _samples()
+    checked = []
+    for label, operation, expected in _operations(pat_id, prefix, fragment, preference):
+        with query_stats.capture() as captured:
+            operation()
+        checked.append((label, captured, expected))
+    for label, statement, expected in _exports(prefix, fragment):
+        checked.append((label, [statement], expected))
+    
+    results = []
+    with get_pool().connection() as conn:
+        for label, statements, expected in checked:
+            results += _check(conn, label, statements, expected)
+    return results
+
+def worst_verdict(results):
+    '''
+    Return the worst verdict among checked queries.
+    
+    Args:
+        results (list): Dictionaries as returned by check_plans
+    
+    Returns:
+        str: One of the PLAN_* verdicts; PLAN_OK if nothing was checked
+    '''
+    return max((result["verdict"] for result in results), key=_VERDICT_ORDER.index,
+               default=PLAN_OK)
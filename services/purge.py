@@ -0,0 +1,175 @@
+'''
+Purge service module for the Client Management System.
+Removes deleted clients from the patron table in the background, in small
+transactions spaced out so that other users are not held up.
+'''
+
+import os
+import sys
+import threading
+import time
+from database.db_config import run_query
+
+# Purge configuration using environment variables
+PURGE_CONFIG = {
+    'chunk_size': int(os.getenv('PURGE_CHUNK_SIZE', '200')),
+    'pause_ms': float(os.getenv('PURGE_PAUSE_MS', '50')),
+    'interval': float(os.getenv('PURGE_INTERVAL', '300'))
+}
+
+class PurgeReport:
+    '''Running totals of a purge.'''
+    
+    def __init__(self):
+        '''Initialize an empty report.'''
+        self.rows_purged = 0
+        self.chunks = 0
+        self.cancelled = False
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+    
+    def summary(self):
+        '''Return a one-line human readable summary.'''
+        return (f"{self.rows_purged} deleted clients purged in {self.chunks} transactions, "
+                f"{self.elapsed:.1f} s")
+
+def count_deleted():
+    '''
+    Count the deleted clients waiting to be purged.
+    
+    Returns:
+        int: Number of rows marked as deleted
+    '''
+    return run_query("SELECT COUNT(*) FROM patron WHERE PAT_DELETED = 1", fetch=True)[0][0]
+
+def next_deleted_ids(limit):
+    '''
+    Read the IDs of the next deleted clients to purge.
+    
+    The indexed lookup takes no locks, and the DELETE that follows then only
+    locks the rows it removes.
+    
+    Args:
+        limit (int): Maximum number of IDs
+    
+    Returns:
+        list: Client IDs in ascending order
+    '''
+    return [row[0] for row in run_query(
+        "SELECT PAT_ID FROM patron WHERE PAT_DELETED = 1 ORDER BY PAT_ID LIMIT %s",
+        (limit,), fetch=True)]
+
+def purge_deleted(chunk_size=None, pause_ms=None, max_rows=None, cancel_event=None):
+    '''
+    Remove deleted clients from the table.
+    
+    Each chunk of ``chunk_size`` rows is removed by primary key in its own
+    short transaction, followed by a pause of ``pause_ms``, so the locks
+    taken by the purge never pile up and queries from other users run in
+    between.
+    
+    Args:
+        chunk_size (int, optional): Rows per transaction; defaults to PURGE_CHUNK_SIZE
+        pause_ms (float, optional): Pause between transactions; defaults to PURGE_PAUSE_MS
+        max_rows (int, optional): Stop after about this many rows
+        cancel_event (threading.Event, optional): Stops the purge between chunks when set
+    
+    Returns:
+        PurgeReport: Rows purged and transactions used
+    '''
+    chunk_size = chunk_size or PURGE_CONFIG['chunk_size']
+    pause_ms = PURGE_CONFIG['pause_ms'] if pause_ms is None else pause_ms
+    report = PurgeReport()
+    
+    while max_rows is None or report.rows_purged < max_rows:
+        if cancel_event is not None and cancel_event.is_set():
+            report.cancelled = True
+            break
+        
+        ids = next_deleted_ids(chunk_size)
+        if not ids:
+            break
+        
+        placeholders = ", ".join(["%s"] * len(ids))
+        report.rows_purged += run_query(
+            f"DELETE FROM patron WHERE PAT_ID IN ({placeholders}) AND PAT_DELETED = 1",
+            tuple(ids), commit=True)
+        report.chunks += 1
+        
+        if len(ids) < chunk_size:
+            break
+        if cancel_event is not None:
+            cancel_event.wait(pause_ms / 1000)
+        else:
+            time.sleep(pause_ms / 1000)
+    
+    report.elapsed = time.monotonic() - report.started
+    return report
+
+class Purger:
+    '''
+    Background thread that purges deleted clients.
+    
+    The thread wakes up every PURGE_INTERVAL seconds, or sooner when
+    clients are deleted, and runs purge_deleted until nothing is left.
+    '''
+    
+    def __init__(self, interval=None):
+        '''
+        Initialize a stopped purger.
+        
+        Args:
+            interval (float, optional): Seconds between purges; defaults to PURGE_INTERVAL
+        '''
+        self.interval = interval or PURGE_CONFIG['interval']
+        self.last_report = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        '''Whether the background thread is running.'''
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        '''Start the background thread if it is not running.'''
+        if self.running:
+            return
+        self._stop.clear()
+        self._wake.set()  # Purge what earlier sessions left behind
+        self._thread = threading.Thread(target=self._run, name="patron-purger", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=None):
+        '''
+        Stop the background thread after its current transaction.
+        
+        Args:
+            timeout (float, optional): Seconds to wait for the thread to finish
+        '''
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def wake(self):
+        '''Purge soon, for example after clients were deleted.'''
+        self._wake.set()
+    
+    def _run(self):
+        '''Purge until stopped.'''
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.last_report = purge_deleted(cancel_event=self._stop)
+            except Exception as err:
+                # Leave the rows for the next attempt
+                print(f"Purge of deleted clients failed: {err}", file=sys.stderr)
+
+# Shared purger, started by the application
+purger = Purger()
@@ -0,0 +1,428 @@
+'''
+Record service module for the Client Management System.
+Provides the patron read and write operations used by the dialogs and the CLI,
+without any user interface code.
+'''
+
+import time
+from database import db_config
+from database.cache import fetch_patron, notify_patron_write, patron_cache, write_patron
+from database.db_config import get_backend, get_pool, run_query
+from database.instrumentation import query_stats
+from database.patron import (BUMP_VERSION, FIELD_TYPES, INSERT_PATRON_QUERY, PATRON_COLUMNS,
+                            PATRON_FIELDS, parse_patron)
+from database.search_index import MATCH_CONTAINS, search_patrons
+from database.write_behind import WRITE_DELETE, WRITE_INSERT, WRITE_UPDATE, write_queue
+from services.purge import purger
+
+# Number of records shown per page in the paginated display
+PAGE_SIZE = 100
+
+# Number of records read per query when streaming the whole table
+STREAM_BATCH_SIZE = 1000
+
+# Removes a deleted client still waiting to be purged, which holds its ID
+CLEAR_DELETED_QUERY = "DELETE FROM patron WHERE PAT_ID = %s AND PAT_DELETED = 1"
+
+# Patron field name -> column, for the fields that can be updated
+UPDATE_COLUMNS = {field: column for field, column in zip(PATRON_FIELDS, PATRON_COLUMNS)
+                  if field != 'id'}
+
+class UpdateConflictError(Exception):
+    '''
+    Raised when a client changed after it was loaded for editing.
+    
+    Attributes:
+        pat_id (int): Client ID
+        current (tuple): (patron record, row version) as now stored, or None
+                         if the client was deleted
+    '''
+    
+    def __init__(self, pat_id, current):
+        self.pat_id = pat_id
+        self.current = current
+        action = "deleted" if current is None else "changed"
+        super().__init__(f"Client {pat_id} was {action} by another user")
+
+class DuplicateClientError(ValueError):
+    '''
+    Raised when a new client's ID is already in use.
+    
+    Attributes:
+        pat_id (int): Client ID
+    '''
+    
+    def __init__(self, pat_id):
+        self.pat_id = pat_id
+        super().__init__(f"Client ID {pat_id} already exists")
+
+def count_patrons():
+    '''
+    Count the records in the patron table.
+    
+    Returns:
+        int: Number of records
+    '''
+    result = run_query("SELECT COUNT(*) FROM live_patron", fetch=True)
+    return result[0][0] if result else 0
+
+def fetch_page(after_id=None, before_id=None, limit=PAGE_SIZE):
+    '''
+    Fetch one page of records using keyset pagination on PAT_ID.
+    
+    Only ``limit + 1`` rows are read so the caller can tell whether another
+    page exists in the direction of travel, regardless of the table size.
+    
+    Args:
+        after_id (int, optional): Return records with PAT_ID greater than this
+        before_id (int, optional): Return records with PAT_ID less than this
+        limit (int): Maximum number of records on the page
+    
+    Returns:
+        tuple: (records in ascending PAT_ID order, whether more records exist
+               beyond the page in the direction of travel)
+    '''
+    if before_id is not None:
+        query = "SELECT * FROM live_patron WHERE PAT_ID < %s ORDER BY PAT_ID DESC LIMIT %s"
+        params = (before_id, limit + 1)
+    elif after_id is not None:
+        query = "SELECT * FROM live_patron WHERE PAT_ID > %s ORDER BY PAT_ID LIMIT %s"
+        params = (after_id, limit + 1)
+    else:
+        query = "SELECT * FROM live_patron ORDER BY PAT_ID LIMIT %s"
+        params = (limit + 1,)
+    
+    records = run_query(query, params, fetch=True) or []
+    has_more = len(records) > limit
+    records = records[:limit]
+    
+    if before_id is not None:
+        records.reverse()
+    
+    return records, has_more
+
+def fetch_last_page(limit=PAGE_SIZE):
+    '''
+    Fetch the page holding the highest PAT_IDs.
+    
+    Args:
+        limit (int): Maximum number of records on the page
+    
+    Returns:
+        tuple: (records in ascending PAT_ID order, whether earlier records exist)
+    '''
+    query = "SELECT * FROM live_patron ORDER BY PAT_ID DESC LIMIT %s"
+    records = run_query(query, (limit + 1,), fetch=True) or []
+    has_more = len(records) > limit
+    records = records[:limit]
+    records.reverse()
+    return records, has_more
+
+def fetch_page_at(client_id, limit=PAGE_SIZE):
+    '''
+    Fetch the page starting at a client ID, or at the next ID after it.
+    
+    Args:
+        client_id (int): PAT_ID the page should start at
+        limit (int): Maximum number of records on the page
+    
+    Returns:
+        tuple: (records in ascending PAT_ID order, whether earlier records
+               exist, whether later records exist)
+    '''
+    records, has_next = fetch_page(after_id=client_id - 1, limit=limit)
+    if not records:
+        return records, False, False
+    
+    # One-row probe to find out whether anything precedes the page
+    earlier, _ = fetch_page(before_id=records[0][0], limit=1)
+    return records, bool(earlier), has_next
+
+def fetch_page_at_position(position, limit=PAGE_SIZE):
+    '''
+    Fetch the page that starts at a position in PAT_ID order.
+    
+    Only the PAT_ID at the position is found by skipping rows, so the skip
+    reads a single narrow column; the page itself is then read with a keyset
+    range scan from that ID. Each position maps to exactly one client, so
+    pages read this way and by fetch_page from their neighbours line up.
+    
+    Args:
+        position (int): Number of records before the page
+        limit (int): Maximum number of records on the page
+    
+    Returns:
+        list: Records in ascending PAT_ID order; empty past the end
+    '''
+    boundary = run_query("SELECT PAT_ID FROM live_patron ORDER BY PAT_ID LIMIT 1 OFFSET %s",
+                         (position,), fetch=True)
+    if not boundary:
+        return []
+    records, _ = fetch_page(after_id=boundary[0][0] - 1, limit=limit)
+    return records
+
+def fetch_all_patrons():
+    '''
+    Fetch every record at once.
+    
+    Returns:
+        list: Records in ascending PAT_ID order
+    '''
+    return run_query("SELECT * FROM live_patron ORDER BY PAT_ID", fetch=True) or []
+
+def iter_patrons(batch_size=STREAM_BATCH_SIZE):
+    '''
+    Stream every record in PAT_ID order.
+    
+    Records are read in keyset-paginated batches, so memory use does not
+    depend on the table size and no connection is held between batches.
+    
+    Args:
+        batch_size (int): Records read per query
+    
+    Yields:
+        tuple: The next patron record
+    '''
+    after_id = None
+    while True:
+        records, has_more = fetch_page(after_id=after_id, limit=batch_size)
+        yield from records
+        if not has_more:
+            return
+        after_id = records[-1][0]
+
+def get_patron(pat_id):
+    '''
+    Look up one record by client ID, through the patron cache.
+    
+    Writes still waiting in the write-behind queue are applied to the
+    record, so a client reads back what was just saved.
+    
+    Args:
+        pat_id (int): Client ID
+    
+    Returns:
+        tuple: The patron record, or None if no client has this ID
+    '''
+    row = fetch_patron(pat_id)
+    if write_queue.enabled:
+        row = write_queue.overlay(pat_id, row)
+    return row
+
+def get_patron_for_update(pat_id):
+    '''
+    Look up one record and its row version for editing.
+    
+    The row is read from the table, not the patron cache, so the version is
+    current. A queued write to the client is flushed first.
+    
+    Args:
+        pat_id (int): Client ID
+    
+    Returns:
+        tuple: (patron record, row version), or None if no client has this ID
+    '''
+    if write_queue.enabled and write_queue.pending(pat_id) is not None:
+        write_queue.flush()
+    result = run_query(f"SELECT {', '.join(PATRON_COLUMNS)}, PAT_VERSION FROM patron "
+                       "WHERE PAT_ID = %s AND PAT_DELETED = 0", (pat_id,), fetch=True)
+    if not result:
+        return None
+    return tuple(result[0][:-1]), result[0][-1]
+
+def find_patrons(field, value, mode=MATCH_CONTAINS, limit=None):
+    '''
+    Search records by name or preference.
+    
+    Args:
+        field (str): "Name" or "Preference"
+        value (str): Text to search for
+        mode (str): MATCH_CONTAINS or MATCH_PREFIX
+        limit (int, optional): Maximum number of records
+    
+    Returns:
+        list: Matching patron records, best match first
+    '''
+    return search_patrons(field, value, mode, limit)
+
+def add_patron(values):
+    '''
+    Validate and insert a new record.
+    
+    Args:
+        values (dict): Field name (see PATRON_FIELDS) -> raw value
+    
+    Returns:
+        int: Number of rows inserted; 1 once queued when the
+             write-behind queue is enabled
+    
+    Raises:
+        ValueError: If a value is missing or invalid
+        DuplicateClientError: If a client with the same ID exists
+    '''
+    params = parse_patron(values)
+    if write_queue.enabled:
+        if get_patron(params[0]) is not None:
+            raise DuplicateClientError(params[0])
+        write_queue.submit(params[0], WRITE_INSERT, dict(zip(PATRON_FIELDS, params)))
+        return 1
+    
+    try:
+        return _insert_patron(params)
+    finally:
+        patron_cache.invalidate(params[0])
+        notify_patron_write(params[0])
+
+def _insert_patron(params):
+    '''
+    Insert a client, first removing a deleted client with the same ID.
+    
+    Both statements run in one transaction, so a failed insert leaves the
+    deleted client for the purger.
+    
+    Args:
+        params (tuple): Row values in PATRON_COLUMNS order
+    
+    Returns:
+        int: Number of rows inserted
+    
+    Raises:
+        DuplicateClientError: If a live client with the same ID exists
+    '''
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for query, query_params in ((CLEAR_DELETED_QUERY, (params[0],)),
+                                        (INSERT_PATRON_QUERY, params)):
+                start = time.perf_counter()
+                try:
+                    cursor.execute(query, query_params)
+                except db_config.DatabaseError as err:
+                    query_stats.record(query, query_params, time.perf_counter() - start,
+                                       error=err)
+                    conn.rollback()
+                    if get_backend().is_duplicate_key(err):
+                        raise DuplicateClientError(params[0]) from err
+                    raise
+                inserted = cursor.rowcount
+                query_stats.record(query, query_params, time.perf_counter() - start, inserted)
+            conn.commit()
+            return inserted
+        finally:
+            cursor.close()
+
+def parse_updates(values):
+    '''
+    Convert the non-empty fields of an edit into typed values.
+    
+    Args:
+        values (dict): Field name -> raw value; empty values are skipped
+    
+    Returns:
+        dict: Field name -> converted value
+    
+    Raises:
+        ValueError: If a field is unknown or a value is not valid for its type
+    '''
+    updates = {}
+    for field, value in values.items():
+        if field not in UPDATE_COLUMNS:
+            raise ValueError(f"Field cannot be updated: {field}")
+        if value is None or value == '':
+            continue
+        updates[field] = FIELD_TYPES[field](value)
+    return updates
+
+def changed_fields(updates, row):
+    '''
+    Keep the updated fields whose value differs from a loaded record.
+    
+    Args:
+        updates (dict): Field name -> converted value, from parse_updates
+        row (tuple): The record as loaded, in PATRON_COLUMNS order
+    
+    Returns:
+        dict: Field name -> new value, for the changed fields only
+    '''
+    return {field: value for field, value in updates.items()
+            if row[PATRON_FIELDS.index(field)] != value}
+
+def update_patron(pat_id, values, original=None, version=None):
+    '''
+    Update the given fields of one record.
+    
+    When the record was loaded with get_patron_for_update, pass the loaded
+    record and version: only the fields that differ from it are written, and
+    the update is refused if another user changed the client in between.
+    
+    Args:
+        pat_id (int): Client ID
+        values (dict): Field name -> raw value; empty values are left unchanged
+        original (tuple, optional): The record as loaded
+        version (int, optional): Row version the record was loaded at
+    
+    Returns:
+        int: Number of rows updated; 1 once queued when the
+             write-behind queue is enabled
+    
+    Raises:
+        ValueError: If no field is changed or a value is invalid
+        UpdateConflictError: If the client changed or was deleted since it
+                             was loaded at ``version``
+    '''
+    updates = parse_updates(values)
+    if original is not None:
+        updates = changed_fields(updates, original)
+    if not updates:
+        raise ValueError("No fields were modified")
+    
+    if write_queue.enabled:
+        # Checked when queued; a change made by another desk before the
+        # flush is not detected
+        if version is not None:
+            current = get_patron_for_update(pat_id)
+            if current is None or current[1] != version:
+                raise UpdateConflictError(pat_id, current)
+        elif get_patron(pat_id) is None:
+            return 0
+        write_queue.submit(pat_id, WRITE_UPDATE, updates)
+        return 1
+    
+    set_clauses = ", ".join(f"{UPDATE_COLUMNS[field]} = %s" for field in updates)
+    params = list(updates.values()) + [pat_id]
+    query = (f"UPDATE patron SET {set_clauses}, {BUMP_VERSION} "
+             "WHERE PAT_ID = %s AND PAT_DELETED = 0")
+    if version is not None:
+        query += " AND PAT_VERSION = %s"
+        params.append(version)
+    
+    updated = write_patron(query, params, pat_id)
+    if not updated and version is not None:
+        raise UpdateConflictError(pat_id, get_patron_for_update(pat_id))
+    return updated
+
+def delete_patron(pat_id):
+    '''
+    Delete one record.
+    
+    The record is only marked as deleted, which hides it at once; the
+    purger removes it from the table later.
+    
+    Args:
+        pat_id (int): Client ID
+    
+    Returns:
+        int: Number of rows deleted; 1 once queued when the
+             write-behind queue is enabled
+    '''
+    if write_queue.enabled:
+        if get_patron(pat_id) is None:
+            return 0
+        write_queue.submit(pat_id, WRITE_DELETE)
+        return 1
+    
+    deleted = write_patron(f"UPDATE patron SET PAT_DELETED = 1, {BUMP_VERSION} "
+                           "WHERE PAT_ID = %s AND PAT_DELETED = 0", (pat_id,), pat_id)
+    if deleted:
+        purger.wake()
+    return deleted
@@ -0,0 +1,122 @@
+'''
+Startup timing module for the Client Management System.
+Measures cold-start time so regressions in import cost stay visible.
+
+Set STARTUP_TIMING=1 to have main.py print the time to the login window and
+to the main window. Run this module directly for an import-time breakdown:
+
+    python3 startup_timing.py --top 15 --budget-ms 300
+'''
+
+import os
+import sys
+import time
+
+# Reference point for all marks; main.py imports this module first
+_START = time.perf_counter()
+
+# Print marks as they are recorded
+ENABLED = os.getenv('STARTUP_TIMING', '') not in ('', '0')
+
+_marks = {}
+
+def mark(label, since=None):
+    '''
+    Record the time at which a startup milestone was reached.
+    
+    Args:
+        label (str): Name of the milestone
+        since (str, optional): Earlier milestone to also report the time from
+    
+    Returns:
+        float: Seconds since this module was imported
+    '''
+    elapsed = time.perf_counter() - _START
+    _marks[label] = elapsed
+    if ENABLED:
+        message = f"[startup] {label}: {elapsed * 1000:.1f} ms"
+        if since in _marks:
+            message += f" ({(elapsed - _marks[since]) * 1000:.1f} ms after {since})"
+        print(message, file=sys.stderr)
+    return elapsed
+
+def marks():
+    '''
+    Return the milestones recorded so far.
+    
+    Returns:
+        dict: Milestone name -> seconds since this module was imported
+    '''
+    return dict(_marks)
+
+def import_breakdown(module="main"):
+    '''
+    Measure the import time of a module and everything it imports.
+    
+    The module is imported in a fresh interpreter with ``-X importtime`` so
+    nothing is already cached.
+    
+    Args:
+        module (str): Module to import
+    
+    Returns:
+        list: (module name, self microseconds, cumulative microseconds,
+              nesting depth) tuples in import order
+    '''
+    import subprocess
+    
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+def main(argv=None):
+    '''
+    Print the slowest imports of the application entry point.
+    
+    Args:
+        argv (list, optional): Arguments; defaults to sys.argv[1:]
+    
+    Returns:
+        int: 1 if the total import time exceeds the budget, else 0
+    '''
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the application")
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--top", type=int, default=15, help="number of modules listed")
+    parser.add_argument("--budget-ms", type=float,
+                        help="fail if importing the module takes longer than this")
+    args = parser.parse_args(argv)
+    
+    entries = import_breakdown(args.module)
+    total_ms = next(e[2] for e in entries if e[0] == args.module) / 1000
+    
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, depth in sorted(entries, key=lambda e: -e[2])[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {'  ' * depth}{name}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms")
+    
+    # Heavy packages that should only load on first use
+    deferred = ("matplotlib", "numpy", "mysql")
+    loaded = sorted({e[0].split(".")[0] for e in entries} & set(deferred))
+    if loaded:
+        print(f"warning: loaded at startup: {', '.join(loaded)}")
+    
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"import time exceeds budget of {args.budget_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
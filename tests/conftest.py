@@ -0,0 +1,35 @@
+'''
+Shared fixtures for the Client Management System tests.
+Every test that touches the database gets its own SQLite file, so the tests
+need no MySQL server and never see each other's clients.
+'''
+
+import pytest
+
+from database.backends.sqlite import SQLiteBackend
+from database.cache import notify_patron_write, patron_cache
+from database.db_config import set_backend
+
+@pytest.fixture
+def backend(tmp_path):
+    '''Switch the application to an empty SQLite database for one test.'''
+    sqlite_backend = SQLiteBackend(str(tmp_path / "clients.sqlite"))
+    set_backend(sqlite_backend)
+    # Nothing read from another test's database may be served
+    patron_cache.clear()
+    notify_patron_write(None)
+    yield sqlite_backend
+    set_backend(None)
+    patron_cache.clear()
+
+@pytest.fixture
+def add_clients(backend):
+    '''Return a function that adds clients with the given IDs.'''
+    from services.records import add_patron
+    
+    def add(ids):
+        for pat_id in ids:
+            add_patron({"id": pat_id, "name": f"Client {pat_id}", "balance": 10.5,
+                        "contact": 5550100 + pat_id, "preference": "Email",
+                        "frequency": pat_id % 7})
+    return add
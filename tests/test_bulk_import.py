@@ -0,0 +1,104 @@
+'''
+Tests for bulk import on SQLite: CSV and JSON Lines input, per-row errors
+with their line numbers, duplicate IDs retried row by row, and IDs of
+deleted clients taken over.
+'''
+
+import json
+
+import pytest
+
+from database.db_config import run_query
+from services.bulk_import import detect_format, import_patrons
+from services.records import delete_patron, find_patrons, get_patron
+
+def stored_ids():
+    return [row[0] for row in run_query("SELECT PAT_ID FROM live_patron ORDER BY PAT_ID",
+                                        fetch=True)]
+
+def write_csv(tmp_path, lines):
+    path = tmp_path / "clients.csv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+def test_csv_import_in_chunks(backend, tmp_path):
+    # Column names and field names are both accepted, in any order
+    path = write_csv(tmp_path, ["PAT_ID,name,Balance,contact,PAT_PREFERENCE,frequency,notes"]
+                     + [f"{i},Client {i},{i}.5,555{i:04},Email,{i % 7},x" for i in range(1, 8)])
+    progress = []
+    report = import_patrons(path, chunk_size=3, on_progress=lambda r: progress.append(r.rows_read))
+    
+    assert (report.rows_read, report.rows_inserted, report.error_count) == (7, 7, 0)
+    assert progress == [3, 6, 7]
+    assert get_patron(4) == (4, "Client 4", 4.5, 5550004, "Email", 4)
+
+def test_invalid_rows_are_reported_and_the_rest_imported(backend, tmp_path):
+    path = write_csv(tmp_path, ["id,name,balance,contact,preference,frequency",
+                                "1,Ann,10,5550100,Email,1",
+                                "2,Bob,lots,5550101,Email,1",
+                                "3,,10,5550102,Email,1",
+                                "4,Cy,10,5550103,Email,1"])
+    report = import_patrons(path)
+    
+    assert report.rows_inserted == 2
+    assert [line_no for line_no, _ in report.errors] == [3, 4]
+    assert stored_ids() == [1, 4]
+
+def test_duplicate_ids_are_retried_row_by_row(add_clients, tmp_path):
+    add_clients([2])
+    path = write_csv(tmp_path, ["id,name,balance,contact,preference,frequency"]
+                     + [f"{i},New {i},1,5550100,Email,1" for i in (1, 2, 3, 3)])
+    report = import_patrons(path, chunk_size=10)
+    
+    assert report.rows_inserted == 2
+    assert [line_no for line_no, _ in report.errors] == [3, 5]
+    assert get_patron(2)[1] == "Client 2"
+    assert stored_ids() == [1, 2, 3]
+
+def test_jsonl_import_reports_lines_that_are_not_objects(backend, tmp_path):
+    path = tmp_path / "clients.jsonl"
+    record = {"id": 5, "name": "Dee", "balance": 3, "contact": 5550100,
+              "preference": "Phone", "frequency": 2}
+    path.write_text("\n".join([json.dumps(record), "{broken", "", "[1, 2]",
+                               json.dumps(dict(record, id=6))]) + "\n", encoding="utf-8")
+    report = import_patrons(str(path))
+    
+    assert report.rows_inserted == 2
+    assert [line_no for line_no, _ in report.errors] == [2, 4]
+    assert stored_ids() == [5, 6]
+
+def test_import_takes_over_ids_of_deleted_clients(add_clients, tmp_path):
+    add_clients([1, 2])
+    delete_patron(2)
+    path = write_csv(tmp_path, ["id,name,balance,contact,preference,frequency",
+                                "2,Imported,1,5550100,Email,1"])
+    assert import_patrons(path).rows_inserted == 1
+    assert get_patron(2)[1] == "Imported"
+
+def test_imported_clients_can_be_searched(add_clients, tmp_path):
+    add_clients([1])
+    find_patrons("Name", "client")
+    path = write_csv(tmp_path, ["id,name,balance,contact,preference,frequency",
+                                "2,Zelda Imported,1,5550100,Email,1"])
+    import_patrons(path)
+    assert [row[0] for row in find_patrons("Name", "zelda")] == [2]
+
+def test_cancelled_import_stops_between_chunks(backend, tmp_path):
+    class StopAfterFirst:
+        calls = 0
+        
+        def is_set(self):
+            self.calls += 1
+            return self.calls > 1
+    
+    path = write_csv(tmp_path, ["id,name,balance,contact,preference,frequency"]
+                     + [f"{i},C {i},1,5550100,Email,1" for i in range(1, 6)])
+    report = import_patrons(path, chunk_size=2, cancel_event=StopAfterFirst())
+    assert report.cancelled
+    assert stored_ids() == [1, 2]
+
+def test_format_is_detected_from_the_extension():
+    assert detect_format("a/b.CSV") == "csv"
+    assert detect_format("clients.ndjson") == "jsonl"
+    with pytest.raises(ValueError):
+        detect_format("clients.xlsx")
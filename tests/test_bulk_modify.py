@@ -0,0 +1,90 @@
+'''
+Tests for bulk modify on SQLite: ID lists, filter selections read in
+chunks, set and adjusted values, and the preview of a selection.
+'''
+
+import pytest
+
+from database.db_config import run_query
+from database.search_index import MATCH_PREFIX
+from services.bulk_modify import MAX_BULK_IDS, bulk_update, parse_ids, preview_bulk_update
+from services.records import get_patron, get_patron_for_update
+
+IDS = list(range(1, 21))
+
+@pytest.fixture
+def clients(add_clients):
+    add_clients(IDS)
+    return IDS
+
+def balances():
+    return dict(run_query("SELECT PAT_ID, PAT_BALANCE FROM patron ORDER BY PAT_ID", fetch=True))
+
+def test_parse_ids_expands_ranges_and_drops_duplicates():
+    assert parse_ids("7, 3 10-12\n3, 11 - 13") == [3, 7, 10, 11, 12, 13]
+
+@pytest.mark.parametrize("text", ["4-2", "3, x", f"1-{MAX_BULK_IDS + 1}"])
+def test_parse_ids_refuses_invalid_lists(text):
+    with pytest.raises(ValueError):
+        parse_ids(text)
+
+def test_update_by_ids_changes_only_those_clients(clients):
+    report = bulk_update(ids=[3, 5, 5, 99], values={"balance": "42"}, chunk_size=1)
+    assert report.rows_updated == 2
+    assert report.chunks == 3
+    assert {pat_id for pat_id, balance in balances().items() if balance == 42} == {3, 5}
+
+def test_update_by_filter_reads_the_selection_in_chunks(clients):
+    # Frequency is the ID modulo 7
+    report = bulk_update(conditions=[("frequency", "=", "3")],
+                         adjustments={"balance": "1.5"}, chunk_size=2)
+    selected = [pat_id for pat_id in clients if pat_id % 7 == 3]
+    assert report.rows_updated == len(selected)
+    assert report.chunks == 2
+    assert {pat_id for pat_id, balance in balances().items() if balance == 12} == set(selected)
+
+def test_ids_and_filter_select_clients_matching_both(clients):
+    report = bulk_update(ids=clients, conditions=[("id", ">", "15")],
+                         values={"preference": "Phone"})
+    assert report.rows_updated == 5
+    assert get_patron(16)[4] == "Phone"
+    assert get_patron(15)[4] == "Email"
+
+def test_update_bumps_the_row_version(clients):
+    version = get_patron_for_update(4)[1]
+    bulk_update(ids=[4], adjustments={"frequency": "1"})
+    assert get_patron_for_update(4)[1] == version + 1
+
+def test_cancelled_update_stops_between_chunks(clients):
+    class StopAfterFirst:
+        calls = 0
+        
+        def is_set(self):
+            self.calls += 1
+            return self.calls > 1
+    
+    report = bulk_update(ids=clients, values={"balance": "0"}, chunk_size=5,
+                         cancel_event=StopAfterFirst())
+    assert report.cancelled
+    assert report.rows_updated == 5
+    assert sorted(pat_id for pat_id, balance in balances().items() if balance == 0) == IDS[:5]
+
+@pytest.mark.parametrize("kwargs", [
+    {"values": {"balance": "1"}},
+    {"ids": [1], "values": {}},
+    {"ids": [1], "values": {"balance": "1"}, "adjustments": {"balance": "2"}},
+    {"conditions": [("colour", "=", "red")], "values": {"balance": "1"}},
+])
+def test_invalid_bulk_update_is_refused(clients, kwargs):
+    with pytest.raises(ValueError):
+        bulk_update(**kwargs)
+    assert set(balances().values()) == {10.5}
+
+def test_preview_counts_the_selection_and_shows_the_first_rows(clients):
+    count, rows = preview_bulk_update(ids=[20, 2, 9, 4], limit=3)
+    assert count == 4
+    assert [row[0] for row in rows] == [2, 4, 9]
+    
+    count, rows = preview_bulk_update(conditions=[("name", MATCH_PREFIX, "Client 1")], limit=2)
+    assert count == 11
+    assert [row[0] for row in rows] == [1, 10]
@@ -0,0 +1,69 @@
+'''
+Tests for the patron cache: LRU eviction and expiry, rows read before a
+write are not stored after it, and every write path invalidates the rows
+it changes.
+'''
+
+import pytest
+
+from database.cache import PatronCache, patron_cache
+from database.db_config import run_query
+from services.bulk_modify import bulk_delete, bulk_update
+from services.records import delete_patron, get_patron, update_patron
+
+@pytest.fixture
+def clients(add_clients):
+    add_clients([1, 2, 3])
+    return [1, 2, 3]
+
+def test_least_recently_used_row_is_evicted():
+    cache = PatronCache(max_size=2)
+    cache.put(1, ("one",))
+    cache.put(2, ("two",))
+    cache.get(1)
+    cache.put(3, ("three",))
+    
+    assert cache.get(2) is None
+    assert cache.get(1) == ("one",)
+    assert cache.stats()['evictions'] == 1
+
+def test_expired_row_is_a_miss():
+    cache = PatronCache(ttl=0)
+    cache.put(1, ("one",))
+    assert cache.get(1) is None
+    assert cache.stats()['expirations'] == 1
+
+def test_row_read_before_an_invalidation_is_not_stored():
+    cache = PatronCache()
+    epoch = cache.epoch
+    cache.invalidate(1)
+    cache.put(1, ("stale",), epoch=epoch)
+    assert cache.get(1) is None
+
+def test_reads_go_through_the_cache(clients):
+    get_patron(2)
+    # A change behind the application's back is not seen until the row is invalidated
+    run_query("UPDATE patron SET PAT_NAME = 'Direct' WHERE PAT_ID = 2", commit=True)
+    assert get_patron(2)[1] == "Client 2"
+    
+    patron_cache.invalidate(2)
+    assert get_patron(2)[1] == "Direct"
+
+@pytest.mark.parametrize("write", [
+    lambda: update_patron(2, {"name": "Changed"}),
+    lambda: bulk_update(ids=[2], values={"name": "Changed"}),
+    lambda: bulk_update(conditions=[("id", ">=", "2")], values={"name": "Changed"}),
+])
+def test_updates_invalidate_the_cached_row(clients, write):
+    get_patron(2)
+    write()
+    assert get_patron(2)[1] == "Changed"
+
+@pytest.mark.parametrize("write", [
+    lambda: delete_patron(2),
+    lambda: bulk_delete(ids=[2]),
+])
+def test_deletes_invalidate_the_cached_row(clients, write):
+    get_patron(2)
+    write()
+    assert get_patron(2) is None
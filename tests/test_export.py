@@ -0,0 +1,105 @@
+'''
+Tests for streaming export on SQLite: CSV, gzipped JSON Lines and Parquet
+output, filtered exports, and stopped or failed exports that leave any
+earlier file in place.
+'''
+
+import csv
+import gzip
+import json
+import os
+
+import pytest
+
+from database.patron import PATRON_COLUMNS
+from database.search_index import MATCH_PREFIX
+from services.export import detect_export_format, export_patrons, parquet_available
+from services.records import delete_patron, get_patron
+
+IDS = list(range(1, 8))
+
+@pytest.fixture
+def clients(add_clients):
+    add_clients(IDS)
+    delete_patron(3)
+    return [pat_id for pat_id in IDS if pat_id != 3]
+
+@pytest.fixture
+def out_dir(tmp_path):
+    '''Directory holding nothing but the export.'''
+    path = tmp_path / "out"
+    path.mkdir()
+    return path
+
+def test_csv_export_writes_every_live_client_in_batches(clients, tmp_path):
+    path = str(tmp_path / "clients.csv")
+    progress = []
+    report = export_patrons(path, batch_size=4,
+                            on_progress=lambda r: progress.append(r.rows_written))
+    
+    assert report.rows_written == len(clients)
+    assert progress == [4, 6]
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(PATRON_COLUMNS)
+    assert [int(row[0]) for row in rows[1:]] == clients
+    assert rows[1] == [str(value) for value in get_patron(1)]
+    assert not os.path.exists(path + ".part")
+
+def test_gzipped_jsonl_export(clients, tmp_path):
+    path = str(tmp_path / "clients.jsonl.gz")
+    export_patrons(path)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["PAT_ID"] for record in records] == clients
+    assert tuple(records[0].values()) == get_patron(1)
+
+def test_filtered_export(add_clients, tmp_path):
+    add_clients([1, 10, 11, 21])
+    path = str(tmp_path / "clients.csv")
+    
+    export_patrons(path, field="Name", value="client 1", mode=MATCH_PREFIX)
+    with open(path, newline="", encoding="utf-8") as f:
+        assert [row[0] for row in list(csv.reader(f))[1:]] == ["1", "10", "11"]
+    
+    export_patrons(path, field="Name", value="1")
+    with open(path, newline="", encoding="utf-8") as f:
+        assert [row[0] for row in list(csv.reader(f))[1:]] == ["1", "10", "11", "21"]
+    
+    with pytest.raises(ValueError):
+        export_patrons(path, field="Name", value="")
+
+def test_stopped_export_keeps_the_earlier_file(clients, out_dir):
+    path = out_dir / "clients.csv"
+    path.write_text("earlier export\n", encoding="utf-8")
+    
+    class StopAtOnce:
+        def is_set(self):
+            return True
+    
+    report = export_patrons(str(path), batch_size=2, cancel_event=StopAtOnce())
+    assert report.cancelled
+    assert report.rows_written == 2
+    assert path.read_text(encoding="utf-8") == "earlier export\n"
+    assert os.listdir(out_dir) == ["clients.csv"]
+
+@pytest.mark.skipif(parquet_available(), reason="pyarrow is installed")
+def test_parquet_export_without_pyarrow_is_refused(clients, out_dir):
+    with pytest.raises(ValueError):
+        export_patrons(str(out_dir / "clients.parquet"))
+    assert os.listdir(out_dir) == []
+
+def test_parquet_export(clients, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "clients.parquet")
+    export_patrons(path, batch_size=4)
+    table = pq.read_table(path)
+    assert table.column_names == list(PATRON_COLUMNS)
+    assert table.column("PAT_ID").to_pylist() == clients
+
+def test_export_format_is_detected_from_the_extension():
+    assert detect_export_format("out/clients.CSV.gz") == "csv"
+    assert detect_export_format("clients.ndjson") == "jsonl"
+    assert detect_export_format("clients.parquet") == "parquet"
+    with pytest.raises(ValueError):
+        detect_export_format("clients.xlsx")
@@ -0,0 +1,86 @@
+'''
+Tests for schema migrations on SQLite: a new database, and a patron table
+created before migrations were recorded.
+'''
+
+import sqlite3
+
+from database.backends.sqlite import SQLiteBackend
+from database.db_config import get_pool, run_query, set_backend
+from database.migrations import MIGRATIONS, migrate, migration_status
+
+# The patron table as the first release created it
+ORIGINAL_TABLE = '''
+    CREATE TABLE patron (
+        PAT_ID INTEGER PRIMARY KEY,
+        PAT_NAME VARCHAR(50) COLLATE NOCASE,
+        PAT_BALANCE FLOAT,
+        PAT_CONTACT INT,
+        PAT_PREFERENCE VARCHAR(50) COLLATE NOCASE,
+        PAT_FREQUENCY INT
+    )
+'''
+
+VERSIONS = [version for version, _, _ in MIGRATIONS]
+
+def columns(conn):
+    return [row[1] for row in conn.execute("PRAGMA table_info(patron)")]
+
+def index_columns(conn, name):
+    return [row[2] for row in conn.execute(f"PRAGMA index_info({name})")]
+
+def applied(backend):
+    with get_pool().connection() as conn:
+        return [version for version, _, applied_at in migration_status(conn, backend)
+                if applied_at is not None]
+
+def test_new_database_gets_the_current_schema(backend):
+    assert run_query("SELECT COUNT(*) FROM live_patron", fetch=True) == [(0,)]
+    assert applied(backend) == VERSIONS
+    with sqlite3.connect(backend.path) as conn:
+        assert columns(conn)[-2:] == ["PAT_DELETED", "PAT_VERSION"]
+
+def test_pre_migration_table_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute(ORIGINAL_TABLE)
+        conn.execute("CREATE INDEX idx_patron_name ON patron (PAT_NAME)")
+        conn.executemany("INSERT INTO patron VALUES (?, ?, ?, ?, ?, ?)",
+                         [(1, "Ann", 1.5, 5550100, "Email", 2),
+                          (2, "Bob", 3.0, 5550101, "Phone", 4)])
+    conn.close()
+    
+    backend = SQLiteBackend(path)
+    set_backend(backend)
+    try:
+        # The first connection migrates the table
+        rows = run_query("SELECT * FROM live_patron ORDER BY PAT_ID", fetch=True)
+        assert rows == [(1, "Ann", 1.5, 5550100, "Email", 2), (2, "Bob", 3.0, 5550101, "Phone", 4)]
+        assert applied(backend) == VERSIONS
+        with get_pool().connection() as conn:
+            assert migrate(conn, backend) == []
+    finally:
+        set_backend(None)
+    
+    with sqlite3.connect(path) as conn:
+        assert columns(conn) == ["PAT_ID", "PAT_NAME", "PAT_BALANCE", "PAT_CONTACT",
+                                 "PAT_PREFERENCE", "PAT_FREQUENCY", "PAT_DELETED", "PAT_VERSION"]
+        assert conn.execute("SELECT PAT_DELETED, PAT_VERSION FROM patron").fetchall() == [(0, 0),
+                                                                                          (0, 0)]
+        assert index_columns(conn, "idx_patron_name") == ["PAT_NAME", "PAT_DELETED"]
+    conn.close()
+
+def test_interrupted_migration_is_repeated(tmp_path):
+    path = str(tmp_path / "partial.sqlite")
+    with sqlite3.connect(path) as conn:
+        conn.execute(ORIGINAL_TABLE)
+        # Step 4 added its column but was not recorded
+        conn.execute("ALTER TABLE patron ADD COLUMN PAT_VERSION INTEGER NOT NULL DEFAULT 0")
+    conn.close()
+    
+    backend = SQLiteBackend(path, create_schema=False)
+    conn = backend.connect()
+    try:
+        assert migrate(conn, backend) == VERSIONS
+    finally:
+        conn.close()
@@ -0,0 +1,139 @@
+'''
+Tests for keyset pagination on SQLite: first, next, previous and last
+pages, jumps to a client ID, the ends of the table, and the row count
+loaded in the background.
+'''
+
+import pytest
+
+from database.db_config import run_query
+from operations.display import PatronRowSource
+from services.records import fetch_last_page, fetch_page, fetch_page_at, fetch_page_at_position
+
+# Even IDs only, so every odd ID falls in a gap
+IDS = list(range(2, 52, 2))
+
+def ids_of(records):
+    return [record[0] for record in records]
+
+@pytest.fixture
+def clients(add_clients):
+    add_clients(IDS)
+    return IDS
+
+def test_first_page(clients):
+    records, has_more = fetch_page(limit=10)
+    assert ids_of(records) == clients[:10]
+    assert has_more
+
+def test_next_pages_until_the_end(clients):
+    seen = []
+    after_id, has_more = None, True
+    while has_more:
+        records, has_more = fetch_page(after_id=after_id, limit=10)
+        seen += ids_of(records)
+        after_id = records[-1][0]
+    assert seen == clients
+
+def test_page_that_exactly_fills_the_limit_has_no_more(clients):
+    records, has_more = fetch_page(after_id=clients[-11], limit=10)
+    assert ids_of(records) == clients[-10:]
+    assert not has_more
+
+def test_previous_page_is_returned_in_ascending_order(clients):
+    records, has_more = fetch_page(before_id=clients[12], limit=5)
+    assert ids_of(records) == clients[7:12]
+    assert has_more
+
+def test_nothing_before_the_first_client(clients):
+    assert fetch_page(before_id=clients[0], limit=5) == ([], False)
+
+def test_last_page(clients):
+    records, has_earlier = fetch_last_page(limit=10)
+    assert ids_of(records) == clients[-10:]
+    assert has_earlier
+    records, has_earlier = fetch_last_page(limit=len(clients))
+    assert ids_of(records) == clients
+    assert not has_earlier
+
+def test_page_at_existing_id(clients):
+    records, has_prev, has_next = fetch_page_at(clients[0], limit=10)
+    assert ids_of(records) == clients[:10]
+    assert not has_prev
+    assert has_next
+
+def test_page_at_id_in_a_gap_starts_at_the_next_client(clients):
+    records, has_prev, has_next = fetch_page_at(clients[4] + 1, limit=10)
+    assert ids_of(records) == clients[5:15]
+    assert has_prev
+    assert has_next
+
+def test_page_at_last_client(clients):
+    records, has_prev, has_next = fetch_page_at(clients[-1], limit=10)
+    assert ids_of(records) == clients[-1:]
+    assert has_prev
+    assert not has_next
+
+def test_page_at_id_past_the_end(clients):
+    assert fetch_page_at(clients[-1] + 1, limit=10) == ([], False, False)
+
+def test_deleted_clients_are_skipped(clients):
+    run_query("UPDATE patron SET PAT_DELETED = 1 WHERE PAT_ID IN (%s, %s)",
+              (clients[1], clients[2]), commit=True)
+    records, _ = fetch_page(limit=3)
+    assert ids_of(records) == [clients[0], clients[3], clients[4]]
+    records, has_prev, _ = fetch_page_at(clients[1], limit=1)
+    assert ids_of(records) == [clients[3]]
+    assert has_prev
+
+def test_page_at_position(clients):
+    assert ids_of(fetch_page_at_position(10, limit=5)) == clients[10:15]
+    assert ids_of(fetch_page_at_position(len(clients) - 3, limit=5)) == clients[-3:]
+    assert fetch_page_at_position(len(clients), limit=5) == []
+
+def test_jumps_show_every_client_once_with_gapped_ids(add_clients):
+    # Two dense runs far apart: interpolating between them would miss pages
+    ids = list(range(1, 11)) + list(range(1000, 1011))
+    add_clients(ids)
+    source = PatronRowSource(page_size=5)
+    assert source.count() == len(ids)
+    
+    # Every page read as a jump, with no neighbour cached
+    pages = len(ids) // 5 + 1
+    shown = [ids_of(PatronRowSource(page_size=5).load_page(page_no)) for page_no in range(pages)]
+    assert sum(shown, []) == ids
+    
+    # Pages reached by jumping to the middle and scrolling both ways line up
+    rows = [source.get_page(page_no) for page_no in (2, 3, 1, 4, 0)]
+    assert sorted(sum((ids_of(page) for page in rows), [])) == ids
+
+class QueuedTasks:
+    '''Task group stand-in that runs submitted work when told to.'''
+    
+    def __init__(self):
+        self.queued = []
+    
+    def submit(self, fn, *args, on_success=None, on_error=None):
+        self.queued.append(lambda: on_success(fn(*args)))
+    
+    def run(self):
+        while self.queued:
+            self.queued.pop(0)()
+
+def test_count_is_reported_as_loading_until_it_arrives(clients):
+    tasks = QueuedTasks()
+    source = PatronRowSource(page_size=5, tasks=tasks)
+    assert source.count() == 0
+    assert source.count_loading
+    
+    tasks.run()
+    assert not source.count_loading
+    assert source.count() == len(clients)
+
+def test_empty_table_is_not_loading_once_counted(backend):
+    tasks = QueuedTasks()
+    source = PatronRowSource(tasks=tasks)
+    source.count()
+    tasks.run()
+    assert source.count() == 0
+    assert not source.count_loading
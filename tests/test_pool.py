@@ -0,0 +1,102 @@
+'''
+Tests for the connection pool: checkout timeouts, idle eviction and health
+checks, with stand-in connections instead of a database.
+'''
+
+import threading
+import time
+
+import pytest
+
+from database.pool import ConnectionPool, PoolTimeoutError
+
+class FakeConnection:
+    '''Connection that only records whether it was closed.'''
+    
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+def make_pool(**kwargs):
+    '''Create a pool of FakeConnection objects numbered in creation order.'''
+    created = []
+    
+    def connect():
+        conn = FakeConnection(len(created))
+        created.append(conn)
+        return conn
+    
+    return ConnectionPool(connect, **kwargs), created
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    pool, _ = make_pool(size=1)
+    pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+    assert pool.stats()["waits"] == 1
+
+def test_waiting_checkout_gets_released_connection():
+    pool, created = make_pool(size=1)
+    conn = pool.acquire()
+    timer = threading.Timer(0.05, pool.release, (conn,))
+    timer.start()
+    try:
+        assert pool.acquire(timeout=2.0) is conn
+    finally:
+        timer.join()
+    assert len(created) == 1
+
+def test_idle_connections_are_reused_most_recent_first():
+    pool, created = make_pool(size=2)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is second
+    assert pool.stats()["reuses"] == 1
+    assert len(created) == 2
+
+def test_idle_connection_past_timeout_is_evicted():
+    pool, created = make_pool(size=1, idle_timeout=0.01)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.05)
+    
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed
+    assert len(created) == 2
+    assert pool.stats()["evicted"] == 1
+
+def test_unhealthy_idle_connection_is_replaced():
+    healthy = {"ok": True}
+    pool, created = make_pool(size=1, health_check_interval=0.0,
+                              is_healthy=lambda conn: healthy["ok"])
+    conn = pool.acquire()
+    pool.release(conn)
+    healthy["ok"] = False
+    time.sleep(0.01)
+    
+    assert pool.acquire() is not conn
+    assert conn.closed
+    assert len(created) == 2
+    assert pool.stats()["discarded"] == 1
+
+def test_discarded_connection_frees_its_slot():
+    pool, created = make_pool(size=1)
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert conn.closed
+    assert pool.acquire(timeout=0.05) is created[1]
+
+def test_closed_pool_refuses_checkouts():
+    pool, created = make_pool(size=1)
+    pool.release(pool.acquire())
+    pool.close()
+    assert created[0].closed
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,75 @@
+'''
+Tests for adding and editing records on SQLite: a new client may take the
+ID of a deleted one, the row version catches edits made by another user,
+and only changed fields are written.
+'''
+
+import pytest
+
+from database.db_config import run_query
+from services.records import (DuplicateClientError, UpdateConflictError, add_patron,
+                             get_patron_for_update, update_patron)
+
+NEW_CLIENT = {"id": 9, "name": "Ann Lee", "balance": "10", "contact": "5550100",
+              "preference": "Email", "frequency": "2"}
+
+@pytest.fixture
+def client_id(add_clients):
+    add_clients([7])
+    return 7
+
+def test_update_with_current_version_bumps_it(client_id):
+    row, version = get_patron_for_update(client_id)
+    assert update_patron(client_id, {"balance": "99"}, row, version) == 1
+    row, new_version = get_patron_for_update(client_id)
+    assert row[2] == 99.0
+    assert new_version == version + 1
+
+def test_update_with_stale_version_is_refused(client_id):
+    row, version = get_patron_for_update(client_id)
+    update_patron(client_id, {"name": "Changed elsewhere"})
+    
+    with pytest.raises(UpdateConflictError) as conflict:
+        update_patron(client_id, {"balance": "1"}, row, version)
+    current_row, current_version = conflict.value.current
+    assert current_row[1] == "Changed elsewhere"
+    assert current_version == version + 1
+    assert get_patron_for_update(client_id)[0][2] == row[2]
+
+def test_update_of_deleted_client_is_refused(client_id):
+    row, version = get_patron_for_update(client_id)
+    run_query("UPDATE patron SET PAT_DELETED = 1, PAT_VERSION = PAT_VERSION + 1 "
+              "WHERE PAT_ID = %s", (client_id,), commit=True)
+    with pytest.raises(UpdateConflictError) as conflict:
+        update_patron(client_id, {"balance": "1"}, row, version)
+    assert conflict.value.current is None
+
+def test_unchanged_fields_are_not_written(client_id):
+    row, version = get_patron_for_update(client_id)
+    with pytest.raises(ValueError):
+        update_patron(client_id, {"name": row[1], "balance": str(row[2])}, row, version)
+    assert get_patron_for_update(client_id)[1] == version
+
+def test_add_reuses_the_id_of_a_deleted_client(backend):
+    add_patron(NEW_CLIENT)
+    run_query("UPDATE patron SET PAT_DELETED = 1 WHERE PAT_ID = 9", commit=True)
+    assert add_patron(dict(NEW_CLIENT, name="Second")) == 1
+    assert run_query("SELECT PAT_NAME, PAT_DELETED FROM patron WHERE PAT_ID = 9",
+                     fetch=True) == [("Second", 0)]
+
+def test_add_of_a_live_id_is_refused(backend):
+    add_patron(NEW_CLIENT)
+    with pytest.raises(DuplicateClientError):
+        add_patron(dict(NEW_CLIENT, name="Second"))
+    assert run_query("SELECT PAT_NAME FROM patron WHERE PAT_ID = 9", fetch=True) == [("Ann Lee",)]
+
+def test_failed_add_keeps_the_deleted_client(backend):
+    add_patron(NEW_CLIENT)
+    run_query("UPDATE patron SET PAT_DELETED = 1 WHERE PAT_ID = 9", commit=True)
+    run_query("CREATE TRIGGER refuse BEFORE INSERT ON patron "
+              "BEGIN SELECT RAISE(ABORT, 'refused'); END", commit=True)
+    
+    with pytest.raises(backend.error_class):
+        add_patron(dict(NEW_CLIENT, name="Second"))
+    assert run_query("SELECT PAT_NAME, PAT_DELETED FROM patron WHERE PAT_ID = 9",
+                     fetch=True) == [("Ann Lee", 1)]
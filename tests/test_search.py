@@ -0,0 +1,81 @@
+'''
+Tests for name and preference search on SQLite: ranking of substring
+matches, short terms, prefix matches, wildcards taken literally, the
+trigram index following writes, and refining earlier results.
+'''
+
+import pytest
+
+from database.search_index import (MATCH_CONTAINS, MATCH_PREFIX, TrigramIndex, refine_results,
+                                   refines, search_patrons)
+from services.records import add_patron, delete_patron, update_patron
+
+NAMES = {1: "Banner", 2: "Mary Ann", 3: "Annabel", 4: "Ann", 5: "Joanne", 6: "Bob", 7: "100% Ann_"}
+
+@pytest.fixture
+def clients(backend):
+    for pat_id, name in NAMES.items():
+        add_patron({"id": pat_id, "name": name, "balance": "1", "contact": "5550100",
+                    "preference": "Email" if pat_id % 2 else "Phone", "frequency": "1"})
+    return NAMES
+
+def names(rows):
+    return [row[1] for row in rows]
+
+def test_trigram_index_ranks_exact_prefix_word_then_inner_matches():
+    index = TrigramIndex()
+    for pat_id, name in NAMES.items():
+        index.add(pat_id, name)
+    assert index.search("ANN", 10) == [4, 3, 2, 7, 1, 5]
+    
+    index.add(4, "Anne")
+    index.remove(3)
+    assert index.search("ann", 2) == [4, 2]
+    with pytest.raises(ValueError):
+        index.search("an", 10)
+
+def test_contains_search_ranks_best_match_first(clients):
+    assert names(search_patrons("Name", "ann")) == ["Ann", "Annabel", "Mary Ann", "100% Ann_",
+                                                    "Banner", "Joanne"]
+    assert names(search_patrons("Name", "ANN", limit=2)) == ["Ann", "Annabel"]
+
+def test_short_terms_are_matched_without_the_index(clients):
+    assert names(search_patrons("Name", "bo")) == ["Bob"]
+    assert names(search_patrons("Name", "An"))[:2] == ["Ann", "Annabel"]
+
+def test_prefix_search_takes_wildcards_literally(clients):
+    assert names(search_patrons("Name", "ann", MATCH_PREFIX)) == ["Ann", "Annabel"]
+    assert names(search_patrons("Name", "100%", MATCH_PREFIX)) == ["100% Ann_"]
+    assert search_patrons("Name", "1_0", MATCH_PREFIX) == []
+    assert names(search_patrons("Name", "n_", MATCH_CONTAINS)) == ["100% Ann_"]
+
+def test_preference_search(clients):
+    rows = search_patrons("Preference", "phone")
+    assert sorted(row[0] for row in rows) == [2, 4, 6]
+
+def test_index_follows_writes(clients):
+    assert 5 in [row[0] for row in search_patrons("Name", "joanne")]
+    
+    update_patron(5, {"name": "Joan"})
+    delete_patron(3)
+    add_patron({"id": 8, "name": "Hannah", "balance": "1", "contact": "5550100",
+                "preference": "Email", "frequency": "1"})
+    
+    assert search_patrons("Name", "joanne") == []
+    assert names(search_patrons("Name", "ann")) == ["Ann", "Mary Ann", "100% Ann_", "Banner",
+                                                    "Hannah"]
+
+@pytest.mark.parametrize("mode, previous, value", [
+    (MATCH_CONTAINS, "an", "ann"),
+    (MATCH_CONTAINS, "ann", "anne"),
+    (MATCH_PREFIX, "a", "ann"),
+])
+def test_refined_results_match_a_new_search(clients, mode, previous, value):
+    assert refines(previous, value, mode)
+    rows = search_patrons("Name", previous, mode)
+    assert refine_results(rows, "Name", value, mode) == search_patrons("Name", value, mode)
+
+def test_values_that_do_not_narrow_a_search_are_not_refinements():
+    assert not refines("ann", "an")
+    assert not refines("ann", "joann", MATCH_PREFIX)
+    assert refines("ann", "joann")
@@ -0,0 +1,114 @@
+'''
+Tests for the HTTP service on SQLite: the client endpoints over a real
+socket, status codes for bad requests and conflicts, row versions as ETags,
+streamed results and keep-alive connections.
+'''
+
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from server import serve
+
+NEW_CLIENT = {"id": 9, "name": "Ann Lee", "balance": 10, "contact": 5550100,
+              "preference": "Email", "frequency": 2}
+
+@pytest.fixture
+def address(backend):
+    '''Run the service on a free port for one test.'''
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    bound = []
+    task = loop.create_task(serve("127.0.0.1", 0, on_ready=lambda a: (bound.append(a),
+                                                                       ready.set())))
+    
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield bound[0]
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(5)
+    loop.close()
+
+@pytest.fixture
+def conn(address):
+    connection = http.client.HTTPConnection(*address, timeout=5)
+    yield connection
+    connection.close()
+
+def call(conn, method, path, body=None, headers=None):
+    '''Send a request and return (status, headers, decoded JSON body or None).'''
+    data = None if body is None else json.dumps(body)
+    conn.request(method, path, body=data, headers=headers or {})
+    response = conn.getresponse()
+    raw = response.read()
+    return response.status, response, json.loads(raw) if raw else None
+
+def test_create_then_read_a_client(conn):
+    status, response, body = call(conn, "POST", "/patrons", NEW_CLIENT)
+    assert status == 201
+    assert response.getheader("Location") == "/patrons/9"
+    
+    status, response, body = call(conn, "GET", "/patrons/9")
+    assert status == 200
+    assert body["PAT_NAME"] == "Ann Lee"
+    assert response.getheader("ETag") == '"0"'
+
+@pytest.mark.parametrize("body, status", [
+    (dict(NEW_CLIENT, id=7), 409),
+    (dict(NEW_CLIENT, id="x"), 400),
+    ({"id": 8}, 400),
+])
+def test_create_refuses_duplicate_and_invalid_clients(add_clients, conn, body, status):
+    add_clients([7])
+    assert call(conn, "POST", "/patrons", body)[0] == status
+
+def test_update_checks_the_row_version(add_clients, conn):
+    add_clients([7])
+    stale = {"If-Match": '"0"'}
+    assert call(conn, "PATCH", "/patrons/7", {"balance": 20}, stale)[0] == 204
+    
+    status, response, body = call(conn, "PATCH", "/patrons/7", {"balance": 30}, stale)
+    assert status == 412
+    assert response.getheader("ETag") == '"1"'
+    assert body["current"]["PAT_BALANCE"] == 20
+
+def test_deleted_client_is_gone(add_clients, conn):
+    add_clients([7])
+    assert call(conn, "DELETE", "/patrons/7")[0] == 204
+    assert call(conn, "GET", "/patrons/7")[0] == 404
+    assert call(conn, "DELETE", "/patrons/7")[0] == 404
+
+def test_pages_and_stream_cover_every_client(add_clients, conn):
+    add_clients(range(1, 8))
+    status, _, body = call(conn, "GET", "/patrons?limit=5")
+    assert [record["PAT_ID"] for record in body["records"]] == [1, 2, 3, 4, 5]
+    assert body["has_more"] and body["next_after"] == 5
+    
+    conn.request("GET", "/patrons.jsonl?batch_size=3")
+    response = conn.getresponse()
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    lines = response.read().decode("utf-8").splitlines()
+    assert [json.loads(line)["PAT_ID"] for line in lines] == list(range(1, 8))
+
+def test_search(add_clients, conn):
+    add_clients([1, 12, 3])
+    status, _, body = call(conn, "GET", "/search?field=name&value=client%201&prefix=1")
+    assert sorted(record["PAT_ID"] for record in body["records"]) == [1, 12]
+    assert call(conn, "GET", "/search?field=contact&value=1")[0] == 400
+
+def test_unknown_paths_and_methods(conn):
+    assert call(conn, "GET", "/nothing")[0] == 404
+    status, response, _ = call(conn, "DELETE", "/patrons")
+    assert status == 405
+    assert set(response.getheader("Allow").split(", ")) == {"GET", "POST"}
+    assert call(conn, "GET", "/patrons?limit=0")[0] == 400
@@ -0,0 +1,99 @@
+'''
+Tests for the columnar snapshot on SQLite: single-client writes applied in
+place, and the on-disk copy reconciled with the database on a warm start.
+'''
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from database.db_config import run_query
+from database.snapshot import PatronSnapshot
+from services.records import add_patron, delete_patron, update_patron
+
+IDS = list(range(1, 9))
+
+@pytest.fixture
+def clients(add_clients):
+    add_clients(IDS)
+    return IDS
+
+@pytest.fixture
+def saved(clients, tmp_path):
+    '''Load a snapshot once, leaving its copy in the cache directory.'''
+    cache_dir = str(tmp_path / "snapshot")
+    PatronSnapshot(batch_size=3, cache_dir=cache_dir).sync()
+    return cache_dir
+
+def warm_start(cache_dir):
+    snapshot = PatronSnapshot(batch_size=3, cache_dir=cache_dir)
+    snapshot.sync(wait=True)
+    return snapshot
+
+def server_rows():
+    return run_query("SELECT PAT_ID, PAT_BALANCE, PAT_PREFERENCE FROM live_patron "
+                     "ORDER BY PAT_ID", fetch=True)
+
+def held_rows(snapshot):
+    balances = snapshot.column('balance')
+    return [(int(pat_id), float(balance), snapshot.categories[code])
+            for pat_id, balance, code in zip(snapshot.ids, balances, snapshot.codes)]
+
+def test_load_reads_every_live_client(clients):
+    delete_patron(3)
+    snapshot = PatronSnapshot(batch_size=3)
+    assert held_rows(snapshot) == server_rows()
+    assert snapshot.group_by_preference() == [("Email", len(clients) - 1)]
+
+def test_writes_are_applied_before_the_next_read(clients):
+    snapshot = PatronSnapshot(batch_size=3)
+    snapshot.sync()
+    
+    update_patron(2, {"preference": "Phone"})
+    delete_patron(5)
+    add_patron({"id": 20, "name": "New", "balance": "1", "contact": "5", "preference": "Mail",
+                "frequency": "1"})
+    for pat_id in (2, 5, 20):
+        snapshot.on_write(pat_id)
+    
+    assert held_rows(snapshot) == server_rows()
+
+def test_warm_start_maps_an_unchanged_copy(saved):
+    snapshot = warm_start(saved)
+    assert isinstance(snapshot.ids, np.memmap)
+    assert held_rows(snapshot) == server_rows()
+
+def test_warm_start_appends_clients_added_since(saved):
+    add_patron({"id": 30, "name": "Late", "balance": "2", "contact": "6", "preference": "SMS",
+                "frequency": "3"})
+    snapshot = warm_start(saved)
+    assert held_rows(snapshot) == server_rows()
+    assert snapshot.watermark() == PatronSnapshot._server_watermark()
+
+@pytest.mark.parametrize("change", [
+    # A preference change leaves every numeric sum alone; only the version shows it
+    lambda: update_patron(4, {"preference": "Phone"}),
+    lambda: update_patron(4, {"balance": "99"}),
+    lambda: delete_patron(4),
+])
+def test_warm_start_reloads_a_copy_with_changed_rows(saved, change):
+    change()
+    snapshot = warm_start(saved)
+    assert held_rows(snapshot) == server_rows()
+    assert not isinstance(snapshot.ids, np.memmap)
+    
+    # The reloaded copy is saved for the next start
+    assert held_rows(warm_start(saved)) == server_rows()
+
+def test_copy_of_another_database_is_ignored(saved):
+    meta_path = os.path.join(saved, "meta.json")
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(dict(meta, source="sqlite:///elsewhere.sqlite"), f)
+    
+    snapshot = PatronSnapshot(cache_dir=saved)
+    snapshot.sync()
+    assert not isinstance(snapshot.ids, np.memmap)
@@ -0,0 +1,75 @@
+'''
+Tests for soft delete on SQLite: deleted clients disappear from every read
+at once, bulk deletes follow the selection, and the purge removes only
+deleted rows, in chunks.
+'''
+
+import threading
+
+import pytest
+
+from database.db_config import run_query
+from services.bulk_modify import bulk_delete
+from services.purge import count_deleted, next_deleted_ids, purge_deleted
+from services.records import count_patrons, delete_patron, fetch_page, get_patron
+
+IDS = list(range(1, 13))
+
+@pytest.fixture
+def clients(add_clients):
+    add_clients(IDS)
+    return IDS
+
+def stored_ids():
+    return [row[0] for row in run_query("SELECT PAT_ID FROM patron ORDER BY PAT_ID", fetch=True)]
+
+def test_deleted_client_is_hidden_but_kept(clients):
+    assert get_patron(4) is not None
+    assert delete_patron(4) == 1
+    
+    assert get_patron(4) is None
+    assert count_patrons() == len(clients) - 1
+    assert 4 not in [record[0] for record in fetch_page(limit=100)[0]]
+    assert 4 in stored_ids()
+    assert count_deleted() == 1
+
+def test_deleting_twice_deletes_nothing(clients):
+    delete_patron(4)
+    assert delete_patron(4) == 0
+    assert delete_patron(99) == 0
+
+def test_bulk_delete_by_ids_and_filter(clients):
+    report = bulk_delete(ids=[2, 3, 4, 50], conditions=[("frequency", "!=", "3")])
+    assert report.rows_updated == 2
+    assert count_deleted() == 2
+    # Frequency is the ID modulo 7, so client 3 does not match
+    assert get_patron(2) is None and get_patron(4) is None
+    assert get_patron(3) is not None
+
+def test_bulk_delete_by_filter_skips_deleted_clients(clients):
+    delete_patron(5)
+    report = bulk_delete(conditions=[("id", "<=", "6")], chunk_size=4)
+    assert report.rows_updated == 5
+    assert report.chunks == 2
+    assert count_patrons() == len(clients) - 6
+
+def test_purge_removes_only_deleted_clients(clients):
+    bulk_delete(ids=[1, 3, 5, 7, 9])
+    assert next_deleted_ids(2) == [1, 3]
+    
+    report = purge_deleted(chunk_size=2, pause_ms=0)
+    assert report.rows_purged == 5
+    assert report.chunks == 3
+    assert stored_ids() == [2, 4, 6, 8, 10, 11, 12]
+    assert count_deleted() == 0
+
+def test_purge_stops_when_cancelled_or_at_max_rows(clients):
+    bulk_delete(ids=clients)
+    assert purge_deleted(chunk_size=3, pause_ms=0, max_rows=5).rows_purged == 6
+    
+    cancel = threading.Event()
+    cancel.set()
+    report = purge_deleted(cancel_event=cancel)
+    assert report.cancelled
+    assert report.rows_purged == 0
+    assert count_deleted() == 6
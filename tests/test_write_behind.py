@@ -0,0 +1,209 @@
+'''
+Tests for the write-behind queue: how pending writes to one client are
+merged, and what a flush does with writes queued while it runs.
+'''
+
+import threading
+import time
+
+import pytest
+
+from database.db_config import run_query
+from database.write_behind import (WRITE_DELETE, WRITE_INSERT, WRITE_UPDATE, PendingWrite,
+                                   WriteBehindQueue)
+
+CLIENT = {"id": 1, "name": "Ann Lee", "balance": 10.0, "contact": 5550100,
+          "preference": "Email", "frequency": 2}
+
+def merged(*writes):
+    '''Merge writes in order, as the queue does; None if nothing is left.'''
+    result = writes[0]
+    for write in writes[1:]:
+        if result is None:
+            result = write
+        else:
+            result = result.merge(write)
+    return result
+
+def test_insert_then_update_is_one_insert():
+    write = merged(PendingWrite(WRITE_INSERT, CLIENT), PendingWrite(WRITE_UPDATE, {"balance": 5.0}))
+    assert write.kind == WRITE_INSERT
+    assert write.values == dict(CLIENT, balance=5.0)
+    assert not write.replace
+
+def test_insert_then_delete_cancels_out():
+    assert merged(PendingWrite(WRITE_INSERT, CLIENT), PendingWrite(WRITE_DELETE)) is None
+
+def test_replacing_insert_then_delete_still_deletes():
+    write = merged(PendingWrite(WRITE_INSERT, CLIENT, replace=True), PendingWrite(WRITE_DELETE))
+    assert write.kind == WRITE_DELETE
+
+def test_updates_combine_later_values_first():
+    write = merged(PendingWrite(WRITE_UPDATE, {"balance": 1.0, "name": "A"}),
+                   PendingWrite(WRITE_UPDATE, {"balance": 2.0}))
+    assert write.kind == WRITE_UPDATE
+    assert write.values == {"balance": 2.0, "name": "A"}
+
+def test_update_then_delete_is_a_delete():
+    write = merged(PendingWrite(WRITE_UPDATE, {"balance": 1.0}), PendingWrite(WRITE_DELETE))
+    assert write.kind == WRITE_DELETE
+
+def test_delete_then_insert_replaces_the_client():
+    write = merged(PendingWrite(WRITE_DELETE), PendingWrite(WRITE_INSERT, CLIENT))
+    assert write.kind == WRITE_INSERT
+    assert write.replace
+
+def test_merge_keeps_the_oldest_queue_time():
+    first = PendingWrite(WRITE_UPDATE, {"balance": 1.0}, queued_at=1.0)
+    assert first.merge(PendingWrite(WRITE_UPDATE, {"balance": 2.0}, queued_at=5.0)).queued_at == 1.0
+
+@pytest.fixture
+def queue(backend, tmp_path):
+    '''A started queue that only flushes when a test calls flush.'''
+    write_queue = WriteBehindQueue(str(tmp_path / "spool.jsonl"), batch_size=10 ** 6,
+                                   delay_ms=10 ** 9)
+    write_queue.start()
+    yield write_queue
+    write_queue.close()
+
+def stored(pat_id):
+    '''The stored row of a client with its deleted flag, or None.'''
+    rows = run_query("SELECT PAT_NAME, PAT_BALANCE, PAT_DELETED FROM patron WHERE PAT_ID = %s",
+                     (pat_id,), fetch=True)
+    return rows[0] if rows else None
+
+def during_flush(queue, action):
+    '''Make the next flush run an action once its batch is taken.'''
+    write_batch = queue._write_batch
+    
+    def run_once(batch):
+        queue._write_batch = write_batch
+        action()
+        return write_batch(batch)
+    queue._write_batch = run_once
+
+def test_flush_writes_merged_insert(queue):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    queue.submit(1, WRITE_UPDATE, {"balance": 7.5})
+    assert queue.flush() == 1
+    assert stored(1) == ("Ann Lee", 7.5, 0)
+    assert queue.pending(1) is None
+
+def test_delete_during_flush_of_insert_is_kept(queue):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    during_flush(queue, lambda: queue.submit(1, WRITE_DELETE))
+    queue.flush()
+    
+    # The insert was committed, so the delete must still run
+    assert stored(1) == ("Ann Lee", 10.0, 0)
+    assert queue.pending(1).kind == WRITE_DELETE
+    queue.flush()
+    assert stored(1)[2] == 1
+
+def test_update_during_flush_applies_on_top(queue):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    during_flush(queue, lambda: queue.submit(1, WRITE_UPDATE, {"name": "Ann Smith"}))
+    queue.flush()
+    assert queue.pending(1).kind == WRITE_UPDATE
+    queue.flush()
+    assert stored(1) == ("Ann Smith", 10.0, 0)
+
+def test_failed_flush_merges_back_under_later_writes(queue, backend):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    
+    def fail(batch):
+        queue.submit(1, WRITE_UPDATE, {"balance": 3.0})
+        raise backend.error_class("database went away")
+    queue._write_batch = fail
+    assert queue.flush() == 0
+    assert queue.last_error == "database went away"
+    
+    write = queue.pending(1)
+    assert write.kind == WRITE_INSERT
+    assert write.values["balance"] == 3.0
+
+def test_delete_during_failed_flush_cancels_the_insert(queue, backend):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    
+    def fail(batch):
+        queue.submit(1, WRITE_DELETE)
+        raise backend.error_class("database went away")
+    queue._write_batch = fail
+    queue.flush()
+    assert queue.pending(1) is None
+
+def test_unexpected_error_propagates_and_keeps_writes(queue):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    
+    def fail(batch):
+        raise KeyError("bug")
+    during_flush(queue, lambda: fail(None))
+    with pytest.raises(KeyError):
+        queue.flush()
+    assert queue.pending(1).kind == WRITE_INSERT
+    assert queue.flush() == 1
+
+def test_insert_over_live_client_is_rejected(queue):
+    run_query("INSERT INTO patron (PAT_ID, PAT_NAME, PAT_BALANCE, PAT_CONTACT, PAT_PREFERENCE, "
+              "PAT_FREQUENCY) VALUES (1, 'Existing', 1, 1, 'Phone', 1)", commit=True)
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    queue.submit(2, WRITE_INSERT, dict(CLIENT, id=2))
+    assert queue.flush() == 1
+    
+    assert stored(1) == ("Existing", 1.0, 0)
+    assert stored(2) == ("Ann Lee", 10.0, 0)
+    assert [(pat_id, kind) for pat_id, kind, _ in queue.failed] == [(1, WRITE_INSERT)]
+
+def test_insert_replaces_deleted_client(queue):
+    run_query("INSERT INTO patron (PAT_ID, PAT_NAME, PAT_BALANCE, PAT_CONTACT, PAT_PREFERENCE, "
+              "PAT_FREQUENCY, PAT_DELETED) VALUES (1, 'Old', 1, 1, 'Phone', 1, 1)", commit=True)
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    assert queue.flush() == 1
+    assert stored(1) == ("Ann Lee", 10.0, 0)
+    assert not queue.failed
+
+def test_replayed_insert_already_written_is_skipped(queue):
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    queue.flush()
+    # As if the spool had not been cleared before a crash
+    queue.submit(1, WRITE_INSERT, CLIENT)
+    assert queue.flush() == 1
+    assert not queue.failed
+
+def test_pending_does_not_start_the_queue(backend, tmp_path):
+    write_queue = WriteBehindQueue(str(tmp_path / "spool.jsonl"))
+    assert write_queue.pending(1) is None
+    assert write_queue._thread is None
+
+def test_close_waits_for_a_slow_flush_before_unlocking(backend, tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    write_queue = WriteBehindQueue(spool_path, batch_size=1, delay_ms=10 ** 9)
+    write_queue.start()
+    flushing = threading.Event()
+    write_batch = write_queue._write_batch
+    
+    def slow(batch):
+        flushing.set()
+        time.sleep(0.3)
+        return write_batch(batch)
+    write_queue._write_batch = slow
+    write_queue.submit(1, WRITE_INSERT, CLIENT)
+    assert flushing.wait(2.0)
+    thread = write_queue._thread
+    
+    # The flush outlasts close: its write is not in the database yet
+    assert write_queue.close(timeout=0.01) == 1
+    with pytest.raises(RuntimeError, match="closed"):
+        write_queue.submit(2, WRITE_INSERT, dict(CLIENT, id=2))
+    # The spool is still locked against other processes
+    with pytest.raises(RuntimeError, match="in use"):
+        WriteBehindQueue(spool_path).start()
+    
+    thread.join(2.0)
+    assert not thread.is_alive()
+    assert stored(1) == ("Ann Lee", 10.0, 0)
+    # Unlocked once the flush ended, with nothing left to replay
+    replay = WriteBehindQueue(spool_path)
+    replay.start()
+    assert replay.pending(1) is None
+    replay.close()
@@ -0,0 +1,8 @@
+'''
+Widgets package initialization.
+Import all reusable widget classes to make them accessible from the widgets package.
+'''
+
+from widgets.tasks import TaskGroup, show_database_error
+from widgets.virtual_grid import VirtualGrid, ListRowSource, PagedRowSource
+from widgets.client_selector import ClientSelector
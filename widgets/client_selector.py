@@ -0,0 +1,85 @@
+'''
+Client selector widget module for the Client Management System.
+Lets the user pick many clients at once, by ID list or by a filter.
+'''
+
+import tkinter as tk
+from tkinter import ttk
+
+from services.bulk_modify import FILTER_COLUMNS, FILTER_OPERATORS, parse_ids
+
+# Selection choices
+BY_IDS = "Client IDs"
+BY_FILTER = "Filter"
+
+class ClientSelector(ttk.LabelFrame):
+    '''
+    Frame for selecting clients by a list of IDs and ranges or by a filter.
+    
+    The filter is one condition: a field, an operator from FILTER_OPERATORS
+    and a value.
+    '''
+    
+    def __init__(self, parent, text="Clients", **kwargs):
+        '''
+        Initialize the client selector.
+        
+        Args:
+            parent: Parent tkinter widget
+            text (str): Frame title
+            **kwargs: Options passed on to ttk.LabelFrame
+        '''
+        super().__init__(parent, text=text, **kwargs)
+        
+        self.select_by = tk.StringVar(value=BY_IDS)
+        ttk.Radiobutton(self, text="Client IDs:", value=BY_IDS, variable=self.select_by,
+                        command=self.update_state).grid(row=0, column=0, padx=5, pady=5,
+                                                        sticky="w")
+        self.ids_entry = ttk.Entry(self, width=50)
+        self.ids_entry.grid(row=0, column=1, columnspan=3, padx=5, pady=5, sticky="w")
+        ttk.Label(self, text="e.g. 3, 7, 10-20").grid(row=0, column=4, padx=5, pady=5)
+        
+        ttk.Radiobutton(self, text="Filter:", value=BY_FILTER, variable=self.select_by,
+                        command=self.update_state).grid(row=1, column=0, padx=5, pady=5,
+                                                        sticky="w")
+        self.filter_field = ttk.Combobox(self, values=list(FILTER_COLUMNS), state="disabled",
+                                         width=12)
+        self.filter_field.grid(row=1, column=1, padx=5, pady=5)
+        self.filter_field.current(0)
+        
+        self.filter_operator = ttk.Combobox(self, values=FILTER_OPERATORS, state="disabled",
+                                            width=10)
+        self.filter_operator.grid(row=1, column=2, padx=5, pady=5)
+        self.filter_operator.current(0)
+        
+        self.filter_value = ttk.Entry(self, width=20, state="disabled")
+        self.filter_value.grid(row=1, column=3, padx=5, pady=5)
+    
+    def update_state(self):
+        '''Enable the inputs of the chosen way of selecting clients.'''
+        by_ids = self.select_by.get() == BY_IDS
+        self.ids_entry.config(state="normal" if by_ids else "disabled")
+        self.filter_field.config(state="disabled" if by_ids else "readonly")
+        self.filter_operator.config(state="disabled" if by_ids else "readonly")
+        self.filter_value.config(state="disabled" if by_ids else "normal")
+    
+    def selection(self):
+        '''
+        Read the selected clients.
+        
+        Returns:
+            tuple: (client IDs or None, filter conditions or None)
+        
+        Raises:
+            ValueError: If the IDs or the filter are missing or invalid
+        '''
+        if self.select_by.get() == BY_IDS:
+            ids = parse_ids(self.ids_entry.get())
+            if not ids:
+                raise ValueError("Please enter the client IDs")
+            return ids, None
+        
+        value = self.filter_value.get().strip()
+        if not value:
+            raise ValueError("Please enter a value to filter on")
+        return None, [(self.filter_field.get(), self.filter_operator.get(), value)]
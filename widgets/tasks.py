@@ -0,0 +1,163 @@
+'''
+Background task module for the Client Management System.
+Delivers results of background database work back onto the Tk thread.
+'''
+
+import tkinter as tk
+from tkinter import messagebox
+
+from database.executor import get_executor
+from database.pool import PoolTimeoutError
+
+class TaskGroup:
+    '''
+    Set of background tasks owned by a Tk widget.
+    
+    Tasks run on the shared query executor. Their results are collected by
+    polling with ``after()`` so callbacks always run on the Tk thread. When
+    the owning widget is destroyed, queued tasks are cancelled and results
+    of tasks that were already running are dropped.
+    '''
+    
+    def __init__(self, widget, busy_label=None, executor=None, poll_interval=30):
+        '''
+        Initialize the task group.
+        
+        Args:
+            widget: Tk widget that owns the tasks
+            busy_label (optional): Label that shows "Loading..." while tasks run
+            executor (QueryExecutor, optional): Executor to run tasks on
+            poll_interval (int): Milliseconds between result checks
+        '''
+        self.widget = widget
+        self.busy_label = busy_label
+        self.executor = executor or get_executor()
+        self.poll_interval = poll_interval
+        
+        self._pending = {}  # future -> (on_success, on_error)
+        self._poll_id = None
+        self._closed = False
+        
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+    
+    @property
+    def busy(self):
+        '''Whether any task is still pending.'''
+        return bool(self._pending)
+    
+    def submit(self, fn, *args, on_success=None, on_error=None, **kwargs):
+        '''
+        Run a callable in the background and deliver its outcome on the Tk thread.
+        
+        Args:
+            fn (callable): Function to run on a worker thread
+            *args: Positional arguments for the function
+            on_success (callable, optional): Called with the function's result
+            on_error (callable, optional): Called with the raised exception
+            **kwargs: Keyword arguments for the function
+        
+        Returns:
+            concurrent.futures.Future: Future for the function's result, or
+            None if the owning widget has already been destroyed
+        '''
+        if self._closed:
+            return None
+        
+        future = self.executor.submit(fn, *args, **kwargs)
+        self._pending[future] = (on_success, on_error)
+        self._set_busy(True)
+        self._schedule_poll()
+        return future
+    
+    def cancel(self, future):
+        '''
+        Cancel a task, or drop its result if it is already running.
+        
+        Args:
+            future: Future returned by ``submit``
+        '''
+        if future is None:
+            return
+        future.cancel()
+        if self._pending.pop(future, None) is not None and not self._pending:
+            self._set_busy(False)
+    
+    def cancel_all(self):
+        '''Cancel every pending task and drop their results.'''
+        for future in list(self._pending):
+            future.cancel()
+        self._pending.clear()
+        self._set_busy(False)
+    
+    def _schedule_poll(self):
+        '''Schedule a result check if one is not already scheduled.'''
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+    
+    def _poll(self):
+        '''Deliver the outcome of every finished task.'''
+        self._poll_id = None
+        
+        done = [future for future in self._pending if future.done()]
+        for future in done:
+            callbacks = self._pending.pop(future, None)
+            if callbacks is None or future.cancelled():
+                continue
+            on_success, on_error = callbacks
+            error = future.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_success:
+                on_success(future.result())
+            
+            # A callback may have destroyed the owning widget
+            if self._closed:
+                return
+        
+        if self._pending:
+            self._schedule_poll()
+        else:
+            self._set_busy(False)
+    
+    def _set_busy(self, busy):
+        '''
+        Show or hide the loading state.
+        
+        Args:
+            busy (bool): Whether tasks are running
+        '''
+        if self._closed:
+            return
+        try:
+            if self.busy_label is not None:
+                self.busy_label.config(text="Loading..." if busy else "")
+            self.widget.winfo_toplevel().config(cursor="watch" if busy else "")
+        except tk.TclError:
+            # The widgets are being destroyed
+            pass
+    
+    def _on_destroy(self, event):
+        '''Cancel outstanding work when the owning widget is destroyed.'''
+        if event.widget is not self.widget:
+            return
+        self.cancel_all()
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+
+def show_database_error(error):
+    '''
+    Report an error raised by a background database task.
+    
+    Args:
+        error (Exception): The exception raised by the task
+    '''
+    if isinstance(error, PoolTimeoutError):
+        messagebox.showerror("Database Connection Error", f"Failed to connect to database: {error}")
+    else:
+        messagebox.showerror("Database Error", f"Error executing query: {error}")
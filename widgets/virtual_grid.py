@@ -0,0 +1,445 @@
+'''
+Virtual grid widget module for the Client Management System.
+Provides a Treeview-based grid that only materializes the rows in view.
+'''
+
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+from widgets.tasks import show_database_error
+
+class ListRowSource:
+    '''Row source backed by an in-memory list of rows.'''
+    
+    def __init__(self, rows=None):
+        '''
+        Initialize the row source.
+        
+        Args:
+            rows (list, optional): Rows to serve
+        '''
+        self.rows = list(rows or [])
+    
+    def count(self):
+        '''Return the total number of rows.'''
+        return len(self.rows)
+    
+    def get_rows(self, start, stop):
+        '''
+        Return rows in the half-open range [start, stop).
+        
+        Args:
+            start (int): Index of the first row
+            stop (int): Index one past the last row
+        
+        Returns:
+            list: The requested rows
+        '''
+        return self.rows[start:stop]
+
+class PagedRowSource:
+    '''
+    Lazy row source that loads fixed-size pages on demand and caches them.
+    
+    Subclasses implement ``load_count`` and ``load_page``; at most
+    ``max_pages`` pages are kept, least recently used pages are dropped first.
+    
+    When a task group is given, missing pages are loaded in the background:
+    placeholder rows are served until the page arrives, then ``on_update``
+    is called so the grid can redraw.
+    '''
+    
+    # Value shown in the first column of rows that are still loading
+    PLACEHOLDER = "..."
+    
+    def __init__(self, page_size=200, max_pages=50, tasks=None):
+        '''
+        Initialize the row source.
+        
+        Args:
+            page_size (int): Number of rows per cached page
+            max_pages (int): Maximum number of pages kept in memory
+            tasks (TaskGroup, optional): Task group used to load pages in the background
+        '''
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.tasks = tasks
+        self.on_update = None
+        self._pages = OrderedDict()
+        self._count = None
+        self._loading = set()
+        self._generation = 0
+    
+    def load_count(self):
+        '''Return the total number of rows. Must be implemented by subclasses.'''
+        raise NotImplementedError
+    
+    def load_page(self, page_no):
+        '''
+        Load one page of rows. Must be implemented by subclasses.
+        
+        Args:
+            page_no (int): Zero-based page number
+        
+        Returns:
+            list: Rows on the page
+        '''
+        raise NotImplementedError
+    
+    def cached_page(self, page_no):
+        '''
+        Return a page if it is cached, without loading it.
+        
+        Args:
+            page_no (int): Zero-based page number
+        
+        Returns:
+            list: Rows on the page, or None if the page is not cached
+        '''
+        return self._pages.get(page_no)
+    
+    def count(self):
+        '''Return the total number of rows, loading it on first use.'''
+        if self._count is None:
+            if self.tasks is None:
+                self._count = self.load_count() or 0
+            else:
+                self._load_async("count", self.load_count)
+                return 0
+        return self._count
+    
+    @property
+    def count_loading(self):
+        '''True while the row count is being loaded in the background.'''
+        return "count" in self._loading
+    
+    def get_page(self, page_no):
+        '''
+        Return a page, loading and caching it if necessary.
+        
+        Args:
+            page_no (int): Zero-based page number
+        
+        Returns:
+            list: Rows on the page, or None while it loads in the background
+        '''
+        page = self._pages.get(page_no)
+        if page is None:
+            if self.tasks is not None:
+                self._load_async(page_no, self.load_page, page_no)
+                return None
+            page = self._store_page(page_no, self.load_page(page_no))
+        else:
+            self._pages.move_to_end(page_no)
+        return page
+    
+    def _store_page(self, page_no, page):
+        '''
+        Cache a loaded page, evicting the least recently used pages.
+        
+        Args:
+            page_no (int): Zero-based page number
+            page (list): Rows on the page
+        
+        Returns:
+            list: The cached page
+        '''
+        page = page or []
+        self._pages[page_no] = page
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+    
+    def _load_async(self, key, fn, *args):
+        '''
+        Load the row count or a page on the task group.
+        
+        Args:
+            key: "count" or a page number
+            fn (callable): Loader to run in the background
+            *args: Arguments for the loader
+        '''
+        if key in self._loading:
+            return
+        self._loading.add(key)
+        generation = self._generation
+        
+        def loaded(value):
+            if generation != self._generation:
+                # The source was invalidated while loading
+                return
+            self._loading.discard(key)
+            if key == "count":
+                self._count = value or 0
+            else:
+                self._store_page(key, value)
+            if self.on_update:
+                self.on_update()
+        
+        def failed(error):
+            self._loading.discard(key)
+            show_database_error(error)
+        
+        self.tasks.submit(fn, *args, on_success=loaded, on_error=failed)
+    
+    def get_rows(self, start, stop):
+        '''
+        Return rows in the half-open range [start, stop).
+        
+        Args:
+            start (int): Index of the first row
+            stop (int): Index one past the last row
+        
+        Returns:
+            list: The requested rows
+        '''
+        rows = []
+        if stop <= start:
+            return rows
+        for page_no in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            page = self.get_page(page_no)
+            base = page_no * self.page_size
+            if page is None:
+                # Still loading; serve placeholders for the covered range
+                first = max(start, base)
+                last = min(stop, base + self.page_size)
+                rows.extend((self.PLACEHOLDER,) for _ in range(first, last))
+            else:
+                rows.extend(page[max(start - base, 0):stop - base])
+        return rows
+    
+    def invalidate(self):
+        '''Drop all cached pages and the cached row count.'''
+        self._pages.clear()
+        self._count = None
+        self._loading.clear()
+        self._generation += 1
+        if self.on_update:
+            self.on_update()
+
+class VirtualGrid(ttk.Frame):
+    '''
+    Grid widget that only creates Treeview items for the rows in view.
+    
+    The underlying Treeview holds one item per visible row plus a small
+    buffer. Scrolling reassigns values to those items from the row source
+    instead of inserting and deleting items, so the cost of a scroll step
+    does not depend on how many rows the source holds.
+    '''
+    
+    def __init__(self, parent, columns, source=None, widths=None, anchors=None,
+                 buffer=2, empty_text="No records found", loading_text="Loading records...",
+                 **kwargs):
+        '''
+        Initialize the virtual grid.
+        
+        Args:
+            parent: Parent tkinter widget
+            columns (tuple): Column names, also used as headings
+            source (optional): Row source with ``count()`` and ``get_rows(start, stop)``
+            widths (dict, optional): Column name -> width in pixels
+            anchors (dict, optional): Column name -> tkinter anchor
+            buffer (int): Extra items materialized below the viewport
+            empty_text (str): Text shown when the source has no rows
+            loading_text (str): Text shown while the source loads its row count
+        '''
+        super().__init__(parent, **kwargs)
+        
+        self.columns = tuple(columns)
+        self.buffer = buffer
+        self.empty_text = empty_text
+        self.loading_text = loading_text
+        self.source = ListRowSource()
+        
+        # Viewport state
+        self.top = 0
+        self.visible_rows = 1
+        self.selected_index = None
+        self._items = []
+        self._row_height = self._lookup_row_height()
+        
+        # Scrollbar driven by the virtual position, not by the Treeview
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings",
+                                 selectmode="browse")
+        self.tree.pack(side="left", fill="both", expand=True)
+        
+        widths = widths or {}
+        anchors = anchors or {}
+        for col in self.columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=widths.get(col, 80), anchor=anchors.get(col, tk.W))
+        
+        # Bindings
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll_rows(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self.scroll_rows(self.visible_rows))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(self.source.count()))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        
+        self.set_source(source or ListRowSource())
+    
+    def _lookup_row_height(self):
+        '''Return the Treeview row height from the current style.'''
+        try:
+            height = int(ttk.Style().lookup("Treeview", "rowheight") or 0)
+        except (tk.TclError, ValueError):
+            height = 0
+        return height or 20
+    
+    def set_source(self, source):
+        '''
+        Replace the row source and scroll back to the top.
+        
+        Args:
+            source: Row source with ``count()`` and ``get_rows(start, stop)``
+        '''
+        self.source = source
+        self.top = 0
+        self.selected_index = None
+        if hasattr(source, "on_update"):
+            source.on_update = self.refresh
+        self.refresh()
+    
+    def scroll_to(self, index):
+        '''
+        Scroll so that the given row index is at the top of the viewport.
+        
+        Args:
+            index (int): Row index to show first
+        '''
+        total = self.source.count()
+        max_top = max(total - self.visible_rows, 0)
+        top = min(max(int(index), 0), max_top)
+        if top != self.top:
+            self.top = top
+            self.refresh()
+    
+    def scroll_rows(self, delta):
+        '''
+        Scroll by a number of rows.
+        
+        Args:
+            delta (int): Rows to scroll; negative values scroll up
+        '''
+        self.scroll_to(self.top + delta)
+        return "break"
+    
+    def refresh(self):
+        '''Redraw the visible rows from the row source.'''
+        total = self.source.count()
+        wanted = self.visible_rows + self.buffer
+        
+        # Grow or shrink the pool of materialized items
+        while len(self._items) < wanted:
+            self._items.append(self.tree.insert("", tk.END, values=()))
+        while len(self._items) > wanted:
+            self.tree.delete(self._items.pop())
+        
+        if total == 0:
+            # A paged source reports 0 rows until its count has loaded
+            loading = getattr(self.source, "count_loading", False)
+            rows = [(self.loading_text if loading else self.empty_text,)]
+        else:
+            rows = self.source.get_rows(self.top, min(self.top + wanted, total))
+        
+        for offset, item in enumerate(self._items):
+            if offset < len(rows):
+                self.tree.item(item, values=rows[offset])
+            else:
+                self.tree.item(item, values=())
+        
+        # Restore the selection if the selected row is still in view
+        selected = ()
+        if self.selected_index is not None:
+            offset = self.selected_index - self.top
+            if 0 <= offset < len(rows):
+                selected = (self._items[offset],)
+        self.tree.selection_set(selected)
+        
+        # Keep the Treeview itself pinned; scrolling is entirely virtual
+        self.tree.yview_moveto(0)
+        
+        # Update the scrollbar to reflect the virtual position
+        if total:
+            first = self.top / total
+            last = min((self.top + self.visible_rows) / total, 1.0)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+    
+    def selected_row(self):
+        '''
+        Return the values of the selected row.
+        
+        Returns:
+            tuple: Values of the selected row, or None if nothing is selected
+        '''
+        if self.selected_index is None:
+            return None
+        rows = self.source.get_rows(self.selected_index, self.selected_index + 1)
+        return tuple(rows[0]) if rows else None
+    
+    def _on_resize(self, event):
+        '''Recompute how many rows fit when the grid is resized.'''
+        # Leave room for the heading row
+        visible = max((event.height - self._row_height - 4) // self._row_height, 1)
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self.scroll_to(self.top)
+            self.refresh()
+    
+    def _on_scrollbar(self, *args):
+        '''Handle scrollbar drags, arrow clicks and trough clicks.'''
+        total = self.source.count()
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * total)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self.scroll_rows(amount)
+    
+    def _on_mousewheel(self, event):
+        '''Scroll in response to mouse wheel events on Windows and macOS.'''
+        step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self.scroll_rows(step * 3)
+    
+    def _on_select(self, event):
+        '''Translate a Treeview selection into a virtual row index.'''
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self._items:
+            return
+        index = self.top + self._items.index(selection[0])
+        if index < self.source.count():
+            self.selected_index = index
+        self.tree.yview_moveto(0)
+    
+    def _move_selection(self, delta):
+        '''
+        Move the selection up or down, scrolling when it leaves the viewport.
+        
+        Args:
+            delta (int): Rows to move; negative values move up
+        '''
+        total = self.source.count()
+        if not total:
+            return "break"
+        current = self.top if self.selected_index is None else self.selected_index
+        index = min(max(current + delta, 0), total - 1)
+        self.selected_index = index
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.visible_rows:
+            self.scroll_to(index - self.visible_rows + 1)
+        self.refresh()
+        return "break"